@@ -0,0 +1,313 @@
+"""
+Archive Module - Moves closed documents into one archive database per financial year
+Run: python archive.py [database] --before YYYY-MM-DD [--dir archive]
+     python archive.py [database] --list
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from datetime import date, datetime
+from urllib.request import pathname2url
+
+DEFAULT_ARCHIVE_DIR = 'archive'
+
+# Tables whose closed rows move to the archive, parents first
+ARCHIVED_TABLES = ('Purchase_Orders', 'Purchase_Order_Items', 'Goods_Receipt',
+                   'Sales_Orders', 'Sales_Order_Items', 'Sales_Deliveries', 'Invoices')
+
+# temp views All_<table> = live rows UNION ALL every attached archive
+VIEW_PREFIX = 'All_'
+
+# Views of a document with values from its own lines. A document's lines are
+# archived with it, so each arm only looks in its own database and filters on
+# the document (e.g. customer_id = ?) still reach every arm's indexes.
+DOCUMENT_VIEWS = {
+    'Sales_Order_Summaries': ('Sales_Orders', 'so',
+                              "(SELECT COUNT(*) FROM {schema}.Sales_Order_Items WHERE so_number = so.so_number) AS item_count"),
+}
+
+# SQLite allows 10 attached databases by default - keep one free for ad-hoc ATTACH
+MAX_ARCHIVES = 9
+
+# Closed documents: completed POs, and delivered SOs whose invoices are all paid
+CLOSED_POS = '''SELECT po_number FROM main.Purchase_Orders
+    WHERE status = 'Completed' AND order_date >= ? AND order_date < ?'''
+
+CLOSED_SOS = '''SELECT so.so_number FROM main.Sales_Orders so
+    WHERE so.status = 'Delivered' AND so.order_date >= ? AND so.order_date < ?
+    AND EXISTS (SELECT 1 FROM main.Invoices WHERE so_number = so.so_number AND status = 'Paid')
+    AND NOT EXISTS (SELECT 1 FROM main.Invoices WHERE so_number = so.so_number AND status != 'Paid')'''
+
+# Which rows of each table belong to the selected documents
+MOVE_FILTERS = {
+    'Purchase_Orders': "po_number IN (SELECT po_number FROM temp.Archive_POs)",
+    'Purchase_Order_Items': "po_number IN (SELECT po_number FROM temp.Archive_POs)",
+    'Goods_Receipt': "po_number IN (SELECT po_number FROM temp.Archive_POs)",
+    'Sales_Orders': "so_number IN (SELECT so_number FROM temp.Archive_SOs)",
+    'Sales_Order_Items': "so_number IN (SELECT so_number FROM temp.Archive_SOs)",
+    'Sales_Deliveries': "so_number IN (SELECT so_number FROM temp.Archive_SOs)",
+    'Invoices': "so_number IN (SELECT so_number FROM temp.Archive_SOs)",
+}
+
+# Values for columns that later migrations added to archived tables, filled in
+# an archive file when ensure_archive_schema adds the column to it
+ARCHIVE_BACKFILLS = {
+    ('Purchase_Order_Items', 'rejected_quantity'): '''UPDATE Purchase_Order_Items SET
+        received_quantity = (SELECT COALESCE(SUM(received_quantity), 0) FROM Goods_Receipt gr
+            WHERE gr.po_number = Purchase_Order_Items.po_number AND gr.item_id = Purchase_Order_Items.item_id),
+        accepted_quantity = (SELECT COALESCE(SUM(accepted_quantity), 0) FROM Goods_Receipt gr
+            WHERE gr.po_number = Purchase_Order_Items.po_number AND gr.item_id = Purchase_Order_Items.item_id),
+        rejected_quantity = (SELECT COALESCE(SUM(rejected_quantity), 0) FROM Goods_Receipt gr
+            WHERE gr.po_number = Purchase_Order_Items.po_number AND gr.item_id = Purchase_Order_Items.item_id)''',
+    # Only fully delivered SOs are ever archived
+    ('Sales_Orders', 'delivered_quantity'): '''UPDATE Sales_Orders SET delivered_quantity =
+        (SELECT COALESCE(SUM(quantity), 0) FROM Sales_Order_Items WHERE so_number = Sales_Orders.so_number)''',
+    ('Sales_Order_Items', 'delivered_quantity'): "UPDATE Sales_Order_Items SET delivered_quantity = quantity",
+}
+
+_CREATE_INDEX = re.compile(r"^(CREATE\s+(?:UNIQUE\s+)?INDEX)\s+(?!IF\s+NOT\s+EXISTS)", re.IGNORECASE)
+
+
+class ArchiveError(Exception):
+    """Archiving could not be carried out"""
+
+
+# ==================== FINANCIAL YEARS ====================
+
+def financial_year(day):
+    """Start year of the April-March financial year containing `day` (date or YYYY-MM-DD)"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return day.year if day.month >= 4 else day.year - 1
+
+
+def fy_label(start_year):
+    """2023 -> '2023-24'"""
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+
+def fy_bounds(start_year):
+    """First day of the financial year and first day of the next one"""
+    return date(start_year, 4, 1), date(start_year + 1, 4, 1)
+
+
+def archive_path(db_path, start_year, archive_dir=DEFAULT_ARCHIVE_DIR):
+    """Archive file for one financial year of db_path, as recorded in Archived_Years
+    (relative paths are relative to the folder holding db_path)"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(archive_dir, f"{stem}-FY{fy_label(start_year)}.db")
+
+
+def resolve_path(db_path, path):
+    """Where an archive path recorded for db_path is on disk"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), path)
+
+
+def schema_name(start_year):
+    """Name the archive of a financial year is attached under"""
+    return f"fy{start_year}"
+
+
+# ==================== ATTACH & VIEWS ====================
+
+def ensure_archive_schema(conn, path):
+    """Create the archived tables (and their indexes) in an archive file, or add
+    columns that later migrations gave the live tables."""
+    placeholders = ", ".join("?" * len(ARCHIVED_TABLES))
+    table_sql = dict(conn.execute(
+        f"SELECT name, sql FROM main.sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+        ARCHIVED_TABLES).fetchall())
+    index_sql = [row[0] for row in conn.execute(
+        f"SELECT sql FROM main.sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})",
+        ARCHIVED_TABLES).fetchall()]
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    archive = sqlite3.connect(path)
+    try:
+        for table in ARCHIVED_TABLES:
+            existing = {row[1] for row in archive.execute(f"PRAGMA table_info({table})")}
+            if not existing:
+                archive.execute(table_sql[table])
+                continue
+            for _, name, col_type, _, default, _ in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+                if name not in existing:
+                    default = f" DEFAULT {default}" if default is not None else ""
+                    archive.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}{default}")
+                    if (table, name) in ARCHIVE_BACKFILLS:
+                        archive.execute(ARCHIVE_BACKFILLS[(table, name)])
+        for sql in index_sql:
+            archive.execute(_CREATE_INDEX.sub(r"\1 IF NOT EXISTS ", sql, count=1))
+        archive.commit()
+    finally:
+        archive.close()
+
+
+def attached_schemas(conn):
+    """Names of the databases attached to a connection (besides main and temp)"""
+    return [row[1] for row in conn.execute("PRAGMA database_list").fetchall() if row[1] not in ('main', 'temp')]
+
+
+def attach(conn, start_year, path, read_only=False):
+    """ATTACH the archive of one financial year unless it already is.
+    read_only needs a connection opened with uri=True."""
+    schema = schema_name(start_year)
+    attached = attached_schemas(conn)
+    if schema not in attached:
+        if len(attached) >= MAX_ARCHIVES:
+            raise ArchiveError(f"Cannot attach more than {MAX_ARCHIVES} archive years")
+        if read_only:
+            path = "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    return schema
+
+
+def create_views(conn, schemas):
+    """(Re)create the temp All_<table> views over the live table and the given archives"""
+    for table in ARCHIVED_TABLES:
+        columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall())
+        arms = [f"SELECT {columns} FROM {schema}.{table}" for schema in ['main'] + list(schemas)]
+        conn.execute(f"DROP VIEW IF EXISTS temp.{VIEW_PREFIX}{table}")
+        conn.execute(f"CREATE TEMP VIEW {VIEW_PREFIX}{table} AS " + " UNION ALL ".join(arms))
+    for view, (table, alias, extra) in DOCUMENT_VIEWS.items():
+        columns = ", ".join(f"{alias}.{row[1]}" for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall())
+        arms = [f"SELECT {columns}, {extra.format(schema=schema)} FROM {schema}.{table} {alias}"
+                for schema in ['main'] + list(schemas)]
+        conn.execute(f"DROP VIEW IF EXISTS temp.{VIEW_PREFIX}{view}")
+        conn.execute(f"CREATE TEMP VIEW {VIEW_PREFIX}{view} AS " + " UNION ALL ".join(arms))
+
+
+def attach_archives(conn, read_only=False):
+    """ATTACH every archive recorded in Archived_Years and build the All_* views.
+
+    Archive files that are missing on disk are skipped (the views then cover
+    the remaining years). The writable connection first brings each archive up
+    to the live schema. Returns {financial year label: path} of what is attached.
+    """
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    attached = {}
+    for start_year, path in conn.execute("SELECT fy, path FROM Archived_Years ORDER BY fy").fetchall():
+        if os.path.exists(resolve_path(db_path, path)):
+            if not read_only and schema_name(start_year) not in attached_schemas(conn):
+                ensure_archive_schema(conn, resolve_path(db_path, path))
+            attach(conn, start_year, resolve_path(db_path, path), read_only)
+            attached[fy_label(start_year)] = path
+    create_views(conn, attached_schemas(conn))
+    return attached
+
+
+# ==================== ARCHIVING ====================
+
+def archive_year(db, start_year, cutoff, archive_dir=DEFAULT_ARCHIVE_DIR):
+    """Move the closed documents of one financial year dated before `cutoff`.
+
+    Rows are copied with their original ids and then deleted from the live
+    tables, and the year's totals in Archived_Years are recomputed from the
+    archive. Copying replaces rows with the same id, so re-running after an
+    interruption is safe. Returns {table: rows moved}.
+    """
+    start, end = fy_bounds(start_year)
+    end = min(end, cutoff)
+    path = archive_path(db.db_name, start_year, archive_dir)
+    ensure_archive_schema(db.conn, resolve_path(db.db_name, path))
+    if db.conn.in_transaction:
+        db.conn.commit()  # ATTACH is not allowed inside a transaction
+    schema = attach(db.conn, start_year, resolve_path(db.db_name, path))
+
+    moved = {}
+    with db.transaction():
+        db.conn.execute("DROP TABLE IF EXISTS temp.Archive_POs")
+        db.conn.execute("DROP TABLE IF EXISTS temp.Archive_SOs")
+        db.conn.execute(f"CREATE TEMP TABLE Archive_POs AS {CLOSED_POS}", (start.isoformat(), end.isoformat()))
+        db.conn.execute(f"CREATE TEMP TABLE Archive_SOs AS {CLOSED_SOS}", (start.isoformat(), end.isoformat()))
+        for table in ARCHIVED_TABLES:
+            columns = ", ".join(row[1] for row in db.conn.execute(f"PRAGMA main.table_info({table})").fetchall())
+            db.conn.execute(f"INSERT OR REPLACE INTO {schema}.{table} ({columns}) "
+                            f"SELECT {columns} FROM main.{table} WHERE {MOVE_FILTERS[table]}")
+        for table in reversed(ARCHIVED_TABLES):
+            moved[table] = db.conn.execute(f"DELETE FROM main.{table} WHERE {MOVE_FILTERS[table]}").rowcount
+        db.conn.execute(f'''INSERT OR REPLACE INTO main.Archived_Years (fy, label, path, archived_at,
+                po_count, po_value, po_gst, so_count, so_value, so_gst, invoice_count, invoice_value)
+            SELECT ?, ?, ?, ?, po.n, po.total, po.gst, so.n, so.total, so.gst, inv.n, inv.total
+            FROM (SELECT COUNT(*) AS n, COALESCE(SUM(total_amount), 0) AS total, COALESCE(SUM(total_gst), 0) AS gst
+                  FROM {schema}.Purchase_Orders) po,
+                 (SELECT COUNT(*) AS n, COALESCE(SUM(total_amount), 0) AS total, COALESCE(SUM(total_gst), 0) AS gst
+                  FROM {schema}.Sales_Orders) so,
+                 (SELECT COUNT(*) AS n, COALESCE(SUM(total_amount), 0) AS total
+                  FROM {schema}.Invoices) inv''',
+            (start_year, fy_label(start_year), path, datetime.now().isoformat(timespec='seconds')))
+        db.conn.execute("DROP TABLE temp.Archive_POs")
+        db.conn.execute("DROP TABLE temp.Archive_SOs")
+    create_views(db.conn, attached_schemas(db.conn))
+    db.archives[fy_label(start_year)] = path
+    db.close_reports()  # reopened with the new archive on next use
+    return moved
+
+
+def archivable_years(db, cutoff):
+    """Financial years that have closed documents dated before `cutoff`"""
+    row = db.conn.execute('''SELECT MIN(order_date) FROM (
+        SELECT MIN(order_date) AS order_date FROM Purchase_Orders WHERE status = 'Completed'
+        UNION ALL
+        SELECT MIN(order_date) FROM Sales_Orders WHERE status = 'Delivered')''').fetchone()
+    if row[0] is None:
+        return []
+    return [year for year in range(financial_year(row[0]), financial_year(cutoff) + 1)
+            if fy_bounds(year)[0] < cutoff]
+
+
+def archive_before(db, cutoff, archive_dir=DEFAULT_ARCHIVE_DIR, progress=None):
+    """Archive closed documents dated before `cutoff` (a date or YYYY-MM-DD), one file per
+    financial year. Returns {financial year label: {table: rows moved}} for years that moved rows."""
+    if isinstance(cutoff, str):
+        cutoff = date.fromisoformat(cutoff)
+    if cutoff > date.today():
+        raise ArchiveError("The cutoff date cannot be in the future")
+    results = {}
+    years = archivable_years(db, cutoff)
+    for done, start_year in enumerate(years):
+        if progress:
+            progress(f"Archiving FY {fy_label(start_year)}", done, len(years))
+        start, end = fy_bounds(start_year)
+        end = min(end, cutoff)
+        closed = (db.conn.execute(f"SELECT COUNT(*) FROM ({CLOSED_POS})", (start.isoformat(), end.isoformat())).fetchone()[0] +
+                  db.conn.execute(f"SELECT COUNT(*) FROM ({CLOSED_SOS})", (start.isoformat(), end.isoformat())).fetchone()[0])
+        if closed:
+            results[fy_label(start_year)] = archive_year(db, start_year, cutoff, archive_dir)
+    if progress:
+        progress("Archiving complete", len(years), len(years))
+    return results
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    from database import Database
+    from migrations import console_progress
+
+    parser = argparse.ArgumentParser(description="Archive closed documents by financial year")
+    parser.add_argument('database', nargs='?', default='integrated_system.db')
+    parser.add_argument('--before', help="Archive closed documents dated before this date (YYYY-MM-DD)")
+    parser.add_argument('--dir', default=DEFAULT_ARCHIVE_DIR, help="Archive directory")
+    parser.add_argument('--list', action='store_true', help="List archived years and exit")
+    args = parser.parse_args()
+    if not os.path.exists(args.database):
+        sys.exit(f"Database not found: {args.database}")
+
+    db = Database(args.database, progress=console_progress)
+    try:
+        if args.before:
+            for label, moved in archive_before(db, args.before, args.dir, console_progress).items():
+                print(f"FY {label}: " + ", ".join(f"{table} {count:,}" for table, count in moved.items()))
+        elif not args.list:
+            parser.error("give --before YYYY-MM-DD or --list")
+        for row in db.conn.execute("SELECT label, po_count, so_count, invoice_count, path FROM Archived_Years ORDER BY fy"):
+            print(f"FY {row[0]}: {row[1]:,} POs, {row[2]:,} SOs, {row[3]:,} invoices -> {row[4]}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
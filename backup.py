@@ -0,0 +1,219 @@
+"""
+Backup Module - Online snapshots of the live database with the SQLite backup API
+Run: python backup.py [database] [--dir backups] [--keep N] [--interval MINUTES] [--list]
+Without --interval a single backup is taken and verified.
+"""
+
+import argparse
+import glob
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+DEFAULT_BACKUP_DIR = 'backups'
+DEFAULT_KEEP = 7                # generations kept per database
+DEFAULT_INTERVAL = 60 * 60      # seconds between scheduled backups
+PAGES_PER_STEP = 256            # pages copied per backup step (1 MiB at 4 KiB pages)
+STEP_SLEEP = 0.005              # seconds yielded between steps so writers are never held up
+
+BackupResult = namedtuple('BackupResult', 'ok path message elapsed manual')
+
+
+class BackupError(Exception):
+    """A snapshot could not be taken or failed verification"""
+
+
+class BackupCancelled(BackupError):
+    """The scheduler was stopped while a snapshot was being copied"""
+
+
+# ==================== SNAPSHOTS ====================
+
+def backup_path(db_path, backup_dir, when=None):
+    """Timestamped file name for a new generation of db_path"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    when = when or datetime.now()
+    return os.path.join(backup_dir, f"{stem}-{when:%Y%m%d-%H%M%S}.db")
+
+
+def list_backups(db_path, backup_dir=DEFAULT_BACKUP_DIR):
+    """Existing generations of db_path, oldest first"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    pattern = os.path.join(glob.escape(backup_dir), f"{glob.escape(stem)}-*.db")
+    return sorted(path for path in glob.glob(pattern) if not path.endswith('.tmp.db'))
+
+
+def verify_backup(path):
+    """Run PRAGMA integrity_check on a snapshot; returns the problems found (empty if sound)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return [] if rows == [('ok',)] else [row[0] for row in rows]
+
+
+def snapshot(db_path, dest_path, pages=PAGES_PER_STEP, sleep=STEP_SLEEP, cancel=None):
+    """Copy a live database into dest_path a few pages at a time, then verify the copy.
+
+    The source connection holds one read transaction for the whole copy. Under
+    WAL that pins a snapshot, so commits from the app carry on and do not force
+    SQLite to restart the copy. The copy is written to a temporary file and only
+    renamed into place once integrity_check passes.
+    """
+    tmp_path = dest_path[:-3] + '.tmp.db'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    def step(status, remaining, total):
+        if cancel is not None and cancel.is_set():
+            raise BackupCancelled("Backup cancelled")
+        # Give the GIL (and the database) back to order entry between steps
+        time.sleep(sleep)
+
+    source = sqlite3.connect(db_path, isolation_level=None)
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # start the read snapshot
+        source.backup(target, pages=pages, progress=step)
+        # The copy inherits WAL mode; a backup should be one self-contained file
+        target.execute("PRAGMA journal_mode = DELETE")
+    except BaseException:
+        target.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        source.close()
+    target.close()
+
+    problems = verify_backup(tmp_path)
+    if problems:
+        os.remove(tmp_path)
+        raise BackupError(f"Integrity check failed: {'; '.join(problems[:5])}")
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def rotate(db_path, backup_dir=DEFAULT_BACKUP_DIR, keep=DEFAULT_KEEP):
+    """Delete the oldest generations beyond `keep`; returns the removed paths"""
+    removed = list_backups(db_path, backup_dir)[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def backup_once(db_path, backup_dir=DEFAULT_BACKUP_DIR, keep=DEFAULT_KEEP,
+                pages=PAGES_PER_STEP, sleep=STEP_SLEEP, cancel=None, manual=False):
+    """Take, verify and rotate one generation; never raises, returns a BackupResult"""
+    started = time.perf_counter()
+    try:
+        os.makedirs(backup_dir, exist_ok=True)
+        path = snapshot(db_path, backup_path(db_path, backup_dir), pages, sleep, cancel)
+        removed = rotate(db_path, backup_dir, keep)
+        elapsed = time.perf_counter() - started
+        message = f"Backup written to {path} ({os.path.getsize(path) / 1e6:.1f} MB, {elapsed:.1f}s)"
+        if removed:
+            message += f", {len(removed)} old generation(s) removed"
+        return BackupResult(True, path, message, elapsed, manual)
+    except Exception as e:
+        return BackupResult(False, None, f"Backup failed: {e}", time.perf_counter() - started, manual)
+
+
+# ==================== SCHEDULER ====================
+
+class BackupScheduler:
+    """Takes a backup every `interval` seconds (and on request) on a background thread.
+
+    The thread uses its own connections, so it never touches the UI's
+    connection. Finished backups are put on `results` for the UI thread to
+    pick up (Tk must only be called from the main thread).
+    """
+
+    def __init__(self, db_path, backup_dir=DEFAULT_BACKUP_DIR, keep=DEFAULT_KEEP,
+                 interval=DEFAULT_INTERVAL, pages=PAGES_PER_STEP, sleep=STEP_SLEEP):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.interval = interval
+        self.pages = pages
+        self.sleep = sleep
+        self.results = queue.Queue()
+        self.last_result = None
+        self.running = False
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self):
+        """Start the background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+            self._thread.start()
+
+    def backup_now(self):
+        """Ask for a backup as soon as the current one (if any) finishes"""
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        """Stop the thread, abandoning a backup that is still copying"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            manual = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.running = True
+            result = backup_once(self.db_path, self.backup_dir, self.keep,
+                                 self.pages, self.sleep, self._stop, manual)
+            self.running = False
+            self.last_result = result
+            self.results.put(result)
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup of the purchase & sales database")
+    parser.add_argument('database', nargs='?', default='integrated_system.db')
+    parser.add_argument('--dir', default=DEFAULT_BACKUP_DIR, help="Backup directory")
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help="Generations to keep")
+    parser.add_argument('--interval', type=float, help="Keep running, backing up every N minutes")
+    parser.add_argument('--list', action='store_true', help="List existing backups and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for path in list_backups(args.database, args.dir):
+            print(f"{path}  {os.path.getsize(path) / 1e6:.1f} MB")
+        return
+    if not os.path.exists(args.database):
+        sys.exit(f"Database not found: {args.database}")
+
+    if args.interval is None:
+        result = backup_once(args.database, args.dir, args.keep)
+        print(result.message)
+        sys.exit(0 if result.ok else 1)
+
+    scheduler = BackupScheduler(args.database, args.dir, args.keep, args.interval * 60)
+    scheduler.start()
+    scheduler.backup_now()
+    try:
+        while True:
+            print(scheduler.results.get().message, flush=True)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
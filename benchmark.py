@@ -0,0 +1,397 @@
+"""
+Benchmark Module - Measures database hot paths against generated data
+Run: python benchmark.py <benchmark> [options]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+import queries
+from database import Database
+from records import POLine, namedtuple_factory
+from sample_data import seed_database
+
+
+def time_query(db, sql, params=(), repeat=5, budget=None):
+    """Median wall time (ms) to execute a query and fetch all rows.
+
+    With a budget (seconds) the query is interrupted once it runs that long
+    and None is returned - unindexed correlated subqueries can take hours.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if budget:
+            deadline = start + budget
+            db.conn.set_progress_handler(lambda: time.perf_counter() > deadline, 100000)
+        try:
+            db.execute(sql, params)
+            db.fetchall()
+        except sqlite3.OperationalError as e:
+            if 'interrupted' not in str(e):
+                raise
+            return None
+        finally:
+            db.conn.set_progress_handler(None, 0)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def format_ms(value, budget=None):
+    """Format a timing, or the budget it exceeded"""
+    return f"{value:.2f}" if value is not None else f">{budget * 1000:.0f}"
+
+
+def create_seeded_database(lines, path=None):
+    """Create (or reuse) a seeded benchmark database and return its path"""
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"benchmark_{lines}.db")
+    if not os.path.exists(path):
+        print(f"Seeding {lines:,} order lines into {path} ...")
+        start = time.perf_counter()
+        db = Database(path, profile='bulk-load')
+        counts = seed_database(db, order_lines=lines)
+        db.close()
+        print(f"  done in {time.perf_counter() - start:.1f}s: {counts}")
+    return path
+
+
+# ==================== INDEX BENCHMARK ====================
+
+def hot_queries(db):
+    """The hot queries from the modules, with realistic parameters"""
+    db.execute("SELECT MAX(po_number) FROM Purchase_Orders")
+    po_number = db.fetchone()[0] // 2
+    db.execute("SELECT invoice_number FROM Goods_Receipt ORDER BY receipt_id DESC LIMIT 1")
+    invoice = db.fetchone()[0]
+    return [
+        ("PO list with item_count", queries.PO_LIST_OPEN, ()),
+        ("Duplicate invoice check", queries.RECEIPT_INVOICE_COUNT, (invoice,)),
+        ("PO completion check", queries.PO_UNRECEIVED_LINE_COUNT, (po_number,)),
+        ("Uninvoiced delivered SOs", queries.UNINVOICED_SOS, ()),
+        ("delete_item: PO references", queries.ITEM_PO_REFERENCES, (42,)),
+        ("delete_item: SO references", queries.ITEM_SO_REFERENCES, (42,)),
+        ("delete_item: GR references", queries.ITEM_GR_REFERENCES, (42,)),
+        ("Unpaid invoice total", queries.INVOICE_UNPAID_TOTAL, ()),
+    ]
+
+
+def bench_indexes(args):
+    """Before/after cost of the hot queries with and without the secondary indexes"""
+    path = create_seeded_database(args.lines, args.db)
+    db = Database(path)
+    queries = hot_queries(db)
+
+    db.drop_indexes()
+    db.execute("ANALYZE")
+    before = [time_query(db, sql, params, args.repeat, args.budget) for _, sql, params in queries]
+
+    start = time.perf_counter()
+    db.init_indexes()
+    db.execute("ANALYZE")
+    build_time = time.perf_counter() - start
+    after = [time_query(db, sql, params, args.repeat, args.budget) for _, sql, params in queries]
+    db.close()
+
+    print(f"\nIndex benchmark - {args.lines:,} order lines (median of {args.repeat}, ms)")
+    print(f"{'Query':<32}{'Before':>12}{'After':>12}{'Speedup':>10}")
+    for (name, _, _), b, a in zip(queries, before, after):
+        if a is None:
+            speedup = "-"
+        elif b is None:
+            speedup = f">{args.budget * 1000 / max(a, 0.001):.0f}x"
+        else:
+            speedup = f"{b / max(a, 0.001):.1f}x"
+        print(f"{name:<32}{format_ms(b, args.budget):>12}{format_ms(a, args.budget):>12}{speedup:>10}")
+    print(f"\nIndex build time on existing data: {build_time:.1f}s")
+
+
+# ==================== DOCUMENT SAVE BENCHMARK ====================
+
+def save_document_per_line(db, po_lines, gr_lines):
+    """PO + goods receipt saved the old way: one statement per line"""
+    with db.transaction():
+        for row in po_lines:
+            db.execute("INSERT INTO Purchase_Order_Items (po_number, item_id, quantity, rate, gst_percent, gst_amount, total_price) VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        for row in gr_lines:
+            db.execute("INSERT INTO Goods_Receipt (po_number, item_id, supplier_id, invoice_number, received_quantity, accepted_quantity, rejected_quantity, receipt_date, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+
+def save_document_bulk(db, po_lines, gr_lines):
+    """PO + goods receipt saved with the bulk write helpers"""
+    with db.transaction():
+        db.insert_many("Purchase_Order_Items", queries.PO_LINE_COLUMNS, po_lines)
+        db.insert_many("Goods_Receipt", queries.RECEIPT_COLUMNS, gr_lines)
+
+
+def bench_saves(args):
+    """Latency of saving a PO plus its goods receipt, per-line statements vs bulk writes"""
+    path = args.db or os.path.join(tempfile.gettempdir(), "benchmark_saves.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db = Database(path)
+    seed_database(db, order_lines=2000, items=5000)
+    db.execute("SELECT MAX(po_number) FROM Purchase_Orders")
+    po_number = db.fetchone()[0]
+
+    print(f"\nDocument save latency - PO lines + receipt lines + stock updates (median of {args.repeat}, ms)")
+    print(f"{'Lines':>8}{'Per-line':>12}{'Bulk':>12}{'Speedup':>10}")
+    for count in (1, 10, 50, 100, 500, 2000):
+        timings = {}
+        for name, save in (("per-line", save_document_per_line), ("bulk", save_document_bulk)):
+            samples = []
+            for run in range(args.repeat):
+                po_lines = [(po_number, item_id, 10, 100.0, 18.0, 180.0, 1180.0) for item_id in range(1, count + 1)]
+                gr_lines = [(po_number, item_id, 1, f"BENCH-{name}-{count}-{run}", 10, 9, 1, "2024-01-01", "")
+                            for item_id in range(1, count + 1)]
+                start = time.perf_counter()
+                save(db, po_lines, gr_lines)
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = statistics.median(samples)
+        print(f"{count:>8}{timings['per-line']:>12.2f}{timings['bulk']:>12.2f}"
+              f"{timings['per-line'] / max(timings['bulk'], 0.001):>9.1f}x")
+    db.close()
+
+
+# ==================== ROW OBJECT BENCHMARK ====================
+
+ROW_QUERY = """SELECT soi.so_item_id, soi.so_number, soi.item_id, i.name, soi.quantity, soi.rate,
+    soi.gst_percent, soi.gst_amount, soi.total_price
+    FROM Sales_Order_Items soi JOIN Items i ON soi.item_id = i.item_id LIMIT ?"""
+
+
+def dict_factory(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+ROW_FACTORIES = [
+    ("tuple", None),
+    ("sqlite3.Row", sqlite3.Row),
+    ("namedtuple", namedtuple_factory),
+    ("dict", dict_factory),
+]
+
+
+def measure_rows(build, repeat):
+    """Median build time (ms) and retained memory (bytes) of the object build() returns"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return statistics.median(samples), size
+
+
+def bench_rows(args):
+    """Cost of building result rows as tuples, sqlite3.Row, namedtuples and dicts"""
+    rows = args.rows
+    path = create_seeded_database(rows * 2)
+    conn = sqlite3.connect(path)
+
+    print(f"\nRow objects - {rows:,} order lines fetched (median of {args.repeat})")
+    print(f"{'Row type':<14}{'Fetch ms':>10}{'Memory MB':>12}{'Bytes/row':>12}")
+    for name, factory in ROW_FACTORIES:
+        def fetch():
+            cursor = conn.cursor()
+            cursor.row_factory = factory
+            return cursor.execute(ROW_QUERY, (rows,)).fetchall()
+        elapsed, size = measure_rows(fetch, args.repeat)
+        print(f"{name:<14}{elapsed:>10.1f}{size / 1e6:>12.1f}{size / rows:>12.0f}")
+
+    # Order lines held by the entry dialogs: __slots__ class vs dict
+    source = conn.execute(ROW_QUERY, (rows,)).fetchall()
+    conn.close()
+    print(f"\nOrder lines - {rows:,} lines built in memory")
+    print(f"{'Line type':<14}{'Build ms':>10}{'Memory MB':>12}{'Bytes/row':>12}")
+    builders = [
+        ("POLine", lambda: [POLine(r[2], r[3], r[4], r[5], r[6], r[7], r[8]) for r in source]),
+        ("dict", lambda: [{'item_id': r[2], 'item_name': r[3], 'quantity': r[4], 'rate': r[5],
+                           'gst_percent': r[6], 'gst_amount': r[7], 'total': r[8]} for r in source]),
+    ]
+    for name, build in builders:
+        elapsed, size = measure_rows(build, args.repeat)
+        print(f"{name:<14}{elapsed:>10.1f}{size / 1e6:>12.1f}{size / rows:>12.0f}")
+
+
+# ==================== LIST REFRESH BENCHMARK ====================
+
+REFRESH_CHANGES = (0, 1, 10, 100, 1000)
+
+RefreshRow = namedtuple('RefreshRow', 'item_id name quantity_on_hand reorder_level')
+
+
+def changed_rows(rows, changes, rng, next_id):
+    """A copy of rows with `changes` edits spread over updates, deletes and inserts"""
+    rows = list(rows)
+    for change in range(changes):
+        kind = change % 3
+        if kind == 0:
+            i = rng.randrange(len(rows))
+            rows[i] = rows[i]._replace(quantity_on_hand=rows[i].quantity_on_hand + 1)
+        elif kind == 1:
+            rows.pop(rng.randrange(len(rows)))
+        else:
+            rows.insert(rng.randrange(len(rows) + 1), RefreshRow(next_id + change, f"New item {change}", 5, 10))
+    return rows
+
+
+def bench_refresh(args):
+    """Cost of a list refresh after a few changes: rebuilding every Treeview row vs TreeSynchronizer"""
+    import random
+    import tkinter as tk
+    from tkinter import ttk
+    from widgets import TreeSynchronizer
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"The refresh benchmark needs a display: {e}")
+        return
+    root.withdraw()
+    rng = random.Random(42)
+    format_row = lambda row: (row, ())
+
+    print(f"\nList refresh - one refresh after N changed rows (median of {args.repeat}, ms)")
+    print(f"{'Rows':>8}{'Rebuild':>10}{'Changes':>9}{'Sync':>10}{'Tk ops':>8}")
+    for size in (args.rows // 100, args.rows // 10, args.rows):
+        rows = [RefreshRow(i, f"Item {i}", i % 50, 10) for i in range(1, size + 1)]
+        tree = ttk.Treeview(root, columns=RefreshRow._fields, show='headings')
+
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert('', 'end', values=row)
+            tree.update_idletasks()
+            samples.append((time.perf_counter() - start) * 1000)
+        rebuild = statistics.median(samples)
+        tree.delete(*tree.get_children())
+
+        sync = TreeSynchronizer(tree, lambda row: row.item_id, format_row)
+        for changes in REFRESH_CHANGES:
+            samples = []
+            for _ in range(args.repeat):
+                sync.sync(rows)
+                changed = changed_rows(rows, changes, rng, size + 1)
+                start = time.perf_counter()
+                counts = sync.sync(changed)
+                tree.update_idletasks()
+                samples.append((time.perf_counter() - start) * 1000)
+            label = f"{size:>8,}{rebuild:>10.1f}" if changes == REFRESH_CHANGES[0] else " " * 18
+            print(f"{label}{changes:>9}{statistics.median(samples):>10.1f}{sum(counts):>8}")
+        tree.destroy()
+    root.destroy()
+
+
+# ==================== GST SUMMARY BENCHMARK ====================
+
+def median_ms(run, repeat):
+    """Median wall time (ms) of run() and its last result"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def bench_gst(args):
+    """Cost of a GST Summary refresh: the queries, the summary model and updating the panels"""
+    import gst_summary
+
+    path = create_seeded_database(args.lines, args.db)
+    db = Database(path)
+    report = db.reports
+    load_ms, (output_rows, input_rows) = median_ms(
+        lambda: (report.fetchall(queries.GST_COLLECTED_BY_RATE), report.fetchall(queries.GST_PAID_BY_RATE)),
+        args.repeat)
+    brackets_ms, bracket_rows = median_ms(lambda: report.fetchall(queries.SALES_GST_BY_RATE), args.repeat)
+    db.close()
+    summarize_ms, summary = median_ms(lambda: gst_summary.summarize_gst(output_rows, input_rows), args.repeat)
+    bracket_ms, _ = median_ms(lambda: gst_summary.summarize_sales_brackets(bracket_rows), args.repeat)
+    compare_ms, _ = median_ms(lambda: gst_summary.summarize_gst(output_rows, input_rows) == summary, args.repeat)
+
+    print(f"\nGST summary - {args.lines:,} order lines (median of {args.repeat}, ms)")
+    print(f"{'Step':<34}{'ms':>10}")
+    print(f"{'Query output + input GST by rate':<34}{load_ms:>10.1f}")
+    print(f"{'Summarize':<34}{summarize_ms:>10.3f}")
+    print(f"{'Summarize again and compare':<34}{compare_ms:>10.3f}")
+    print(f"{'Query sales GST brackets':<34}{brackets_ms:>10.1f}")
+    print(f"{'Summarize brackets':<34}{bracket_ms:>10.3f}")
+
+    import tkinter as tk
+    from widgets import LabelRows
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Updating the panels needs a display: {e}")
+        return
+    root.withdraw()
+    columns = [(10, ('Arial', 10))] * 6
+    cells = lambda rows: [[(f"{row.gst_percent:.1f}%", gst_summary.gst_color(row.gst_percent)),
+                           (f"{row.output_gst:,.2f}", None), (f"{row.input_gst:,.2f}", None),
+                           (f"{row.net_gst:,.2f}", None), (str(row.output_orders), None),
+                           (str(row.input_orders), None)] for row in rows]
+    rows = list(summary.comparison)
+    changed = rows[:1] and [rows[0]._replace(output_gst=rows[0].output_gst + 1)] + rows[1:]
+
+    table = LabelRows(root, columns)
+
+    def build():
+        nonlocal table
+        table.frame.destroy()
+        table = LabelRows(root, columns)
+        table.pack()
+        return table.show(cells(rows))
+
+    def update(shown):
+        count = table.show(cells(shown))
+        table.show(cells(rows))   # back to the rows on screen for the next run
+        return count
+
+    print(f"\n{'Comparison table refresh':<34}{'ms':>10}{'Cells':>8}")
+    for label, run in (("Build every row", build), ("In place, unchanged", lambda: update(rows)),
+                       ("In place, one rate changed", lambda: update(changed))):
+        elapsed, count = median_ms(lambda: (run(), root.update_idletasks())[0], args.repeat)
+        print(f"{label:<34}{elapsed:>10.2f}{count:>8}")
+    root.destroy()
+
+
+BENCHMARKS = {
+    'indexes': bench_indexes,
+    'saves': bench_saves,
+    'rows': bench_rows,
+    'refresh': bench_refresh,
+    'gst': bench_gst,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database performance benchmarks")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--lines', type=int, default=1000000, help="Order lines to generate (default 1M)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement")
+    parser.add_argument('--budget', type=float, default=20.0,
+                        help="Seconds before a single query run is abandoned")
+    parser.add_argument('--rows', type=int, default=100000, help="Rows fetched by the rows benchmark (largest list for refresh)")
+    parser.add_argument('--db', help="Benchmark database path (default: temp dir, reused between runs)")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
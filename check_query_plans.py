@@ -0,0 +1,140 @@
+"""
+Query Plan Check - Runs EXPLAIN QUERY PLAN on every statement in queries.py against a generated
+database and fails if a statement scans a large table it is expected to reach through an index.
+Run: python check_query_plans.py [--lines N] [--db path] [--verbose]
+Exits non-zero when a check fails.
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import date
+
+import queries
+from archive import VIEW_PREFIX, archive_before, financial_year
+from database import Database
+from sample_data import seed_database
+
+# Tables that grow with order history - a full scan of these is a regression
+LARGE_TABLES = {'Purchase_Orders', 'Purchase_Order_Items', 'Goods_Receipt',
+                'Sales_Orders', 'Sales_Order_Items', 'Sales_Deliveries', 'Invoices',
+                'Inventory_Movements'}
+
+# Statements that read the whole table on purpose, with the reason
+ALLOWED_SCANS = {
+    'PO_LIST_ALL': "'Show Completed' lists every PO",
+    'SO_LIST_ALL': "'Show Completed' lists every SO",
+    'RECEIPT_HISTORY': "receipt history groups every goods receipt",
+    'INVOICE_LIST': "invoice tab lists every invoice",
+    'GST_COLLECTED_BY_RATE': "GST summary aggregates every sales line",
+    'GST_PAID_BY_RATE': "GST summary aggregates every purchase line",
+    'SALES_GST_BY_RATE': "sales report aggregates every sales line",
+    'TOP_CUSTOMERS': "ranks customers by revenue over every SO, archived years included",
+    'RECEIPT_SEARCH_LIKE': "search fallback for SQLite builds without FTS5",
+}
+
+_SQL_KEYWORDS = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'ON', 'GROUP', 'ORDER', 'LIMIT', 'SET', 'VALUES', 'AS', 'HAVING'}
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (?:(\w+)\.)?(\w+)")
+
+
+def statements():
+    """Every SQL statement defined in queries.py, by constant name"""
+    return {name: value for name, value in vars(queries).items()
+            if name.isupper() and isinstance(value, str)}
+
+
+def table_aliases(sql):
+    """Map each alias (and bare table name) used in a statement to its table"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in _SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def query_plan(db, sql):
+    """EXPLAIN QUERY PLAN detail lines, binding a placeholder value for every parameter"""
+    params = (1,) * sql.count('?')
+    return [row[3] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def large_table_scans(sql, plan):
+    """Large tables that the plan reads in full"""
+    aliases = table_aliases(sql)
+    scanned = []
+    for detail in plan:
+        match = _SCAN.match(detail)
+        if match:
+            schema, name = match.groups()
+            # Tables read through the All_* views show up schema-qualified (SCAN fy2023.Invoices)
+            table = name if schema else aliases.get(name, name)
+            if table.startswith(VIEW_PREFIX):
+                continue  # reading the view's own rows - its arms are listed separately
+            if table in LARGE_TABLES:
+                scanned.append(table)
+    return scanned
+
+
+def create_fixture(lines):
+    """Generate (or reuse) the fixture database.
+
+    The fixture is never ANALYZEd, so plans show which indexes a statement can
+    use rather than how the generated values happen to be distributed. Closed
+    documents from past financial years are archived, so the All_* views are
+    checked with archives attached.
+    """
+    path = os.path.join(tempfile.gettempdir(), f"query_plan_fixture_{lines}.db")
+    if not os.path.exists(path):
+        db = Database(path, profile='bulk-load')
+        seed_database(db, order_lines=lines)
+        archive_before(db, date(financial_year(date.today()), 4, 1),
+                       os.path.join(tempfile.gettempdir(), "query_plan_archive"))
+        db.conn.close()
+    return path
+
+
+def check(db, verbose=False):
+    """Check every statement; returns the number of failures"""
+    failures = 0
+    used_allowances = set()
+    for name, sql in sorted(statements().items()):
+        plan = query_plan(db, sql)
+        scans = large_table_scans(sql, plan)
+        if not scans:
+            status = "OK"
+        elif name in ALLOWED_SCANS:
+            status = f"ALLOWED ({ALLOWED_SCANS[name]})"
+            used_allowances.add(name)
+        else:
+            status = f"FAIL - full scan of {', '.join(sorted(set(scans)))}"
+            failures += 1
+        print(f"{name:<28} {status}")
+        if verbose or status.startswith("FAIL"):
+            for detail in plan:
+                print(f"{'':<30}{detail}")
+    for name in sorted(set(ALLOWED_SCANS) - used_allowances):
+        print(f"note: {name} is allowed to scan but no longer does - remove it from ALLOWED_SCANS")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN check for queries.py")
+    parser.add_argument('--lines', type=int, default=20000, help="Order lines in the generated fixture")
+    parser.add_argument('--db', help="Check against an existing database instead of a generated one")
+    parser.add_argument('--verbose', action='store_true', help="Print every plan, not just failures")
+    args = parser.parse_args()
+
+    db = Database(args.db or create_fixture(args.lines))
+    failures = check(db, args.verbose)
+    db.conn.close()  # skip PRAGMA optimize - the check must not leave statistics behind
+    total = len(statements())
+    print(f"\n{total - failures}/{total} statements passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Dashboard Stats Module - One-row summary of the dashboard figures, kept current by triggers
+Run: python dashboard_stats.py [database] [--rebuild]
+Without --rebuild the stored figures are checked against the live tables.
+"""
+
+import argparse
+import sys
+
+# What each row of a table adds to the Dashboard_Stats columns ({r} is the
+# table). The triggers of migration 4 apply the same definitions one row at a
+# time; check() finds any place the two drift apart. Live rows only: archived
+# years are added from Archived_Years when the dashboard reads the row.
+ROW_CONTRIBUTIONS = {
+    'Items': {
+        'item_count': "1",
+    },
+    'Inventory': {
+        'low_stock_count': "{r}.quantity_on_hand <= {r}.reorder_level",
+        'stock_units': "{r}.quantity_on_hand",
+    },
+    'Suppliers': {
+        'supplier_count': "1",
+    },
+    'Customers': {
+        'customer_count': "1",
+    },
+    'Purchase_Orders': {
+        'po_count': "1",
+        'po_pending_count': "{r}.status = 'Pending'",
+        'po_value': "{r}.total_amount",
+        'po_gst': "{r}.total_gst",
+    },
+    'Sales_Orders': {
+        'so_count': "1",
+        'so_pending_count': "{r}.status = 'Pending'",
+        'so_delivered_count': "{r}.status = 'Delivered'",
+        'so_value': "{r}.total_amount",
+        'so_pending_value': "CASE WHEN {r}.status = 'Pending' THEN {r}.total_amount END",
+        'so_gst': "{r}.total_gst",
+    },
+    'Invoices': {
+        'invoice_count': "1",
+        'invoice_unpaid_count': "{r}.status = 'Unpaid'",
+        'invoice_unpaid_total': "CASE WHEN {r}.status = 'Unpaid' THEN {r}.total_amount END",
+    },
+}
+
+# Money columns are summed one row at a time, so allow for floating-point drift
+MONEY_TOLERANCE = 0.01
+
+
+def stat_columns():
+    """Every Dashboard_Stats column, in table order"""
+    return [column for contributions in ROW_CONTRIBUTIONS.values() for column in contributions]
+
+
+def _term(expression, row):
+    return f"COALESCE({expression.format(r=row)}, 0)"
+
+
+def actual_values(conn):
+    """Every figure recomputed from the live tables: {column: value}"""
+    values = {}
+    for table, contributions in ROW_CONTRIBUTIONS.items():
+        sums = ", ".join(f"COALESCE(SUM({_term(expr, table)}), 0)" for expr in contributions.values())
+        row = conn.execute(f"SELECT {sums} FROM main.{table}").fetchone()
+        values.update(zip(contributions, row))
+    return values
+
+
+def stored_values(conn):
+    """The figures currently held in Dashboard_Stats: {column: value}"""
+    columns = stat_columns()
+    row = conn.execute(f"SELECT {', '.join(columns)} FROM Dashboard_Stats WHERE id = 1").fetchone()
+    return dict(zip(columns, row))
+
+
+def rebuild(conn):
+    """Recompute Dashboard_Stats from scratch (caller commits)"""
+    values = actual_values(conn)
+    conn.execute("INSERT OR IGNORE INTO Dashboard_Stats (id) VALUES (1)")
+    conn.execute(f"UPDATE Dashboard_Stats SET {', '.join(f'{col} = ?' for col in values)} WHERE id = 1",
+                 list(values.values()))
+    return values
+
+
+def check(conn):
+    """Compare Dashboard_Stats with the live tables; returns [(column, stored, actual)] that differ"""
+    stored = stored_values(conn)
+    mismatches = []
+    for column, actual in actual_values(conn).items():
+        if abs(stored[column] - actual) > MONEY_TOLERANCE:
+            mismatches.append((column, stored[column], actual))
+    return mismatches
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    from database import Database
+    from migrations import console_progress
+
+    parser = argparse.ArgumentParser(description="Check or rebuild the dashboard summary table")
+    parser.add_argument('database', nargs='?', default='integrated_system.db')
+    parser.add_argument('--rebuild', action='store_true', help="Recompute Dashboard_Stats from the live tables")
+    args = parser.parse_args()
+
+    db = Database(args.database, progress=console_progress)
+    try:
+        if args.rebuild:
+            with db.transaction():
+                values = rebuild(db.conn)
+            print(f"Dashboard_Stats rebuilt ({len(values)} figures)")
+            return
+        mismatches = check(db.conn)
+        for column, stored, actual in mismatches:
+            print(f"{column:<24} stored {stored:>16,.2f}   actual {actual:>16,.2f}")
+        print(f"{len(stat_columns()) - len(mismatches)}/{len(stat_columns())} figures consistent")
+    finally:
+        db.close()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,203 +2,445 @@
 Database Module - Updated with GST Support for India
 """
 
+import os
+import random
 import sqlite3
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.request import pathname2url
+
+from archive import attach_archives
+from migrations import INDEXES, migrate
+from query_stats import DEFAULT_LOG_PATH, DEFAULT_SLOW_MS, QueryStats
+from records import namedtuple_factory
+
+
+# ==================== CONNECTION PROFILES ====================
+
+# PRAGMA settings applied when a connection is opened.
+# cache_size is negative = size in KiB (SQLite convention), busy_timeout is in ms.
+CONNECTION_PROFILES = {
+    # Interactive order entry: WAL so reports never block writers,
+    # NORMAL sync (durable at checkpoint, no fsync per commit)
+    'desktop': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # Imports / data migrations: trade durability for raw insert speed
+    'bulk-load': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,
+        'mmap_size': 1073741824,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+    },
+    # Heavy aggregate reports: big cache, never writes
+    'read-only-report': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 1073741824,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+        'query_only': 'ON',
+    },
+}
+
+DEFAULT_PROFILE = 'desktop'
+
+# Profile of the separate connection the report screens read through
+REPORT_PROFILE = 'read-only-report'
+
+# Order matters: journal_mode first (it may need a lock), query_only last
+PRAGMA_ORDER = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size',
+                'temp_store', 'busy_timeout', 'query_only')
+
+# Bound parameters per statement (SQLite's limit on older builds) - bulk writes split on this
+MAX_VARIABLES = 999
+
+# Busy-retry policy for BEGIN IMMEDIATE. Each attempt already waits busy_timeout;
+# the retries cover SQLITE_BUSY returned without waiting and long writers on other
+# desktops, backing off (seconds, doubled each time, with jitter) so they spread out.
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.05
+BUSY_BACKOFF_MAX = 1.0
+
+
+class ConcurrencyConflict(Exception):
+    """A compare-and-swap write found its row changed (or gone) since it was read"""
+
+
+class DatabaseBusy(sqlite3.OperationalError):
+    """Another connection kept the write lock through every retry"""
+
+
+class StrayTransaction(RuntimeError):
+    """transaction() found writes left uncommitted outside any transaction;
+    they have been rolled back"""
+
+
+def is_busy_error(error):
+    """True for SQLite's "database is locked" / "database is busy" errors"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def resolve_profile(profile=DEFAULT_PROFILE, **overrides):
+    """Return the PRAGMA settings for a named profile plus any overrides"""
+    if profile not in CONNECTION_PROFILES:
+        raise ValueError(f"Unknown connection profile '{profile}'. "
+                         f"Choose from: {', '.join(CONNECTION_PROFILES)}")
+    settings = dict(CONNECTION_PROFILES[profile])
+    for key, value in overrides.items():
+        if key not in PRAGMA_ORDER:
+            raise ValueError(f"Unsupported connection setting '{key}'")
+        settings[key] = value
+    return settings
+
 
 class Database:
-    def __init__(self, db_name='integrated_system.db'):
-        self.conn = sqlite3.connect(db_name)
+    def __init__(self, db_name='integrated_system.db', profile=DEFAULT_PROFILE, progress=None, **settings):
+        self.db_name = db_name
+        self.profile = profile
+        self.settings = resolve_profile(profile, **settings)
+        timeout = self.settings.get('busy_timeout', 5000) / 1000
+        self.conn = sqlite3.connect(db_name, timeout=timeout)
         self.cursor = self.conn.cursor()
-        self.init_tables()
+        # Rows read through execute()/fetch*() are namedtuples: row.status as well as row[4]
+        self.cursor.row_factory = namedtuple_factory
+        self._tx_depth = 0
+        self._savepoint_seq = 0
+        self.busy_retries = BUSY_RETRIES
+        self._reports = None
+        self.reports_generation = 0  # bumped whenever reporting connections must be reopened
+        self.stats = None
+        self.apply_settings(exclude=('query_only',))
+        self.applied_migrations = migrate(self.conn, progress)
+        # Archived financial years + the All_* views that reports read through
+        self.archives = attach_archives(self.conn)
+        # query_only goes on after the schema exists, otherwise migrations would fail
+        if 'query_only' in self.settings:
+            self.apply_settings(include=('query_only',))
     
-    def init_tables(self):
-        """Initialize all database tables with GST support"""
-        
-        # SHARED TABLES (used by both Purchase and Sales)
-        
-        # Items table - Now with GST rates
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Items (
-                item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                category TEXT,
-                unit_of_measure TEXT,
-                purchase_rate REAL,
-                purchase_gst_percent REAL DEFAULT 18.0,
-                purchase_price REAL,
-                selling_rate REAL,
-                selling_gst_percent REAL DEFAULT 18.0,
-                selling_price REAL,
-                hsn_code TEXT
-            )
-        ''')
-        
-        # Inventory table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Inventory (
-                item_id INTEGER PRIMARY KEY,
-                quantity_on_hand INTEGER DEFAULT 0,
-                reorder_level INTEGER DEFAULT 10,
-                location TEXT,
-                last_updated TIMESTAMP,
-                FOREIGN KEY (item_id) REFERENCES Items(item_id)
-            )
-        ''')
-        
-        # PURCHASE DEPARTMENT TABLES
-        
-        # Suppliers table - with GST details
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Suppliers (
-                supplier_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                contact_person TEXT,
-                phone TEXT,
-                email TEXT,
-                address TEXT,
-                gstin TEXT,
-                payment_terms TEXT
-            )
-        ''')
-        
-        # Purchase Orders table - with GST breakdown
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Purchase_Orders (
-                po_number INTEGER PRIMARY KEY AUTOINCREMENT,
-                supplier_id INTEGER,
-                order_date DATE,
-                expected_delivery DATE,
-                status TEXT DEFAULT 'Pending',
-                subtotal REAL,
-                total_gst REAL,
-                total_amount REAL,
-                FOREIGN KEY (supplier_id) REFERENCES Suppliers(supplier_id)
-            )
-        ''')
-        
-        # Purchase Order Items table - with GST per item
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Purchase_Order_Items (
-                po_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                po_number INTEGER,
-                item_id INTEGER,
-                quantity INTEGER,
-                rate REAL,
-                gst_percent REAL,
-                gst_amount REAL,
-                total_price REAL,
-                FOREIGN KEY (po_number) REFERENCES Purchase_Orders(po_number),
-                FOREIGN KEY (item_id) REFERENCES Items(item_id)
-            )
-        ''')
-        
-        # Goods Receipt table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Goods_Receipt (
-                receipt_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                po_number INTEGER,
-                item_id INTEGER,
-                supplier_id INTEGER,
-                invoice_number TEXT,
-                received_quantity INTEGER,
-                accepted_quantity INTEGER,
-                rejected_quantity INTEGER,
-                receipt_date DATE,
-                notes TEXT,
-                FOREIGN KEY (po_number) REFERENCES Purchase_Orders(po_number),
-                FOREIGN KEY (item_id) REFERENCES Items(item_id),
-                FOREIGN KEY (supplier_id) REFERENCES Suppliers(supplier_id)
-            )
-        ''')
-        
-        # SALES DEPARTMENT TABLES
-        
-        # Customers table - with GST details
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Customers (
-                customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                contact_person TEXT,
-                phone TEXT,
-                email TEXT,
-                address TEXT,
-                gstin TEXT,
-                credit_limit REAL,
-                payment_terms TEXT
-            )
-        ''')
-        
-        # Sales Orders table - with GST breakdown
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Sales_Orders (
-                so_number INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER,
-                order_date DATE,
-                delivery_date DATE,
-                status TEXT DEFAULT 'Pending',
-                subtotal REAL,
-                total_gst REAL,
-                total_amount REAL,
-                FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
-            )
-        ''')
-        
-        # Sales Order Items table - with GST per item
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Sales_Order_Items (
-                so_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                so_number INTEGER,
-                item_id INTEGER,
-                quantity INTEGER,
-                rate REAL,
-                gst_percent REAL,
-                gst_amount REAL,
-                total_price REAL,
-                FOREIGN KEY (so_number) REFERENCES Sales_Orders(so_number),
-                FOREIGN KEY (item_id) REFERENCES Items(item_id)
-            )
-        ''')
-        
-        # Invoices table - with GST breakdown
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Invoices (
-                invoice_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                so_number INTEGER,
-                customer_id INTEGER,
-                invoice_date DATE,
-                due_date DATE,
-                subtotal REAL,
-                total_gst REAL,
-                total_amount REAL,
-                status TEXT DEFAULT 'Unpaid',
-                FOREIGN KEY (so_number) REFERENCES Sales_Orders(so_number),
-                FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
-            )
-        ''')
-        
+    def apply_settings(self, include=PRAGMA_ORDER, exclude=()):
+        """Apply the connection profile PRAGMAs"""
+        for key in PRAGMA_ORDER:
+            if key in self.settings and key in include and key not in exclude:
+                self.conn.execute(f"PRAGMA {key} = {self.settings[key]}")
+    
+    def connection_settings(self):
+        """Report the settings SQLite actually applied (read back from the connection)"""
+        labels = {
+            'synchronous': {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+            'temp_store': {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'},
+            'query_only': {0: 'OFF', 1: 'ON'},
+        }
+        applied = {'profile': self.profile}
+        for key in PRAGMA_ORDER:
+            value = self.conn.execute(f"PRAGMA {key}").fetchone()[0]
+            applied[key] = labels.get(key, {}).get(value, value)
+        return applied
+    
+    def init_indexes(self):
+        """Create any missing secondary indexes"""
+        for name, table, columns in INDEXES:
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        self.conn.commit()
+    
+    def drop_indexes(self):
+        """Drop the secondary indexes (used by the benchmark for before/after runs)"""
+        for name, _, _ in INDEXES:
+            self.cursor.execute(f"DROP INDEX IF EXISTS {name}")
         self.conn.commit()
     
     def execute(self, query, params=()):
         """Execute a query"""
-        return self.cursor.execute(query, params)
+        if self.stats is None:
+            return self.cursor.execute(query, params)
+        started = self.stats.start(query, params)
+        try:
+            return self.cursor.execute(query, params)
+        finally:
+            self.stats.add_time(started)
+    
+    def executemany(self, query, seq_of_params):
+        """Execute a query once for every parameter tuple"""
+        if self.stats is None:
+            return self.cursor.executemany(query, seq_of_params)
+        started = self.stats.start(query, ())
+        try:
+            return self.cursor.executemany(query, seq_of_params)
+        finally:
+            self.stats.add_time(started)
     
     def fetchall(self):
         """Fetch all results"""
-        return self.cursor.fetchall()
+        if self.stats is None:
+            return self.cursor.fetchall()
+        started = time.perf_counter()
+        try:
+            return self.cursor.fetchall()
+        finally:
+            self.stats.add_time(started)
     
     def fetchone(self):
         """Fetch one result"""
-        return self.cursor.fetchone()
+        if self.stats is None:
+            return self.cursor.fetchone()
+        started = time.perf_counter()
+        try:
+            return self.cursor.fetchone()
+        finally:
+            self.stats.add_time(started)
     
     def commit(self):
         """Commit changes"""
         self.conn.commit()
     
+    def rollback(self):
+        """Discard uncommitted changes"""
+        self.conn.rollback()
+    
+    # ==================== TRANSACTIONS ====================
+    
+    @contextmanager
+    def transaction(self):
+        """Run a unit of work as one BEGIN IMMEDIATE ... COMMIT.
+        
+        The write lock is taken up front, so checks made inside the block
+        stay valid until it commits. Any exception rolls everything back and
+        is re-raised. Nested calls become savepoints of the outer transaction.
+        """
+        if self._tx_depth:
+            with self.savepoint():
+                yield self
+            return
+        if self.conn.in_transaction:
+            # Every write goes through transaction(), so this is a bug: never
+            # commit half-finished work that no transaction owned
+            self.conn.rollback()
+            raise StrayTransaction("Uncommitted writes were made outside a transaction and have been "
+                                   "rolled back")
+        self._begin_immediate()
+        self._tx_depth = 1
+        try:
+            yield self
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._tx_depth = 0
+    
+    def _begin_immediate(self):
+        """BEGIN IMMEDIATE, retrying with backoff while another desktop holds the write lock"""
+        for attempt in range(self.busy_retries + 1):
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                if attempt == self.busy_retries:
+                    raise DatabaseBusy("The database is busy: another desktop is saving. "
+                                       "Please try again in a moment.") from e
+                time.sleep(min(BUSY_BACKOFF_MAX, BUSY_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0))
+    
+    def execute_versioned(self, query, params, what):
+        """Run a compare-and-swap UPDATE (one whose WHERE checks row_version = ?).
+        Raises ConcurrencyConflict when no row matched, so the caller's transaction
+        rolls back instead of overwriting someone else's change."""
+        cursor = self.execute(query, params)
+        if cursor.rowcount == 0:
+            raise ConcurrencyConflict(f"{what} was changed on another desktop after you opened it.\n"
+                                      "Nothing was saved - reopen it to see the latest version.")
+        return cursor
+    
+    @contextmanager
+    def savepoint(self, name=None):
+        """Run part of a transaction so that it can fail without aborting the rest"""
+        self._savepoint_seq += 1
+        name = name or f"sp_{self._savepoint_seq}"
+        self.conn.execute(f"SAVEPOINT {name}")
+        self._tx_depth += 1
+        try:
+            yield self
+            self.conn.execute(f"RELEASE SAVEPOINT {name}")
+        except BaseException:
+            self.conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            self.conn.execute(f"RELEASE SAVEPOINT {name}")
+            raise
+        finally:
+            self._tx_depth -= 1
+    
+    def in_transaction(self):
+        """True while inside transaction() or savepoint()"""
+        return self._tx_depth > 0
+    
+    # ==================== BULK WRITES ====================
+    
+    def _execute_values(self, head, width, rows, tail=""):
+        """Run head VALUES (...), (...) ... tail in as few statements as the variable limit allows"""
+        rows = list(rows)
+        per_statement = max(1, MAX_VARIABLES // width)
+        placeholder = "(" + ", ".join("?" * width) + ")"
+        for start in range(0, len(rows), per_statement):
+            batch = rows[start:start + per_statement]
+            values = ", ".join([placeholder] * len(batch))
+            self.execute(f"{head} VALUES {values}{tail}", [value for row in batch for value in row])
+        return len(rows)
+    
+    def insert_many(self, table, columns, rows):
+        """Insert many rows with multi-row INSERT statements; returns the row count"""
+        return self._execute_values(f"INSERT INTO {table} ({', '.join(columns)})", len(columns), rows)
+    
+    def upsert_many(self, table, columns, rows, key, increment=()):
+        """Insert rows, updating the existing row when `key` already exists.
+        
+        Columns listed in `increment` are added to the stored value instead of
+        replacing it, e.g. stock movements against Inventory.quantity_on_hand.
+        """
+        key = (key,) if isinstance(key, str) else tuple(key)
+        updates = [f"{col} = {col} + excluded.{col}" if col in increment else f"{col} = excluded.{col}"
+                   for col in columns if col not in key]
+        tail = f" ON CONFLICT ({', '.join(key)}) DO UPDATE SET {', '.join(updates)}"
+        return self._execute_values(f"INSERT INTO {table} ({', '.join(columns)})", len(columns), rows, tail)
+    
     def lastrowid(self):
         """Get last inserted row ID"""
         return self.cursor.lastrowid
     
+    # ==================== REPORTING CONNECTION ====================
+    
+    @property
+    def reports(self):
+        """The read-only ReportConnection (opened on first use)"""
+        if self._reports is None:
+            self._reports = ReportConnection(self)
+        return self._reports
+    
+    def read_snapshot(self):
+        """with db.read_snapshot() as report: every query in the block sees the same data"""
+        return self.reports.snapshot()
+    
+    def close_reports(self):
+        """Close the reporting connection; the next report opens a fresh one.
+        Background readers (executor.py) reopen theirs when reports_generation changes."""
+        self.reports_generation += 1
+        if self._reports is not None:
+            self._reports.close()
+            self._reports = None
+    
+    # ==================== QUERY STATS ====================
+    
+    def enable_query_stats(self, slow_ms=DEFAULT_SLOW_MS, log_path=DEFAULT_LOG_PATH):
+        """Start timing every statement; statements over slow_ms go to the JSONL log"""
+        self.stats = QueryStats(self.conn, slow_ms, log_path)
+        return self.stats
+    
+    def disable_query_stats(self):
+        """Stop timing statements and drop what was recorded"""
+        self.stats = None
+    
+    def query_stats(self):
+        """Per-statement count, total, p50/p95/max (ms), most expensive first"""
+        return self.stats.summary() if self.stats else []
+    
+    def reset_query_stats(self):
+        """Clear the recorded statement timings"""
+        if self.stats:
+            self.stats.reset()
+    
+    def dump_query_stats(self, path):
+        """Write the recorded statement timings to a JSON file"""
+        if self.stats:
+            self.stats.dump(path)
+    
     def close(self):
         """Close database connection"""
+        self.close_reports()
+        if self.stats:
+            self.stats.finish()
+        # Let SQLite refresh planner statistics for the indexes it actually used
+        if self.settings.get('query_only') != 'ON':
+            self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+
+
+class ReportConnection:
+    """Second, read-only connection that the report screens query through.
+    
+    It is opened with mode=ro and query_only, so it can never write. Under WAL
+    its reads neither wait for nor hold up order entry on the main connection.
+    Every call runs on its own cursor and returns the rows, so a query made
+    while looping over another one's rows cannot clobber them.
+    
+    One ReportConnection must only be used by one thread at a time; the
+    executor gives each worker thread its own.
+    """
+    
+    def __init__(self, db):
+        self.db = db
+        self.settings = resolve_profile(REPORT_PROFILE)
+        uri = "file:" + pathname2url(os.path.abspath(db.db_name)) + "?mode=ro"
+        # check_same_thread=False only so that a worker's connection can be closed at shutdown
+        self.conn = sqlite3.connect(uri, uri=True, timeout=self.settings['busy_timeout'] / 1000,
+                                    isolation_level=None, check_same_thread=False)
+        # journal_mode belongs to the file (set by the main connection); query_only goes on last
+        for key in PRAGMA_ORDER:
+            if key in self.settings and key not in ('journal_mode', 'query_only'):
+                self.conn.execute(f"PRAGMA {key} = {self.settings[key]}")
+        self.archives = attach_archives(self.conn, read_only=True)
+        self.conn.execute("PRAGMA query_only = ON")
+        self.conn.row_factory = namedtuple_factory
+        self._snapshot_depth = 0
+    
+    def _run(self, query, params, fetch):
+        stats = self.db.stats
+        if stats is None:
+            return fetch(self.conn.execute(query, params))
+        started = time.perf_counter()
+        try:
+            return fetch(self.conn.execute(query, params))
+        finally:
+            stats.record(query, params, (time.perf_counter() - started) * 1000, self.conn)
+    
+    def fetchall(self, query, params=()):
+        """Run a query and return all of its rows"""
+        return self._run(query, params, sqlite3.Cursor.fetchall)
+    
+    def fetchone(self, query, params=()):
+        """Run a query and return its first row"""
+        return self._run(query, params, sqlite3.Cursor.fetchone)
+    
+    @contextmanager
+    def snapshot(self):
+        """Hold one read transaction for the block.
+        
+        Under WAL every query inside sees the database as of the first read,
+        even if orders are saved in between. Nested calls join the outer snapshot.
+        """
+        if self._snapshot_depth:
+            self._snapshot_depth += 1
+            try:
+                yield self
+            finally:
+                self._snapshot_depth -= 1
+            return
+        self.conn.execute("BEGIN")
+        self._snapshot_depth = 1
+        try:
+            yield self
+        finally:
+            self._snapshot_depth = 0
+            self.conn.execute("COMMIT")  # ends the read transaction, nothing to write
+    
+    def close(self):
+        """Close the connection"""
         self.conn.close()
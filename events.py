@@ -0,0 +1,54 @@
+"""
+Events Module - Change bus: saves announce what they changed, and each screen
+refreshes only what it shows of that
+"""
+
+# What changed. Each change carries the keys it is about, or None for "any".
+ITEMS = 'items'                     # item_id - item details, stock, reservations
+SUPPLIERS = 'suppliers'             # supplier_id
+CUSTOMERS = 'customers'             # customer_id
+PURCHASE_ORDERS = 'purchase_orders' # po_number
+RECEIPTS = 'receipts'               # invoice_number of the goods receipt
+SALES_ORDERS = 'sales_orders'       # so_number - lines, status, deliveries
+INVOICES = 'invoices'               # invoice_id
+
+ALL_KINDS = (ITEMS, SUPPLIERS, CUSTOMERS, PURCHASE_ORDERS, RECEIPTS, SALES_ORDERS, INVOICES)
+
+
+class ChangeBus:
+    """Publish/subscribe for data changes on the Tk thread.
+
+    A save calls publish(kind, keys) once its transaction has committed.
+    Changes are collected until Tk is next idle, then each subscriber is
+    called once with everything it asked for, as {kind: set of keys or
+    None}. A dialog that saves a receipt touching items, a PO and the
+    receipt list therefore causes one refresh per screen, not three.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._subscribers = []      # (kinds, callback)
+        self._pending = {}          # kind -> set of keys, or None for any
+        self._flush_id = None
+
+    def subscribe(self, kinds, callback):
+        """Call callback({kind: keys}) after changes of any of these kinds"""
+        self._subscribers.append((tuple(kinds), callback))
+
+    def publish(self, kind, keys=None):
+        """Announce that rows of `kind` changed: an iterable of keys, or None for any"""
+        if keys is None or self._pending.get(kind, ()) is None:
+            self._pending[kind] = None
+        else:
+            self._pending.setdefault(kind, set()).update(keys)
+        if self._flush_id is None:
+            self._flush_id = self.root.after_idle(self.flush)
+
+    def flush(self):
+        """Deliver the collected changes (normally from after_idle)"""
+        self._flush_id = None
+        pending, self._pending = self._pending, {}
+        for kinds, callback in self._subscribers:
+            changes = {kind: pending[kind] for kind in kinds if kind in pending}
+            if changes:
+                callback(changes)
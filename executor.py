@@ -0,0 +1,114 @@
+"""
+Executor Module - Runs report queries on worker threads so the Tk window never freezes
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tkinter import messagebox
+
+from database import ReportConnection
+
+DEFAULT_WORKERS = 2
+POLL_MS = 50            # how often the Tk thread picks up finished work
+LOADING_TEXT = "⏳ Loading..."
+
+
+class QueryExecutor:
+    """Thread pool for read-only database work.
+
+    Each worker thread reads through its own ReportConnection, and every job
+    runs inside one read snapshot. Results are handed back through a queue
+    that the Tk thread drains with root.after, because Tk must only be called
+    from the main thread.
+
+    Jobs are submitted under a key (usually the screen they fill). Submitting
+    again under the same key makes the older job stale: its result is dropped
+    instead of overwriting newer data.
+    """
+
+    def __init__(self, root, db, workers=DEFAULT_WORKERS):
+        self.root = root
+        self.db = db
+        self.results = queue.Queue()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="db-reader")
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._generations = {}
+        self._closed = False
+        self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def submit(self, key, work, on_done, on_error=None):
+        """Run work(report) on a worker thread, then on_done(result) on the Tk thread.
+
+        `report` is the worker's ReportConnection (fetchall/fetchone). If work
+        raises, on_error(exception) is called instead (default: an error box).
+        Returns the concurrent.futures.Future of the job.
+        """
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+        future = self._pool.submit(self._run, work)
+        future.add_done_callback(lambda f: self.results.put((key, generation, f, on_done, on_error)))
+        return future
+
+    def _connection(self):
+        """This worker thread's reporting connection, reopened after archiving"""
+        report = getattr(self._local, 'report', None)
+        if report is not None and self._local.generation != self.db.reports_generation:
+            with self._connections_lock:
+                self._connections.remove(report)
+            report.close()
+            report = None
+        if report is None:
+            report = ReportConnection(self.db)
+            self._local.report = report
+            self._local.generation = self.db.reports_generation
+            with self._connections_lock:
+                self._connections.append(report)
+        return report
+
+    def _run(self, work):
+        report = self._connection()
+        with report.snapshot():
+            return work(report)
+
+    def _poll(self):
+        """Hand finished jobs to their callbacks (Tk thread)"""
+        while True:
+            try:
+                key, generation, future, on_done, on_error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generations.get(key) or future.cancelled():
+                continue  # superseded by a newer refresh of the same screen
+            error = future.exception()
+            if error is None:
+                on_done(future.result())
+            elif on_error is not None:
+                on_error(error)
+            else:
+                messagebox.showerror("Error", f"Could not load data: {error}")
+        if not self._closed:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def shutdown(self):
+        """Stop the workers, dropping queued jobs, and close their connections"""
+        self._closed = True
+        self.root.after_cancel(self._poll_id)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        with self._connections_lock:
+            for report in self._connections:
+                report.close()
+            self._connections = []
+
+
+# ==================== LOADING INDICATORS ====================
+
+def show_loading(tree):
+    """Empty a Treeview and show a single 'Loading...' row until the data arrives"""
+    for item in tree.get_children():
+        tree.delete(item)
+    tree.insert('', 'end', values=(LOADING_TEXT,), tags=('loading',))
+    tree.tag_configure('loading', foreground='gray')
@@ -0,0 +1,121 @@
+"""
+GST Summary Module - Output and input GST by tax rate for the GST Summary and
+Reports tabs, computed apart from the screens
+Run: python gst_summary.py [database]
+"""
+
+import argparse
+import time
+from collections import namedtuple
+
+import queries
+
+# Tax brackets, warmest colour for the highest rates: (highest rate, legend label, colour)
+GST_BRACKETS = (
+    (0, "0%", '#666666'),
+    (5, "1-5%", '#28a745'),
+    (12, "6-12%", '#17a2b8'),
+    (18, "13-18%", '#ffc107'),
+    (None, "19%+", '#dc3545'),
+)
+
+RateTotals = namedtuple('RateTotals', 'gst_percent gst base orders items')
+RateComparison = namedtuple('RateComparison', 'gst_percent output_gst input_gst net_gst output_orders input_orders')
+GstSummary = namedtuple('GstSummary', 'output_gst input_gst net_gst sales_orders comparison output input')
+
+SalesBracket = namedtuple('SalesBracket', 'gst_percent gst base with_gst orders items')
+SalesBrackets = namedtuple('SalesBrackets', 'brackets base gst with_gst')
+
+
+# ==================== COLOURS ====================
+
+def gst_color(gst_percent):
+    """Colour of the bracket a GST rate falls in"""
+    for highest, _, color in GST_BRACKETS:
+        if highest is None or gst_percent <= highest:
+            return color
+
+
+def net_color(amount):
+    """Red when GST is owed, green when it is refundable, teal when balanced"""
+    return '#dc3545' if amount > 0 else ('#28a745' if amount < 0 else '#17a2b8')
+
+
+def net_status(amount):
+    return "To Pay" if amount > 0 else ("Refund" if amount < 0 else "Balanced")
+
+
+# ==================== SUMMARIES ====================
+# Plain functions of the query rows: equal rows give an equal summary, so a
+# screen can compare the new summary with the one it shows and skip the redraw.
+
+def summarize_gst(output_rows, input_rows):
+    """GstSummary of GST_COLLECTED_BY_RATE and GST_PAID_BY_RATE rows, or None with no orders"""
+    output = [RateTotals(*row) for row in output_rows]
+    input_ = [RateTotals(*row) for row in input_rows]
+    if not output and not input_:
+        return None
+    by_output = {row.gst_percent: row for row in output}
+    by_input = {row.gst_percent: row for row in input_}
+    comparison = []
+    for rate in sorted(set(by_output) | set(by_input)):
+        out = by_output.get(rate, RateTotals(rate, 0, 0, 0, 0))
+        in_ = by_input.get(rate, RateTotals(rate, 0, 0, 0, 0))
+        if out.gst > 0 or in_.gst > 0:
+            comparison.append(RateComparison(rate, out.gst, in_.gst, out.gst - in_.gst, out.orders, in_.orders))
+    output_gst = sum(row.gst for row in output)
+    input_gst = sum(row.gst for row in input_)
+    return GstSummary(output_gst, input_gst, output_gst - input_gst, sum(row.orders for row in output),
+                      tuple(comparison), tuple(output), tuple(input_))
+
+
+def summarize_sales_brackets(rows):
+    """SalesBrackets of SALES_GST_BY_RATE rows with their totals, or None with no sales"""
+    brackets = tuple(SalesBracket(*row) for row in rows)
+    if not brackets:
+        return None
+    return SalesBrackets(brackets, sum(b.base for b in brackets), sum(b.gst for b in brackets),
+                         sum(b.with_gst for b in brackets))
+
+
+def load_gst_summary(report):
+    """Query and summarize output and input GST (caller's read snapshot)"""
+    return summarize_gst(report.fetchall(queries.GST_COLLECTED_BY_RATE),
+                         report.fetchall(queries.GST_PAID_BY_RATE))
+
+
+def load_sales_brackets(report):
+    """Query and summarize GST collected by bracket (caller's read snapshot)"""
+    return summarize_sales_brackets(report.fetchall(queries.SALES_GST_BY_RATE))
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Print the GST summary by tax rate")
+    parser.add_argument('database', nargs='?', default='integrated_system.db')
+    args = parser.parse_args()
+
+    db = Database(args.database)
+    try:
+        started = time.perf_counter()
+        with db.reports.snapshot():
+            summary = load_gst_summary(db.reports)
+        elapsed = (time.perf_counter() - started) * 1000
+        if summary is None:
+            print("No orders yet")
+            return
+        print(f"{'Rate':>6} {'Output GST':>16} {'Input GST':>16} {'Net':>16} {'Out Orders':>11} {'In Orders':>10}")
+        for row in summary.comparison:
+            print(f"{row.gst_percent:>5.1f}% {row.output_gst:>16,.2f} {row.input_gst:>16,.2f} "
+                  f"{row.net_gst:>16,.2f} {row.output_orders:>11,} {row.input_orders:>10,}")
+        print(f"{'Total':>6} {summary.output_gst:>16,.2f} {summary.input_gst:>16,.2f} "
+              f"{summary.net_gst:>16,.2f}   {net_status(summary.net_gst)} ({elapsed:.1f} ms)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,22 @@ Main Application File - Integrated Purchase & Sales Management System with Menu
 Run this file to start the application
 """
 
+import time
 import tkinter as tk
+from datetime import date
 from tkinter import ttk, messagebox
+from archive import archivable_years, archive_before, financial_year, fy_label
+from backup import BackupScheduler
 from database import Database
+from events import ALL_KINDS, ChangeBus
+from executor import QueryExecutor
+import queries
+from migrations import console_progress
 from purchase_module import PurchaseModule
 from sales_module import SalesModule
+from search import search
+from stock_ledger import ensure_snapshots
+from widgets import VirtualTreeview
 
 
 # ==================== GLOBAL UI SETTINGS ====================
@@ -19,27 +30,103 @@ SMALL_FONT = ("Arial", 14)
 TITLE_FONT = ("Arial", 18, "bold")
 HEADER_FONT = ("Arial", 16, "bold")
 
+# Statements slower than this (ms) are written to slow_queries.jsonl with their query plan
+SLOW_QUERY_MS = 200
+
+# Online backups: one generation every BACKUP_INTERVAL_MINUTES, newest BACKUP_KEEP kept
+BACKUP_DIR = 'backups'
+BACKUP_KEEP = 7
+BACKUP_INTERVAL_MINUTES = 60
+
+# Closed documents of past financial years are moved into one file per year here
+ARCHIVE_DIR = 'archive'
+
+# Global search runs this long after the last keystroke
+SEARCH_DELAY_MS = 150
+SEARCH_KIND_LABELS = {'item': "📦 Item", 'customer': "👥 Customer", 'supplier': "🏢 Supplier", 'receipt': "📥 Receipt"}
+
+# Dashboard stat cards, one row per section (values from IntegratedManagementSystem.dashboard_cards).
+# While the dashboard is showing it re-reads them every DASHBOARD_REFRESH_SECONDS.
+DASHBOARD_SECTIONS = (
+    ("📦 Inventory Status", ("Total Items", "Low Stock Items", "Total Stock Units")),
+    ("🛒 Purchase Overview", ("Total POs", "Pending POs", "Total Purchase Value", "Suppliers")),
+    ("🛍️ Sales Overview", ("Total SOs", "Pending SOs", "Total Sales Value", "Customers")),
+    ("📄 Invoice Status", ("Total Invoices", "Unpaid Invoices", "Unpaid Amount")),
+    ("💰 GST Summary", ("Output GST (Collected)", "Input GST (Paid)", "Net GST Liability")),
+)
+DASHBOARD_REFRESH_SECONDS = 30
+
 class IntegratedManagementSystem:
-    def __init__(self, root):
+    def __init__(self, root, started=None):
         self.root = root
         self.root.title("Integrated Purchase & Sales Management System")
         self.root.geometry("1440x900")
         
-        # Initialize database
-        self.db = Database()
+        # Startup timing: (phase, seconds) up to the first paint, see report_startup
+        self.started = started or time.perf_counter()
+        self.startup_phases = []
+        self.startup_report = None
+        self.root.bind('<Map>', self.on_first_map, add='+')
+        
+        # Initialize database (runs any pending schema migrations)
+        self.db = Database(progress=console_progress)
+        self.db.enable_query_stats(slow_ms=SLOW_QUERY_MS)
+        
+        # Month-start stock snapshots that fell due while the app was closed
+        ensure_snapshots(self.db)
+        self.mark_startup("database")
+        
+        # Background backups (own connection and thread, results polled below)
+        self.backup = BackupScheduler(self.db.db_name, BACKUP_DIR, BACKUP_KEEP, BACKUP_INTERVAL_MINUTES * 60)
+        self.backup.start()
+        self.poll_backups()
+        
+        # Worker threads for report and list queries (modules refresh through it)
+        self.executor = QueryExecutor(self.root, self.db)
+        
+        # Saves publish what they changed; each screen refreshes only that
+        self.changes = ChangeBus(self.root)
+        self.changes.subscribe(ALL_KINDS, self.on_changes)
         
         # Create main content area with notebook (before menu bar)
         self.create_main_content()
         
-        # Initialize modules (before menu bar)
+        # Initialize modules (before menu bar); their tabs are built when first shown
         self.purchase_module = PurchaseModule(self.notebook, self.db, self)
         self.sales_module = SalesModule(self.notebook, self.db, self)
         
         # Create menu bar (after modules are initialized)
         self.create_menu_bar()
+        self.mark_startup("window")
         
         # Show welcome screen by default
         self.show_dashboard()
+        self.mark_startup("dashboard")
+        
+    # ==================== STARTUP TIMING ====================
+    
+    def mark_startup(self, phase):
+        """Record the end of a startup phase"""
+        if self.startup_report is None:
+            self.startup_phases.append((phase, time.perf_counter()))
+    
+    def on_first_map(self, event):
+        """The window is on screen; it is painted at the next idle moment"""
+        if event.widget is self.root and self.startup_report is None:
+            self.root.after_idle(self.report_startup)
+    
+    def report_startup(self):
+        """Print how long startup took up to the first paint, by phase"""
+        if self.startup_report is not None:
+            return
+        self.mark_startup("first paint")
+        previous, phases = self.started, []
+        for phase, at in self.startup_phases:
+            phases.append(f"{phase} {(at - previous) * 1000:.0f}")
+            previous = at
+        total = (self.startup_phases[-1][1] - self.started) * 1000
+        self.startup_report = f"{total:.0f} ms to first paint ({', '.join(phases)} ms)"
+        print(f"Startup: {self.startup_report}")
         
     # ==================== MENU BAR ====================
 
@@ -53,8 +140,11 @@ class IntegratedManagementSystem:
         menubar.add_cascade(label="🏠 Home", menu=home_menu)
     
         home_menu.add_command(label="📊 Dashboard", command=self.show_dashboard)
+        home_menu.add_command(label="🔍 Search    Ctrl+F", command=self.focus_search)
         home_menu.add_separator()
         home_menu.add_command(label="🔄 Refresh All Data", command=self.refresh_all_tabs)
+        home_menu.add_command(label="💾 Backup Now", command=self.backup_now)
+        home_menu.add_command(label="🗄️ Archive Closed Years...", command=self.show_archive_dialog)
         home_menu.add_separator()
         home_menu.add_command(label="🚪 Exit", command=self.on_closing)
     
@@ -115,7 +205,7 @@ class IntegratedManagementSystem:
         invoice_submenu.add_command(label="📋 View Invoices", 
                                    command=lambda: self.switch_to_tab("📄 Invoices"))
         invoice_submenu.add_command(label="💰 Mark as Paid", 
-                                   command=self.sales_module.mark_invoice_paid)
+                                   command=self.mark_invoice_paid)
     
         # ==================== REPORTS MENU ====================
         reports_menu = tk.Menu(menubar, tearoff=0)
@@ -133,6 +223,7 @@ class IntegratedManagementSystem:
         menubar.add_cascade(label="❓ Help", menu=help_menu)
         help_menu.add_command(label="📖 About", command=self.show_about)
         help_menu.add_command(label="ℹ️ System Info", command=self.show_system_info)
+        help_menu.add_command(label="⏱️ Query Statistics", command=self.show_query_stats)
 
     
     def create_main_content(self):
@@ -157,12 +248,32 @@ class IntegratedManagementSystem:
         ttk.Button(quick_frame, text="🔄 Refresh", 
                   command=self.refresh_all_tabs, width=10).pack(side='left', padx=2)
         
+        # Global search: items, customers, suppliers and receipts
+        search_frame = ttk.Frame(header)
+        search_frame.pack(side='right', padx=15, pady=10)
+        ttk.Label(search_frame, text="🔍").pack(side='left')
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=36)
+        self.search_entry.pack(side='left', padx=5)
+        self.search_entry.bind('<KeyRelease>', self.schedule_search)
+        self.search_entry.bind('<Return>', lambda e: self.open_first_search_result())
+        self.search_entry.bind('<Down>', lambda e: self.focus_search_results())
+        self.search_entry.bind('<Escape>', lambda e: self.hide_search_results())
+        self.root.bind('<Control-f>', lambda e: self.focus_search())
+        # A click anywhere else in the main window closes the drop-down
+        self.root.bind('<Button-1>', lambda e: e.widget is not self.search_entry and self.hide_search_results(), add='+')
+        self.search_popup = None
+        self.search_results = {}
+        self._search_after = None
+        
         # Separator
         ttk.Separator(self.root, orient='horizontal').pack(fill='x', padx=10)
         
         # Create main notebook
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        self.lazy_tabs = {}
+        self.notebook.bind('<<NotebookTabChanged>>', lambda e: self.build_tab(self.notebook.select()))
         
         # HIDE NOTEBOOK TABS
         style = ttk.Style()
@@ -170,24 +281,146 @@ class IntegratedManagementSystem:
     
         # ==================== NAVIGATION ====================
     
+    def add_lazy_tab(self, tab_name, build):
+        """Add an empty tab now; build(frame) fills it the first time it is shown"""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=tab_name)
+        self.lazy_tabs[str(frame)] = (build, frame)
+    
+    def build_tab(self, tab):
+        """Build a lazy tab (notebook tab id) if it has not been built yet"""
+        entry = self.lazy_tabs.pop(str(tab), None)
+        if entry:
+            build, frame = entry
+            build(frame)
+    
     def switch_to_tab(self, tab_name):
         """Switch to a specific tab by name"""
         for i in range(self.notebook.index("end")):
             if self.notebook.tab(i, "text") == tab_name:
+                # Built now rather than on <<NotebookTabChanged>>, which arrives later,
+                # so callers can use the tab's widgets straight away
+                self.build_tab(self.notebook.tabs()[i])
                 self.notebook.select(i)
                 return
         messagebox.showinfo("Info", f"Tab '{tab_name}' not found")
     
+    def mark_invoice_paid(self):
+        """Menu: the invoice is picked on the Invoices tab"""
+        self.switch_to_tab("📄 Invoices")
+        self.sales_module.mark_invoice_paid()
+    
+    # ==================== GLOBAL SEARCH ====================
+    
+    def focus_search(self):
+        """Put the cursor in the search box (Ctrl+F)"""
+        self.search_entry.focus_set()
+        self.search_entry.select_range(0, tk.END)
+    
+    def schedule_search(self, event):
+        """Search once typing pauses; a newer search drops the results of older ones"""
+        if event.keysym in ('Return', 'Down', 'Escape'):
+            return
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(SEARCH_DELAY_MS, self.run_search)
+    
+    def run_search(self):
+        self._search_after = None
+        text = self.search_var.get().strip()
+        if not text:
+            self.hide_search_results()
+            return
+        self.executor.submit('search', lambda report: search(report, text), self.show_search_results)
+    
+    def show_search_results(self, results):
+        """List the matches in a drop-down under the search box"""
+        if self.search_popup is None:
+            self.search_popup = tk.Toplevel(self.root)
+            self.search_popup.overrideredirect(True)
+            self.search_popup.transient(self.root)
+            columns = ("Type", "Name", "Details")
+            self.search_tree = ttk.Treeview(self.search_popup, columns=columns, show='headings', height=12)
+            for col, width in zip(columns, (130, 300, 300)):
+                self.search_tree.heading(col, text=col)
+                self.search_tree.column(col, width=width)
+            self.search_tree.pack(fill='both', expand=True)
+            self.search_tree.bind('<Return>', lambda e: self.open_selected_search_result())
+            self.search_tree.bind('<Double-1>', lambda e: self.open_selected_search_result())
+            self.search_tree.bind('<Escape>', lambda e: (self.hide_search_results(), self.focus_search()))
+        for row in self.search_tree.get_children():
+            self.search_tree.delete(row)
+        self.search_results = {}
+        for result in results:
+            row = self.search_tree.insert('', 'end', values=(SEARCH_KIND_LABELS[result.kind], result.title, result.detail))
+            self.search_results[row] = result
+        if not results:
+            self.search_tree.insert('', 'end', values=("", "No matches", ""))
+        # Right-aligned under the search box
+        self.search_popup.update_idletasks()
+        x = self.search_entry.winfo_rootx() + self.search_entry.winfo_width() - self.search_popup.winfo_reqwidth()
+        y = self.search_entry.winfo_rooty() + self.search_entry.winfo_height()
+        self.search_popup.geometry(f"+{max(0, x)}+{y}")
+        self.search_popup.deiconify()
+        self.search_popup.lift()
+    
+    def hide_search_results(self):
+        if self.search_popup is not None:
+            self.search_popup.withdraw()
+    
+    def focus_search_results(self):
+        if self.search_popup is not None and self.search_results:
+            first = self.search_tree.get_children()[0]
+            self.search_tree.focus_set()
+            self.search_tree.selection_set(first)
+            self.search_tree.focus(first)
+    
+    def open_first_search_result(self):
+        if self.search_results:
+            self.open_search_result(next(iter(self.search_results.values())))
+    
+    def open_selected_search_result(self):
+        selected = self.search_tree.selection()
+        if selected and selected[0] in self.search_results:
+            self.open_search_result(self.search_results[selected[0]])
+    
+    def open_search_result(self, result):
+        """Jump to the record: switch to its tab and select its row"""
+        self.hide_search_results()
+        # Virtual lists are searched in SQL by column name, the others by value index.
+        # The trees are looked up after switch_to_tab, which builds a tab on first use.
+        targets = {
+            'item': ("📦 Inventory", self.purchase_module, 'inv_tree', 'item_id'),
+            'customer': ("👥 Customers", self.sales_module, 'cust_tree', 0),
+            'supplier': ("🏢 Suppliers", self.purchase_module, 'sup_tree', 0),
+            'receipt': ("📥 Goods Receipt", self.purchase_module, 'receipt_tree', 'invoice_number'),
+        }
+        tab_name, module, attr, column = targets[result.kind]
+        self.switch_to_tab(tab_name)
+        tree = getattr(module, attr)
+        if isinstance(tree, VirtualTreeview):
+            tree.reveal(result.key, column,
+                        lambda found: found or messagebox.showinfo("Search", f"{result.title} was not found."))
+            return
+        for row in tree.get_children():
+            values = tree.item(row)['values']
+            if len(values) > column and str(values[column]) == str(result.key):
+                tree.selection_set(row)
+                tree.focus(row)
+                tree.see(row)
+                tree.focus_set()
+                return
+        messagebox.showinfo("Search", f"{result.title} is not in the list yet.\nRefresh the tab and try again.")
+    
     # ==================== DASHBOARD ====================
     
     def show_dashboard(self):
         """Show dashboard with summary statistics"""
         # Check if dashboard tab already exists
-        for i in range(self.notebook.index("end")):
-            if self.notebook.tab(i, "text") == "🏠 Dashboard":
-                self.notebook.select(i)
-                self.refresh_dashboard()
-                return
+        if hasattr(self, 'dashboard_frame'):
+            self.notebook.select(self.dashboard_frame)
+            self.refresh_dashboard()
+            return
         
         # Create dashboard tab
         dashboard_frame = ttk.Frame(self.notebook)
@@ -205,19 +438,14 @@ class IntegratedManagementSystem:
                   font=SMALL_FONT,
                   foreground="gray").pack(anchor="w")
         
-        # Create dashboard content
+        # Create dashboard content once; refreshes only change the card values
         self.dashboard_frame = dashboard_frame
+        self.create_dashboard_cards()
         self.refresh_dashboard()
+        self.root.after(DASHBOARD_REFRESH_SECONDS * 1000, self.auto_refresh_dashboard)
     
-    def refresh_dashboard(self):
-        """Refresh dashboard statistics - HORIZONTAL LAYOUT"""
-        if not hasattr(self, 'dashboard_frame'):
-            return
-
-        # Clear existing widgets (except title)
-        for widget in self.dashboard_frame.winfo_children()[1:]:
-           widget.destroy()
-
+    def create_dashboard_cards(self):
+        """Build the stat card sections and quick actions - HORIZONTAL LAYOUT"""
         # Create scrollable frame
         canvas = tk.Canvas(self.dashboard_frame, bg='#f5f5f5')
         scrollbar = ttk.Scrollbar(self.dashboard_frame, orient="vertical", command=canvas.yview)
@@ -235,133 +463,23 @@ class IntegratedManagementSystem:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        # === INVENTORY SECTION - HORIZONTAL ===
-        inv_section = ttk.LabelFrame(scrollable, text="📦 Inventory Status", padding=15)
-        inv_section.pack(fill='x', pady=(0, 15), padx=10)
-
-        self.db.execute("SELECT COUNT(*) FROM Items")
-        total_items = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COUNT(*) FROM Items i JOIN Inventory inv ON i.item_id = inv.item_id WHERE inv.quantity_on_hand <= inv.reorder_level")
-        low_stock = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COALESCE(SUM(quantity_on_hand), 0) FROM Inventory")
-        total_stock = self.db.fetchone()[0]
-
-        stats_frame = ttk.Frame(inv_section)
-        stats_frame.pack(fill='both', expand=True)
-
-        # Configure columns to distribute evenly
-        for i in range(3):
-            stats_frame.grid_columnconfigure(i, weight=1)
-        stats_frame.grid_rowconfigure(0, weight=1)
-
-        self.create_stat_card(stats_frame, "Total Items", str(total_items), "blue", 0, 0)
-        self.create_stat_card(stats_frame, "Low Stock Items", str(low_stock), "red" if low_stock > 0 else "green", 0, 1)
-        self.create_stat_card(stats_frame, "Total Stock Units", str(total_stock), "blue", 0, 2)
-
-        # === PURCHASE SECTION - HORIZONTAL ===
-        purchase_section = ttk.LabelFrame(scrollable, text="🛒 Purchase Overview", padding=15)
-        purchase_section.pack(fill='x', pady=(0, 15), padx=10)
-
-        self.db.execute("SELECT COUNT(*) FROM Purchase_Orders")
-        total_pos = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COUNT(*) FROM Purchase_Orders WHERE status = 'Pending'")
-        pending_pos = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COALESCE(SUM(total_amount), 0) FROM Purchase_Orders")
-        total_purchase = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COUNT(*) FROM Suppliers")
-        total_suppliers = self.db.fetchone()[0]
-
-        stats_frame = ttk.Frame(purchase_section)
-        stats_frame.pack(fill='both', expand=True)
-
-        for i in range(4):
-            stats_frame.grid_columnconfigure(i, weight=1)
-        stats_frame.grid_rowconfigure(0, weight=1)
-    
-        self.create_stat_card(stats_frame, "Total POs", str(total_pos), "blue", 0, 0)
-        self.create_stat_card(stats_frame, "Pending POs", str(pending_pos), "orange", 0, 1)
-        self.create_stat_card(stats_frame, "Total Purchase Value", f"₹{total_purchase:,.2f}", "green", 0, 2)
-        self.create_stat_card(stats_frame, "Suppliers", str(total_suppliers), "blue", 0, 3)
-
-        # === SALES SECTION - HORIZONTAL ===
-        sales_section = ttk.LabelFrame(scrollable, text="🛍️ Sales Overview", padding=15)
-        sales_section.pack(fill='x', pady=(0, 15), padx=10)
-
-        self.db.execute("SELECT COUNT(*) FROM Sales_Orders")
-        total_sos = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COUNT(*) FROM Sales_Orders WHERE status = 'Pending'")
-        pending_sos = self.db.fetchone()[0]
+        # One section per row of cards; each card is updated through its StringVar
+        self.stat_cards = {}     # label -> (value StringVar, value Label)
+        self.dashboard_shown = {}   # label -> (text, color) on screen
+        for title, labels in DASHBOARD_SECTIONS:
+            section = ttk.LabelFrame(scrollable, text=title, padding=15)
+            section.pack(fill='x', pady=(0, 15), padx=10)
 
-        self.db.execute("SELECT COALESCE(SUM(total_amount), 0) FROM Sales_Orders")
-        total_sales = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COUNT(*) FROM Customers")
-        total_customers = self.db.fetchone()[0]
-
-        stats_frame = ttk.Frame(sales_section)
-        stats_frame.pack(fill='both', expand=True)
-
-        for i in range(4):
-            stats_frame.grid_columnconfigure(i, weight=1)
-        stats_frame.grid_rowconfigure(0, weight=1)
-    
-        self.create_stat_card(stats_frame, "Total SOs", str(total_sos), "blue", 0, 0)
-        self.create_stat_card(stats_frame, "Pending SOs", str(pending_sos), "orange", 0, 1)
-        self.create_stat_card(stats_frame, "Total Sales Value", f"₹{total_sales:,.2f}", "green", 0, 2)
-        self.create_stat_card(stats_frame, "Customers", str(total_customers), "blue", 0, 3)
-
-        # === INVOICES SECTION - HORIZONTAL ===
-        invoice_section = ttk.LabelFrame(scrollable, text="📄 Invoice Status", padding=15)
-        invoice_section.pack(fill='x', pady=(0, 15), padx=10)
-
-        self.db.execute("SELECT COUNT(*) FROM Invoices")
-        total_invoices = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COUNT(*) FROM Invoices WHERE status = 'Unpaid'")
-        unpaid_invoices = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COALESCE(SUM(total_amount), 0) FROM Invoices WHERE status = 'Unpaid'")
-        unpaid_amount = self.db.fetchone()[0]
-
-        stats_frame = ttk.Frame(invoice_section)
-        stats_frame.pack(fill='both', expand=True)
-
-        for i in range(3):
-            stats_frame.grid_columnconfigure(i, weight=1)
-        stats_frame.grid_rowconfigure(0, weight=1)
-    
-        self.create_stat_card(stats_frame, "Total Invoices", str(total_invoices), "blue", 0, 0)
-        self.create_stat_card(stats_frame, "Unpaid Invoices", str(unpaid_invoices), "red" if unpaid_invoices > 0 else "green", 0, 1)
-        self.create_stat_card(stats_frame, "Unpaid Amount", f"₹{unpaid_amount:,.2f}", "red" if unpaid_amount > 0 else "green", 0, 2)
+            stats_frame = ttk.Frame(section)
+            stats_frame.pack(fill='both', expand=True)
 
-        # === GST SECTION - HORIZONTAL ===
-        gst_section = ttk.LabelFrame(scrollable, text="💰 GST Summary", padding=15)
-        gst_section.pack(fill='x', pady=(0, 15), padx=10)
+            # Configure columns to distribute evenly
+            for i in range(len(labels)):
+                stats_frame.grid_columnconfigure(i, weight=1)
+            stats_frame.grid_rowconfigure(0, weight=1)
 
-        self.db.execute("SELECT COALESCE(SUM(total_gst), 0) FROM Sales_Orders")
-        output_gst = self.db.fetchone()[0]
-
-        self.db.execute("SELECT COALESCE(SUM(total_gst), 0) FROM Purchase_Orders")
-        input_gst = self.db.fetchone()[0]
-
-        net_gst = output_gst - input_gst
-
-        stats_frame = ttk.Frame(gst_section)
-        stats_frame.pack(fill='both', expand=True)
-
-        for i in range(3):
-            stats_frame.grid_columnconfigure(i, weight=1)
-        stats_frame.grid_rowconfigure(0, weight=1)
-    
-        self.create_stat_card(stats_frame, "Output GST (Collected)", f"₹{output_gst:,.2f}", "green", 0, 0)
-        self.create_stat_card(stats_frame, "Input GST (Paid)", f"₹{input_gst:,.2f}", "orange", 0, 1)
-        self.create_stat_card(stats_frame, "Net GST Liability", f"₹{net_gst:,.2f}", "red" if net_gst > 0 else "blue", 0, 2)
+            for col, label in enumerate(labels):
+                self.stat_cards[label] = self.create_stat_card(stats_frame, label, 0, col)
 
         # Quick Actions - HORIZONTAL
         actions_section = ttk.LabelFrame(scrollable, text="⚡ Quick Actions", padding=15)
@@ -380,8 +498,54 @@ class IntegratedManagementSystem:
         ttk.Button(actions_frame, text="📄 Generate Invoice", 
                   command=self.sales_module.generate_invoice, width=25).pack(side='left', padx=5, pady=5)
 
-    def create_stat_card(self, parent, label, value, color, row, col):
-        """Create a statistics card"""
+    def dashboard_cards(self, stats):
+        """Text and colour of every stat card: {label: (text, color)}"""
+        net_gst = stats.so_gst - stats.po_gst
+        return {
+            "Total Items": (str(stats.item_count), "blue"),
+            "Low Stock Items": (str(stats.low_stock_count), "red" if stats.low_stock_count > 0 else "green"),
+            "Total Stock Units": (str(stats.stock_units), "blue"),
+            "Total POs": (str(stats.po_count), "blue"),
+            "Pending POs": (str(stats.po_pending_count), "orange"),
+            "Total Purchase Value": (f"₹{stats.po_value:,.2f}", "green"),
+            "Suppliers": (str(stats.supplier_count), "blue"),
+            "Total SOs": (str(stats.so_count), "blue"),
+            "Pending SOs": (str(stats.so_pending_count), "orange"),
+            "Total Sales Value": (f"₹{stats.so_value:,.2f}", "green"),
+            "Customers": (str(stats.customer_count), "blue"),
+            "Total Invoices": (str(stats.invoice_count), "blue"),
+            "Unpaid Invoices": (str(stats.invoice_unpaid_count), "red" if stats.invoice_unpaid_count > 0 else "green"),
+            "Unpaid Amount": (f"₹{stats.invoice_unpaid_total:,.2f}", "red" if stats.invoice_unpaid_total > 0 else "green"),
+            "Output GST (Collected)": (f"₹{stats.so_gst:,.2f}", "green"),
+            "Input GST (Paid)": (f"₹{stats.po_gst:,.2f}", "orange"),
+            "Net GST Liability": (f"₹{net_gst:,.2f}", "red" if net_gst > 0 else "blue"),
+        }
+
+    def refresh_dashboard(self):
+        """Update the stat cards in place; returns how many changed"""
+        if not hasattr(self, 'dashboard_frame'):
+            return 0
+
+        # Every figure comes from one read of the one-row Dashboard_Stats summary (kept current by triggers)
+        cards = self.dashboard_cards(self.db.reports.fetchone(queries.DASHBOARD_STATS))
+        changed = [label for label, card in cards.items() if self.dashboard_shown.get(label) != card]
+        for label in changed:
+            text, color = cards[label]
+            value_var, value_label = self.stat_cards[label]
+            value_var.set(text)
+            value_label.configure(foreground=color)
+        self.dashboard_shown = cards
+        return len(changed)
+    
+    def auto_refresh_dashboard(self):
+        """Re-read the figures every DASHBOARD_REFRESH_SECONDS while the dashboard is
+        showing, so saves from other desktops on the same database appear too"""
+        if self.notebook.select() == str(self.dashboard_frame):
+            self.refresh_dashboard()
+        self.root.after(DASHBOARD_REFRESH_SECONDS * 1000, self.auto_refresh_dashboard)
+
+    def create_stat_card(self, parent, label, row, col):
+        """Create a statistics card; returns its (value StringVar, value Label)"""
         card_frame = ttk.Frame(parent, relief='solid', borderwidth=1)
         card_frame.grid(row=row, column=col, padx=10, pady=10, sticky='nsew')
         parent.grid_columnconfigure(col, weight=1)
@@ -389,8 +553,10 @@ class IntegratedManagementSystem:
     
         ttk.Label(card_frame, text=label, font=('Arial', 9), 
                  foreground='gray').pack(pady=(10, 5))
-        ttk.Label(card_frame, text=value, font=('Arial', 16, 'bold'), 
-                 foreground=color).pack(pady=(0, 10))
+        value_var = tk.StringVar(card_frame, value="…")
+        value_label = ttk.Label(card_frame, textvariable=value_var, font=('Arial', 16, 'bold'))
+        value_label.pack(pady=(0, 10))
+        return value_var, value_label
     
     def show_about(self):
         """Show about dialog"""
@@ -414,24 +580,27 @@ Developed with Python & Tkinter
     
     def show_system_info(self):
         """Show system information"""
-        self.db.execute("SELECT COUNT(*) FROM Items")
-        items = self.db.fetchone()[0]
-        
-        self.db.execute("SELECT COUNT(*) FROM Suppliers")
-        suppliers = self.db.fetchone()[0]
-        
-        self.db.execute("SELECT COUNT(*) FROM Customers")
-        customers = self.db.fetchone()[0]
-        
-        self.db.execute("SELECT COUNT(*) FROM Purchase_Orders")
-        pos = self.db.fetchone()[0]
+        stats = self.db.reports.fetchone(queries.DASHBOARD_STATS)
+        items = stats.item_count
+        suppliers = stats.supplier_count
+        customers = stats.customer_count
+        pos = stats.po_count
+        sos = stats.so_count
         
-        self.db.execute("SELECT COUNT(*) FROM Sales_Orders")
-        sos = self.db.fetchone()[0]
+        settings = self.db.connection_settings()
+        last_backup = self.backup.last_result.message if self.backup.last_result else "none this session"
         
         info_text = f"""System Information
 
-Database: SQLite (integrated_system.db)
+Database: SQLite ({self.db.db_name})
+
+Connection Profile: {settings['profile']}
+• Journal Mode: {settings['journal_mode']}
+• Synchronous: {settings['synchronous']}
+• Cache Size: {settings['cache_size']}
+• Memory Map: {settings['mmap_size']} bytes
+• Temp Store: {settings['temp_store']}
+• Busy Timeout: {settings['busy_timeout']} ms
 
 Current Data:
 • Items: {items}
@@ -440,12 +609,156 @@ Current Data:
 • Purchase Orders: {pos}
 • Sales Orders: {sos}
 
+Backups: every {BACKUP_INTERVAL_MINUTES} min to {BACKUP_DIR}/ (keeping {BACKUP_KEEP})
+• Last: {last_backup}
+
+Archived Financial Years: {', '.join(self.db.archives) or 'none'}
+
+Startup: {self.startup_report or 'not measured yet'}
+
 Status: Operational ✓"""
         
         messagebox.showinfo("System Information", info_text)
     
+    def show_query_stats(self):
+        """Show per-statement timings recorded by the database layer"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Query Statistics")
+        dialog.geometry("1100x500")
+        dialog.transient(self.root)
+        
+        summary_label = ttk.Label(dialog, font=('Arial', 10))
+        summary_label.pack(pady=5)
+        
+        columns = ("Count", "Total ms", "p50 ms", "p95 ms", "Max ms", "Statement")
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=15)
+        col_widths = [70, 90, 80, 80, 80, 650]
+        for i, col in enumerate(columns):
+            tree.heading(col, text=col)
+            tree.column(col, width=col_widths[i], anchor='w' if col == "Statement" else 'e')
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        def load():
+            for item in tree.get_children():
+                tree.delete(item)
+            rows = self.db.query_stats()
+            for row in rows:
+                tree.insert('', 'end', values=(row['count'], f"{row['total_ms']:.1f}", f"{row['p50_ms']:.2f}",
+                    f"{row['p95_ms']:.2f}", f"{row['max_ms']:.2f}", row['sql']))
+            slow = self.db.stats.slow_count if self.db.stats else 0
+            summary_label.config(text=f"{len(rows)} distinct statements  |  {slow} slower than "
+                f"{SLOW_QUERY_MS} ms (logged to {self.db.stats.log_path if self.db.stats else '-'})")
+        
+        def reset():
+            self.db.reset_query_stats()
+            load()
+        
+        def save():
+            self.db.dump_query_stats("query_stats.json")
+            messagebox.showinfo("Saved", "Statistics written to query_stats.json", parent=dialog)
+        
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="🔄 Refresh", command=load).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="🧹 Reset", command=reset).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="💾 Save JSON", command=save).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="❌ Close", command=dialog.destroy).pack(side='left', padx=5)
+        load()
+    
+    def backup_now(self):
+        """Queue an immediate backup; the result is reported when it finishes"""
+        if self.backup.running:
+            messagebox.showinfo("Backup", "A backup is already in progress")
+            return
+        self.backup.backup_now()
+    
+    def poll_backups(self):
+        """Report finished backups (the scheduler thread cannot touch Tk itself)"""
+        while not self.backup.results.empty():
+            result = self.backup.results.get_nowait()
+            if not result.ok:
+                messagebox.showerror("Backup", result.message)
+            elif result.manual:
+                messagebox.showinfo("Backup", result.message)
+        self.root.after(1000, self.poll_backups)
+    
+    def show_archive_dialog(self):
+        """List archived financial years and archive closed documents of past years"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Financial Year Archives")
+        dialog.geometry("1100x450")
+        dialog.transient(self.root)
+        
+        ttk.Label(dialog, text="Completed POs and delivered, fully paid SOs are moved into one archive "
+                  "file per financial year.\nReports and dashboard totals still include them.",
+                  font=('Arial', 10)).pack(pady=5)
+        
+        columns = ("FY", "POs", "PO Value", "SOs", "SO Value", "Invoices", "Archived At", "File")
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=8)
+        col_widths = [80, 70, 130, 70, 130, 80, 160, 330]
+        for i, col in enumerate(columns):
+            tree.heading(col, text=col)
+            tree.column(col, width=col_widths[i], anchor='w' if col in ("FY", "Archived At", "File") else 'e')
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        # Cutoffs are financial year boundaries up to the start of the current year
+        current_fy = financial_year(date.today())
+        cutoff_frame = ttk.Frame(dialog)
+        cutoff_frame.pack(pady=5)
+        ttk.Label(cutoff_frame, text="Archive closed documents up to the end of FY:").pack(side='left', padx=5)
+        cutoff_var = tk.StringVar()
+        cutoff_combo = ttk.Combobox(cutoff_frame, textvariable=cutoff_var, state='readonly', width=12)
+        cutoff_combo.pack(side='left', padx=5)
+        
+        def load():
+            for item in tree.get_children():
+                tree.delete(item)
+            self.db.execute(queries.ARCHIVED_YEARS_LIST)
+            for row in self.db.fetchall():
+                missing = "" if row.label in self.db.archives else "  (missing)"
+                tree.insert('', 'end', values=(row.label, row.po_count, f"₹{row.po_value:,.2f}", row.so_count,
+                    f"₹{row.so_value:,.2f}", row.invoice_count, row.archived_at, row.path + missing))
+            years = archivable_years(self.db, date(current_fy, 4, 1))
+            cutoff_combo['values'] = [fy_label(year) for year in years]
+            cutoff_var.set(cutoff_combo['values'][-1] if years else "")
+        
+        def archive():
+            if not cutoff_var.get():
+                messagebox.showinfo("Archive", "There are no past financial years to archive", parent=dialog)
+                return
+            start_year = int(cutoff_var.get()[:4])
+            if not messagebox.askyesno("Confirm Archive",
+                    f"Move closed documents up to the end of FY {cutoff_var.get()} into archive files?\n\n"
+                    "They can no longer be edited or deleted afterwards.", parent=dialog):
+                return
+            try:
+                moved = archive_before(self.db, date(start_year + 1, 4, 1), ARCHIVE_DIR)
+            except Exception as e:
+                messagebox.showerror("Archive", f"Archiving failed: {e}", parent=dialog)
+                return
+            load()
+            for kind in ALL_KINDS:
+                self.changes.publish(kind)
+            if not moved:
+                messagebox.showinfo("Archive", "No closed documents to archive", parent=dialog)
+                return
+            summary = "\n".join(f"FY {label}: {counts['Purchase_Orders']} POs, {counts['Sales_Orders']} SOs, "
+                                f"{counts['Invoices']} invoices" for label, counts in moved.items())
+            messagebox.showinfo("Archive", f"Archived:\n\n{summary}", parent=dialog)
+        
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="🗄️ Archive", command=archive).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="❌ Close", command=dialog.destroy).pack(side='left', padx=5)
+        load()
+    
+    def on_changes(self, changes):
+        """Any saved change may move the dashboard figures"""
+        if hasattr(self, 'dashboard_frame'):
+            self.refresh_dashboard()
+    
     def refresh_all_tabs(self):
-        """Refresh all tabs across both modules"""
+        """Refresh all tabs across both modules (Refresh button and menu)"""
         self.purchase_module.refresh_all()
         self.sales_module.refresh_all()
         if hasattr(self, 'dashboard_frame'):
@@ -455,10 +768,13 @@ Status: Operational ✓"""
     def on_closing(self):
         """Handle application close"""
         if messagebox.askyesno("Exit", "Are you sure you want to exit?"):
+            self.backup.stop()
+            self.executor.shutdown()
             self.db.close()
             self.root.destroy()
 
 if __name__ == "__main__":
+    started = time.perf_counter()
     root = tk.Tk()
 
     # Global scaling (THIS fixes small text everywhere)
@@ -469,6 +785,6 @@ if __name__ == "__main__":
     style.configure("Treeview", font=BASE_FONT, rowheight=28)
     style.configure("Treeview.Heading", font=(BASE_FONT[0], BASE_FONT[1], "bold"))
 
-    app = IntegratedManagementSystem(root)
+    app = IntegratedManagementSystem(root, started)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
@@ -0,0 +1,1015 @@
+"""
+Migrations Module - Versioned schema changes keyed on PRAGMA user_version
+Run: python migrations.py [database] to migrate headlessly, --status to inspect
+"""
+
+import sqlite3
+import sys
+import time
+
+
+class MigrationError(Exception):
+    """A migration step failed and was rolled back"""
+
+
+class Migration:
+    """One ordered schema step. Plain steps run inside a single transaction;
+    chunked steps manage their own transactions (see backfill) and must be
+    safe to resume after an interruption."""
+
+    def __init__(self, version, description, apply, chunked=False):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.chunked = chunked
+
+
+MIGRATIONS = []
+
+
+def migration(version, description, chunked=False):
+    """Register a function as the migration to the given schema version"""
+    def register(apply):
+        if MIGRATIONS and version != MIGRATIONS[-1].version + 1:
+            raise ValueError(f"Migration {version} registered out of order")
+        MIGRATIONS.append(Migration(version, description, apply, chunked))
+        return apply
+    return register
+
+
+def latest_version():
+    """Schema version the code expects"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(conn):
+    """Schema version stored in the database file"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, progress=None):
+    """Bring the database up to latest_version().
+
+    A database that is already current costs one PRAGMA read and no DDL.
+    Returns the list of versions that were applied.
+    """
+    version = current_version(conn)
+    if version == latest_version():
+        return []
+    if version > latest_version():
+        raise MigrationError(f"Database schema v{version} is newer than this application (v{latest_version()})")
+
+    applied = []
+    for step in MIGRATIONS:
+        if step.version <= version:
+            continue
+        if progress:
+            progress(f"Migrating to v{step.version}: {step.description}", 0, 1)
+        try:
+            if step.chunked:
+                step.apply(conn, progress)
+                conn.execute("BEGIN IMMEDIATE")
+            else:
+                conn.execute("BEGIN IMMEDIATE")
+                step.apply(conn, progress)
+            conn.execute(f"PRAGMA user_version = {step.version}")
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            raise MigrationError(f"Migration v{step.version} ({step.description}) failed: {e}") from e
+        applied.append(step.version)
+        if progress:
+            progress(f"Migrated to v{step.version}: {step.description}", 1, 1)
+    return applied
+
+
+def backfill(conn, table, assignments, where="1", params=(), chunk_size=20000, progress=None):
+    """Run UPDATE table SET <assignments> WHERE <where> in rowid-range chunks.
+
+    Each chunk commits on its own so a backfill over millions of rows never
+    holds the write lock for long. `where` must exclude rows that are already
+    done, so an interrupted backfill simply resumes where it stopped.
+    Returns the number of rows updated.
+    """
+    sql = f"UPDATE {table} SET {assignments} WHERE rowid BETWEEN ? AND ? AND ({where})"
+    return _in_chunks(conn, table, sql, params, chunk_size, progress, f"Backfilling {table}")
+
+
+def backfill_insert(conn, table, insert, where="1", params=(), chunk_size=20000, progress=None):
+    """Run `insert` (an INSERT ... SELECT ... FROM table [JOIN ...]) over rowid-range
+    chunks of `table`, committing each chunk. As with backfill, `where` must
+    exclude source rows that were already copied. Returns the number of rows inserted.
+    """
+    sql = f"{insert} WHERE {table}.rowid BETWEEN ? AND ? AND ({where})"
+    return _in_chunks(conn, table, sql, params, chunk_size, progress, f"Copying {table}")
+
+
+def _in_chunks(conn, table, sql, params, chunk_size, progress, message):
+    low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+    if low is None:
+        return 0
+    changed = 0
+    total = high - low + 1
+    for start in range(low, high + 1, chunk_size):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(sql, (start, start + chunk_size - 1) + tuple(params))
+            changed += cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if progress:
+            progress(message, min(start + chunk_size - low, total), total)
+    return changed
+
+
+def console_progress(message, done, total):
+    """Progress reporter for headless runs"""
+    if total > 1:
+        print(f"\r{message}: {done:,}/{total:,} ({done * 100 // total}%)", end='' if done < total else '\n', flush=True)
+    elif done == total:
+        print(message, flush=True)
+
+
+# ==================== INDEXES ====================
+
+# Secondary / covering indexes for every foreign-key and filter column.
+# (name, table, columns) - created by migration v2. Indexes added later
+# get their own migration so deployed databases pick them up on startup.
+INDEXES = [
+    # item_count subquery and PO detail lookups
+    ('idx_poi_po_item', 'Purchase_Order_Items', 'po_number, item_id'),
+    ('idx_poi_item', 'Purchase_Order_Items', 'item_id'),
+    # Completion check SUM(accepted_quantity) per PO line - covering
+    ('idx_gr_po_item', 'Goods_Receipt', 'po_number, item_id, accepted_quantity'),
+    ('idx_gr_supplier_invoice', 'Goods_Receipt', 'supplier_id, invoice_number'),
+    # Duplicate-invoice check and receipt detail/edit lookups filter on invoice alone
+    ('idx_gr_invoice', 'Goods_Receipt', 'invoice_number'),
+    ('idx_gr_item', 'Goods_Receipt', 'item_id'),
+    ('idx_soi_so_item', 'Sales_Order_Items', 'so_number, item_id'),
+    ('idx_soi_item', 'Sales_Order_Items', 'item_id'),
+    ('idx_invoices_so', 'Invoices', 'so_number'),
+    ('idx_invoices_customer', 'Invoices', 'customer_id'),
+    # Unpaid COUNT/SUM - covering
+    ('idx_invoices_status', 'Invoices', 'status, total_amount'),
+    ('idx_po_supplier', 'Purchase_Orders', 'supplier_id'),
+    ('idx_po_status_date', 'Purchase_Orders', 'status, order_date'),
+    ('idx_so_customer', 'Sales_Orders', 'customer_id'),
+    ('idx_so_status_date', 'Sales_Orders', 'status, order_date'),
+]
+
+
+# ==================== MIGRATIONS ====================
+
+@migration(1, "Base schema with GST support")
+def create_base_schema(conn, progress):
+    """Initialize all database tables with GST support"""
+    # IF NOT EXISTS: databases created before versioning already have these
+    
+    # SHARED TABLES (used by both Purchase and Sales)
+    
+    # Items table - Now with GST rates
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            category TEXT,
+            unit_of_measure TEXT,
+            purchase_rate REAL,
+            purchase_gst_percent REAL DEFAULT 18.0,
+            purchase_price REAL,
+            selling_rate REAL,
+            selling_gst_percent REAL DEFAULT 18.0,
+            selling_price REAL,
+            hsn_code TEXT
+        )
+    ''')
+    
+    # Inventory table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Inventory (
+            item_id INTEGER PRIMARY KEY,
+            quantity_on_hand INTEGER DEFAULT 0,
+            reorder_level INTEGER DEFAULT 10,
+            location TEXT,
+            last_updated TIMESTAMP,
+            FOREIGN KEY (item_id) REFERENCES Items(item_id)
+        )
+    ''')
+    
+    # PURCHASE DEPARTMENT TABLES
+    
+    # Suppliers table - with GST details
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Suppliers (
+            supplier_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            contact_person TEXT,
+            phone TEXT,
+            email TEXT,
+            address TEXT,
+            gstin TEXT,
+            payment_terms TEXT
+        )
+    ''')
+    
+    # Purchase Orders table - with GST breakdown
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Purchase_Orders (
+            po_number INTEGER PRIMARY KEY AUTOINCREMENT,
+            supplier_id INTEGER,
+            order_date DATE,
+            expected_delivery DATE,
+            status TEXT DEFAULT 'Pending',
+            subtotal REAL,
+            total_gst REAL,
+            total_amount REAL,
+            FOREIGN KEY (supplier_id) REFERENCES Suppliers(supplier_id)
+        )
+    ''')
+    
+    # Purchase Order Items table - with GST per item
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Purchase_Order_Items (
+            po_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            po_number INTEGER,
+            item_id INTEGER,
+            quantity INTEGER,
+            rate REAL,
+            gst_percent REAL,
+            gst_amount REAL,
+            total_price REAL,
+            FOREIGN KEY (po_number) REFERENCES Purchase_Orders(po_number),
+            FOREIGN KEY (item_id) REFERENCES Items(item_id)
+        )
+    ''')
+    
+    # Goods Receipt table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Goods_Receipt (
+            receipt_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            po_number INTEGER,
+            item_id INTEGER,
+            supplier_id INTEGER,
+            invoice_number TEXT,
+            received_quantity INTEGER,
+            accepted_quantity INTEGER,
+            rejected_quantity INTEGER,
+            receipt_date DATE,
+            notes TEXT,
+            FOREIGN KEY (po_number) REFERENCES Purchase_Orders(po_number),
+            FOREIGN KEY (item_id) REFERENCES Items(item_id),
+            FOREIGN KEY (supplier_id) REFERENCES Suppliers(supplier_id)
+        )
+    ''')
+    
+    # SALES DEPARTMENT TABLES
+    
+    # Customers table - with GST details
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Customers (
+            customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            contact_person TEXT,
+            phone TEXT,
+            email TEXT,
+            address TEXT,
+            gstin TEXT,
+            credit_limit REAL,
+            payment_terms TEXT
+        )
+    ''')
+    
+    # Sales Orders table - with GST breakdown
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Sales_Orders (
+            so_number INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER,
+            order_date DATE,
+            delivery_date DATE,
+            status TEXT DEFAULT 'Pending',
+            subtotal REAL,
+            total_gst REAL,
+            total_amount REAL,
+            FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
+        )
+    ''')
+    
+    # Sales Order Items table - with GST per item
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Sales_Order_Items (
+            so_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            so_number INTEGER,
+            item_id INTEGER,
+            quantity INTEGER,
+            rate REAL,
+            gst_percent REAL,
+            gst_amount REAL,
+            total_price REAL,
+            FOREIGN KEY (so_number) REFERENCES Sales_Orders(so_number),
+            FOREIGN KEY (item_id) REFERENCES Items(item_id)
+        )
+    ''')
+    
+    # Invoices table - with GST breakdown
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Invoices (
+            invoice_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            so_number INTEGER,
+            customer_id INTEGER,
+            invoice_date DATE,
+            due_date DATE,
+            subtotal REAL,
+            total_gst REAL,
+            total_amount REAL,
+            status TEXT DEFAULT 'Unpaid',
+            FOREIGN KEY (so_number) REFERENCES Sales_Orders(so_number),
+            FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
+        )
+    ''')
+
+
+@migration(2, "Secondary and covering indexes")
+def create_indexes(conn, progress):
+    """Create the secondary index set"""
+    for name, table, columns in INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+@migration(3, "Archived_Years table for financial-year archives")
+def create_archived_years(conn, progress):
+    """One row per archived financial year with its totals, so dashboard figures
+    still include documents that were moved out of the live tables (see archive.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Archived_Years (
+            fy INTEGER PRIMARY KEY,
+            label TEXT NOT NULL,
+            path TEXT NOT NULL,
+            archived_at TIMESTAMP,
+            po_count INTEGER DEFAULT 0,
+            po_value REAL DEFAULT 0,
+            po_gst REAL DEFAULT 0,
+            so_count INTEGER DEFAULT 0,
+            so_value REAL DEFAULT 0,
+            so_gst REAL DEFAULT 0,
+            invoice_count INTEGER DEFAULT 0,
+            invoice_value REAL DEFAULT 0
+        )
+    ''')
+
+
+
+# Each row adds its share of the figures to Dashboard_Stats on insert and takes
+# it back on delete; updates move only the figures that depend on a changed
+# column. DASHBOARD_STATS_REBUILD computes the same figures from scratch and
+# dashboard_stats.py checks the two agree.
+DASHBOARD_STATS_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_items_insert AFTER INSERT ON Items
+    BEGIN
+        UPDATE Dashboard_Stats SET item_count = item_count + 1 WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_items_delete AFTER DELETE ON Items
+    BEGIN
+        UPDATE Dashboard_Stats SET item_count = item_count - 1 WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_inventory_insert AFTER INSERT ON Inventory
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET low_stock_count = low_stock_count + COALESCE(NEW.quantity_on_hand <= NEW.reorder_level, 0),
+            stock_units = stock_units + COALESCE(NEW.quantity_on_hand, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_inventory_delete AFTER DELETE ON Inventory
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET low_stock_count = low_stock_count - COALESCE(OLD.quantity_on_hand <= OLD.reorder_level, 0),
+            stock_units = stock_units - COALESCE(OLD.quantity_on_hand, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_inventory_update
+    AFTER UPDATE OF quantity_on_hand, reorder_level ON Inventory
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET low_stock_count = low_stock_count - COALESCE(OLD.quantity_on_hand <= OLD.reorder_level, 0)
+                + COALESCE(NEW.quantity_on_hand <= NEW.reorder_level, 0),
+            stock_units = stock_units - COALESCE(OLD.quantity_on_hand, 0) + COALESCE(NEW.quantity_on_hand, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_suppliers_insert AFTER INSERT ON Suppliers
+    BEGIN
+        UPDATE Dashboard_Stats SET supplier_count = supplier_count + 1 WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_suppliers_delete AFTER DELETE ON Suppliers
+    BEGIN
+        UPDATE Dashboard_Stats SET supplier_count = supplier_count - 1 WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_customers_insert AFTER INSERT ON Customers
+    BEGIN
+        UPDATE Dashboard_Stats SET customer_count = customer_count + 1 WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_customers_delete AFTER DELETE ON Customers
+    BEGIN
+        UPDATE Dashboard_Stats SET customer_count = customer_count - 1 WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_purchase_orders_insert AFTER INSERT ON Purchase_Orders
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET po_count = po_count + 1,
+            po_pending_count = po_pending_count + COALESCE(NEW.status = 'Pending', 0),
+            po_value = po_value + COALESCE(NEW.total_amount, 0),
+            po_gst = po_gst + COALESCE(NEW.total_gst, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_purchase_orders_delete AFTER DELETE ON Purchase_Orders
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET po_count = po_count - 1,
+            po_pending_count = po_pending_count - COALESCE(OLD.status = 'Pending', 0),
+            po_value = po_value - COALESCE(OLD.total_amount, 0),
+            po_gst = po_gst - COALESCE(OLD.total_gst, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_purchase_orders_update
+    AFTER UPDATE OF status, total_amount, total_gst ON Purchase_Orders
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET po_pending_count = po_pending_count - COALESCE(OLD.status = 'Pending', 0)
+                + COALESCE(NEW.status = 'Pending', 0),
+            po_value = po_value - COALESCE(OLD.total_amount, 0) + COALESCE(NEW.total_amount, 0),
+            po_gst = po_gst - COALESCE(OLD.total_gst, 0) + COALESCE(NEW.total_gst, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_sales_orders_insert AFTER INSERT ON Sales_Orders
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET so_count = so_count + 1,
+            so_pending_count = so_pending_count + COALESCE(NEW.status = 'Pending', 0),
+            so_delivered_count = so_delivered_count + COALESCE(NEW.status = 'Delivered', 0),
+            so_value = so_value + COALESCE(NEW.total_amount, 0),
+            so_pending_value = so_pending_value
+                + COALESCE(CASE WHEN NEW.status = 'Pending' THEN NEW.total_amount END, 0),
+            so_gst = so_gst + COALESCE(NEW.total_gst, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_sales_orders_delete AFTER DELETE ON Sales_Orders
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET so_count = so_count - 1,
+            so_pending_count = so_pending_count - COALESCE(OLD.status = 'Pending', 0),
+            so_delivered_count = so_delivered_count - COALESCE(OLD.status = 'Delivered', 0),
+            so_value = so_value - COALESCE(OLD.total_amount, 0),
+            so_pending_value = so_pending_value
+                - COALESCE(CASE WHEN OLD.status = 'Pending' THEN OLD.total_amount END, 0),
+            so_gst = so_gst - COALESCE(OLD.total_gst, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_sales_orders_update
+    AFTER UPDATE OF status, total_amount, total_gst ON Sales_Orders
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET so_pending_count = so_pending_count - COALESCE(OLD.status = 'Pending', 0)
+                + COALESCE(NEW.status = 'Pending', 0),
+            so_delivered_count = so_delivered_count - COALESCE(OLD.status = 'Delivered', 0)
+                + COALESCE(NEW.status = 'Delivered', 0),
+            so_value = so_value - COALESCE(OLD.total_amount, 0) + COALESCE(NEW.total_amount, 0),
+            so_pending_value = so_pending_value
+                - COALESCE(CASE WHEN OLD.status = 'Pending' THEN OLD.total_amount END, 0)
+                + COALESCE(CASE WHEN NEW.status = 'Pending' THEN NEW.total_amount END, 0),
+            so_gst = so_gst - COALESCE(OLD.total_gst, 0) + COALESCE(NEW.total_gst, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_insert AFTER INSERT ON Invoices
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET invoice_count = invoice_count + 1,
+            invoice_unpaid_count = invoice_unpaid_count + COALESCE(NEW.status = 'Unpaid', 0),
+            invoice_unpaid_total = invoice_unpaid_total
+                + COALESCE(CASE WHEN NEW.status = 'Unpaid' THEN NEW.total_amount END, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_delete AFTER DELETE ON Invoices
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET invoice_count = invoice_count - 1,
+            invoice_unpaid_count = invoice_unpaid_count - COALESCE(OLD.status = 'Unpaid', 0),
+            invoice_unpaid_total = invoice_unpaid_total
+                - COALESCE(CASE WHEN OLD.status = 'Unpaid' THEN OLD.total_amount END, 0)
+        WHERE id = 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_update
+    AFTER UPDATE OF status, total_amount ON Invoices
+    BEGIN
+        UPDATE Dashboard_Stats
+        SET invoice_unpaid_count = invoice_unpaid_count - COALESCE(OLD.status = 'Unpaid', 0)
+                + COALESCE(NEW.status = 'Unpaid', 0),
+            invoice_unpaid_total = invoice_unpaid_total
+                - COALESCE(CASE WHEN OLD.status = 'Unpaid' THEN OLD.total_amount END, 0)
+                + COALESCE(CASE WHEN NEW.status = 'Unpaid' THEN NEW.total_amount END, 0)
+        WHERE id = 1;
+    END''',
+]
+
+DASHBOARD_STATS_REBUILD = '''
+    UPDATE Dashboard_Stats SET
+        item_count = (SELECT COUNT(*) FROM Items),
+        (low_stock_count, stock_units) = (
+            SELECT COALESCE(SUM(quantity_on_hand <= reorder_level), 0), COALESCE(SUM(quantity_on_hand), 0)
+            FROM Inventory),
+        supplier_count = (SELECT COUNT(*) FROM Suppliers),
+        customer_count = (SELECT COUNT(*) FROM Customers),
+        (po_count, po_pending_count, po_value, po_gst) = (
+            SELECT COUNT(*), COALESCE(SUM(status = 'Pending'), 0),
+                   COALESCE(SUM(total_amount), 0), COALESCE(SUM(total_gst), 0)
+            FROM Purchase_Orders),
+        (so_count, so_pending_count, so_delivered_count, so_value, so_pending_value, so_gst) = (
+            SELECT COUNT(*), COALESCE(SUM(status = 'Pending'), 0), COALESCE(SUM(status = 'Delivered'), 0),
+                   COALESCE(SUM(total_amount), 0),
+                   COALESCE(SUM(CASE WHEN status = 'Pending' THEN total_amount END), 0),
+                   COALESCE(SUM(total_gst), 0)
+            FROM Sales_Orders),
+        (invoice_count, invoice_unpaid_count, invoice_unpaid_total) = (
+            SELECT COUNT(*), COALESCE(SUM(status = 'Unpaid'), 0),
+                   COALESCE(SUM(CASE WHEN status = 'Unpaid' THEN total_amount END), 0)
+            FROM Invoices)
+    WHERE id = 1
+'''
+
+
+@migration(4, "Dashboard_Stats summary row maintained by triggers")
+def create_dashboard_stats(conn, progress):
+    """Single-row table of the dashboard figures. Triggers on the underlying
+    tables keep it current, so the dashboard reads one row instead of running
+    a dozen aggregates (see dashboard_stats.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Dashboard_Stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            item_count INTEGER DEFAULT 0,
+            low_stock_count INTEGER DEFAULT 0,
+            stock_units INTEGER DEFAULT 0,
+            supplier_count INTEGER DEFAULT 0,
+            customer_count INTEGER DEFAULT 0,
+            po_count INTEGER DEFAULT 0,
+            po_pending_count INTEGER DEFAULT 0,
+            po_value REAL DEFAULT 0,
+            po_gst REAL DEFAULT 0,
+            so_count INTEGER DEFAULT 0,
+            so_pending_count INTEGER DEFAULT 0,
+            so_delivered_count INTEGER DEFAULT 0,
+            so_value REAL DEFAULT 0,
+            so_pending_value REAL DEFAULT 0,
+            so_gst REAL DEFAULT 0,
+            invoice_count INTEGER DEFAULT 0,
+            invoice_unpaid_count INTEGER DEFAULT 0,
+            invoice_unpaid_total REAL DEFAULT 0
+        )
+    ''')
+    for sql in DASHBOARD_STATS_TRIGGERS:
+        conn.execute(sql)
+    conn.execute("INSERT OR IGNORE INTO Dashboard_Stats (id) VALUES (1)")
+    conn.execute(DASHBOARD_STATS_REBUILD)
+
+
+
+# Goods_Receipt rows add to (and edits/deletes take back from) the running
+# totals on their purchase order line, inside the receipt's own transaction
+POI_RECEIPT_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_gr_insert_poi_totals AFTER INSERT ON Goods_Receipt
+    BEGIN
+        UPDATE Purchase_Order_Items
+        SET received_quantity = received_quantity + COALESCE(NEW.received_quantity, 0),
+            accepted_quantity = accepted_quantity + COALESCE(NEW.accepted_quantity, 0),
+            rejected_quantity = rejected_quantity + COALESCE(NEW.rejected_quantity, 0)
+        WHERE po_number = NEW.po_number AND item_id = NEW.item_id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_gr_delete_poi_totals AFTER DELETE ON Goods_Receipt
+    BEGIN
+        UPDATE Purchase_Order_Items
+        SET received_quantity = received_quantity - COALESCE(OLD.received_quantity, 0),
+            accepted_quantity = accepted_quantity - COALESCE(OLD.accepted_quantity, 0),
+            rejected_quantity = rejected_quantity - COALESCE(OLD.rejected_quantity, 0)
+        WHERE po_number = OLD.po_number AND item_id = OLD.item_id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_gr_update_poi_totals
+    AFTER UPDATE OF po_number, item_id, received_quantity, accepted_quantity, rejected_quantity ON Goods_Receipt
+    BEGIN
+        UPDATE Purchase_Order_Items
+        SET received_quantity = received_quantity - COALESCE(OLD.received_quantity, 0),
+            accepted_quantity = accepted_quantity - COALESCE(OLD.accepted_quantity, 0),
+            rejected_quantity = rejected_quantity - COALESCE(OLD.rejected_quantity, 0)
+        WHERE po_number = OLD.po_number AND item_id = OLD.item_id;
+        UPDATE Purchase_Order_Items
+        SET received_quantity = received_quantity + COALESCE(NEW.received_quantity, 0),
+            accepted_quantity = accepted_quantity + COALESCE(NEW.accepted_quantity, 0),
+            rejected_quantity = rejected_quantity + COALESCE(NEW.rejected_quantity, 0)
+        WHERE po_number = NEW.po_number AND item_id = NEW.item_id;
+    END''',
+]
+
+
+@migration(5, "Received / accepted / rejected totals on purchase order lines", chunked=True)
+def add_poi_receipt_totals(conn, progress):
+    """Running receipt totals on each PO line, so completion and remaining
+    quantities no longer re-aggregate the whole receipt history"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(Purchase_Order_Items)")}
+    conn.execute("BEGIN IMMEDIATE")
+    for column in ('received_quantity', 'accepted_quantity', 'rejected_quantity'):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE Purchase_Order_Items ADD COLUMN {column} INTEGER DEFAULT 0")
+    for sql in POI_RECEIPT_TRIGGERS:
+        conn.execute(sql)
+    conn.commit()
+
+    # Lines that already have receipts; the triggers keep everything current from here on
+    totals = {column: f"""(SELECT COALESCE(SUM(gr.{column}), 0) FROM Goods_Receipt gr
+                WHERE gr.po_number = Purchase_Order_Items.po_number AND gr.item_id = Purchase_Order_Items.item_id)"""
+              for column in ('received_quantity', 'accepted_quantity', 'rejected_quantity')}
+    backfill(conn, 'Purchase_Order_Items',
+             ", ".join(f"{column} = {total}" for column, total in totals.items()),
+             where="""received_quantity = 0 AND accepted_quantity = 0 AND rejected_quantity = 0
+                AND EXISTS (SELECT 1 FROM Goods_Receipt gr WHERE gr.po_number = Purchase_Order_Items.po_number
+                            AND gr.item_id = Purchase_Order_Items.item_id)""",
+             progress=progress)
+
+
+
+# Each Sales_Deliveries row adds to the delivered total of its SO line and of
+# the order itself, inside the delivery's own transaction
+DELIVERY_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_sd_insert_delivered AFTER INSERT ON Sales_Deliveries
+    BEGIN
+        UPDATE Sales_Order_Items SET delivered_quantity = delivered_quantity + NEW.quantity
+        WHERE so_number = NEW.so_number AND item_id = NEW.item_id;
+        UPDATE Sales_Orders SET delivered_quantity = delivered_quantity + NEW.quantity
+        WHERE so_number = NEW.so_number;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_sd_delete_delivered AFTER DELETE ON Sales_Deliveries
+    BEGIN
+        UPDATE Sales_Order_Items SET delivered_quantity = delivered_quantity - OLD.quantity
+        WHERE so_number = OLD.so_number AND item_id = OLD.item_id;
+        UPDATE Sales_Orders SET delivered_quantity = delivered_quantity - OLD.quantity
+        WHERE so_number = OLD.so_number;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_sd_update_delivered
+    AFTER UPDATE OF so_number, item_id, quantity ON Sales_Deliveries
+    BEGIN
+        UPDATE Sales_Order_Items SET delivered_quantity = delivered_quantity - OLD.quantity
+        WHERE so_number = OLD.so_number AND item_id = OLD.item_id;
+        UPDATE Sales_Orders SET delivered_quantity = delivered_quantity - OLD.quantity
+        WHERE so_number = OLD.so_number;
+        UPDATE Sales_Order_Items SET delivered_quantity = delivered_quantity + NEW.quantity
+        WHERE so_number = NEW.so_number AND item_id = NEW.item_id;
+        UPDATE Sales_Orders SET delivered_quantity = delivered_quantity + NEW.quantity
+        WHERE so_number = NEW.so_number;
+    END''',
+]
+
+
+@migration(6, "Sales_Deliveries ledger and delivered totals on sales orders", chunked=True)
+def create_sales_deliveries(conn, progress):
+    """One ledger row per item per delivery, with running delivered totals on
+    each SO line and order, so remaining-to-deliver is a lookup"""
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Sales_Deliveries (
+            delivery_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            so_number INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            delivery_date DATE,
+            FOREIGN KEY (so_number) REFERENCES Sales_Orders(so_number),
+            FOREIGN KEY (item_id) REFERENCES Items(item_id)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sd_so_item ON Sales_Deliveries (so_number, item_id)")
+    for table in ('Sales_Order_Items', 'Sales_Orders'):
+        if 'delivered_quantity' not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN delivered_quantity INTEGER DEFAULT 0")
+    for sql in DELIVERY_TRIGGERS:
+        conn.execute(sql)
+    conn.commit()
+
+    # Orders already marked Delivered were delivered in full. Partial deliveries
+    # were never recorded, so those lines start with nothing delivered.
+    backfill_insert(conn, 'Sales_Order_Items',
+                    '''INSERT INTO Sales_Deliveries (so_number, item_id, quantity, delivery_date)
+                    SELECT Sales_Order_Items.so_number, Sales_Order_Items.item_id, Sales_Order_Items.quantity,
+                           so.delivery_date
+                    FROM Sales_Order_Items JOIN Sales_Orders so ON so.so_number = Sales_Order_Items.so_number''',
+                    where="so.status = 'Delivered' AND Sales_Order_Items.quantity > 0 "
+                          "AND Sales_Order_Items.delivered_quantity = 0",
+                    progress=progress)
+
+
+
+# Stock only moves through Inventory_Movements: a movement row updates
+# Inventory, and receipts / receipt edits / deliveries post their own movements.
+# Deleting a document (e.g. when archiving it) leaves the stock alone.
+STOCK_LEDGER_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_im_insert_stock AFTER INSERT ON Inventory_Movements
+    BEGIN
+        UPDATE Inventory SET quantity_on_hand = quantity_on_hand + NEW.quantity,
+            last_updated = NEW.movement_date
+        WHERE item_id = NEW.item_id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_im_no_update BEFORE UPDATE ON Inventory_Movements
+    BEGIN
+        SELECT RAISE(ABORT, 'Inventory_Movements is append-only: post a correcting movement');
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_im_no_delete BEFORE DELETE ON Inventory_Movements
+    BEGIN
+        SELECT RAISE(ABORT, 'Inventory_Movements is append-only: post a correcting movement');
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_gr_insert_movement AFTER INSERT ON Goods_Receipt
+    WHEN COALESCE(NEW.accepted_quantity, 0) != 0
+    BEGIN
+        INSERT INTO Inventory_Movements (item_id, quantity, source_type, source_id)
+        VALUES (NEW.item_id, NEW.accepted_quantity, 'receipt', NEW.receipt_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_gr_update_movement AFTER UPDATE OF accepted_quantity ON Goods_Receipt
+    WHEN COALESCE(NEW.accepted_quantity, 0) != COALESCE(OLD.accepted_quantity, 0)
+    BEGIN
+        INSERT INTO Inventory_Movements (item_id, quantity, source_type, source_id)
+        VALUES (NEW.item_id, COALESCE(NEW.accepted_quantity, 0) - COALESCE(OLD.accepted_quantity, 0),
+                'receipt-edit', NEW.receipt_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_sd_insert_movement AFTER INSERT ON Sales_Deliveries
+    BEGIN
+        INSERT INTO Inventory_Movements (item_id, quantity, source_type, source_id)
+        VALUES (NEW.item_id, -NEW.quantity, 'delivery', NEW.delivery_id);
+    END''',
+]
+
+
+@migration(7, "Inventory_Movements ledger and monthly stock snapshots")
+def create_stock_ledger(conn, progress):
+    """Append-only ledger of every stock change, with per-item month-start
+    snapshots for as-of-date stock (see stock_ledger.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Inventory_Movements (
+            movement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            movement_date TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+            source_type TEXT NOT NULL,
+            source_id INTEGER,
+            notes TEXT,
+            FOREIGN KEY (item_id) REFERENCES Items(item_id)
+        )
+    ''')
+    # As-of range sums per item - covering
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_im_item_date ON Inventory_Movements (item_id, movement_date, quantity)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Inventory_Snapshots (
+            item_id INTEGER NOT NULL,
+            snapshot_date DATE NOT NULL,
+            quantity_on_hand INTEGER NOT NULL,
+            PRIMARY KEY (item_id, snapshot_date)
+        ) WITHOUT ROWID
+    ''')
+
+    # The ledger starts from today's stock (before the triggers exist, so
+    # the opening rows do not add to Inventory a second time)
+    if conn.execute("SELECT COUNT(*) FROM Inventory_Movements").fetchone()[0] == 0:
+        conn.execute('''INSERT INTO Inventory_Movements (item_id, quantity, source_type, notes)
+            SELECT item_id, quantity_on_hand, 'opening', 'Stock on hand when the ledger was started'
+            FROM Inventory WHERE quantity_on_hand != 0''')
+    for sql in STOCK_LEDGER_TRIGGERS:
+        conn.execute(sql)
+
+
+
+# Deliveries use up the delivered item's reservation for that SO
+RESERVATION_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_sd_insert_reservation AFTER INSERT ON Sales_Deliveries
+    BEGIN
+        UPDATE Inventory SET reserved_quantity = reserved_quantity - MIN(NEW.quantity,
+            COALESCE((SELECT quantity FROM Stock_Reservations
+                      WHERE so_number = NEW.so_number AND item_id = NEW.item_id), 0))
+        WHERE item_id = NEW.item_id;
+        UPDATE Stock_Reservations SET quantity = quantity - MIN(quantity, NEW.quantity)
+        WHERE so_number = NEW.so_number AND item_id = NEW.item_id;
+        DELETE FROM Stock_Reservations
+        WHERE so_number = NEW.so_number AND item_id = NEW.item_id AND quantity <= 0;
+    END''',
+]
+
+
+@migration(8, "Stock reservations for open sales orders")
+def create_stock_reservations(conn, progress):
+    """Reserved quantity per item plus one reservation row per SO line, so
+    available-to-promise is on hand minus reserved (see stock_ledger.reserve_stock)"""
+    if 'reserved_quantity' not in {row[1] for row in conn.execute("PRAGMA table_info(Inventory)")}:
+        conn.execute("ALTER TABLE Inventory ADD COLUMN reserved_quantity INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Stock_Reservations (
+            so_number INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            reserved_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+            PRIMARY KEY (so_number, item_id)
+        ) WITHOUT ROWID
+    ''')
+    # Sales pick list filters on available stock
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_available ON Inventory (quantity_on_hand - reserved_quantity)")
+    for sql in RESERVATION_TRIGGERS:
+        conn.execute(sql)
+
+    # Open orders reserve what they still have to deliver, even where that is
+    # more than is on hand today
+    conn.execute("DELETE FROM Stock_Reservations")
+    conn.execute('''INSERT INTO Stock_Reservations (so_number, item_id, quantity)
+        SELECT soi.so_number, soi.item_id, SUM(soi.quantity - soi.delivered_quantity)
+        FROM Sales_Order_Items soi JOIN Sales_Orders so ON so.so_number = soi.so_number
+        WHERE so.status IN ('Pending', 'Partially Delivered')
+        GROUP BY soi.so_number, soi.item_id
+        HAVING SUM(soi.quantity - soi.delivered_quantity) > 0''')
+    conn.execute('''UPDATE Inventory SET reserved_quantity =
+        (SELECT COALESCE(SUM(quantity), 0) FROM Stock_Reservations WHERE item_id = Inventory.item_id)''')
+
+
+# Tables whose rows carry a row_version for compare-and-swap edits, with their
+# key and the columns whose change makes an open edit dialog stale (None = any)
+VERSIONED_TABLES = {
+    'Purchase_Orders': ('po_number', None),
+    'Sales_Orders': ('so_number', None),
+    'Goods_Receipt': ('receipt_id', None),
+    'Inventory': ('item_id', ('quantity_on_hand', 'reorder_level', 'location')),
+}
+
+
+def row_version_triggers():
+    """Bump row_version on every change that did not bump it itself, so writes made
+    by triggers (stock ledger, delivered totals) also invalidate older reads"""
+    statements = []
+    for table, (key, columns) in VERSIONED_TABLES.items():
+        watched = f" OF {', '.join(columns)}" if columns else ""
+        statements.append(f'''CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_row_version
+            AFTER UPDATE{watched} ON {table} WHEN NEW.row_version = OLD.row_version
+            BEGIN UPDATE {table} SET row_version = row_version + 1 WHERE {key} = NEW.{key}; END''')
+    return statements
+
+
+@migration(9, "Row versions for compare-and-swap edits")
+def add_row_versions(conn, progress):
+    """row_version on order headers, receipts and Inventory; edits update
+    WHERE row_version = <version read when the dialog opened>"""
+    for table in VERSIONED_TABLES:
+        if 'row_version' not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    for sql in row_version_triggers():
+        conn.execute(sql)
+
+
+
+# External-content FTS5 indexes: they hold only the tokens, the text stays in
+# the source table. Prefix indexes for 2 and 3 characters keep short prefixes
+# fast (search.MIN_TERM_LENGTH).
+SEARCH_TABLES = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS Items_FTS USING fts5(name, description, category, hsn_code,
+        content='Items', content_rowid='item_id', prefix='2 3')''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS Customers_FTS USING fts5(name, contact_person, phone, email, gstin,
+        content='Customers', content_rowid='customer_id', prefix='2 3')''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS Suppliers_FTS USING fts5(name, contact_person, phone, email, gstin,
+        content='Suppliers', content_rowid='supplier_id', prefix='2 3')''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS Receipts_FTS USING fts5(invoice_number, notes,
+        content='Goods_Receipt', content_rowid='receipt_id', prefix='2 3')''',
+]
+
+# (index, bm25 column weights) - names and codes count for more than free text
+SEARCH_WEIGHTS = [
+    ('Items_FTS', 'bm25(10.0, 1.0, 2.0, 5.0)'),
+    ('Customers_FTS', 'bm25(10.0, 3.0, 5.0, 3.0, 5.0)'),
+    ('Suppliers_FTS', 'bm25(10.0, 3.0, 5.0, 3.0, 5.0)'),
+    ('Receipts_FTS', 'bm25(10.0, 1.0)'),
+]
+
+# Keep each index in step with its table. External content: the old text has
+# to be handed back to remove its tokens.
+SEARCH_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_items_fts_insert AFTER INSERT ON Items
+    BEGIN
+        INSERT INTO Items_FTS (rowid, name, description, category, hsn_code)
+        VALUES (NEW.item_id, NEW.name, NEW.description, NEW.category, NEW.hsn_code);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_items_fts_delete AFTER DELETE ON Items
+    BEGIN
+        INSERT INTO Items_FTS (Items_FTS, rowid, name, description, category, hsn_code)
+        VALUES ('delete', OLD.item_id, OLD.name, OLD.description, OLD.category, OLD.hsn_code);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_items_fts_update AFTER UPDATE OF name, description, category, hsn_code ON Items
+    BEGIN
+        INSERT INTO Items_FTS (Items_FTS, rowid, name, description, category, hsn_code)
+        VALUES ('delete', OLD.item_id, OLD.name, OLD.description, OLD.category, OLD.hsn_code);
+        INSERT INTO Items_FTS (rowid, name, description, category, hsn_code)
+        VALUES (NEW.item_id, NEW.name, NEW.description, NEW.category, NEW.hsn_code);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_customers_fts_insert AFTER INSERT ON Customers
+    BEGIN
+        INSERT INTO Customers_FTS (rowid, name, contact_person, phone, email, gstin)
+        VALUES (NEW.customer_id, NEW.name, NEW.contact_person, NEW.phone, NEW.email, NEW.gstin);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_customers_fts_delete AFTER DELETE ON Customers
+    BEGIN
+        INSERT INTO Customers_FTS (Customers_FTS, rowid, name, contact_person, phone, email, gstin)
+        VALUES ('delete', OLD.customer_id, OLD.name, OLD.contact_person, OLD.phone, OLD.email, OLD.gstin);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_customers_fts_update
+    AFTER UPDATE OF name, contact_person, phone, email, gstin ON Customers
+    BEGIN
+        INSERT INTO Customers_FTS (Customers_FTS, rowid, name, contact_person, phone, email, gstin)
+        VALUES ('delete', OLD.customer_id, OLD.name, OLD.contact_person, OLD.phone, OLD.email, OLD.gstin);
+        INSERT INTO Customers_FTS (rowid, name, contact_person, phone, email, gstin)
+        VALUES (NEW.customer_id, NEW.name, NEW.contact_person, NEW.phone, NEW.email, NEW.gstin);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_suppliers_fts_insert AFTER INSERT ON Suppliers
+    BEGIN
+        INSERT INTO Suppliers_FTS (rowid, name, contact_person, phone, email, gstin)
+        VALUES (NEW.supplier_id, NEW.name, NEW.contact_person, NEW.phone, NEW.email, NEW.gstin);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_suppliers_fts_delete AFTER DELETE ON Suppliers
+    BEGIN
+        INSERT INTO Suppliers_FTS (Suppliers_FTS, rowid, name, contact_person, phone, email, gstin)
+        VALUES ('delete', OLD.supplier_id, OLD.name, OLD.contact_person, OLD.phone, OLD.email, OLD.gstin);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_suppliers_fts_update
+    AFTER UPDATE OF name, contact_person, phone, email, gstin ON Suppliers
+    BEGIN
+        INSERT INTO Suppliers_FTS (Suppliers_FTS, rowid, name, contact_person, phone, email, gstin)
+        VALUES ('delete', OLD.supplier_id, OLD.name, OLD.contact_person, OLD.phone, OLD.email, OLD.gstin);
+        INSERT INTO Suppliers_FTS (rowid, name, contact_person, phone, email, gstin)
+        VALUES (NEW.supplier_id, NEW.name, NEW.contact_person, NEW.phone, NEW.email, NEW.gstin);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_receipts_fts_insert AFTER INSERT ON Goods_Receipt
+    BEGIN
+        INSERT INTO Receipts_FTS (rowid, invoice_number, notes)
+        VALUES (NEW.receipt_id, NEW.invoice_number, NEW.notes);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_receipts_fts_delete AFTER DELETE ON Goods_Receipt
+    BEGIN
+        INSERT INTO Receipts_FTS (Receipts_FTS, rowid, invoice_number, notes)
+        VALUES ('delete', OLD.receipt_id, OLD.invoice_number, OLD.notes);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_receipts_fts_update AFTER UPDATE OF invoice_number, notes ON Goods_Receipt
+    BEGIN
+        INSERT INTO Receipts_FTS (Receipts_FTS, rowid, invoice_number, notes)
+        VALUES ('delete', OLD.receipt_id, OLD.invoice_number, OLD.notes);
+        INSERT INTO Receipts_FTS (rowid, invoice_number, notes)
+        VALUES (NEW.receipt_id, NEW.invoice_number, NEW.notes);
+    END''',
+]
+
+
+def fts5_available(conn):
+    """True if this SQLite build has the FTS5 extension"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except Exception:
+        return False
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+@migration(10, "Full-text search indexes")
+def create_search_indexes(conn, progress):
+    """FTS5 indexes over items, customers, suppliers and goods receipts, kept in
+    step by triggers (see search.py). Builds without FTS5 skip this and search
+    falls back to LIKE."""
+    if not fts5_available(conn):
+        if progress:
+            progress("SQLite has no FTS5 - search will scan with LIKE", 1, 1)
+        return
+    for sql in SEARCH_TABLES:
+        conn.execute(sql)
+    for sql in SEARCH_TRIGGERS:
+        conn.execute(sql)
+    # Read the existing rows into each index and set its ranking weights
+    for index, weights in SEARCH_WEIGHTS:
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+        conn.execute(f"INSERT INTO {index} ({index}, rank) VALUES ('rank', ?)", (weights,))
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    db_name = args[0] if args else 'integrated_system.db'
+    conn = sqlite3.connect(db_name)
+    version = current_version(conn)
+    if '--status' in sys.argv:
+        print(f"{db_name}: schema v{version}, application expects v{latest_version()}")
+        for step in MIGRATIONS:
+            state = "applied" if step.version <= version else "pending"
+            print(f"  v{step.version:<3} {state:<8} {step.description}")
+        return
+    start = time.perf_counter()
+    applied = migrate(conn, console_progress)
+    conn.close()
+    if applied:
+        print(f"Applied {len(applied)} migration(s) in {time.perf_counter() - start:.2f}s")
+    else:
+        print(f"{db_name} is already at schema v{version}")
+
+
+if __name__ == "__main__":
+    main()
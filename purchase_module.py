@@ -6,17 +6,28 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 
+import queries
+from database import ConcurrencyConflict
+from events import ITEMS, PURCHASE_ORDERS, RECEIPTS, SUPPLIERS
+from records import POLine, ReceiptLine
+from stock_ledger import OPENING, adjust_stock, stock_as_of
+from widgets import TreeSynchronizer, VirtualTreeview
+
+STOCK_HISTORY_ROWS = 200
+
 class PurchaseModule:
     def __init__(self, notebook, db, app):
         self.notebook = notebook
         self.db = db
         self.app = app
         self.show_completed_pos = False
-        self.create_inventory_tab()
-        self.create_purchase_order_tab()
-        self.create_suppliers_tab()
-        self.create_goods_receipt_tab()
-        self.create_alerts_tab()
+        # Each tab is built and loaded the first time it is shown
+        app.add_lazy_tab("📦 Inventory", self.create_inventory_tab)
+        app.add_lazy_tab("🛒 Purchase Orders", self.create_purchase_order_tab)
+        app.add_lazy_tab("🏢 Suppliers", self.create_suppliers_tab)
+        app.add_lazy_tab("📥 Goods Receipt", self.create_goods_receipt_tab)
+        app.add_lazy_tab("⚠️ Alerts", self.create_alerts_tab)
+        app.changes.subscribe((ITEMS, PURCHASE_ORDERS, SUPPLIERS, RECEIPTS), self.on_changes)
     
     def refresh_all(self):
         self.refresh_inventory()
@@ -25,6 +36,19 @@ class PurchaseModule:
         self.refresh_receipt_history()
         self.refresh_alerts()
     
+    def on_changes(self, changes):
+        """Refresh what the saved changes touch (see events.ChangeBus)"""
+        if ITEMS in changes:
+            self.refresh_inventory(changes[ITEMS])
+            self.refresh_alerts()
+        if SUPPLIERS in changes:
+            self.refresh_suppliers()
+            self.refresh_purchase_orders()  # the list shows supplier names
+        elif PURCHASE_ORDERS in changes:
+            self.refresh_purchase_orders(changes[PURCHASE_ORDERS])
+        if RECEIPTS in changes:
+            self.refresh_receipt_history()
+    
     def calculate_gst_price(self, rate, gst_percent):
         """Calculate final price from rate and GST"""
         gst_amount = (rate * gst_percent) / 100
@@ -33,42 +57,45 @@ class PurchaseModule:
     
     # ==================== INVENTORY TAB ====================
     
-    def create_inventory_tab(self):
-        inv_frame = ttk.Frame(self.notebook)
-        self.notebook.add(inv_frame, text="📦 Inventory")
+    def create_inventory_tab(self, inv_frame):
         top_btn_frame = ttk.Frame(inv_frame)
         top_btn_frame.pack(side='top', fill='x', padx=10, pady=8)
         ttk.Button(top_btn_frame, text="➕ Add Item", command=self.add_new_item).pack(side='left', padx=3)
         ttk.Button(top_btn_frame, text="✏️ Edit", command=self.edit_item).pack(side='left', padx=3)
         ttk.Button(top_btn_frame, text="🗑️ Delete", command=self.delete_item).pack(side='left', padx=3)
+        ttk.Button(top_btn_frame, text="📜 Stock History", command=self.show_stock_history).pack(side='left', padx=3)
         ttk.Button(top_btn_frame, text="🔄 Refresh", command=self.refresh_inventory).pack(side='right', padx=3)
         columns = ("ID", "Name", "Category", "Qty", "Reorder", "Buy Rate", "Buy GST%", "Buy Price", "Sell Rate", "Sell GST%", "Sell Price", "Status")
-        self.inv_tree = ttk.Treeview(inv_frame, columns=columns, show='headings', height=25)
         widths = [40, 140, 100, 60, 70, 90, 70, 100, 90, 70, 100, 70]
-        for i, col in enumerate(columns):
-            self.inv_tree.heading(col, text=col)
-            self.inv_tree.column(col, width=widths[i])
+        sort_columns = dict(zip(columns, ("item_id", "name", "category", "quantity_on_hand", "reorder_level",
+                                          "purchase_rate", "purchase_gst_percent", "purchase_price",
+                                          "selling_rate", "selling_gst_percent", "selling_price", "low_stock")))
+        self.inv_tree = VirtualTreeview(inv_frame, self.app.executor, 'inventory', queries.INVENTORY_LIST,
+                                        'item_id', columns, widths, self.format_inventory_row,
+                                        sort_columns=sort_columns, height=25)
+        self.inv_tree.tag_configure('low', background='#ffcccc')
         self.inv_tree.pack(side='left', fill='both', expand=True, padx=10, pady=(0, 10))
-        scrollbar = ttk.Scrollbar(inv_frame, orient='vertical', command=self.inv_tree.yview)
+        scrollbar = ttk.Scrollbar(inv_frame, orient='vertical')
         scrollbar.pack(side='right', fill='y', pady=(0, 10), padx=(0, 10))
-        self.inv_tree.configure(yscrollcommand=scrollbar.set)
+        self.inv_tree.set_scrollbar(scrollbar)
         self.refresh_inventory()
     
-    def refresh_inventory(self):
-        for item in self.inv_tree.get_children():
-            self.inv_tree.delete(item)
-        self.db.execute('''SELECT i.item_id, i.name, i.category, inv.quantity_on_hand, inv.reorder_level,
-            i.purchase_rate, i.purchase_gst_percent, i.purchase_price, 
-            i.selling_rate, i.selling_gst_percent, i.selling_price
-            FROM Items i JOIN Inventory inv ON i.item_id = inv.item_id ORDER BY i.item_id''')
-        for row in self.db.fetchall():
-            status = "LOW" if row[3] <= row[4] else "OK"
-            tag = 'low' if status == "LOW" else ''
-            display_row = (row[0], row[1], row[2], row[3], row[4], 
-                          f"₹{row[5]:.2f}", f"{row[6]:.1f}%", f"₹{row[7]:.2f}",
-                          f"₹{row[8]:.2f}", f"{row[9]:.1f}%", f"₹{row[10]:.2f}", status)
-            self.inv_tree.insert('', 'end', values=display_row, tags=(tag,))
-        self.inv_tree.tag_configure('low', background='#ffcccc')
+    def refresh_inventory(self, item_ids=None):
+        """Reload the inventory list in the background (only these items, if given)"""
+        if not hasattr(self, 'inv_tree'):
+            return  # tab not opened yet
+        if item_ids is None:
+            self.inv_tree.refresh()
+        else:
+            self.inv_tree.refresh_rows(item_ids)
+    
+    def format_inventory_row(self, row):
+        status = "LOW" if row.low_stock else "OK"
+        tag = 'low' if status == "LOW" else ''
+        display_row = (row.item_id, row.name, row.category, row.quantity_on_hand, row.reorder_level,
+                      f"₹{row.purchase_rate:.2f}", f"{row.purchase_gst_percent:.1f}%", f"₹{row.purchase_price:.2f}",
+                      f"₹{row.selling_rate:.2f}", f"{row.selling_gst_percent:.1f}%", f"₹{row.selling_price:.2f}", status)
+        return display_row, (tag,)
     
     def validate_item_data(self, name, purchase_rate, purchase_gst, selling_rate, selling_gst, qty, reorder):
         if not name or not name.strip():
@@ -176,21 +203,18 @@ class PurchaseModule:
                 _, p_price = self.calculate_gst_price(p_rate, p_gst)
                 _, s_price = self.calculate_gst_price(s_rate, s_gst)
                 
-                self.db.execute("""INSERT INTO Items (name, description, category, unit_of_measure, hsn_code,
-                    purchase_rate, purchase_gst_percent, purchase_price, 
-                    selling_rate, selling_gst_percent, selling_price) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (entries["name"].get().strip(), entries["desc"].get(), entries["cat"].get(), 
-                     entries["uom"].get(), entries["hsn"].get(), p_rate, p_gst, p_price, s_rate, s_gst, s_price))
-                item_id = self.db.lastrowid()
-                
-                self.db.execute("INSERT INTO Inventory (item_id, quantity_on_hand, reorder_level, location, last_updated) VALUES (?, ?, ?, ?, ?)",
-                    (item_id, qty_val, reorder_val, entries["loc"].get(), datetime.now()))
+                with self.db.transaction():
+                    self.db.execute(queries.ITEM_INSERT,
+                        (entries["name"].get().strip(), entries["desc"].get(), entries["cat"].get(), 
+                         entries["uom"].get(), entries["hsn"].get(), p_rate, p_gst, p_price, s_rate, s_gst, s_price))
+                    item_id = self.db.lastrowid()
                 
-                self.db.commit()
+                    self.db.execute(queries.INVENTORY_INSERT,
+                        (item_id, 0, reorder_val, entries["loc"].get(), datetime.now()))
+                    adjust_stock(self.db, item_id, qty_val, OPENING)
+                self.app.changes.publish(ITEMS, [item_id])
                 messagebox.showinfo("Success", f"Item added!\nPurchase: ₹{p_price:.2f}\nSelling: ₹{s_price:.2f}")
                 dialog.destroy()
-                self.app.refresh_all_tabs()
             except ValueError as ve:
                 messagebox.showerror("Validation Error", str(ve))
             except Exception as e:
@@ -209,10 +233,7 @@ class PurchaseModule:
         values = self.inv_tree.item(selected[0])['values']
         item_id = values[0]
         
-        self.db.execute('''SELECT i.name, i.description, i.category, i.unit_of_measure, i.hsn_code,
-            i.purchase_rate, i.purchase_gst_percent, i.selling_rate, i.selling_gst_percent,
-            inv.quantity_on_hand, inv.reorder_level, inv.location
-            FROM Items i JOIN Inventory inv ON i.item_id = inv.item_id WHERE i.item_id = ?''', (item_id,))
+        self.db.execute(queries.ITEM_DETAIL, (item_id,))
         data = self.db.fetchone()
         
         dialog = tk.Toplevel(self.app.root)
@@ -222,18 +243,18 @@ class PurchaseModule:
         dialog.grab_set()
         
         fields = [
-            ("Item Name:", data[0]),
-            ("Description:", data[1] or ""),
-            ("Category:", data[2] or ""),
-            ("Unit of Measure:", data[3] or ""),
-            ("HSN Code:", data[4] or ""),
-            ("Purchase Rate (₹):", data[5]),
-            ("Purchase GST (%):", data[6]),
-            ("Selling Rate (₹):", data[7]),
-            ("Selling GST (%):", data[8]),
-            ("Quantity:", data[9]),
-            ("Reorder Level:", data[10]),
-            ("Location:", data[11] or "")
+            ("Item Name:", data.name),
+            ("Description:", data.description or ""),
+            ("Category:", data.category or ""),
+            ("Unit of Measure:", data.unit_of_measure or ""),
+            ("HSN Code:", data.hsn_code or ""),
+            ("Purchase Rate (₹):", data.purchase_rate),
+            ("Purchase GST (%):", data.purchase_gst_percent),
+            ("Selling Rate (₹):", data.selling_rate),
+            ("Selling GST (%):", data.selling_gst_percent),
+            ("Quantity:", data.quantity_on_hand),
+            ("Reorder Level:", data.reorder_level),
+            ("Location:", data.location or "")
         ]
         
         entries = []
@@ -275,17 +296,23 @@ class PurchaseModule:
                 _, p_price = self.calculate_gst_price(p_rate, p_gst)
                 _, s_price = self.calculate_gst_price(s_rate, s_gst)
                 
-                self.db.execute("""UPDATE Items SET name=?, description=?, category=?, unit_of_measure=?, hsn_code=?,
-                    purchase_rate=?, purchase_gst_percent=?, purchase_price=?,
-                    selling_rate=?, selling_gst_percent=?, selling_price=? WHERE item_id=?""",
-                    (entries[0].get().strip(), entries[1].get(), entries[2].get(), entries[3].get(), entries[4].get(),
-                     p_rate, p_gst, p_price, s_rate, s_gst, s_price, item_id))
-                self.db.execute("UPDATE Inventory SET quantity_on_hand=?, reorder_level=?, location=?, last_updated=? WHERE item_id=?",
-                    (qty_val, reorder_val, entries[11].get(), datetime.now(), item_id))
-                self.db.commit()
+                with self.db.transaction():
+                    # Fails if stock or the item's inventory settings changed since the dialog opened
+                    self.db.execute_versioned(queries.INVENTORY_UPDATE,
+                        (reorder_val, entries[11].get(), item_id, data.row_version), f"Item '{data.name}'")
+                    self.db.execute(queries.ITEM_UPDATE,
+                        (entries[0].get().strip(), entries[1].get(), entries[2].get(), entries[3].get(), entries[4].get(),
+                         p_rate, p_gst, p_price, s_rate, s_gst, s_price, item_id))
+                    
+                    # A changed quantity is posted to the stock ledger as an adjustment
+                    adjust_stock(self.db, item_id, qty_val - data.quantity_on_hand, notes="Edited on the item screen")
+                self.app.changes.publish(ITEMS, [item_id])
                 messagebox.showinfo("Success", "Item updated!")
                 dialog.destroy()
-                self.app.refresh_all_tabs()
+            except ConcurrencyConflict as e:
+                self.app.changes.publish(ITEMS, [item_id])
+                messagebox.showwarning("Changed Elsewhere", str(e))
+                dialog.destroy()
             except ValueError as ve:
                 messagebox.showerror("Validation Error", str(ve))
             except Exception as e:
@@ -302,11 +329,11 @@ class PurchaseModule:
         values = self.inv_tree.item(selected[0])['values']
         item_id, item_name = values[0], values[1]
         
-        self.db.execute("SELECT COUNT(*) FROM Purchase_Order_Items WHERE item_id = ?", (item_id,))
+        self.db.execute(queries.ITEM_PO_REFERENCES, (item_id,))
         po_count = self.db.fetchone()[0]
-        self.db.execute("SELECT COUNT(*) FROM Sales_Order_Items WHERE item_id = ?", (item_id,))
+        self.db.execute(queries.ITEM_SO_REFERENCES, (item_id,))
         so_count = self.db.fetchone()[0]
-        self.db.execute("SELECT COUNT(*) FROM Goods_Receipt WHERE item_id = ?", (item_id,))
+        self.db.execute(queries.ITEM_GR_REFERENCES, (item_id,))
         gr_count = self.db.fetchone()[0]
         
         if po_count > 0 or so_count > 0 or gr_count > 0:
@@ -320,19 +347,71 @@ class PurchaseModule:
         
         if messagebox.askyesno("Confirm", f"Delete '{item_name}'?"):
             try:
-                self.db.execute("DELETE FROM Inventory WHERE item_id = ?", (item_id,))
-                self.db.execute("DELETE FROM Items WHERE item_id = ?", (item_id,))
-                self.db.commit()
+                with self.db.transaction():
+                    # Close the item's stock in the ledger before it goes
+                    self.db.execute(queries.ITEM_STOCK, (item_id,))
+                    adjust_stock(self.db, item_id, -(self.db.fetchone()[0] or 0), notes="Item deleted")
+                    self.db.execute(queries.INVENTORY_DELETE, (item_id,))
+                    self.db.execute(queries.ITEM_DELETE, (item_id,))
+                self.app.changes.publish(ITEMS, [item_id])
                 messagebox.showinfo("Success", "Deleted!")
-                self.app.refresh_all_tabs()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
     
+    def show_stock_history(self):
+        """Recent stock movements of an item, and its stock on any date"""
+        selected = self.inv_tree.selection()
+        if not selected:
+            messagebox.showwarning("Warning", "Please select an item")
+            return
+        values = self.inv_tree.item(selected[0])['values']
+        item_id, item_name = values[0], values[1]
+        
+        dialog = tk.Toplevel(self.app.root)
+        dialog.title(f"Stock History - {item_name}")
+        dialog.geometry("800x550")
+        dialog.transient(self.app.root)
+        
+        as_of_frame = ttk.Frame(dialog)
+        as_of_frame.pack(fill='x', padx=10, pady=10)
+        ttk.Label(as_of_frame, text="Stock at end of (YYYY-MM-DD):").pack(side='left', padx=5)
+        date_entry = ttk.Entry(as_of_frame, width=15)
+        date_entry.insert(0, datetime.now().strftime('%Y-%m-%d'))
+        date_entry.pack(side='left', padx=5)
+        result_label = ttk.Label(as_of_frame, text="", font=('Arial', 10, 'bold'), foreground='blue')
+        
+        def show_stock_as_of():
+            try:
+                with self.db.reports.snapshot():
+                    quantity = stock_as_of(self.db.reports.conn, item_id, date_entry.get().strip())
+                result_label.config(text=f"{quantity} units")
+            except ValueError:
+                messagebox.showerror("Error", "Enter a date as YYYY-MM-DD")
+        
+        ttk.Button(as_of_frame, text="Show", command=show_stock_as_of).pack(side='left', padx=5)
+        result_label.pack(side='left', padx=10)
+        
+        frame = ttk.LabelFrame(dialog, text=f"Last {STOCK_HISTORY_ROWS} Movements", padding=10)
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
+        columns = ("Date", "Quantity", "Source", "Document", "Notes")
+        tree = ttk.Treeview(frame, columns=columns, show='headings', height=18)
+        col_widths = [170, 80, 110, 90, 300]
+        for i, col in enumerate(columns):
+            tree.heading(col, text=col)
+            tree.column(col, width=col_widths[i])
+        tree.pack(side='left', fill='both', expand=True)
+        scrollbar = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        scrollbar.pack(side='right', fill='y')
+        tree.configure(yscrollcommand=scrollbar.set)
+        
+        for row in self.db.reports.fetchall(queries.ITEM_MOVEMENTS, (item_id, STOCK_HISTORY_ROWS)):
+            tree.insert('', 'end', values=(row.movement_date, f"{row.quantity:+d}", row.source_type,
+                                           row.source_id or "", row.notes or ""))
+        show_stock_as_of()
+    
     # ==================== PURCHASE ORDERS TAB ====================
     
-    def create_purchase_order_tab(self):
-        po_frame = ttk.Frame(self.notebook)
-        self.notebook.add(po_frame, text="🛒 Purchase Orders")
+    def create_purchase_order_tab(self, po_frame):
         top_btn_frame = ttk.Frame(po_frame)
         top_btn_frame.pack(side='top', fill='x', padx=10, pady=8)
         ttk.Button(top_btn_frame, text="➕ Create PO", command=self.create_purchase_order).pack(side='left', padx=3)
@@ -342,15 +421,18 @@ class PurchaseModule:
         self.toggle_completed_btn.pack(side='left', padx=3)
         ttk.Button(top_btn_frame, text="🔄 Refresh", command=self.refresh_purchase_orders).pack(side='right', padx=3)
         columns = ("PO#", "Supplier", "Order Date", "Delivery", "Status", "Subtotal", "GST", "Total", "Items")
-        self.po_tree = ttk.Treeview(po_frame, columns=columns, show='headings', height=25)
         widths = [50, 130, 90, 90, 90, 80, 70, 90, 50]
-        for i, col in enumerate(columns):
-            self.po_tree.heading(col, text=col)
-            self.po_tree.column(col, width=widths[i])
+        sort_columns = dict(zip(columns, ("po_number", "name", "order_date", "expected_delivery", "status",
+                                          "subtotal", "total_gst", "total_amount", "item_count")))
+        self.po_tree = VirtualTreeview(po_frame, self.app.executor, 'purchase_orders', queries.PO_LIST_OPEN,
+                                       'po_number', columns, widths, self.format_po_row,
+                                       sort_columns=sort_columns, descending=True, height=25)
+        # Completed orders are grayed out
+        self.po_tree.tag_configure('completed', background='#e8e8e8', foreground='#666666')
         self.po_tree.pack(side='left', fill='both', expand=True, padx=10, pady=(0, 10))
-        scrollbar = ttk.Scrollbar(po_frame, orient='vertical', command=self.po_tree.yview)
+        scrollbar = ttk.Scrollbar(po_frame, orient='vertical')
         scrollbar.pack(side='right', fill='y', pady=(0, 10), padx=(0, 10))
-        self.po_tree.configure(yscrollcommand=scrollbar.set)
+        self.po_tree.set_scrollbar(scrollbar)
         self.refresh_purchase_orders()
     
     def toggle_completed_orders(self):
@@ -360,46 +442,29 @@ class PurchaseModule:
             self.toggle_completed_btn.config(text="🚫 Hide Completed")
         else:
             self.toggle_completed_btn.config(text="👁️ Show Completed")
-        self.refresh_purchase_orders()
+        self.po_tree.query = queries.PO_LIST_ALL if self.show_completed_pos else queries.PO_LIST_OPEN
+        self.po_tree.reload()
     
-    def refresh_purchase_orders(self):
-        for item in self.po_tree.get_children():
-            self.po_tree.delete(item)
-    
-        # Build query based on filter
-        if self.show_completed_pos:
-            query = '''SELECT po.po_number, s.name, po.order_date, po.expected_delivery, po.status, 
-                po.subtotal, po.total_gst, po.total_amount,
-                (SELECT COUNT(*) FROM Purchase_Order_Items WHERE po_number = po.po_number) as item_count
-                FROM Purchase_Orders po JOIN Suppliers s ON po.supplier_id = s.supplier_id 
-                ORDER BY po.po_number DESC'''
+    def refresh_purchase_orders(self, po_numbers=None):
+        """Reload the purchase order list in the background (only these POs, if given)"""
+        if not hasattr(self, 'po_tree'):
+            return  # tab not opened yet
+        if po_numbers is None:
+            self.po_tree.refresh()
         else:
-            query = '''SELECT po.po_number, s.name, po.order_date, po.expected_delivery, po.status, 
-                po.subtotal, po.total_gst, po.total_amount,
-                (SELECT COUNT(*) FROM Purchase_Order_Items WHERE po_number = po.po_number) as item_count
-                FROM Purchase_Orders po JOIN Suppliers s ON po.supplier_id = s.supplier_id 
-                WHERE po.status != 'Completed'
-                ORDER BY po.po_number DESC'''
+            self.po_tree.refresh_rows(po_numbers)
     
-        self.db.execute(query)
-        for row in self.db.fetchall():
-            display_row = (row[0], row[1], row[2], row[3], row[4], 
-                          f"₹{row[5]:.2f}", f"₹{row[6]:.2f}", f"₹{row[7]:.2f}", row[8])
-            # Optionally color completed orders differently
-            if row[4] == "Completed":
-                self.po_tree.insert('', 'end', values=display_row, tags=('completed',))
-            else:
-                self.po_tree.insert('', 'end', values=display_row)
-    
-        # Configure tag for completed orders (grayed out)
-        self.po_tree.tag_configure('completed', background='#e8e8e8', foreground='#666666')
+    def format_po_row(self, row):
+        display_row = (row.po_number, row.name, row.order_date, row.expected_delivery, row.status,
+                      f"₹{row.subtotal:.2f}", f"₹{row.total_gst:.2f}", f"₹{row.total_amount:.2f}", row.item_count)
+        return display_row, ('completed',) if row.status == "Completed" else ()
     
     def create_purchase_order(self):
-        self.db.execute("SELECT COUNT(*) FROM Suppliers")
+        self.db.execute(queries.SUPPLIER_COUNT)
         if self.db.fetchone()[0] == 0:
             messagebox.showwarning("Warning", "Add suppliers first")
             return
-        self.db.execute("SELECT COUNT(*) FROM Items")
+        self.db.execute(queries.ITEM_COUNT)
         if self.db.fetchone()[0] == 0:
             messagebox.showwarning("Warning", "Add items first")
             return
@@ -412,9 +477,9 @@ class PurchaseModule:
         
         # Supplier
         ttk.Label(dialog, text="Supplier:*", font=('Arial', 10, 'bold')).grid(row=0, column=0, padx=10, pady=10, sticky='w')
-        self.db.execute("SELECT supplier_id, name, gstin FROM Suppliers ORDER BY name")
+        self.db.execute(queries.SUPPLIER_PICKLIST)
         suppliers = self.db.fetchall()
-        supplier_dict = {f"{s[1]} (GSTIN: {s[2] or 'N/A'})": s[0] for s in suppliers}
+        supplier_dict = {f"{s.name} (GSTIN: {s.gstin or 'N/A'})": s.supplier_id for s in suppliers}
         supplier_var = tk.StringVar()
         supplier_combo = ttk.Combobox(dialog, textvariable=supplier_var, values=list(supplier_dict.keys()), width=50, state='readonly')
         supplier_combo.grid(row=0, column=1, padx=10, pady=10, columnspan=3)
@@ -430,9 +495,10 @@ class PurchaseModule:
         item_frame.grid(row=3, column=0, columnspan=4, padx=10, pady=10, sticky='ew')
         
         ttk.Label(item_frame, text="Item:").grid(row=0, column=0, padx=5, pady=5, sticky='w')
-        self.db.execute("SELECT item_id, name, purchase_rate, purchase_gst_percent, purchase_price FROM Items ORDER BY name")
+        self.db.execute(queries.ITEM_PURCHASE_PICKLIST)
         items = self.db.fetchall()
-        item_dict = {f"{i[1]} (Rate: ₹{i[2]:.2f} + {i[3]:.1f}% GST = ₹{i[4]:.2f})": (i[0], i[2], i[3]) for i in items}
+        item_dict = {f"{i.name} (Rate: ₹{i.purchase_rate:.2f} + {i.purchase_gst_percent:.1f}% GST = ₹{i.purchase_price:.2f})":
+                     (i.item_id, i.purchase_rate, i.purchase_gst_percent) for i in items}
         item_var = tk.StringVar()
         item_combo = ttk.Combobox(item_frame, textvariable=item_var, values=list(item_dict.keys()), width=50, state='readonly')
         item_combo.grid(row=0, column=1, padx=5, pady=5, columnspan=2)
@@ -456,12 +522,12 @@ class PurchaseModule:
                 item_name = item_var.get().split(' (Rate:')[0]
                 
                 for existing in selected_items:
-                    if existing[0] == item_id:
+                    if existing.item_id == item_id:
                         messagebox.showwarning("Warning", "Item already added")
                         return
                 
                 gst_amt, total = self.calculate_gst_price(rate * qty, gst_percent)
-                selected_items.append((item_id, item_name, qty, rate, gst_percent, gst_amt, total))
+                selected_items.append(POLine(item_id, item_name, qty, rate, gst_percent, gst_amt, total))
                 items_tree.insert('', 'end', values=(item_name, qty, f"₹{rate:.2f}", f"{gst_percent:.1f}%", f"₹{gst_amt:.2f}", f"₹{total:.2f}"))
                 update_total()
                 item_var.set('')
@@ -480,9 +546,9 @@ class PurchaseModule:
             update_total()
         
         def update_total():
-            subtotal = sum(item[3] * item[2] for item in selected_items)
-            total_gst = sum(item[5] for item in selected_items)
-            total = sum(item[6] for item in selected_items)
+            subtotal = sum(item.base_amount for item in selected_items)
+            total_gst = sum(item.gst_amount for item in selected_items)
+            total = sum(item.total for item in selected_items)
             total_label.config(text=f"Subtotal: ₹{subtotal:.2f}  |  GST: ₹{total_gst:.2f}  |  Total: ₹{total:.2f}")
         
         ttk.Button(item_frame, text="➕ Add", command=add_item).grid(row=0, column=5, padx=5, pady=5)
@@ -515,22 +581,21 @@ class PurchaseModule:
                     return
                 
                 supplier_id = supplier_dict[supplier_var.get()]
-                subtotal = sum(item[3] * item[2] for item in selected_items)
-                total_gst = sum(item[5] for item in selected_items)
-                total_amount = sum(item[6] for item in selected_items)
-                
-                self.db.execute("INSERT INTO Purchase_Orders (supplier_id, order_date, expected_delivery, status, subtotal, total_gst, total_amount) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (supplier_id, datetime.now().date(), delivery_entry.get(), "Pending", subtotal, total_gst, total_amount))
-                po_number = self.db.lastrowid()
+                subtotal = sum(item.base_amount for item in selected_items)
+                total_gst = sum(item.gst_amount for item in selected_items)
+                total_amount = sum(item.total for item in selected_items)
                 
-                for item_id, item_name, qty, rate, gst_percent, gst_amt, total in selected_items:
-                    self.db.execute("INSERT INTO Purchase_Order_Items (po_number, item_id, quantity, rate, gst_percent, gst_amount, total_price) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                        (po_number, item_id, qty, rate, gst_percent, gst_amt, total))
+                with self.db.transaction():
+                    self.db.execute(queries.PO_INSERT,
+                        (supplier_id, datetime.now().date(), delivery_entry.get(), "Pending", subtotal, total_gst, total_amount))
+                    po_number = self.db.lastrowid()
                 
-                self.db.commit()
+                    self.db.insert_many("Purchase_Order_Items", queries.PO_LINE_COLUMNS,
+                        [(po_number, item.item_id, item.quantity, item.rate, item.gst_percent, item.gst_amount, item.total)
+                         for item in selected_items])
+                self.app.changes.publish(PURCHASE_ORDERS, [po_number])
                 messagebox.showinfo("Success", f"PO #{po_number} created!\n\nItems: {len(selected_items)}\nSubtotal: ₹{subtotal:.2f}\nGST: ₹{total_gst:.2f}\nTotal: ₹{total_amount:.2f}")
                 dialog.destroy()
-                self.refresh_purchase_orders()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed: {str(e)}")
         
@@ -546,7 +611,7 @@ class PurchaseModule:
         values = self.po_tree.item(selected[0])['values']
         po_number = values[0]
         
-        self.db.execute("SELECT COUNT(*) FROM Goods_Receipt WHERE po_number = ?", (po_number,))
+        self.db.execute(queries.PO_RECEIPT_COUNT, (po_number,))
         gr_count = self.db.fetchone()[0]
         if gr_count > 0:
             messagebox.showerror("Cannot Delete", f"PO #{po_number} has {gr_count} goods receipt(s).\nData integrity protected.")
@@ -554,11 +619,11 @@ class PurchaseModule:
         
         if messagebox.askyesno("Confirm", f"Delete PO #{po_number} and all items?"):
             try:
-                self.db.execute("DELETE FROM Purchase_Order_Items WHERE po_number = ?", (po_number,))
-                self.db.execute("DELETE FROM Purchase_Orders WHERE po_number = ?", (po_number,))
-                self.db.commit()
+                with self.db.transaction():
+                    self.db.execute(queries.PO_LINES_DELETE, (po_number,))
+                    self.db.execute(queries.PO_DELETE, (po_number,))
+                self.app.changes.publish(PURCHASE_ORDERS, [po_number])
                 messagebox.showinfo("Success", f"PO #{po_number} deleted!")
-                self.refresh_purchase_orders()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
     
@@ -576,21 +641,19 @@ class PurchaseModule:
         dialog.transient(self.app.root)
         dialog.grab_set()
         
-        self.db.execute('''SELECT po.po_number, s.name, s.gstin, po.order_date, po.expected_delivery, 
-            po.status, po.subtotal, po.total_gst, po.total_amount
-            FROM Purchase_Orders po JOIN Suppliers s ON po.supplier_id = s.supplier_id WHERE po.po_number = ?''', (po_number,))
+        self.db.execute(queries.PO_HEADER, (po_number,))
         po_info = self.db.fetchone()
         
         info_frame = ttk.LabelFrame(dialog, text="Order Information", padding=15)
         info_frame.pack(fill='x', padx=10, pady=10)
         
         labels = [
-            f"PO Number: {po_info[0]}",
-            f"Supplier: {po_info[1]}",
-            f"GSTIN: {po_info[2] or 'N/A'}",
-            f"Order Date: {po_info[3]}",
-            f"Expected Delivery: {po_info[4]}",
-            f"Status: {po_info[5]}"
+            f"PO Number: {po_info.po_number}",
+            f"Supplier: {po_info.name}",
+            f"GSTIN: {po_info.gstin or 'N/A'}",
+            f"Order Date: {po_info.order_date}",
+            f"Expected Delivery: {po_info.expected_delivery}",
+            f"Status: {po_info.status}"
         ]
         
         for i, text in enumerate(labels):
@@ -601,15 +664,15 @@ class PurchaseModule:
         summary_frame.pack(fill='x', padx=10, pady=10)
         
         ttk.Label(summary_frame, text=f"Subtotal (Before GST):", font=('Arial', 10)).grid(row=0, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{po_info[6]:.2f}", font=('Arial', 10, 'bold')).grid(row=0, column=1, sticky='e', padx=10, pady=3)
+        ttk.Label(summary_frame, text=f"₹{po_info.subtotal:.2f}", font=('Arial', 10, 'bold')).grid(row=0, column=1, sticky='e', padx=10, pady=3)
         
         ttk.Label(summary_frame, text=f"Total GST:", font=('Arial', 10)).grid(row=1, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{po_info[7]:.2f}", font=('Arial', 10, 'bold'), foreground='blue').grid(row=1, column=1, sticky='e', padx=10, pady=3)
+        ttk.Label(summary_frame, text=f"₹{po_info.total_gst:.2f}", font=('Arial', 10, 'bold'), foreground='blue').grid(row=1, column=1, sticky='e', padx=10, pady=3)
         
         ttk.Separator(summary_frame, orient='horizontal').grid(row=2, column=0, columnspan=2, sticky='ew', padx=10, pady=5)
         
         ttk.Label(summary_frame, text=f"Total Amount:", font=('Arial', 11, 'bold')).grid(row=3, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{po_info[8]:.2f}", font=('Arial', 11, 'bold'), foreground='green').grid(row=3, column=1, sticky='e', padx=10, pady=3)
+        ttk.Label(summary_frame, text=f"₹{po_info.total_amount:.2f}", font=('Arial', 11, 'bold'), foreground='green').grid(row=3, column=1, sticky='e', padx=10, pady=3)
         
         # Items
         items_frame = ttk.LabelFrame(dialog, text="Items", padding=10)
@@ -623,16 +686,14 @@ class PurchaseModule:
             tree.column(col, width=col_widths[i])
         tree.pack(fill='both', expand=True)
         
-        self.db.execute('''SELECT i.name, poi.quantity, poi.rate, poi.gst_percent, poi.gst_amount, poi.total_price
-            FROM Purchase_Order_Items poi JOIN Items i ON poi.item_id = i.item_id WHERE poi.po_number = ?''', (po_number,))
+        self.db.execute(queries.PO_LINES, (po_number,))
         for row in self.db.fetchall():
-            tree.insert('', 'end', values=(row[0], row[1], f"₹{row[2]:.2f}", f"{row[3]:.1f}%", f"₹{row[4]:.2f}", f"₹{row[5]:.2f}"))
+            tree.insert('', 'end', values=(row.name, row.quantity, f"₹{row.rate:.2f}", f"{row.gst_percent:.1f}%",
+                                           f"₹{row.gst_amount:.2f}", f"₹{row.total_price:.2f}"))
     
     # ==================== SUPPLIERS TAB ====================
     
-    def create_suppliers_tab(self):
-        sup_frame = ttk.Frame(self.notebook)
-        self.notebook.add(sup_frame, text="🏢 Suppliers")
+    def create_suppliers_tab(self, sup_frame):
         top_btn_frame = ttk.Frame(sup_frame)
         top_btn_frame.pack(side='top', fill='x', padx=10, pady=8)
         ttk.Button(top_btn_frame, text="➕ Add", command=self.add_supplier).pack(side='left', padx=3)
@@ -649,14 +710,14 @@ class PurchaseModule:
         scrollbar = ttk.Scrollbar(sup_frame, orient='vertical', command=self.sup_tree.yview)
         scrollbar.pack(side='right', fill='y', pady=(0, 10), padx=(0, 10))
         self.sup_tree.configure(yscrollcommand=scrollbar.set)
+        self.sup_sync = TreeSynchronizer(self.sup_tree, lambda row: row.supplier_id, lambda row: (row, ()))
         self.refresh_suppliers()
     
     def refresh_suppliers(self):
-        for item in self.sup_tree.get_children():
-            self.sup_tree.delete(item)
-        self.db.execute("SELECT supplier_id, name, contact_person, phone, email, gstin, payment_terms FROM Suppliers")
-        for row in self.db.fetchall():
-            self.sup_tree.insert('', 'end', values=row)
+        if not hasattr(self, 'sup_sync'):
+            return  # tab not opened yet
+        self.db.execute(queries.SUPPLIER_LIST)
+        self.sup_sync.sync(self.db.fetchall())
     
     def add_supplier(self):
         dialog = tk.Toplevel(self.app.root)
@@ -678,13 +739,13 @@ class PurchaseModule:
                 if not entries["name"].get().strip():
                     messagebox.showerror("Error", "Supplier name required")
                     return
-                self.db.execute("INSERT INTO Suppliers (name, contact_person, phone, email, address, gstin, payment_terms) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (entries["name"].get().strip(), entries["contact"].get(), entries["phone"].get(),
-                     entries["email"].get(), entries["address"].get(), entries["gstin"].get(), entries["terms"].get()))
-                self.db.commit()
+                with self.db.transaction():
+                    self.db.execute(queries.SUPPLIER_INSERT,
+                        (entries["name"].get().strip(), entries["contact"].get(), entries["phone"].get(),
+                         entries["email"].get(), entries["address"].get(), entries["gstin"].get(), entries["terms"].get()))
+                self.app.changes.publish(SUPPLIERS)
                 messagebox.showinfo("Success", "Supplier added!")
                 dialog.destroy()
-                self.refresh_suppliers()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
         ttk.Button(dialog, text="Save", command=save).grid(row=len(fields), column=0, columnspan=2, pady=15)
@@ -695,7 +756,7 @@ class PurchaseModule:
             messagebox.showwarning("Warning", "Select a supplier")
             return
         supplier_id = self.sup_tree.item(selected[0])['values'][0]
-        self.db.execute("SELECT name, contact_person, phone, email, address, gstin, payment_terms FROM Suppliers WHERE supplier_id = ?", (supplier_id,))
+        self.db.execute(queries.SUPPLIER_DETAIL, (supplier_id,))
         data = self.db.fetchone()
         dialog = tk.Toplevel(self.app.root)
         dialog.title("Edit Supplier")
@@ -716,12 +777,12 @@ class PurchaseModule:
                 if not entries[0].get().strip():
                     messagebox.showerror("Error", "Name required")
                     return
-                self.db.execute("UPDATE Suppliers SET name=?, contact_person=?, phone=?, email=?, address=?, gstin=?, payment_terms=? WHERE supplier_id=?",
-                    tuple(e.get() for e in entries) + (supplier_id,))
-                self.db.commit()
+                with self.db.transaction():
+                    self.db.execute(queries.SUPPLIER_UPDATE,
+                        tuple(e.get() for e in entries) + (supplier_id,))
+                self.app.changes.publish(SUPPLIERS, [supplier_id])
                 messagebox.showinfo("Success", "Updated!")
                 dialog.destroy()
-                self.refresh_suppliers()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
         ttk.Button(dialog, text="Update", command=update).grid(row=len(fields), column=0, columnspan=2, pady=15)
@@ -732,24 +793,22 @@ class PurchaseModule:
             messagebox.showwarning("Warning", "Select a supplier")
             return
         supplier_id, name = self.sup_tree.item(selected[0])['values'][0], self.sup_tree.item(selected[0])['values'][1]
-        self.db.execute("SELECT COUNT(*) FROM Purchase_Orders WHERE supplier_id = ?", (supplier_id,))
+        self.db.execute(queries.SUPPLIER_PO_COUNT, (supplier_id,))
         if self.db.fetchone()[0] > 0:
             messagebox.showerror("Cannot Delete", f"'{name}' has purchase orders.\nData integrity protected.")
             return
         if messagebox.askyesno("Confirm", f"Delete '{name}'?"):
             try:
-                self.db.execute("DELETE FROM Suppliers WHERE supplier_id = ?", (supplier_id,))
-                self.db.commit()
+                with self.db.transaction():
+                    self.db.execute(queries.SUPPLIER_DELETE, (supplier_id,))
+                self.app.changes.publish(SUPPLIERS, [supplier_id])
                 messagebox.showinfo("Success", "Deleted!")
-                self.refresh_suppliers()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
             
             # ==================== GOODS RECEIPT TABS ====================
-    def create_goods_receipt_tab(self):
+    def create_goods_receipt_tab(self, gr_frame):
         """Create goods receipt tab"""
-        gr_frame = ttk.Frame(self.notebook)
-        self.notebook.add(gr_frame, text="📥 Goods Receipt")
     
         top_frame = ttk.Frame(gr_frame)
         top_frame.pack(side='top', fill='x', padx=10, pady=10)
@@ -760,18 +819,18 @@ class PurchaseModule:
         history_frame.pack(fill='both', expand=True, padx=10, pady=10)
     
         columns = ("ID", "PO#", "Supplier", "Invoice", "Items", "Total Received", "Total Accepted", "Date")
-        self.receipt_tree = ttk.Treeview(history_frame, columns=columns, show='headings', height=20)
-    
         widths = [50, 60, 150, 120, 60, 100, 100, 100]
-        for i, col in enumerate(columns):
-            self.receipt_tree.heading(col, text=col)
-            self.receipt_tree.column(col, width=widths[i])
+        sort_columns = dict(zip(columns, ("receipt_id", "po_number", "name", "invoice_number", "item_count",
+                                          "total_received", "total_accepted", "receipt_date")))
+        self.receipt_tree = VirtualTreeview(history_frame, self.app.executor, 'receipts', queries.RECEIPT_HISTORY,
+                                            'receipt_id', columns, widths, lambda row: (row, ()),
+                                            sort_columns=sort_columns, height=20)
     
         self.receipt_tree.pack(side='left', fill='both', expand=True)
     
-        scrollbar = ttk.Scrollbar(history_frame, orient='vertical', command=self.receipt_tree.yview)
+        scrollbar = ttk.Scrollbar(history_frame, orient='vertical')
         scrollbar.pack(side='right', fill='y')
-        self.receipt_tree.configure(yscrollcommand=scrollbar.set)
+        self.receipt_tree.set_scrollbar(scrollbar)
     
         # Bind double-click to view details
         self.receipt_tree.bind('<Double-1>', lambda e: self.view_receipt_details())
@@ -781,28 +840,15 @@ class PurchaseModule:
     
     def refresh_receipt_history(self):
         """Refresh goods receipt history - showing grouped receipts"""
-        for item in self.receipt_tree.get_children():
-            self.receipt_tree.delete(item)
-        
-        # Get unique receipts grouped by invoice number and PO
-        self.db.execute('''
-            SELECT 
-                MIN(gr.receipt_id) as receipt_id,
-                gr.po_number, 
-                s.name, 
-                gr.invoice_number,
-                COUNT(DISTINCT gr.item_id) as item_count,
-                SUM(gr.accepted_quantity) as total_received,
-                SUM(gr.accepted_quantity) as total_accepted,
-                gr.receipt_date
-                FROM Goods_Receipt gr
-                JOIN Suppliers s ON gr.supplier_id = s.supplier_id
-            GROUP BY gr.invoice_number, gr.po_number, gr.receipt_date
-            ORDER BY MIN(gr.receipt_id) 
-        ''')
+        if not hasattr(self, 'receipt_tree'):
+            return  # tab not opened yet
+        self.receipt_tree.refresh()
     
-        for row in self.db.fetchall():
-            self.receipt_tree.insert('', 'end', values=row)
+    def publish_receipt(self, invoice_number, po_number, item_ids):
+        """A receipt moves stock and PO status as well as the receipt list"""
+        self.app.changes.publish(RECEIPTS, [invoice_number])
+        self.app.changes.publish(ITEMS, item_ids)
+        self.app.changes.publish(PURCHASE_ORDERS, [po_number])
     
     def view_receipt_details(self):
         """View detailed items in a receipt"""
@@ -845,14 +891,7 @@ class PurchaseModule:
         tree.pack(fill='both', expand=True)
     
         #Get items for this receipt
-        self.db.execute('''
-            SELECT i.name, gr.received_quantity, gr.accepted_quantity, 
-                gr.rejected_quantity, gr.notes
-            FROM Goods_Receipt gr
-            JOIN Items i ON gr.item_id = i.item_id
-            WHERE gr.invoice_number = ?
-            ORDER BY i.name
-            ''', (invoice_number,))
+        self.db.execute(queries.RECEIPT_LINES, (invoice_number,))
     
         for row in self.db.fetchall():
             tree.insert('', 'end', values=row)
@@ -869,15 +908,7 @@ class PurchaseModule:
         po_number = values[1]
         
         # Fetch all rows with ordered quantities
-        self.db.execute("""
-            SELECT gr.receipt_id, gr.item_id, i.name,
-                gr.received_quantity, gr.accepted_quantity, gr.rejected_quantity, gr.notes,
-                poi.quantity as ordered_quantity, gr.po_number
-            FROM Goods_Receipt gr
-            JOIN Items i ON i.item_id = gr.item_id
-            JOIN Purchase_Order_Items poi ON poi.item_id = gr.item_id AND poi.po_number = gr.po_number
-            WHERE gr.invoice_number = ?
-        """, (invoice_number,))
+        self.db.execute(queries.RECEIPT_EDIT_LINES, (invoice_number,))
         rows = self.db.fetchall()
 
         if not rows:
@@ -920,11 +951,15 @@ class PurchaseModule:
 
         # Store original data for validation
         item_data = {}  # {tree_item_id: (rec_id, item_id, ordered_qty, old_recv, old_acc, old_rej)}
+        versions = {}   # {rec_id: row_version when the dialog opened}
         
         # Load data
-        for rec_id, item_id, name, recv, acc, rej, notes, ordered_qty, _ in rows:
-            tree_id = tree.insert("", "end", values=(name, ordered_qty, recv, acc, rej, notes or ""))
-            item_data[tree_id] = (rec_id, item_id, ordered_qty, recv, acc, rej)
+        for row in rows:
+            tree_id = tree.insert("", "end", values=(row.name, row.ordered_quantity, row.received_quantity,
+                                                     row.accepted_quantity, row.rejected_quantity, row.notes or ""))
+            item_data[tree_id] = (row.receipt_id, row.item_id, row.ordered_quantity, row.received_quantity,
+                                  row.accepted_quantity, row.rejected_quantity)
+            versions[row.receipt_id] = row.row_version
 
         # Variable to track currently editing entry
         current_entry = None
@@ -1114,56 +1149,38 @@ class PurchaseModule:
                         messagebox.showerror("Error", f"{name}: Accepted ({acc}) + Rejected ({rej}) must equal Received ({recv})")
                         return
 
-                    rec_id, item_id, _, old_recv, old_acc, old_rej = item_data[tree_id]
-                    
-                    # Calculate inventory adjustment (only accepted affects inventory)
-                    diff = acc - old_acc
+                    rec_id = item_data[tree_id][0]
                     
-                    updates.append((recv, acc, rej, notes, rec_id, item_id, diff))
+                    updates.append((recv, acc, rej, notes, rec_id))
                 
-                # Apply all updates
-                for recv, acc, rej, notes, rec_id, item_id, diff in updates:
-                    self.db.execute("""
-                        UPDATE Goods_Receipt
-                        SET received_quantity=?, accepted_quantity=?, rejected_quantity=?, notes=?
-                        WHERE receipt_id=?
-                    """, (recv, acc, rej, notes, rec_id))
-
-                    # Update inventory only by the difference
-                    if diff != 0:
-                        self.db.execute("""
-                            UPDATE Inventory 
-                            SET quantity_on_hand = quantity_on_hand + ?, last_updated=?
-                            WHERE item_id=?
-                        """, (diff, datetime.now(), item_id))
+                # Apply all updates (a changed accepted quantity posts the
+                # difference to the stock ledger through its trigger). Each
+                # line only applies if nobody else changed it meanwhile.
+                with self.db.transaction():
+                    for recv, acc, rej, notes, rec_id in updates:
+                        self.db.execute_versioned(queries.RECEIPT_UPDATE,
+                            (recv, acc, rej, notes, rec_id, versions[rec_id]), f"Receipt {invoice_number}")
+                
+                    # Check if all items in the PO have been fully received
+                    self.db.execute(queries.PO_UNRECEIVED_LINE_COUNT, (po_number,))
             
-                # Check if all items in the PO have been fully received
-                    self.db.execute('''
-                    SELECT COUNT(*) FROM Purchase_Order_Items poi
-                    WHERE poi.po_number = ?
-                    AND poi.quantity > (
-                        SELECT COALESCE(SUM(gr.accepted_quantity), 0)
-                        FROM Goods_Receipt gr
-                        WHERE gr.po_number = poi.po_number 
-                        AND gr.item_id = poi.item_id
-                    )
-                ''', (po_number,))
-        
-                unreceived_items = self.db.fetchone()[0]
-        
-                # Update PO status based on receipt completion
-                if unreceived_items == 0:
-                    self.db.execute('UPDATE Purchase_Orders SET status = "Completed" WHERE po_number = ?', (po_number,))
-                else:
-                    self.db.execute('UPDATE Purchase_Orders SET status = "Partially Received" WHERE po_number = ?', (po_number,))
+                    unreceived_items = self.db.fetchone()[0]
+            
+                    # Update PO status based on receipt completion
+                    if unreceived_items == 0:
+                        self.db.execute(queries.PO_MARK_COMPLETED, (po_number,))
+                    else:
+                        self.db.execute(queries.PO_MARK_PARTIAL, (po_number,))
+                self.publish_receipt(invoice_number, po_number, [data[1] for data in item_data.values()])
             
-                self.db.commit()
                 messagebox.showinfo("Success", f"Receipt updated successfully!\n{len(updates)} item(s) updated.")
                 dialog.destroy()
-                self.app.refresh_all_tabs()
 
+            except ConcurrencyConflict as e:
+                self.publish_receipt(invoice_number, po_number, [data[1] for data in item_data.values()])
+                messagebox.showwarning("Changed Elsewhere", str(e))
+                dialog.destroy()
             except Exception as e:
-                self.db.rollback()
                 messagebox.showerror("Error", f"Failed to save changes: {str(e)}")
 
         # Buttons
@@ -1175,7 +1192,7 @@ class PurchaseModule:
     
     def new_goods_receipt(self):
         """Create new goods receipt - multi-item"""
-        self.db.execute("SELECT COUNT(*) FROM Suppliers")
+        self.db.execute(queries.SUPPLIER_COUNT)
         if self.db.fetchone()[0] == 0:
             messagebox.showwarning("Warning", "Add suppliers first")
             return
@@ -1193,9 +1210,9 @@ class PurchaseModule:
     
         ttk.Label(header_frame, text="Supplier:*").grid(row=0, column=0, padx=10, pady=8, sticky='w')
     
-        self.db.execute("SELECT supplier_id, name FROM Suppliers ORDER BY name")
+        self.db.execute(queries.SUPPLIER_NAMES)
         suppliers = self.db.fetchall()
-        supplier_dict = {f"{s[1]} (ID: {s[0]})": s[0] for s in suppliers}
+        supplier_dict = {f"{s.name} (ID: {s.supplier_id})": s.supplier_id for s in suppliers}
     
         supplier_var = tk.StringVar()
         supplier_combo = ttk.Combobox(header_frame, textvariable=supplier_var, 
@@ -1289,13 +1306,14 @@ class PurchaseModule:
         # Store data
         po_dict = {}
         item_dict = {}
-        selected_items = []  # List of tuples: (item_id, item_name, ordered_qty, recv, accept, reject, notes)
+        po_versions = {}     # {po_number: row_version when its lines were loaded}
+        selected_items = []  # List of ReceiptLine
         
         def update_summary():
             total_items = len(selected_items)
-            total_recv = sum(item[3] for item in selected_items)
-            total_accept = sum(item[4] for item in selected_items)
-            total_reject = sum(item[5] for item in selected_items)
+            total_recv = sum(item.received for item in selected_items)
+            total_accept = sum(item.accepted for item in selected_items)
+            total_reject = sum(item.rejected for item in selected_items)
             summary_label.config(text=f"Total Items: {total_items} | Total Received: {total_recv} | Total Accepted: {total_accept} | Total Rejected: {total_reject}")
     
         
@@ -1306,12 +1324,7 @@ class PurchaseModule:
         
             supplier_id = supplier_dict[supplier_var.get()]
             
-            self.db.execute('''
-                SELECT po_number, order_date, status 
-                FROM Purchase_Orders 
-                WHERE supplier_id = ? 
-                ORDER BY po_number DESC
-            ''', (supplier_id,))
+            self.db.execute(queries.SUPPLIER_POS, (supplier_id,))
             
             pos = self.db.fetchall()
             if not pos:
@@ -1320,9 +1333,9 @@ class PurchaseModule:
                 return
                 
             po_dict.clear()
-            po_list = [f"PO #{po[0]} - {po[1]} ({po[2]})" for po in pos]
+            po_list = [f"PO #{po.po_number} - {po.order_date} ({po.status})" for po in pos]
             for i, po in enumerate(pos):
-                po_dict[po_list[i]] = po[0]
+                po_dict[po_list[i]] = po.po_number
             
             po_combo['values'] = po_list
             po_combo['state'] = 'readonly'
@@ -1344,12 +1357,9 @@ class PurchaseModule:
             po_number = po_dict[po_var.get()]
         
             #Get items for this PO
-            self.db.execute('''
-                SELECT poi.item_id, i.name, poi.quantity
-                FROM Purchase_Order_Items poi
-                JOIN Items i ON poi.item_id = i.item_id
-                WHERE poi.po_number = ?
-            ''', (po_number,))
+            self.db.execute(queries.PO_ROW_VERSION, (po_number,))
+            po_versions[po_number] = self.db.fetchone()[0]
+            self.db.execute(queries.PO_RECEIVABLE_LINES, (po_number,))
             
             items = self.db.fetchall()
             if not items:
@@ -1358,9 +1368,9 @@ class PurchaseModule:
                 return
             
             item_dict.clear()
-            item_list = [f"{item[1]} (Ordered: {item[2]})" for item in items]
+            item_list = [f"{item.name} (Ordered: {item.quantity}, Remaining: {item.remaining})" for item in items]
             for i, item in enumerate(items):
-                item_dict[item_list[i]] = (item[0], item[1], item[2])  # (id, name, qty)
+                item_dict[item_list[i]] = (item.item_id, item.name, item.quantity, item.remaining)
             
             item_combo['values'] = item_list
             item_combo['state'] = 'readonly'
@@ -1374,10 +1384,10 @@ class PurchaseModule:
             add_item_btn['state'] = 'normal'
             
         def on_item_selected(event):
-            """Show ordered quantity"""
+            """Show ordered and still-to-receive quantity"""
             if item_var.get():
-                _, _, ordered_qty = item_dict[item_var.get()]
-                ordered_label.config(text=str(ordered_qty))
+                _, _, ordered_qty, remaining = item_dict[item_var.get()]
+                ordered_label.config(text=f"{ordered_qty} ({remaining} remaining)")
             else:
                 ordered_label.config(text="0")
         
@@ -1402,10 +1412,13 @@ class PurchaseModule:
                 
                 # Validate against ordered quantity
                 if item_var.get():
-                    _, _, ordered_qty = item_dict[item_var.get()]
+                    _, _, ordered_qty, remaining = item_dict[item_var.get()]
                     if recv > ordered_qty:
                         messagebox.showerror("Error", f"Received quantity ({recv}) cannot exceed ordered quantity ({ordered_qty})")
                         return None
+                    if accept > remaining:
+                        messagebox.showerror("Error", f"Accepted quantity ({accept}) cannot exceed the quantity still to receive ({remaining})")
+                        return None
                 
                 return recv, accept, reject
             except ValueError:
@@ -1418,11 +1431,11 @@ class PurchaseModule:
                 messagebox.showwarning("Warning", "Select an item")
                 return
         
-            item_id, item_name, ordered_qty = item_dict[item_var.get()]
+            item_id, item_name, ordered_qty, _ = item_dict[item_var.get()]
             
             #Check if already added
             for existing in selected_items:
-                if existing[0] == item_id:
+                if existing.item_id == item_id:
                     messagebox.showwarning("Warning", "Item already added to this receipt")
                     return
             
@@ -1434,7 +1447,7 @@ class PurchaseModule:
             notes = notes_entry.get().strip()
             
             #Add to list
-            selected_items.append((item_id, item_name, ordered_qty, recv, accept, reject, notes))
+            selected_items.append(ReceiptLine(item_id, item_name, ordered_qty, recv, accept, reject, notes))
             items_tree.insert('', 'end', values=(item_name, ordered_qty, recv, accept, reject, notes))
             
             #Clear inputs
@@ -1470,12 +1483,6 @@ class PurchaseModule:
             if not invoice_entry.get().strip():
                 messagebox.showerror("Error", "Enter invoice number")
                 return
-            # Prevent duplicate invoices
-            self.db.execute("SELECT COUNT(*) FROM Goods_Receipt WHERE invoice_number = ?", 
-                (invoice_entry.get().strip(),))
-            if self.db.fetchone()[0] > 0:
-                messagebox.showerror("Error", "This invoice number already exists. Duplicate invoices are not allowed.")
-                return
             if not selected_items:
                 messagebox.showerror("Error", "Add at least one item to the receipt")
                 return
@@ -1486,49 +1493,38 @@ class PurchaseModule:
                 invoice_no = invoice_entry.get().strip()
                 receipt_date = date_entry.get()
                 
-                #Insert all items with same invoice number
-                for item_id, item_name, ordered_qty, recv, accept, reject, notes in selected_items:
-                    self.db.execute('''
-                        INSERT INTO Goods_Receipt 
-                        (po_number, item_id, supplier_id, invoice_number, received_quantity, 
-                        accepted_quantity, rejected_quantity, receipt_date, notes)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (po_number, item_id, supplier_id, invoice_no, recv, accept, reject, receipt_date, notes))
-                
-                # Update inventory with ONLY accepted quantity
-                    self.db.execute('''
-                        UPDATE Inventory 
-                        SET quantity_on_hand = quantity_on_hand + ?, 
-                            last_updated = ?
-                        WHERE item_id = ?
-                    ''', (accept, datetime.now(), item_id))
-                
-                # Check if all items in PO have been fully received
-                self.db.execute('''
-                    SELECT COUNT(*) FROM Purchase_Order_Items poi
-                    WHERE poi.po_number = ?
-                    AND poi.quantity > (
-                        SELECT COALESCE(SUM(gr.accepted_quantity), 0)
-                        FROM Goods_Receipt gr
-                        WHERE gr.po_number = poi.po_number 
-                        AND gr.item_id = poi.item_id
-                    )
-                ''', (po_number,))
-                
-                unreceived_items = self.db.fetchone()[0]
-                
-                # Update PO status
-                if unreceived_items == 0:
-                    self.db.execute('UPDATE Purchase_Orders SET status = "Completed" WHERE po_number = ?', (po_number,))
-                else:
-                    self.db.execute('UPDATE Purchase_Orders SET status = "Partially Received" WHERE po_number = ?', (po_number,))
-                
-                self.db.commit()
+                with self.db.transaction():
+                    # The remaining quantities checked above are only valid if no other
+                    # receipt was booked against this PO since they were loaded
+                    self.db.execute_versioned(queries.PO_CLAIM, (po_number, po_versions[po_number]), f"PO #{po_number}")
+                    
+                    # Prevent duplicate invoices (checked under the write lock)
+                    self.db.execute(queries.RECEIPT_INVOICE_COUNT, (invoice_no,))
+                    if self.db.fetchone()[0] > 0:
+                        raise ValueError("This invoice number already exists. Duplicate invoices are not allowed.")
+                    
+                    #Insert all items with same invoice number (the stock ledger
+                    # trigger adds ONLY the accepted quantity to inventory)
+                    self.db.insert_many("Goods_Receipt", queries.RECEIPT_COLUMNS,
+                        [(po_number, item.item_id, supplier_id, invoice_no, item.received, item.accepted,
+                          item.rejected, receipt_date, item.notes) for item in selected_items])
+                    
+                    # Check if all items in PO have been fully received
+                    self.db.execute(queries.PO_UNRECEIVED_LINE_COUNT, (po_number,))
+                    
+                    unreceived_items = self.db.fetchone()[0]
+                    
+                    # Update PO status
+                    if unreceived_items == 0:
+                        self.db.execute(queries.PO_MARK_COMPLETED, (po_number,))
+                    else:
+                        self.db.execute(queries.PO_MARK_PARTIAL, (po_number,))
+                self.publish_receipt(invoice_no, po_number, [item.item_id for item in selected_items])
                 
                 #Summary message
-                total_recv = sum(item[3] for item in selected_items)
-                total_accept = sum(item[4] for item in selected_items)
-                total_reject = sum(item[5] for item in selected_items)
+                total_recv = sum(item.received for item in selected_items)
+                total_accept = sum(item.accepted for item in selected_items)
+                total_reject = sum(item.rejected for item in selected_items)
                 
                 msg = f"Goods Receipt Recorded Successfully!\n\n"
                 msg += f"Invoice: {invoice_no}\n"
@@ -1539,8 +1535,13 @@ class PurchaseModule:
                 
                 messagebox.showinfo("Success", msg)
                 dialog.destroy()
-                self.app.refresh_all_tabs()
                 
+            except ConcurrencyConflict as e:
+                self.publish_receipt(invoice_no, po_number, [item.item_id for item in selected_items])
+                messagebox.showwarning("Changed Elsewhere", str(e))
+                dialog.destroy()
+            except ValueError as ve:
+                messagebox.showerror("Error", str(ve))
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save receipt: {str(e)}")
     
@@ -1559,10 +1560,8 @@ class PurchaseModule:
         ttk.Button(btn_frame, text="❌ Cancel", command=dialog.destroy).pack(side='right', padx=5)
         # ==================== ALERTS TAB ====================
         
-    def create_alerts_tab(self):
+    def create_alerts_tab(self, alert_frame):
         """Create alerts/reports tab"""
-        alert_frame = ttk.Frame(self.notebook)
-        self.notebook.add(alert_frame, text="⚠️ Alerts")
         
         top_btn_frame = ttk.Frame(alert_frame)
         top_btn_frame.pack(side='top', fill='x', padx=10, pady=8)
@@ -1578,23 +1577,18 @@ class PurchaseModule:
             self.alert_tree.column(col, width=180)
         
         self.alert_tree.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        self.alert_sync = TreeSynchronizer(self.alert_tree, lambda row: row.item_id, self.format_alert_row)
         
         self.refresh_alerts()
     
     def refresh_alerts(self):
         """Refresh low stock alerts"""
-        for item in self.alert_tree.get_children():
-            self.alert_tree.delete(item)
-        
-        self.db.execute('''
-            SELECT i.item_id, i.name, inv.quantity_on_hand, inv.reorder_level
-            FROM Items i
-            JOIN Inventory inv ON i.item_id = inv.item_id
-            WHERE inv.quantity_on_hand <= inv.reorder_level
-            ORDER BY (inv.quantity_on_hand - inv.reorder_level)
-        ''')
-        
-        for row in self.db.fetchall():
-            action = f"Order {row[3] * 2 - row[2]} units"
-            self.alert_tree.insert('', 'end', values=row + (action,))
+        if not hasattr(self, 'alert_sync'):
+            return  # tab not opened yet
+        self.db.execute(queries.LOW_STOCK_LIST)
+        self.alert_sync.sync(self.db.fetchall())
+    
+    def format_alert_row(self, row):
+        action = f"Order {row.reorder_level * 2 - row.quantity_on_hand} units"
+        return (row.item_id, row.name, row.quantity_on_hand, row.reorder_level, action), ()
     
@@ -0,0 +1,568 @@
+"""
+Queries Module - Every SQL statement the screens run, kept in one place so they can be enumerated
+(check_query_plans.py runs EXPLAIN QUERY PLAN on each of them)
+"""
+
+# ==================== DASHBOARD & SYSTEM INFO ====================
+
+ITEM_COUNT = "SELECT COUNT(*) FROM Items"
+
+SUPPLIER_COUNT = "SELECT COUNT(*) FROM Suppliers"
+
+CUSTOMER_COUNT = "SELECT COUNT(*) FROM Customers"
+
+INVOICE_UNPAID_TOTAL = "SELECT COALESCE(SUM(total_amount), 0) FROM Invoices WHERE status = 'Unpaid'"
+
+# Every dashboard figure in one row: the trigger-maintained Dashboard_Stats
+# (dashboard_stats.py) plus archived years where a figure is all-time
+DASHBOARD_STATS = '''SELECT s.item_count, s.low_stock_count, s.stock_units, s.supplier_count, s.customer_count,
+        s.po_count + a.po_count as po_count, s.po_pending_count,
+        s.po_value + a.po_value as po_value, s.po_gst + a.po_gst as po_gst,
+        s.so_count + a.so_count as so_count, s.so_pending_count,
+        s.so_delivered_count + a.so_count as so_delivered_count,
+        s.so_value + a.so_value as so_value, s.so_pending_value, s.so_gst + a.so_gst as so_gst,
+        s.invoice_count + a.invoice_count as invoice_count, s.invoice_unpaid_count, s.invoice_unpaid_total
+    FROM Dashboard_Stats s,
+        (SELECT COALESCE(SUM(po_count), 0) as po_count, COALESCE(SUM(po_value), 0) as po_value,
+                COALESCE(SUM(po_gst), 0) as po_gst, COALESCE(SUM(so_count), 0) as so_count,
+                COALESCE(SUM(so_value), 0) as so_value, COALESCE(SUM(so_gst), 0) as so_gst,
+                COALESCE(SUM(invoice_count), 0) as invoice_count
+         FROM Archived_Years) a
+    WHERE s.id = 1'''
+
+ARCHIVED_YEARS_LIST = '''SELECT fy, label, po_count, po_value, so_count, so_value, invoice_count, archived_at, path
+    FROM Archived_Years
+    ORDER BY fy'''
+
+
+# ==================== ITEMS & INVENTORY ====================
+
+# The tab lists (INVENTORY_LIST, PO_LIST_*, RECEIPT_HISTORY, INVOICE_LIST) have no ORDER BY:
+# widgets.VirtualTreeview adds the sort and pages through them by keyset
+INVENTORY_LIST = '''SELECT i.item_id, i.name, i.category, inv.quantity_on_hand, inv.reorder_level,
+    i.purchase_rate, i.purchase_gst_percent, i.purchase_price,
+    i.selling_rate, i.selling_gst_percent, i.selling_price,
+    inv.quantity_on_hand <= inv.reorder_level AS low_stock
+    FROM Items i JOIN Inventory inv ON i.item_id = inv.item_id'''
+
+ITEM_DETAIL = '''SELECT i.name, i.description, i.category, i.unit_of_measure, i.hsn_code,
+    i.purchase_rate, i.purchase_gst_percent, i.selling_rate, i.selling_gst_percent,
+    inv.quantity_on_hand, inv.reorder_level, inv.location, inv.row_version
+    FROM Items i JOIN Inventory inv ON i.item_id = inv.item_id WHERE i.item_id = ?'''
+
+ITEM_PO_REFERENCES = "SELECT COUNT(*) FROM All_Purchase_Order_Items WHERE item_id = ?"
+
+ITEM_SO_REFERENCES = "SELECT COUNT(*) FROM All_Sales_Order_Items WHERE item_id = ?"
+
+ITEM_GR_REFERENCES = "SELECT COUNT(*) FROM All_Goods_Receipt WHERE item_id = ?"
+
+ITEM_STOCK = "SELECT quantity_on_hand FROM Inventory WHERE item_id = ?"
+
+STOCK_FOR_ITEMS = '''SELECT item_id, quantity_on_hand, quantity_on_hand - reserved_quantity as available
+    FROM Inventory WHERE item_id IN (SELECT value FROM json_each(?))'''
+
+ITEM_INSERT = '''INSERT INTO Items (name, description, category, unit_of_measure, hsn_code,
+    purchase_rate, purchase_gst_percent, purchase_price,
+    selling_rate, selling_gst_percent, selling_price)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INVENTORY_INSERT = "INSERT INTO Inventory (item_id, quantity_on_hand, reorder_level, location, last_updated) VALUES (?, ?, ?, ?, ?)"
+
+ITEM_UPDATE = '''UPDATE Items SET name=?, description=?, category=?, unit_of_measure=?, hsn_code=?,
+    purchase_rate=?, purchase_gst_percent=?, purchase_price=?,
+    selling_rate=?, selling_gst_percent=?, selling_price=? WHERE item_id=?'''
+
+# quantity_on_hand only changes through Inventory_Movements (see stock_ledger.adjust_stock)
+# Compare-and-swap: only applies if the row is still at the row_version the dialog read
+INVENTORY_UPDATE = "UPDATE Inventory SET reorder_level=?, location=? WHERE item_id=? AND row_version=?"
+
+ITEM_DELETE = "DELETE FROM Items WHERE item_id = ?"
+
+INVENTORY_DELETE = "DELETE FROM Inventory WHERE item_id = ?"
+
+
+
+# ==================== STOCK LEDGER ====================
+
+MOVEMENT_INSERT = '''INSERT INTO Inventory_Movements (item_id, quantity, source_type, source_id, notes)
+    VALUES (?, ?, ?, ?, ?)'''
+
+ITEM_MOVEMENTS = '''SELECT movement_date, quantity, source_type, source_id, notes
+    FROM Inventory_Movements
+    WHERE item_id = ?
+    ORDER BY movement_date DESC, movement_id DESC
+    LIMIT ?'''
+
+# As-of stock = latest snapshot on or before the date + movements since it
+STOCK_SNAPSHOT_BEFORE = '''SELECT snapshot_date, quantity_on_hand FROM Inventory_Snapshots
+    WHERE item_id = ? AND snapshot_date <= ?
+    ORDER BY snapshot_date DESC LIMIT 1'''
+
+STOCK_MOVED_BETWEEN = '''SELECT COALESCE(SUM(quantity), 0) as moved FROM Inventory_Movements
+    WHERE item_id = ? AND movement_date >= ? AND movement_date < ?'''
+
+
+# ==================== RESERVATIONS ====================
+
+# One conditional UPDATE for a whole order: each line only reserves if enough is
+# free, so a rowcount short of the line count means some line could not be covered
+STOCK_RESERVE = '''UPDATE Inventory
+    SET reserved_quantity = reserved_quantity + r.quantity
+    FROM (SELECT json_extract(value, '$[0]') AS item_id, json_extract(value, '$[1]') AS quantity
+          FROM json_each(?)) r
+    WHERE Inventory.item_id = r.item_id
+    AND Inventory.quantity_on_hand - Inventory.reserved_quantity >= r.quantity'''
+
+STOCK_UNRESERVE = '''UPDATE Inventory
+    SET reserved_quantity = reserved_quantity - r.quantity
+    FROM (SELECT item_id, quantity FROM Stock_Reservations WHERE so_number = ?) r
+    WHERE Inventory.item_id = r.item_id'''
+
+RESERVATIONS_DELETE = "DELETE FROM Stock_Reservations WHERE so_number = ?"
+
+
+# ==================== PURCHASE ORDERS ====================
+
+PO_LIST_ALL = '''SELECT po.po_number, s.name, po.order_date, po.expected_delivery, po.status,
+    po.subtotal, po.total_gst, po.total_amount,
+    (SELECT COUNT(*) FROM Purchase_Order_Items WHERE po_number = po.po_number) as item_count
+    FROM Purchase_Orders po JOIN Suppliers s ON po.supplier_id = s.supplier_id'''
+
+PO_LIST_OPEN = '''SELECT po.po_number, s.name, po.order_date, po.expected_delivery, po.status,
+    po.subtotal, po.total_gst, po.total_amount,
+    (SELECT COUNT(*) FROM Purchase_Order_Items WHERE po_number = po.po_number) as item_count
+    FROM Purchase_Orders po JOIN Suppliers s ON po.supplier_id = s.supplier_id
+    WHERE po.status IN ('Pending', 'Partially Received')'''
+
+SUPPLIER_PICKLIST = "SELECT supplier_id, name, gstin FROM Suppliers ORDER BY name"
+
+ITEM_PURCHASE_PICKLIST = "SELECT item_id, name, purchase_rate, purchase_gst_percent, purchase_price FROM Items ORDER BY name"
+
+PO_RECEIPT_COUNT = "SELECT COUNT(*) FROM Goods_Receipt WHERE po_number = ?"
+
+PO_HEADER = '''SELECT po.po_number, s.name, s.gstin, po.order_date, po.expected_delivery,
+    po.status, po.subtotal, po.total_gst, po.total_amount
+    FROM Purchase_Orders po JOIN Suppliers s ON po.supplier_id = s.supplier_id WHERE po.po_number = ?'''
+
+PO_LINES = '''SELECT i.name, poi.quantity, poi.rate, poi.gst_percent, poi.gst_amount, poi.total_price
+    FROM Purchase_Order_Items poi JOIN Items i ON poi.item_id = i.item_id WHERE poi.po_number = ?'''
+
+PO_INSERT = "INSERT INTO Purchase_Orders (supplier_id, order_date, expected_delivery, status, subtotal, total_gst, total_amount) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+PO_LINES_DELETE = "DELETE FROM Purchase_Order_Items WHERE po_number = ?"
+
+PO_DELETE = "DELETE FROM Purchase_Orders WHERE po_number = ?"
+
+
+# ==================== SUPPLIERS ====================
+
+SUPPLIER_LIST = "SELECT supplier_id, name, contact_person, phone, email, gstin, payment_terms FROM Suppliers"
+
+SUPPLIER_DETAIL = "SELECT name, contact_person, phone, email, address, gstin, payment_terms FROM Suppliers WHERE supplier_id = ?"
+
+SUPPLIER_PO_COUNT = "SELECT COUNT(*) FROM All_Purchase_Orders WHERE supplier_id = ?"
+
+SUPPLIER_INSERT = "INSERT INTO Suppliers (name, contact_person, phone, email, address, gstin, payment_terms) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+SUPPLIER_UPDATE = "UPDATE Suppliers SET name=?, contact_person=?, phone=?, email=?, address=?, gstin=?, payment_terms=? WHERE supplier_id=?"
+
+SUPPLIER_DELETE = "DELETE FROM Suppliers WHERE supplier_id = ?"
+
+
+# ==================== GOODS RECEIPT ====================
+
+RECEIPT_HISTORY = '''SELECT
+        MIN(gr.receipt_id) as receipt_id,
+        gr.po_number,
+        s.name,
+        gr.invoice_number,
+        COUNT(DISTINCT gr.item_id) as item_count,
+        SUM(gr.accepted_quantity) as total_received,
+        SUM(gr.accepted_quantity) as total_accepted,
+        gr.receipt_date
+    FROM Goods_Receipt gr
+    JOIN Suppliers s ON gr.supplier_id = s.supplier_id
+    GROUP BY gr.invoice_number, gr.po_number, gr.receipt_date'''
+
+RECEIPT_LINES = '''SELECT i.name, gr.received_quantity, gr.accepted_quantity,
+        gr.rejected_quantity, gr.notes
+    FROM Goods_Receipt gr
+    JOIN Items i ON gr.item_id = i.item_id
+    WHERE gr.invoice_number = ?
+    ORDER BY i.name'''
+
+RECEIPT_EDIT_LINES = '''SELECT gr.receipt_id, gr.item_id, i.name,
+        gr.received_quantity, gr.accepted_quantity, gr.rejected_quantity, gr.notes,
+        poi.quantity as ordered_quantity, gr.po_number, gr.row_version
+    FROM Goods_Receipt gr
+    JOIN Items i ON i.item_id = gr.item_id
+    JOIN Purchase_Order_Items poi ON poi.item_id = gr.item_id AND poi.po_number = gr.po_number
+    WHERE gr.invoice_number = ?'''
+
+SUPPLIER_NAMES = "SELECT supplier_id, name FROM Suppliers ORDER BY name"
+
+SUPPLIER_POS = '''SELECT po_number, order_date, status
+    FROM Purchase_Orders
+    WHERE supplier_id = ?
+    ORDER BY po_number DESC'''
+
+PO_RECEIVABLE_LINES = '''SELECT poi.item_id, i.name, poi.quantity, poi.accepted_quantity,
+        poi.quantity - poi.accepted_quantity as remaining
+    FROM Purchase_Order_Items poi
+    JOIN Items i ON poi.item_id = i.item_id
+    WHERE poi.po_number = ?'''
+
+RECEIPT_INVOICE_COUNT = "SELECT COUNT(*) FROM All_Goods_Receipt WHERE invoice_number = ?"
+
+RECEIPT_UPDATE = '''UPDATE Goods_Receipt
+    SET received_quantity=?, accepted_quantity=?, rejected_quantity=?, notes=?
+    WHERE receipt_id=? AND row_version=?'''
+
+# accepted_quantity on the line is kept current by triggers on Goods_Receipt (migration 5)
+PO_UNRECEIVED_LINE_COUNT = '''SELECT COUNT(*) FROM Purchase_Order_Items
+    WHERE po_number = ? AND quantity > accepted_quantity'''
+
+PO_ROW_VERSION = "SELECT row_version FROM Purchase_Orders WHERE po_number = ?"
+
+# Claims the PO for this write: fails if it changed since PO_ROW_VERSION was read
+PO_CLAIM = "UPDATE Purchase_Orders SET row_version = row_version + 1 WHERE po_number = ? AND row_version = ?"
+
+PO_MARK_COMPLETED = "UPDATE Purchase_Orders SET status = 'Completed' WHERE po_number = ?"
+
+PO_MARK_PARTIAL = "UPDATE Purchase_Orders SET status = 'Partially Received' WHERE po_number = ?"
+
+
+# ==================== ALERTS ====================
+
+LOW_STOCK_LIST = '''SELECT i.item_id, i.name, inv.quantity_on_hand, inv.reorder_level
+    FROM Items i
+    JOIN Inventory inv ON i.item_id = inv.item_id
+    WHERE inv.quantity_on_hand <= inv.reorder_level
+    ORDER BY (inv.quantity_on_hand - inv.reorder_level)'''
+
+
+# ==================== CUSTOMERS ====================
+
+CUSTOMER_LIST = "SELECT customer_id, name, contact_person, phone, email, gstin, credit_limit, payment_terms FROM Customers"
+
+CUSTOMER_DETAIL = "SELECT name, contact_person, phone, email, address, gstin, credit_limit, payment_terms FROM Customers WHERE customer_id = ?"
+
+CUSTOMER_SO_COUNT = "SELECT COUNT(*) FROM All_Sales_Orders WHERE customer_id = ?"
+
+CUSTOMER_INVOICE_COUNT = "SELECT COUNT(*) FROM All_Invoices WHERE customer_id = ?"
+
+CUSTOMER_INSERT = "INSERT INTO Customers (name, contact_person, phone, email, address, gstin, credit_limit, payment_terms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+CUSTOMER_UPDATE = "UPDATE Customers SET name=?, contact_person=?, phone=?, email=?, address=?, gstin=?, credit_limit=?, payment_terms=? WHERE customer_id=?"
+
+CUSTOMER_DELETE = "DELETE FROM Customers WHERE customer_id = ?"
+
+
+# ==================== SALES ORDERS ====================
+
+SO_LIST_ALL = '''SELECT so.so_number, c.name, so.order_date, so.delivery_date, so.status,
+    so.subtotal, so.total_gst, so.total_amount,
+    (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count
+    FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id
+    ORDER BY so.so_number DESC'''
+
+SO_LIST_OPEN = '''SELECT so.so_number, c.name, so.order_date, so.delivery_date, so.status,
+    so.subtotal, so.total_gst, so.total_amount,
+    (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count
+    FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id
+    WHERE so.status IN ('Pending', 'Partially Delivered')
+    ORDER BY so.so_number DESC'''
+
+# The same rows for a few SOs (json list of so_numbers), to refresh them after a save
+SO_ROWS_ALL = '''SELECT so.so_number, c.name, so.order_date, so.delivery_date, so.status,
+    so.subtotal, so.total_gst, so.total_amount,
+    (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count
+    FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id
+    WHERE so.so_number IN (SELECT value FROM json_each(?))'''
+
+SO_ROWS_OPEN = '''SELECT so.so_number, c.name, so.order_date, so.delivery_date, so.status,
+    so.subtotal, so.total_gst, so.total_amount,
+    (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count
+    FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id
+    WHERE so.so_number IN (SELECT value FROM json_each(?))
+    AND so.status IN ('Pending', 'Partially Delivered')'''
+
+ITEMS_AVAILABLE_COUNT = '''SELECT COUNT(*) FROM Items
+    WHERE item_id IN (SELECT item_id FROM Inventory WHERE quantity_on_hand - reserved_quantity > 0)'''
+
+CUSTOMER_PICKLIST = "SELECT customer_id, name, gstin FROM Customers ORDER BY name"
+
+# Available-to-promise = on hand - reserved (idx_inventory_available)
+ITEM_SALES_PICKLIST = '''SELECT i.item_id, i.name, i.selling_rate, i.selling_gst_percent, i.selling_price,
+        inv.quantity_on_hand - inv.reserved_quantity as available
+    FROM Items i JOIN Inventory inv ON i.item_id = inv.item_id
+    WHERE inv.quantity_on_hand - inv.reserved_quantity > 0 ORDER BY i.name'''
+
+# What one line of an SO could be raised to: free stock plus what the SO already holds
+ITEM_AVAILABLE_FOR_SO = '''SELECT inv.quantity_on_hand - inv.reserved_quantity +
+        COALESCE((SELECT quantity FROM Stock_Reservations WHERE so_number = ? AND item_id = inv.item_id), 0)
+        as available
+    FROM Inventory inv WHERE inv.item_id = ?'''
+
+SO_EDIT_HEADER = '''SELECT so.customer_id, c.name, so.delivery_date, so.subtotal, so.total_gst, so.total_amount,
+        so.row_version
+    FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id WHERE so.so_number = ?'''
+
+SO_EDIT_LINES = '''SELECT soi.item_id, i.name, soi.quantity, soi.rate, soi.gst_percent
+    FROM Sales_Order_Items soi JOIN Items i ON soi.item_id = i.item_id WHERE soi.so_number = ?'''
+
+SO_INVOICE_COUNT = "SELECT COUNT(*) FROM Invoices WHERE so_number = ?"
+
+SO_HEADER = '''SELECT so.so_number, c.name, c.gstin, so.order_date, so.delivery_date,
+    so.status, so.subtotal, so.total_gst, so.total_amount
+    FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id
+    WHERE so.so_number = ?'''
+
+SO_LINES = '''SELECT i.name, soi.quantity, soi.rate, soi.gst_percent,
+    soi.gst_amount, soi.total_price
+    FROM Sales_Order_Items soi JOIN Items i ON soi.item_id = i.item_id
+    WHERE soi.so_number = ?'''
+
+SO_INSERT = "INSERT INTO Sales_Orders (customer_id, order_date, delivery_date, status, subtotal, total_gst, total_amount) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+SO_SET_DELIVERY_DATE = "UPDATE Sales_Orders SET delivery_date = ? WHERE so_number = ? AND row_version = ?"
+
+SO_SET_TOTALS = '''UPDATE Sales_Orders
+    SET subtotal = ?, total_gst = ?, total_amount = ?
+    WHERE so_number = ?'''
+
+SO_LINES_DELETE = "DELETE FROM Sales_Order_Items WHERE so_number = ?"
+
+SO_DELETE = "DELETE FROM Sales_Orders WHERE so_number = ?"
+
+
+# ==================== DELIVERY ====================
+
+# delivered_quantity on Sales_Orders / Sales_Order_Items is kept current by
+# triggers on the Sales_Deliveries ledger (migration 6)
+DELIVERY_HISTORY = '''SELECT so.so_number, c.name, so.delivery_date,
+        (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count,
+        so.delivered_quantity,
+        so.status
+    FROM Sales_Orders so
+    JOIN Customers c ON so.customer_id = c.customer_id
+    WHERE so.status IN ('Delivered', 'Partially Delivered')
+    ORDER BY so.so_number DESC'''
+
+DELIVERY_ROWS = '''SELECT so.so_number, c.name, so.delivery_date,
+        (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count,
+        so.delivered_quantity,
+        so.status
+    FROM Sales_Orders so
+    JOIN Customers c ON so.customer_id = c.customer_id
+    WHERE so.so_number IN (SELECT value FROM json_each(?))
+    AND so.status IN ('Delivered', 'Partially Delivered')'''
+
+SO_PENDING_LIST = '''SELECT so_number, order_date FROM Sales_Orders
+    WHERE status = 'Pending' ORDER BY so_number DESC'''
+
+SO_STATUS = "SELECT status FROM Sales_Orders WHERE so_number = ?"
+
+SO_ROW_VERSION = "SELECT row_version FROM Sales_Orders WHERE so_number = ?"
+
+# Claims the SO for this write: fails if it changed since SO_ROW_VERSION was read
+SO_CLAIM = "UPDATE Sales_Orders SET row_version = row_version + 1 WHERE so_number = ? AND row_version = ?"
+
+SO_DELIVERY_LINES = '''SELECT soi.item_id, i.name, soi.quantity, soi.delivered_quantity,
+        soi.quantity - soi.delivered_quantity as remaining, inv.quantity_on_hand
+    FROM Sales_Order_Items soi
+    JOIN Items i ON soi.item_id = i.item_id
+    JOIN Inventory inv ON i.item_id = inv.item_id
+    WHERE soi.so_number = ?'''
+
+SO_LINE_QUANTITIES = '''SELECT i.name, soi.quantity, soi.delivered_quantity,
+        soi.quantity - soi.delivered_quantity as remaining
+    FROM Sales_Order_Items soi
+    JOIN Items i ON soi.item_id = i.item_id
+    WHERE soi.so_number = ?'''
+
+SO_DELIVERIES = '''SELECT sd.delivery_date, i.name, sd.quantity
+    FROM Sales_Deliveries sd
+    JOIN Items i ON sd.item_id = i.item_id
+    WHERE sd.so_number = ?
+    ORDER BY sd.delivery_id'''
+
+DELIVERY_INSERT = '''INSERT INTO Sales_Deliveries (so_number, item_id, quantity, delivery_date)
+    VALUES (?, ?, ?, ?)'''
+
+SO_UNDELIVERED_LINE_COUNT = '''SELECT COUNT(*) FROM Sales_Order_Items
+    WHERE so_number = ? AND quantity > delivered_quantity'''
+
+SO_SET_STATUS = '''UPDATE Sales_Orders
+    SET status = ?, delivery_date = ?
+    WHERE so_number = ?'''
+
+
+# ==================== INVOICES ====================
+
+INVOICE_LIST = '''SELECT inv.invoice_id, inv.so_number, c.name, inv.invoice_date, inv.due_date,
+        inv.subtotal, inv.total_gst, inv.total_amount, inv.status
+    FROM Invoices inv
+    JOIN Customers c ON inv.customer_id = c.customer_id'''
+
+UNINVOICED_SOS = '''SELECT so.so_number, c.name, so.delivery_date, so.subtotal, so.total_gst, so.total_amount
+    FROM Sales_Orders so
+    JOIN Customers c ON so.customer_id = c.customer_id
+    WHERE so.status = 'Delivered'
+    AND so.so_number NOT IN (SELECT so_number FROM Invoices WHERE so_number IS NOT NULL)
+    ORDER BY so.so_number DESC'''
+
+INVOICE_DETAIL = '''SELECT inv.invoice_id, inv.so_number, c.name, c.gstin, c.address,
+        inv.invoice_date, inv.due_date, inv.subtotal, inv.total_gst,
+        inv.total_amount, inv.status
+    FROM Invoices inv
+    JOIN Customers c ON inv.customer_id = c.customer_id
+    WHERE inv.invoice_id = ?'''
+
+SO_CUSTOMER = "SELECT customer_id FROM Sales_Orders WHERE so_number = ?"
+
+INVOICE_INSERT = '''INSERT INTO Invoices (so_number, customer_id, invoice_date, due_date,
+        subtotal, total_gst, total_amount, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INVOICE_MARK_PAID = "UPDATE Invoices SET status = 'Paid' WHERE invoice_id = ?"
+
+
+# ==================== GST SUMMARY ====================
+# Reports read the All_* views so archived financial years are included
+
+GST_COLLECTED_BY_RATE = '''SELECT
+        soi.gst_percent,
+        COALESCE(SUM(soi.gst_amount), 0) as total_gst_collected,
+        COALESCE(SUM(soi.rate * soi.quantity), 0) as total_base_amount,
+        COUNT(DISTINCT so.so_number) as order_count,
+        COUNT(*) as item_count
+    FROM All_Sales_Order_Items soi
+    JOIN All_Sales_Orders so ON soi.so_number = so.so_number
+    GROUP BY soi.gst_percent
+    ORDER BY soi.gst_percent'''
+
+GST_PAID_BY_RATE = '''SELECT
+        poi.gst_percent,
+        COALESCE(SUM(poi.gst_amount), 0) as total_gst_paid,
+        COALESCE(SUM(poi.rate * poi.quantity), 0) as total_base_amount,
+        COUNT(DISTINCT po.po_number) as order_count,
+        COUNT(*) as item_count
+    FROM All_Purchase_Order_Items poi
+    JOIN All_Purchase_Orders po ON poi.po_number = po.po_number
+    GROUP BY poi.gst_percent
+    ORDER BY poi.gst_percent'''
+
+
+# ==================== REPORTS ====================
+
+SALES_GST_BY_RATE = '''SELECT
+        soi.gst_percent,
+        COALESCE(SUM(soi.gst_amount), 0) as total_gst_collected,
+        COALESCE(SUM(soi.rate * soi.quantity), 0) as total_base_amount,
+        COALESCE(SUM(soi.total_price), 0) as total_with_gst,
+        COUNT(DISTINCT so.so_number) as order_count,
+        COUNT(*) as item_count
+    FROM All_Sales_Order_Items soi
+    JOIN All_Sales_Orders so ON soi.so_number = so.so_number
+    GROUP BY soi.gst_percent
+    ORDER BY soi.gst_percent'''
+
+TOP_CUSTOMERS = '''SELECT c.customer_id,
+        c.name,
+        COUNT(so.so_number) as order_count,
+        COALESCE(SUM(so.subtotal), 0) as total_subtotal,
+        COALESCE(SUM(so.total_gst), 0) as total_gst,
+        COALESCE(SUM(so.total_amount), 0) as total_revenue,
+        COALESCE(AVG(so.total_amount), 0) as avg_order
+    FROM Customers c
+    LEFT JOIN All_Sales_Orders so ON c.customer_id = so.customer_id
+    GROUP BY c.customer_id, c.name
+    HAVING order_count > 0
+    ORDER BY total_revenue DESC
+    LIMIT 20'''
+
+CUSTOMER_SALES_TOTALS = '''SELECT
+        COUNT(so.so_number) as total_orders,
+        COALESCE(SUM(so.subtotal), 0) as total_subtotal,
+        COALESCE(SUM(so.total_gst), 0) as total_gst,
+        COALESCE(SUM(so.total_amount), 0) as total_amount,
+        COALESCE(AVG(so.total_amount), 0) as avg_order
+    FROM All_Sales_Orders so
+    WHERE so.customer_id = ?'''
+
+CUSTOMER_ORDERS = '''SELECT so.so_number, so.order_date, so.status, so.item_count,
+        so.subtotal, so.total_gst, so.total_amount
+    FROM All_Sales_Order_Summaries so
+    WHERE so.customer_id = ?
+    ORDER BY so.so_number DESC'''
+
+
+# ==================== SEARCH ====================
+# Each search returns (key, title, detail, rank); lower rank = better match.
+# The FTS5 ones take the best-ranked search.CANDIDATES matches, then join and
+# (for receipts, one row per invoice) group those.
+
+SEARCH_INDEX_COUNT = "SELECT COUNT(*) FROM sqlite_master WHERE name = ?"
+
+ITEM_SEARCH = '''SELECT i.item_id, i.name, COALESCE(i.category, '') || '  HSN ' || COALESCE(i.hsn_code, ''), m.rank
+    FROM (SELECT rowid, rank FROM Items_FTS WHERE Items_FTS MATCH ? ORDER BY rank LIMIT ?) m
+    JOIN Items i ON i.item_id = m.rowid
+    ORDER BY m.rank LIMIT ?'''
+
+CUSTOMER_SEARCH = '''SELECT c.customer_id, c.name, COALESCE(c.phone, '') || '  ' || COALESCE(c.gstin, ''), m.rank
+    FROM (SELECT rowid, rank FROM Customers_FTS WHERE Customers_FTS MATCH ? ORDER BY rank LIMIT ?) m
+    JOIN Customers c ON c.customer_id = m.rowid
+    ORDER BY m.rank LIMIT ?'''
+
+SUPPLIER_SEARCH = '''SELECT s.supplier_id, s.name, COALESCE(s.phone, '') || '  ' || COALESCE(s.gstin, ''), m.rank
+    FROM (SELECT rowid, rank FROM Suppliers_FTS WHERE Suppliers_FTS MATCH ? ORDER BY rank LIMIT ?) m
+    JOIN Suppliers s ON s.supplier_id = m.rowid
+    ORDER BY m.rank LIMIT ?'''
+
+# One result per invoice, however many of its lines matched
+RECEIPT_SEARCH = '''SELECT gr.invoice_number, 'Invoice ' || gr.invoice_number,
+        'PO #' || gr.po_number || '  ' || s.name, MIN(m.rank) as rank
+    FROM (SELECT rowid, rank FROM Receipts_FTS WHERE Receipts_FTS MATCH ? ORDER BY rank LIMIT ?) m
+    JOIN Goods_Receipt gr ON gr.receipt_id = m.rowid
+    JOIN Suppliers s ON s.supplier_id = gr.supplier_id
+    GROUP BY gr.invoice_number ORDER BY rank LIMIT ?'''
+
+# Fallbacks for SQLite builds without FTS5: unranked substring scans
+ITEM_SEARCH_LIKE = '''SELECT item_id, name, COALESCE(category, '') || '  HSN ' || COALESCE(hsn_code, ''), 0
+    FROM Items
+    WHERE name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\' OR category LIKE ? ESCAPE '\\'
+        OR hsn_code LIKE ? ESCAPE '\\'
+    ORDER BY name LIMIT ?'''
+
+CUSTOMER_SEARCH_LIKE = '''SELECT customer_id, name, COALESCE(phone, '') || '  ' || COALESCE(gstin, ''), 0
+    FROM Customers
+    WHERE name LIKE ? ESCAPE '\\' OR contact_person LIKE ? ESCAPE '\\' OR phone LIKE ? ESCAPE '\\'
+        OR email LIKE ? ESCAPE '\\' OR gstin LIKE ? ESCAPE '\\'
+    ORDER BY name LIMIT ?'''
+
+SUPPLIER_SEARCH_LIKE = '''SELECT supplier_id, name, COALESCE(phone, '') || '  ' || COALESCE(gstin, ''), 0
+    FROM Suppliers
+    WHERE name LIKE ? ESCAPE '\\' OR contact_person LIKE ? ESCAPE '\\' OR phone LIKE ? ESCAPE '\\'
+        OR email LIKE ? ESCAPE '\\' OR gstin LIKE ? ESCAPE '\\'
+    ORDER BY name LIMIT ?'''
+
+RECEIPT_SEARCH_LIKE = '''SELECT gr.invoice_number, 'Invoice ' || gr.invoice_number,
+        'PO #' || gr.po_number || '  ' || s.name, 0
+    FROM Goods_Receipt gr JOIN Suppliers s ON s.supplier_id = gr.supplier_id
+    WHERE gr.invoice_number LIKE ? ESCAPE '\\' OR gr.notes LIKE ? ESCAPE '\\'
+    GROUP BY gr.invoice_number ORDER BY gr.invoice_number DESC LIMIT ?'''
+
+
+# ==================== BULK WRITE COLUMNS ====================
+# Column lists for Database.insert_many / upsert_many
+
+PO_LINE_COLUMNS = ("po_number", "item_id", "quantity", "rate", "gst_percent", "gst_amount", "total_price")
+
+SO_LINE_COLUMNS = ("so_number", "item_id", "quantity", "rate", "gst_percent", "gst_amount", "total_price")
+
+RECEIPT_COLUMNS = ("po_number", "item_id", "supplier_id", "invoice_number", "received_quantity",
+                   "accepted_quantity", "rejected_quantity", "receipt_date", "notes")
+
+RESERVATION_COLUMNS = ("so_number", "item_id", "quantity")
+
@@ -0,0 +1,164 @@
+"""
+Query Stats Module - Per-statement timing, histogram and slow-query log for Database.execute
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+DEFAULT_SLOW_MS = 200
+DEFAULT_LOG_PATH = 'slow_queries.jsonl'
+
+# Durations kept per statement for the percentiles (count/total/max are exact)
+SAMPLES_PER_STATEMENT = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Collapse a statement to its shape so that calls differing only in values share one entry"""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _PLACEHOLDER_LIST.sub("(?...)", sql)
+    return _VALUES_LIST.sub("(?...), ...", sql)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class StatementStats:
+    """Timing totals for one normalized statement"""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=SAMPLES_PER_STATEMENT)
+
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def as_dict(self):
+        ordered = sorted(self.samples)
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'p50_ms': round(percentile(ordered, 0.50), 3),
+            'p95_ms': round(percentile(ordered, 0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+class QueryStats:
+    """Histogram of statement timings plus a JSONL log of slow statements.
+
+    A statement's time runs from execute() until the next statement starts,
+    so rows fetched afterwards (fetchall/fetchone) count towards it too.
+    Background readers report finished statements with record(), which may be
+    called from any thread.
+    """
+
+    def __init__(self, conn, slow_ms=DEFAULT_SLOW_MS, log_path=DEFAULT_LOG_PATH):
+        self.conn = conn
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self.statements = {}
+        self.slow_count = 0
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def start(self, sql, params):
+        """Begin timing a statement (finishing the previous one)"""
+        self.finish()
+        self._pending = [sql, params, 0.0]
+        return time.perf_counter()
+
+    def add_time(self, started):
+        """Add the time since `started` to the statement being timed"""
+        if self._pending is not None:
+            self._pending[2] += (time.perf_counter() - started) * 1000
+
+    def finish(self):
+        """Record the statement being timed"""
+        if self._pending is None:
+            return
+        sql, params, elapsed_ms = self._pending
+        self._pending = None
+        self.record(sql, params, elapsed_ms)
+
+    def record(self, sql, params, elapsed_ms, conn=None):
+        """Add one finished statement; conn is the connection it ran on (for the slow-query plan)"""
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = StatementStats(key)
+            entry.add(elapsed_ms)
+            if self.slow_ms is not None and elapsed_ms >= self.slow_ms:
+                self.log_slow(sql, params, elapsed_ms, conn or self.conn)
+
+    def log_slow(self, sql, params, elapsed_ms, conn):
+        """Append a slow statement with its parameters and query plan to the log"""
+        self.slow_count += 1
+        try:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+        except Exception as e:
+            plan = [f"unavailable: {e}"]
+        record = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'elapsed_ms': round(elapsed_ms, 3),
+            'sql': _WHITESPACE.sub(" ", sql).strip(),
+            'params': list(params) if not isinstance(params, dict) else params,
+            'plan': plan,
+        }
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def summary(self, order_by='total_ms'):
+        """Per-statement stats, most expensive first"""
+        self.finish()
+        with self._lock:
+            rows = [entry.as_dict() for entry in self.statements.values()]
+        return sorted(rows, key=lambda row: row[order_by], reverse=True)
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        self._pending = None
+        with self._lock:
+            self.statements = {}
+            self.slow_count = 0
+
+    def report(self, limit=20):
+        """Plain-text table of the most expensive statements"""
+        rows = self.summary()[:limit]
+        lines = [f"{'Count':>7} {'Total ms':>10} {'p50':>8} {'p95':>8} {'Max':>8}  Statement"]
+        for row in rows:
+            sql = row['sql'] if len(row['sql']) <= 90 else row['sql'][:87] + "..."
+            lines.append(f"{row['count']:>7} {row['total_ms']:>10.1f} {row['p50_ms']:>8.2f} "
+                         f"{row['p95_ms']:>8.2f} {row['max_ms']:>8.2f}  {sql}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write the full summary as JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'slow_ms': self.slow_ms, 'slow_count': self.slow_count,
+                       'statements': self.summary()}, f, indent=2)
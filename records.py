@@ -0,0 +1,84 @@
+"""
+Records Module - Compact named row objects for query results and order lines
+"""
+
+from collections import namedtuple
+
+
+# ==================== QUERY ROWS ====================
+
+# One record class per distinct column list, shared by every query returning it
+_record_classes = {}
+# (cursor.description, class) of the last result set - a cursor keeps the same
+# description object for every row, so this skips the per-row name lookup
+_last = (None, None)
+
+
+def record_class(columns):
+    """namedtuple class for a list of column names (cached)"""
+    columns = tuple(columns)
+    cls = _record_classes.get(columns)
+    if cls is None:
+        # rename=True turns names such as COUNT(*) or duplicates into _0, _1, ...
+        cls = _record_classes[columns] = namedtuple('Record', columns, rename=True)
+    return cls
+
+
+def namedtuple_factory(cursor, row):
+    """sqlite3 row_factory returning namedtuples: row.quantity_on_hand as well as row[3].
+
+    namedtuples have no per-instance __dict__, so they cost the same memory as
+    a plain tuple and far less than a dict or sqlite3.Row per row.
+    """
+    global _last
+    description, cls = _last
+    if description is not cursor.description:
+        description = cursor.description
+        cls = record_class(column[0] for column in description)
+        _last = (description, cls)
+    return tuple.__new__(cls, row)  # same as cls._make(row) without the extra call
+
+
+# ==================== ORDER LINES ====================
+# Lines held by the PO / SO / receipt dialogs before they are saved.
+# __slots__ keeps them as small as tuples while allowing edits in place.
+
+class POLine:
+    """A purchase order line being entered"""
+    __slots__ = ('item_id', 'item_name', 'quantity', 'rate', 'gst_percent', 'gst_amount', 'total')
+
+    def __init__(self, item_id, item_name, quantity, rate, gst_percent, gst_amount, total):
+        self.item_id = item_id
+        self.item_name = item_name
+        self.quantity = quantity
+        self.rate = rate
+        self.gst_percent = gst_percent
+        self.gst_amount = gst_amount
+        self.total = total
+
+    @property
+    def base_amount(self):
+        return self.quantity * self.rate
+
+
+class SOLine(POLine):
+    """A sales order line being entered, with the stock it was checked against"""
+    __slots__ = ('stock',)
+
+    def __init__(self, item_id, item_name, quantity, rate, gst_percent, gst_amount, total, stock):
+        super().__init__(item_id, item_name, quantity, rate, gst_percent, gst_amount, total)
+        self.stock = stock
+
+
+class ReceiptLine:
+    """A goods receipt line being entered"""
+    __slots__ = ('item_id', 'item_name', 'ordered', 'received', 'accepted', 'rejected', 'notes')
+
+    def __init__(self, item_id, item_name, ordered, received, accepted, rejected, notes):
+        self.item_id = item_id
+        self.item_name = item_name
+        self.ordered = ordered
+        self.received = received
+        self.accepted = accepted
+        self.rejected = rejected
+        self.notes = notes
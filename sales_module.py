@@ -2,22 +2,56 @@
 Sales Module with GST Support (India)
 """
 
+import json
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
 
+import queries
+from executor import LOADING_TEXT, show_loading
+from records import SOLine
+from database import ConcurrencyConflict
+from events import CUSTOMERS, INVOICES, ITEMS, PURCHASE_ORDERS, SALES_ORDERS
+from gst_summary import GST_BRACKETS, gst_color, load_gst_summary, load_sales_brackets, net_color, net_status
+from stock_ledger import InsufficientStock, release_reservations, reserve_stock
+from widgets import LabelRows, TreeSynchronizer, VirtualTreeview
+
+# Column templates (width, font) of the GST tables; headers use the same widths in bold
+GST_COMPARISON_COLUMNS = [(10, ('Arial', 10, 'bold')), (15, ('Arial', 10)), (15, ('Arial', 10)),
+                          (15, ('Arial', 10, 'bold')), (12, ('Arial', 10)), (12, ('Arial', 10))]
+GST_DETAIL_COLUMNS = [(8, ('Arial', 9, 'bold')), (12, ('Arial', 9)), (12, ('Arial', 9, 'bold')),
+                      (8, ('Arial', 9)), (8, ('Arial', 9))]
+GST_BRACKET_COLUMNS = [(12, ('Arial', 10, 'bold')), (15, ('Arial', 10)), (15, ('Arial', 10, 'bold')),
+                       (15, ('Arial', 10)), (10, ('Arial', 10)), (10, ('Arial', 10))]
+# GST tab quick summary cards: (title, value colour, caption)
+GST_CARDS = [("Output GST", 'green', "Collected from Sales"), ("Input GST", 'orange', "Paid on Purchases"),
+             ("Net GST Liability", None, None), ("Sales Orders", 'blue', "With GST")]
+
+
+def header_columns(columns, font):
+    """The same column widths in the header font"""
+    return [(width, font) for width, _ in columns]
+
+
+def header_cells(titles):
+    """A header row for LabelRows.show"""
+    return [(title, None) for title in titles]
+
+
 class SalesModule:
     def __init__(self, notebook, db, app):
         self.notebook = notebook
         self.db = db
         self.app = app
         self.show_completed_sos = False
-        self.create_customers_tab()
-        self.create_sales_order_tab()
-        self.create_delivery_tab()
-        self.create_invoices_tab()
-        self.create_gst_summary_tab()
-        self.create_sales_reports_tab()
+        # Each tab is built and loaded the first time it is shown
+        app.add_lazy_tab("👥 Customers", self.create_customers_tab)
+        app.add_lazy_tab("🛒 Sales Orders", self.create_sales_order_tab)
+        app.add_lazy_tab("🚚 Delivery", self.create_delivery_tab)
+        app.add_lazy_tab("📄 Invoices", self.create_invoices_tab)
+        app.add_lazy_tab("💰 GST Summary", self.create_gst_summary_tab)
+        app.add_lazy_tab("📊 Reports", self.create_sales_reports_tab)
+        app.changes.subscribe((CUSTOMERS, SALES_ORDERS, INVOICES, PURCHASE_ORDERS), self.on_changes)
     
     def refresh_all(self):
         self.refresh_customers()
@@ -27,6 +61,23 @@ class SalesModule:
         self.refresh_gst_summary()
         self.refresh_sales_reports()
     
+    def on_changes(self, changes):
+        """Refresh what the saved changes touch (see events.ChangeBus)"""
+        if CUSTOMERS in changes:
+            self.refresh_customers()
+            self.refresh_sales_orders()  # the lists show customer names
+            self.refresh_invoices()
+        if SALES_ORDERS in changes:
+            if CUSTOMERS not in changes:
+                self.refresh_sales_orders(changes[SALES_ORDERS])
+            self.refresh_delivery_history(changes[SALES_ORDERS])
+        if SALES_ORDERS in changes or PURCHASE_ORDERS in changes:
+            self.refresh_gst_summary()
+        if INVOICES in changes and CUSTOMERS not in changes:
+            self.refresh_invoices(changes[INVOICES])
+        if CUSTOMERS in changes or SALES_ORDERS in changes or INVOICES in changes:
+            self.refresh_sales_reports()
+    
     def calculate_gst_price(self, rate, gst_percent):
         """Calculate final price from rate and GST"""
         gst_amount = (rate * gst_percent) / 100
@@ -35,9 +86,7 @@ class SalesModule:
     
     # ==================== CUSTOMERS TAB ====================
     
-    def create_customers_tab(self):
-        cust_frame = ttk.Frame(self.notebook)
-        self.notebook.add(cust_frame, text="👥 Customers")
+    def create_customers_tab(self, cust_frame):
         top_btn_frame = ttk.Frame(cust_frame)
         top_btn_frame.pack(side='top', fill='x', padx=10, pady=8)
         ttk.Button(top_btn_frame, text="➕ Add", command=self.add_customer).pack(side='left', padx=3)
@@ -54,15 +103,19 @@ class SalesModule:
         scrollbar = ttk.Scrollbar(cust_frame, orient='vertical', command=self.cust_tree.yview)
         scrollbar.pack(side='right', fill='y', pady=(0, 10), padx=(0, 10))
         self.cust_tree.configure(yscrollcommand=scrollbar.set)
+        self.cust_sync = TreeSynchronizer(self.cust_tree, lambda row: row.customer_id, self.format_customer_row)
         self.refresh_customers()
     
     def refresh_customers(self):
-        for item in self.cust_tree.get_children():
-            self.cust_tree.delete(item)
-        self.db.execute("SELECT customer_id, name, contact_person, phone, email, gstin, credit_limit, payment_terms FROM Customers")
-        for row in self.db.fetchall():
-            display_row = list(row[:6]) + [f"₹{row[6]:.2f}" if row[6] else "₹0.00"] + [row[7]]
-            self.cust_tree.insert('', 'end', values=display_row)
+        if not hasattr(self, 'cust_sync'):
+            return  # tab not opened yet
+        self.db.execute(queries.CUSTOMER_LIST)
+        self.cust_sync.sync(self.db.fetchall())
+    
+    def format_customer_row(self, row):
+        display_row = (row.customer_id, row.name, row.contact_person, row.phone, row.email, row.gstin,
+                       f"₹{row.credit_limit:.2f}" if row.credit_limit else "₹0.00", row.payment_terms)
+        return display_row, ()
     
     def add_customer(self):
         dialog = tk.Toplevel(self.app.root)
@@ -95,13 +148,13 @@ class SalesModule:
                     except ValueError:
                         messagebox.showerror("Error", "Invalid credit limit")
                         return
-                self.db.execute("INSERT INTO Customers (name, contact_person, phone, email, address, gstin, credit_limit, payment_terms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (entries["name"].get().strip(), entries["contact"].get(), entries["phone"].get(),
-                     entries["email"].get(), entries["address"].get(), entries["gstin"].get(), credit, entries["terms"].get()))
-                self.db.commit()
+                with self.db.transaction():
+                    self.db.execute(queries.CUSTOMER_INSERT,
+                        (entries["name"].get().strip(), entries["contact"].get(), entries["phone"].get(),
+                         entries["email"].get(), entries["address"].get(), entries["gstin"].get(), credit, entries["terms"].get()))
+                self.app.changes.publish(CUSTOMERS)
                 messagebox.showinfo("Success", "Customer added!")
                 dialog.destroy()
-                self.refresh_customers()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
         ttk.Button(dialog, text="Save", command=save).grid(row=len(fields), column=0, columnspan=2, pady=15)
@@ -112,7 +165,7 @@ class SalesModule:
             messagebox.showwarning("Warning", "Select a customer")
             return
         customer_id = self.cust_tree.item(selected[0])['values'][0]
-        self.db.execute("SELECT name, contact_person, phone, email, address, gstin, credit_limit, payment_terms FROM Customers WHERE customer_id = ?", (customer_id,))
+        self.db.execute(queries.CUSTOMER_DETAIL, (customer_id,))
         data = self.db.fetchone()
         dialog = tk.Toplevel(self.app.root)
         dialog.title("Edit Customer")
@@ -137,12 +190,12 @@ class SalesModule:
                 if credit < 0:
                     messagebox.showerror("Error", "Credit cannot be negative")
                     return
-                self.db.execute("UPDATE Customers SET name=?, contact_person=?, phone=?, email=?, address=?, gstin=?, credit_limit=?, payment_terms=? WHERE customer_id=?",
-                    (entries[0].get(), entries[1].get(), entries[2].get(), entries[3].get(), entries[4].get(), entries[5].get(), credit, entries[7].get(), customer_id))
-                self.db.commit()
+                with self.db.transaction():
+                    self.db.execute(queries.CUSTOMER_UPDATE,
+                        (entries[0].get(), entries[1].get(), entries[2].get(), entries[3].get(), entries[4].get(), entries[5].get(), credit, entries[7].get(), customer_id))
+                self.app.changes.publish(CUSTOMERS, [customer_id])
                 messagebox.showinfo("Success", "Updated!")
                 dialog.destroy()
-                self.refresh_customers()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
         ttk.Button(dialog, text="Update", command=update).grid(row=len(fields), column=0, columnspan=2, pady=15)
@@ -153,9 +206,9 @@ class SalesModule:
             messagebox.showwarning("Warning", "Select a customer")
             return
         customer_id, name = self.cust_tree.item(selected[0])['values'][0], self.cust_tree.item(selected[0])['values'][1]
-        self.db.execute("SELECT COUNT(*) FROM Sales_Orders WHERE customer_id = ?", (customer_id,))
+        self.db.execute(queries.CUSTOMER_SO_COUNT, (customer_id,))
         so_count = self.db.fetchone()[0]
-        self.db.execute("SELECT COUNT(*) FROM Invoices WHERE customer_id = ?", (customer_id,))
+        self.db.execute(queries.CUSTOMER_INVOICE_COUNT, (customer_id,))
         inv_count = self.db.fetchone()[0]
         if so_count > 0 or inv_count > 0:
             msg = f"Cannot delete '{name}'\n\nReferenced in:\n"
@@ -166,18 +219,16 @@ class SalesModule:
             return
         if messagebox.askyesno("Confirm", f"Delete '{name}'?"):
             try:
-                self.db.execute("DELETE FROM Customers WHERE customer_id = ?", (customer_id,))
-                self.db.commit()
+                with self.db.transaction():
+                    self.db.execute(queries.CUSTOMER_DELETE, (customer_id,))
+                self.app.changes.publish(CUSTOMERS, [customer_id])
                 messagebox.showinfo("Success", "Deleted!")
-                self.refresh_customers()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
     
     # ==================== SALES ORDERS TAB ====================
     
-    def create_sales_order_tab(self):
-        so_frame = ttk.Frame(self.notebook)
-        self.notebook.add(so_frame, text="🛒 Sales Orders")
+    def create_sales_order_tab(self, so_frame):
         top_btn_frame = ttk.Frame(so_frame)
         top_btn_frame.pack(side='top', fill='x', padx=10, pady=8)
         ttk.Button(top_btn_frame, text="➕ Create SO", command=self.create_sales_order).pack(side='left', padx=3)
@@ -197,6 +248,8 @@ class SalesModule:
         scrollbar = ttk.Scrollbar(so_frame, orient='vertical', command=self.so_tree.yview)
         scrollbar.pack(side='right', fill='y', pady=(0, 10), padx=(0, 10))
         self.so_tree.configure(yscrollcommand=scrollbar.set)
+        self.so_tree.tag_configure('completed', background='#e8e8e8', foreground='#666666')
+        self.so_sync = TreeSynchronizer(self.so_tree, lambda row: row.so_number, self.format_so_row)
         self.refresh_sales_orders()
     
     def toggle_completed_sales_orders(self):
@@ -208,44 +261,38 @@ class SalesModule:
             self.toggle_completed_so_btn.config(text="👁️ Show Completed")
         self.refresh_sales_orders()
     
-    def refresh_sales_orders(self):
-        for item in self.so_tree.get_children():
-            self.so_tree.delete(item)
+    def refresh_sales_orders(self, so_numbers=None):
+        """Reload the sales order list (only these SOs, if given)"""
+        if not hasattr(self, 'so_sync'):
+            return  # tab not opened yet
+        if so_numbers is not None:
+            query = queries.SO_ROWS_ALL if self.show_completed_sos else queries.SO_ROWS_OPEN
+            self.db.execute(query, (json.dumps(list(so_numbers)),))
+            if self.so_sync.sync_keys(so_numbers, self.db.fetchall()) is not None:
+                return
         
         # FIXED: Now properly filters completed orders
         if self.show_completed_sos:
-            query = '''SELECT so.so_number, c.name, so.order_date, so.delivery_date, so.status, 
-                so.subtotal, so.total_gst, so.total_amount,
-                (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count
-                FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id 
-                ORDER BY so.so_number DESC'''
+            query = queries.SO_LIST_ALL
         else:
-            query = '''SELECT so.so_number, c.name, so.order_date, so.delivery_date, so.status, 
-                so.subtotal, so.total_gst, so.total_amount,
-                (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count
-                FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id 
-                WHERE so.status != 'Delivered'
-                ORDER BY so.so_number DESC'''
+            query = queries.SO_LIST_OPEN
         
         self.db.execute(query)
-        for row in self.db.fetchall():
-            display_row = (row[0], row[1], row[2], row[3], row[4], 
-                          f"₹{row[5]:.2f}", f"₹{row[6]:.2f}", f"₹{row[7]:.2f}", row[8])
-            if row[4] == "Delivered":
-                self.so_tree.insert('', 'end', values=display_row, tags=('completed',))
-            else:
-                self.so_tree.insert('', 'end', values=display_row)
-        
-        self.so_tree.tag_configure('completed', background='#e8e8e8', foreground='#666666')
+        self.so_sync.sync(self.db.fetchall())
+    
+    def format_so_row(self, row):
+        display_row = (row.so_number, row.name, row.order_date, row.delivery_date, row.status,
+                      f"₹{row.subtotal:.2f}", f"₹{row.total_gst:.2f}", f"₹{row.total_amount:.2f}", row.item_count)
+        return display_row, ('completed',) if row.status == "Delivered" else ()
     
     def create_sales_order(self):
-        self.db.execute("SELECT COUNT(*) FROM Customers")
+        self.db.execute(queries.CUSTOMER_COUNT)
         if self.db.fetchone()[0] == 0:
             messagebox.showwarning("Warning", "Add customers first")
             return
-        self.db.execute("SELECT COUNT(*) FROM Items WHERE item_id IN (SELECT item_id FROM Inventory WHERE quantity_on_hand > 0)")
+        self.db.execute(queries.ITEMS_AVAILABLE_COUNT)
         if self.db.fetchone()[0] == 0:
-            messagebox.showwarning("Warning", "No items in stock!")
+            messagebox.showwarning("Warning", "No items available!")
             return
         
         dialog = tk.Toplevel(self.app.root)
@@ -256,9 +303,9 @@ class SalesModule:
         
         # Customer
         ttk.Label(dialog, text="Customer:*", font=('Arial', 10, 'bold')).grid(row=0, column=0, padx=10, pady=10, sticky='w')
-        self.db.execute("SELECT customer_id, name, gstin FROM Customers ORDER BY name")
+        self.db.execute(queries.CUSTOMER_PICKLIST)
         customers = self.db.fetchall()
-        customer_dict = {f"{c[1]} (GSTIN: {c[2] or 'N/A'})": c[0] for c in customers}
+        customer_dict = {f"{c.name} (GSTIN: {c.gstin or 'N/A'})": c.customer_id for c in customers}
         customer_var = tk.StringVar()
         customer_combo = ttk.Combobox(dialog, textvariable=customer_var, values=list(customer_dict.keys()), width=50, state='readonly')
         customer_combo.grid(row=0, column=1, padx=10, pady=10, columnspan=3)
@@ -275,10 +322,10 @@ class SalesModule:
         item_frame.grid(row=3, column=0, columnspan=4, padx=10, pady=10, sticky='ew')
         
         ttk.Label(item_frame, text="Item:").grid(row=0, column=0, padx=5, pady=5, sticky='w')
-        self.db.execute('''SELECT i.item_id, i.name, i.selling_rate, i.selling_gst_percent, i.selling_price, inv.quantity_on_hand
-            FROM Items i JOIN Inventory inv ON i.item_id = inv.item_id WHERE inv.quantity_on_hand > 0 ORDER BY i.name''')
+        self.db.execute(queries.ITEM_SALES_PICKLIST)
         items = self.db.fetchall()
-        item_dict = {f"{i[1]} (Rate: ₹{i[2]:.2f} + {i[3]:.1f}% GST = ₹{i[4]:.2f}) [Stock: {i[5]}]": (i[0], i[2], i[3], i[5]) for i in items}
+        item_dict = {f"{i.name} (Rate: ₹{i.selling_rate:.2f} + {i.selling_gst_percent:.1f}% GST = ₹{i.selling_price:.2f}) [Available: {i.available}]":
+                     (i.item_id, i.selling_rate, i.selling_gst_percent, i.available) for i in items}
         item_var = tk.StringVar()
         item_combo = ttk.Combobox(item_frame, textvariable=item_var, values=list(item_dict.keys()), width=60, state='readonly')
         item_combo.grid(row=0, column=1, padx=5, pady=5, columnspan=2)
@@ -315,12 +362,12 @@ class SalesModule:
                 item_name = item_var.get().split(' (Rate:')[0]
                 
                 for existing in selected_items:
-                    if existing[0] == item_id:
+                    if existing.item_id == item_id:
                         messagebox.showwarning("Warning", "Item already added")
                         return
                 
                 gst_amt, total = self.calculate_gst_price(rate * qty, gst_percent)
-                selected_items.append((item_id, item_name, qty, rate, gst_percent, gst_amt, total, stock))
+                selected_items.append(SOLine(item_id, item_name, qty, rate, gst_percent, gst_amt, total, stock))
                 items_tree.insert('', 'end', values=(item_name, qty, f"₹{rate:.2f}", f"{gst_percent:.1f}%", f"₹{gst_amt:.2f}", f"₹{total:.2f}"))
                 update_total()
                 item_var.set('')
@@ -340,9 +387,9 @@ class SalesModule:
             update_total()
         
         def update_total():
-            subtotal = sum(item[3] * item[2] for item in selected_items)
-            total_gst = sum(item[5] for item in selected_items)
-            total = sum(item[6] for item in selected_items)
+            subtotal = sum(item.base_amount for item in selected_items)
+            total_gst = sum(item.gst_amount for item in selected_items)
+            total = sum(item.total for item in selected_items)
             total_label.config(text=f"Subtotal: ₹{subtotal:.2f}  |  GST: ₹{total_gst:.2f}  |  Total: ₹{total:.2f}")
         
         ttk.Button(item_frame, text="➕ Add", command=add_item).grid(row=0, column=5, padx=5, pady=5)
@@ -376,32 +423,32 @@ class SalesModule:
                 
                 customer_id = customer_dict[customer_var.get()]
                 
-                # Verify stock again
-                for item_id, name, qty, rate, gst_percent, gst_amt, total, original_stock in selected_items:
-                    self.db.execute("SELECT quantity_on_hand FROM Inventory WHERE item_id = ?", (item_id,))
-                    current_stock = self.db.fetchone()[0]
-                    if qty > current_stock:
-                        messagebox.showerror("Error", f"Stock changed! {name} now has only {current_stock} units")
-                        return
+                subtotal = sum(item.base_amount for item in selected_items)
+                total_gst = sum(item.gst_amount for item in selected_items)
+                total_amount = sum(item.total for item in selected_items)
                 
-                subtotal = sum(item[3] * item[2] for item in selected_items)
-                total_gst = sum(item[5] for item in selected_items)
-                total_amount = sum(item[6] for item in selected_items)
-                
-                # CHANGED: Set status to "Pending" instead of "Completed"
-                self.db.execute("INSERT INTO Sales_Orders (customer_id, order_date, delivery_date, status, subtotal, total_gst, total_amount) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (customer_id, datetime.now().date(), delivery_entry.get(), "Pending", subtotal, total_gst, total_amount))
-                so_number = self.db.lastrowid()
-                
-                # Add items - DON'T reduce inventory yet (wait for delivery)
-                for item_id, name, qty, rate, gst_percent, gst_amt, total, stock in selected_items:
-                    self.db.execute("INSERT INTO Sales_Order_Items (so_number, item_id, quantity, rate, gst_percent, gst_amount, total_price) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                        (so_number, item_id, qty, rate, gst_percent, gst_amt, total))
-                
-                self.db.commit()
-                messagebox.showinfo("Success", f"SO #{so_number} created!\n\nItems: {len(selected_items)}\nSubtotal: ₹{subtotal:.2f}\nGST: ₹{total_gst:.2f}\nTotal: ₹{total_amount:.2f}\n\nStatus: Pending\nInventory will be reduced upon delivery.")
+                with self.db.transaction():
+                    # CHANGED: Set status to "Pending" instead of "Completed"
+                    self.db.execute(queries.SO_INSERT,
+                        (customer_id, datetime.now().date(), delivery_entry.get(), "Pending", subtotal, total_gst, total_amount))
+                    so_number = self.db.lastrowid()
+                    
+                    # Add items - DON'T reduce inventory yet (wait for delivery)
+                    self.db.insert_many("Sales_Order_Items", queries.SO_LINE_COLUMNS,
+                        [(so_number, item.item_id, item.quantity, item.rate, item.gst_percent, item.gst_amount, item.total)
+                         for item in selected_items])
+                    # Reserve every line at once (under the write lock); a short line rolls the SO back
+                    reserve_stock(self.db, so_number, [(item.item_id, item.quantity) for item in selected_items])
+                self.app.changes.publish(SALES_ORDERS, [so_number])
+                self.app.changes.publish(ITEMS, [item.item_id for item in selected_items])
+                messagebox.showinfo("Success", f"SO #{so_number} created!\n\nItems: {len(selected_items)}\nSubtotal: ₹{subtotal:.2f}\nGST: ₹{total_gst:.2f}\nTotal: ₹{total_amount:.2f}\n\nStatus: Pending\nStock is reserved now and reduced upon delivery.")
                 dialog.destroy()
-                self.app.refresh_all_tabs()
+            except InsufficientStock as e:
+                names = {item.item_id: item.item_name for item in selected_items}
+                messagebox.showerror("Stock Changed", "Not enough stock is free any more:\n\n" + "\n".join(
+                    f"{names[item_id]}: ordered {wanted}, available {available}" for item_id, wanted, available in e.shortages))
+            except ValueError as ve:
+                messagebox.showerror("Error", str(ve))
             except Exception as e:
                 messagebox.showerror("Error", f"Failed: {str(e)}")
         
@@ -426,13 +473,11 @@ class SalesModule:
             return
         
         # Get SO details
-        self.db.execute('''SELECT so.customer_id, c.name, so.delivery_date, so.subtotal, so.total_gst, so.total_amount
-            FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id WHERE so.so_number = ?''', (so_number,))
+        self.db.execute(queries.SO_EDIT_HEADER, (so_number,))
         so_data = self.db.fetchone()
         
         # Get items
-        self.db.execute('''SELECT soi.item_id, i.name, soi.quantity, soi.rate, soi.gst_percent
-            FROM Sales_Order_Items soi JOIN Items i ON soi.item_id = i.item_id WHERE soi.so_number = ?''', (so_number,))
+        self.db.execute(queries.SO_EDIT_LINES, (so_number,))
         items_data = self.db.fetchall()
         
         dialog = tk.Toplevel(self.app.root)
@@ -444,11 +489,11 @@ class SalesModule:
         info_frame = ttk.LabelFrame(dialog, text="Order Information", padding=10)
         info_frame.pack(fill='x', padx=10, pady=10)
         
-        ttk.Label(info_frame, text=f"SO #: {so_number} | Customer: {so_data[1]}", font=('Arial', 11, 'bold')).pack()
+        ttk.Label(info_frame, text=f"SO #: {so_number} | Customer: {so_data.name}", font=('Arial', 11, 'bold')).pack()
         
         ttk.Label(info_frame, text="Delivery Date:").pack(side='left', padx=10)
         delivery_entry = ttk.Entry(info_frame, width=20)
-        delivery_entry.insert(0, so_data[2])
+        delivery_entry.insert(0, so_data.delivery_date)
         delivery_entry.pack(side='left', padx=10)
         
         # Items list with edit capability
@@ -464,10 +509,11 @@ class SalesModule:
         tree.pack(fill='both', expand=True)
         # Load existing items
         item_data = {}  # {tree_id: (item_id, old_qty, rate, gst_percent)}
-        for item_id, name, qty, rate, gst_percent in items_data:
-            gst_amt, total = self.calculate_gst_price(rate * qty, gst_percent)
-            tree_id = tree.insert("", "end", values=(name, qty, f"₹{rate:.2f}", f"{gst_percent:.1f}%", f"₹{total:.2f}"))
-            item_data[tree_id] = (item_id, qty, rate, gst_percent)
+        for row in items_data:
+            gst_amt, total = self.calculate_gst_price(row.rate * row.quantity, row.gst_percent)
+            tree_id = tree.insert("", "end", values=(row.name, row.quantity, f"₹{row.rate:.2f}",
+                                                     f"{row.gst_percent:.1f}%", f"₹{total:.2f}"))
+            item_data[tree_id] = (row.item_id, row.quantity, row.rate, row.gst_percent)
         
         # Summary
         summary_label = ttk.Label(dialog, text="", font=('Arial', 10, 'bold'), foreground='blue')
@@ -532,9 +578,9 @@ class SalesModule:
                         messagebox.showerror("Error", "Quantity must be positive")
                         return
                     
-                    # Check stock
+                    # Check free stock (counting what this SO already holds)
                     item_id, old_qty, rate, gst_percent = item_data[row_id]
-                    self.db.execute("SELECT quantity_on_hand FROM Inventory WHERE item_id = ?", (item_id,))
+                    self.db.execute(queries.ITEM_AVAILABLE_FOR_SO, (so_number, item_id))
                     stock = self.db.fetchone()[0]
                     if new_qty > stock:
                         messagebox.showerror("Error", f"Insufficient stock! Available: {stock}")
@@ -566,42 +612,50 @@ class SalesModule:
         
         def save_changes():
             try:
-                # Update delivery date
-                self.db.execute("UPDATE Sales_Orders SET delivery_date = ? WHERE so_number = ?",
-                    (delivery_entry.get(), so_number))
+                with self.db.transaction():
+                    # Update delivery date
+                    self.db.execute_versioned(queries.SO_SET_DELIVERY_DATE,
+                        (delivery_entry.get(), so_number, so_data.row_version), f"SO #{so_number}")
                 
-                # Update items and recalculate totals
-                self.db.execute("DELETE FROM Sales_Order_Items WHERE so_number = ?", (so_number,))
+                    # Update items and recalculate totals
+                    release_reservations(self.db, so_number)
+                    self.db.execute(queries.SO_LINES_DELETE, (so_number,))
                 
-                subtotal = 0
-                total_gst = 0
-                total_amount = 0
+                    subtotal = 0
+                    total_gst = 0
+                    total_amount = 0
+                    lines = []
                 
-                for tree_id in tree.get_children():
-                    item_id, qty, rate, gst_percent = item_data[tree_id]
-                    gst_amt, item_total = self.calculate_gst_price(rate * qty, gst_percent)
+                    for tree_id in tree.get_children():
+                        item_id, qty, rate, gst_percent = item_data[tree_id]
+                        gst_amt, item_total = self.calculate_gst_price(rate * qty, gst_percent)
+                        lines.append((so_number, item_id, qty, rate, gst_percent, gst_amt, item_total))
                     
-                    self.db.execute("""INSERT INTO Sales_Order_Items 
-                        (so_number, item_id, quantity, rate, gst_percent, gst_amount, total_price) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                        (so_number, item_id, qty, rate, gst_percent, gst_amt, item_total))
+                        subtotal += rate * qty
+                        total_gst += gst_amt
+                        total_amount += item_total
                     
-                    subtotal += rate * qty
-                    total_gst += gst_amt
-                    total_amount += item_total
-                
-                # Update order totals
-                self.db.execute("""UPDATE Sales_Orders 
-                    SET subtotal = ?, total_gst = ?, total_amount = ? 
-                    WHERE so_number = ?""",
-                    (subtotal, total_gst, total_amount, so_number))
+                    self.db.insert_many("Sales_Order_Items", queries.SO_LINE_COLUMNS, lines)
                 
-                self.db.commit()
+                    # Update order totals
+                    self.db.execute(queries.SO_SET_TOTALS,
+                        (subtotal, total_gst, total_amount, so_number))
+                    reserve_stock(self.db, so_number, [(line[1], line[2]) for line in lines])
+                # Lines may have been dropped, so any item's reservation may have moved
+                self.app.changes.publish(SALES_ORDERS, [so_number])
+                self.app.changes.publish(ITEMS)
                 messagebox.showinfo("Success", f"SO #{so_number} updated!")
                 dialog.destroy()
-                self.app.refresh_all_tabs()
+            except ConcurrencyConflict as e:
+                self.app.changes.publish(SALES_ORDERS, [so_number])
+                self.app.changes.publish(ITEMS)
+                messagebox.showwarning("Changed Elsewhere", str(e))
+                dialog.destroy()
+            except InsufficientStock as e:
+                names = {item_data[tree_id][0]: tree.item(tree_id)["values"][0] for tree_id in tree.get_children()}
+                messagebox.showerror("Stock Changed", "Not enough stock is free any more:\n\n" + "\n".join(
+                    f"{names[item_id]}: ordered {wanted}, available {available}" for item_id, wanted, available in e.shortages))
             except Exception as e:
-                self.db.rollback()
                 messagebox.showerror("Error", f"Failed: {str(e)}")
         
         btn_frame = ttk.Frame(dialog)
@@ -627,7 +681,7 @@ class SalesModule:
             return
         
         # Check if invoices exist
-        self.db.execute("SELECT COUNT(*) FROM Invoices WHERE so_number = ?", (so_number,))
+        self.db.execute(queries.SO_INVOICE_COUNT, (so_number,))
         inv_count = self.db.fetchone()[0]
         if inv_count > 0:
             messagebox.showerror("Cannot Delete", 
@@ -636,11 +690,13 @@ class SalesModule:
         
         if messagebox.askyesno("Confirm", f"Delete SO #{so_number} and all items?"):
             try:
-                self.db.execute("DELETE FROM Sales_Order_Items WHERE so_number = ?", (so_number,))
-                self.db.execute("DELETE FROM Sales_Orders WHERE so_number = ?", (so_number,))
-                self.db.commit()
+                with self.db.transaction():
+                    release_reservations(self.db, so_number)
+                    self.db.execute(queries.SO_LINES_DELETE, (so_number,))
+                    self.db.execute(queries.SO_DELETE, (so_number,))
+                self.app.changes.publish(SALES_ORDERS, [so_number])
+                self.app.changes.publish(ITEMS)  # its reservations were released
                 messagebox.showinfo("Success", f"SO #{so_number} deleted!")
-                self.refresh_sales_orders()
             except Exception as e:
                 messagebox.showerror("Error", str(e))
     
@@ -661,10 +717,7 @@ class SalesModule:
         dialog.grab_set()
         
         # Get SO info
-        self.db.execute('''SELECT so.so_number, c.name, c.gstin, so.order_date, so.delivery_date, 
-            so.status, so.subtotal, so.total_gst, so.total_amount
-            FROM Sales_Orders so JOIN Customers c ON so.customer_id = c.customer_id 
-            WHERE so.so_number = ?''', (so_number,))
+        self.db.execute(queries.SO_HEADER, (so_number,))
         so_info = self.db.fetchone()
         
         # Info frame
@@ -672,12 +725,12 @@ class SalesModule:
         info_frame.pack(fill='x', padx=10, pady=10)
         
         labels = [
-            f"SO Number: {so_info[0]}",
-            f"Customer: {so_info[1]}",
-            f"GSTIN: {so_info[2] or 'N/A'}",
-            f"Order Date: {so_info[3]}",
-            f"Delivery Date: {so_info[4]}",
-            f"Status: {so_info[5]}"
+            f"SO Number: {so_info.so_number}",
+            f"Customer: {so_info.name}",
+            f"GSTIN: {so_info.gstin or 'N/A'}",
+            f"Order Date: {so_info.order_date}",
+            f"Delivery Date: {so_info.delivery_date}",
+            f"Status: {so_info.status}"
         ]
         
         for i, text in enumerate(labels):
@@ -690,12 +743,12 @@ class SalesModule:
         
         ttk.Label(summary_frame, text="Subtotal (Before GST):", font=('Arial', 10)).grid(
             row=0, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{so_info[6]:.2f}", font=('Arial', 10, 'bold')).grid(
+        ttk.Label(summary_frame, text=f"₹{so_info.subtotal:.2f}", font=('Arial', 10, 'bold')).grid(
             row=0, column=1, sticky='e', padx=10, pady=3)
         
         ttk.Label(summary_frame, text="Total GST:", font=('Arial', 10)).grid(
             row=1, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{so_info[7]:.2f}", font=('Arial', 10, 'bold'), 
+        ttk.Label(summary_frame, text=f"₹{so_info.total_gst:.2f}", font=('Arial', 10, 'bold'), 
             foreground='blue').grid(row=1, column=1, sticky='e', padx=10, pady=3)
         
         ttk.Separator(summary_frame, orient='horizontal').grid(
@@ -703,7 +756,7 @@ class SalesModule:
         
         ttk.Label(summary_frame, text="Total Amount:", font=('Arial', 11, 'bold')).grid(
             row=3, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{so_info[8]:.2f}", font=('Arial', 11, 'bold'), 
+        ttk.Label(summary_frame, text=f"₹{so_info.total_amount:.2f}", font=('Arial', 11, 'bold'), 
             foreground='green').grid(row=3, column=1, sticky='e', padx=10, pady=3)
         
         # Items
@@ -718,21 +771,16 @@ class SalesModule:
             tree.column(col, width=col_widths[i])
         tree.pack(fill='both', expand=True)
         
-        self.db.execute('''SELECT i.name, soi.quantity, soi.rate, soi.gst_percent, 
-            soi.gst_amount, soi.total_price
-            FROM Sales_Order_Items soi JOIN Items i ON soi.item_id = i.item_id 
-            WHERE soi.so_number = ?''', (so_number,))
+        self.db.execute(queries.SO_LINES, (so_number,))
         
         for row in self.db.fetchall():
-            tree.insert('', 'end', values=(row[0], row[1], f"₹{row[2]:.2f}", 
-                f"{row[3]:.1f}%", f"₹{row[4]:.2f}", f"₹{row[5]:.2f}"))
+            tree.insert('', 'end', values=(row.name, row.quantity, f"₹{row.rate:.2f}", 
+                f"{row.gst_percent:.1f}%", f"₹{row.gst_amount:.2f}", f"₹{row.total_price:.2f}"))
     
     # ==================== DELIVERY TAB ====================
     
-    def create_delivery_tab(self):
+    def create_delivery_tab(self, del_frame):
         """Create delivery/dispatch tab"""
-        del_frame = ttk.Frame(self.notebook)
-        self.notebook.add(del_frame, text="🚚 Delivery")
         
         top_frame = ttk.Frame(del_frame)
         top_frame.pack(side='top', fill='x', padx=10, pady=10)
@@ -743,7 +791,7 @@ class SalesModule:
         history_frame = ttk.LabelFrame(del_frame, text="Delivery History", padding=10)
         history_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        columns = ("SO#", "Customer", "Delivery Date", "Items", "Total Qty", "Status")
+        columns = ("SO#", "Customer", "Delivery Date", "Items", "Delivered Qty", "Status")
         self.delivery_tree = ttk.Treeview(history_frame, columns=columns, show='headings', height=20)
         
         widths = [60, 150, 120, 60, 100, 100]
@@ -758,36 +806,26 @@ class SalesModule:
         self.delivery_tree.configure(yscrollcommand=scrollbar.set)
         
         self.delivery_tree.bind('<Double-1>', lambda e: self.view_delivery_details())
+        self.delivery_sync = TreeSynchronizer(self.delivery_tree, lambda row: row.so_number, lambda row: (row, ()))
         
         self.refresh_delivery_history()
     
-    def refresh_delivery_history(self):
-        """Refresh delivery history"""
-        for item in self.delivery_tree.get_children():
-            self.delivery_tree.delete(item)
+    def refresh_delivery_history(self, so_numbers=None):
+        """Refresh delivery history (only these SOs, if given)"""
+        if not hasattr(self, 'delivery_sync'):
+            return  # tab not opened yet
+        if so_numbers is not None:
+            rows = self.db.reports.fetchall(queries.DELIVERY_ROWS, (json.dumps(list(so_numbers)),))
+            if self.delivery_sync.sync_keys(so_numbers, rows) is not None:
+                return
         
         # Get delivered/partially delivered orders
-        self.db.execute('''
-            SELECT so.so_number, c.name, so.delivery_date, 
-                COUNT(DISTINCT soi.item_id) as item_count,
-                SUM(soi.quantity) as total_qty,
-                so.status
-            FROM Sales_Orders so
-            JOIN Customers c ON so.customer_id = c.customer_id
-            JOIN Sales_Order_Items soi ON so.so_number = soi.so_number
-            WHERE so.status IN ('Delivered', 'Partially Delivered')
-            GROUP BY so.so_number
-            ORDER BY so.so_number DESC
-        ''')
-        
-        for row in self.db.fetchall():
-            self.delivery_tree.insert('', 'end', values=row)
+        self.delivery_sync.sync(self.db.reports.fetchall(queries.DELIVERY_HISTORY))
     
     def new_delivery(self):
         """Record a new delivery"""
         # Get pending sales orders
-        self.db.execute('''SELECT so_number, order_date FROM Sales_Orders 
-            WHERE status = 'Pending' ORDER BY so_number DESC''')
+        self.db.execute(queries.SO_PENDING_LIST)
         pending_orders = self.db.fetchall()
         
         if not pending_orders:
@@ -806,7 +844,7 @@ class SalesModule:
         
         ttk.Label(header_frame, text="Sales Order:").pack(side='left', padx=10)
         
-        so_dict = {f"SO #{so[0]} - {so[1]}": so[0] for so in pending_orders}
+        so_dict = {f"SO #{so.so_number} - {so.order_date}": so.so_number for so in pending_orders}
         so_var = tk.StringVar()
         so_combo = ttk.Combobox(header_frame, textvariable=so_var, 
             values=list(so_dict.keys()), width=40, state='readonly')
@@ -824,10 +862,12 @@ class SalesModule:
             tree.column(col, width=col_widths[i])
         tree.pack(fill='both', expand=True)
         
-        item_data = {}  # {tree_id: (item_id, ordered_qty, stock)}
+        item_data = {}  # {tree_id: (item_id, remaining_qty, stock)}
+        so_version = None  # row_version of the SO when its lines were loaded
         
         def load_so_items(event):
             """Load items when SO is selected"""
+            nonlocal so_version
             if not so_var.get():
                 return
             
@@ -837,17 +877,13 @@ class SalesModule:
             
             so_number = so_dict[so_var.get()]
             
-            self.db.execute('''
-                SELECT soi.item_id, i.name, soi.quantity, inv.quantity_on_hand
-                FROM Sales_Order_Items soi
-                JOIN Items i ON soi.item_id = i.item_id
-                JOIN Inventory inv ON i.item_id = inv.item_id
-                WHERE soi.so_number = ?
-            ''', (so_number,))
+            self.db.execute(queries.SO_ROW_VERSION, (so_number,))
+            so_version = self.db.fetchone()[0]
+            self.db.execute(queries.SO_DELIVERY_LINES, (so_number,))
             
-            for item_id, name, ordered, stock in self.db.fetchall():
-                tree_id = tree.insert("", "end", values=(name, ordered, ordered, stock))
-                item_data[tree_id] = (item_id, ordered, stock)
+            for line in self.db.fetchall():
+                tree_id = tree.insert("", "end", values=(line.name, line.quantity, line.remaining, line.quantity_on_hand))
+                item_data[tree_id] = (line.item_id, line.remaining, line.quantity_on_hand)
         
         so_combo.bind('<<ComboboxSelected>>', load_so_items)
         
@@ -891,13 +927,13 @@ class SalesModule:
                 nonlocal current_entry
                 try:
                     new_qty = int(entry.get())
-                    item_id, ordered, stock = item_data[row_id]
+                    item_id, remaining, stock = item_data[row_id]
                     
                     if new_qty < 0:
                         messagebox.showerror("Error", "Quantity cannot be negative")
                         return
-                    if new_qty > ordered:
-                        messagebox.showerror("Error", f"Cannot deliver more than ordered ({ordered})")
+                    if new_qty > remaining:
+                        messagebox.showerror("Error", f"Cannot deliver more than remaining ({remaining})")
                         return
                     if new_qty > stock:
                         messagebox.showerror("Error", f"Insufficient stock! Available: {stock}")
@@ -939,46 +975,24 @@ class SalesModule:
             try:
                 so_number = so_dict[so_var.get()]
                 
-                total_delivered = 0
-                items_fully_delivered = 0
-                items_partially_delivered = 0
-                
+                # Validate every line before changing anything
+                deliveries = []
                 for tree_id in tree.get_children():
                     values = tree.item(tree_id)["values"]
                     deliver_qty = int(values[2])
-                    item_id, ordered_qty, stock = item_data[tree_id]
+                    item_id, remaining_qty, stock = item_data[tree_id]
                     
                     if deliver_qty > stock:
                         messagebox.showerror("Error", f"{values[0]}: Insufficient stock!")
                         return
-                    
                     if deliver_qty > 0:
-                        # Reduce inventory
-                        self.db.execute('''UPDATE Inventory 
-                            SET quantity_on_hand = quantity_on_hand - ?,
-                                last_updated = ?
-                            WHERE item_id = ?''',
-                            (deliver_qty, datetime.now(), item_id))
-                        
-                        total_delivered += deliver_qty
-                        
-                        if deliver_qty == ordered_qty:
-                            items_fully_delivered += 1
-                        else:
-                            items_partially_delivered += 1
-                
-                # Update SO status
-                if items_partially_delivered > 0 or total_delivered == 0:
-                    new_status = "Partially Delivered"
-                else:
-                    new_status = "Delivered"
+                        deliveries.append((item_id, deliver_qty))
                 
-                self.db.execute('''UPDATE Sales_Orders 
-                    SET status = ?, delivery_date = ?
-                    WHERE so_number = ?''',
-                    (new_status, datetime.now().date(), so_number))
+                if not deliveries:
+                    messagebox.showerror("Error", "Enter a quantity to deliver for at least one item")
+                    return
                 
-                self.db.commit()
+                total_delivered, new_status = self.record_delivery(so_number, deliveries, so_version)
                 
                 msg = f"Delivery Recorded!\n\n"
                 msg += f"SO #{so_number}\n"
@@ -987,10 +1001,13 @@ class SalesModule:
                 
                 messagebox.showinfo("Success", msg)
                 dialog.destroy()
-                self.app.refresh_all_tabs()
                 
+            except ConcurrencyConflict as e:
+                self.app.changes.publish(SALES_ORDERS, [so_number])
+                self.app.changes.publish(ITEMS)
+                messagebox.showwarning("Changed Elsewhere", str(e))
+                dialog.destroy()
             except Exception as e:
-                self.db.rollback()
                 messagebox.showerror("Error", f"Failed: {str(e)}")
         
         btn_frame = ttk.Frame(dialog)
@@ -1015,7 +1032,7 @@ class SalesModule:
             return
         
         # Check if it's partially delivered
-        self.db.execute("SELECT status FROM Sales_Orders WHERE so_number = ?", (so_number,))
+        self.db.execute(queries.SO_STATUS, (so_number,))
         current_status = self.db.fetchone()[0]
         
         if current_status != "Partially Delivered":
@@ -1049,22 +1066,16 @@ class SalesModule:
         tree.pack(fill='both', expand=True)
         
         # Load items - show remaining to deliver
-        self.db.execute('''
-            SELECT soi.item_id, i.name, soi.quantity, inv.quantity_on_hand
-            FROM Sales_Order_Items soi
-            JOIN Items i ON soi.item_id = i.item_id
-            JOIN Inventory inv ON i.item_id = inv.item_id
-            WHERE soi.so_number = ?
-        ''', (so_number,))
+        self.db.execute(queries.SO_ROW_VERSION, (so_number,))
+        so_version = self.db.fetchone()[0]
+        self.db.execute(queries.SO_DELIVERY_LINES, (so_number,))
         
         item_data = {}  # {tree_id: (item_id, ordered_qty, stock)}
         
-        for item_id, name, ordered, stock in self.db.fetchall():
-            # For partially delivered, assume we need to deliver the rest
-            # In a real system, you'd track delivered quantities separately
-            remaining = ordered  # Simplified: show full quantity as remaining
-            tree_id = tree.insert("", "end", values=(name, ordered, remaining, remaining, stock))
-            item_data[tree_id] = (item_id, ordered, stock)
+        for line in self.db.fetchall():
+            tree_id = tree.insert("", "end", values=(line.name, line.quantity, line.remaining,
+                                                     line.remaining, line.quantity_on_hand))
+            item_data[tree_id] = (line.item_id, line.quantity, line.quantity_on_hand)
         
         # Edit delivery quantity on double-click
         current_entry = None
@@ -1148,7 +1159,6 @@ class SalesModule:
                 for tree_id in tree.get_children():
                     values = tree.item(tree_id)["values"]
                     deliver_qty = int(values[3])
-                    remaining_qty = int(values[2])
                     item_id, ordered_qty, stock = item_data[tree_id]
                     
                     # Check stock BEFORE doing anything
@@ -1156,46 +1166,15 @@ class SalesModule:
                         messagebox.showerror("Error", f"{values[0]}: Insufficient stock! Available: {stock}")
                         return  # Exit without making ANY changes
                     
-                    # Store validated items
-                    items_to_deliver.append({
-                        'item_id': item_id,
-                        'item_name': values[0],
-                        'deliver_qty': deliver_qty,
-                        'remaining_qty': remaining_qty,
-                        'ordered_qty': ordered_qty
-                    })
-                
-                # STEP 2: ALL ITEMS VALIDATED - NOW UPDATE DATABASE
-                total_delivered = 0
-                all_items_complete = True
-                
-                for item_info in items_to_deliver:
-                    if item_info['deliver_qty'] > 0:
-                        # Reduce inventory
-                        self.db.execute('''UPDATE Inventory 
-                            SET quantity_on_hand = quantity_on_hand - ?,
-                                last_updated = ?
-                            WHERE item_id = ?''',
-                            (item_info['deliver_qty'], datetime.now(), item_info['item_id']))
-                        
-                        total_delivered += item_info['deliver_qty']
-                    
-                    # Check if this item is fully delivered
-                    if item_info['deliver_qty'] < item_info['remaining_qty']:
-                        all_items_complete = False
-                
-                # Update SO status
-                if all_items_complete and total_delivered > 0:
-                    new_status = "Delivered"
-                else:
-                    new_status = "Partially Delivered"
+                    if deliver_qty > 0:
+                        items_to_deliver.append((item_id, deliver_qty))
                 
-                self.db.execute('''UPDATE Sales_Orders 
-                    SET status = ?, delivery_date = ?
-                    WHERE so_number = ?''',
-                    (new_status, datetime.now().date(), so_number))
+                if not items_to_deliver:
+                    messagebox.showerror("Error", "Enter a quantity to deliver for at least one item")
+                    return
                 
-                self.db.commit()
+                # STEP 2: ALL ITEMS VALIDATED - NOW UPDATE DATABASE
+                total_delivered, new_status = self.record_delivery(so_number, items_to_deliver, so_version)
                 
                 msg = f"Delivery Updated!\n\n"
                 msg += f"SO #{so_number}\n"
@@ -1204,10 +1183,13 @@ class SalesModule:
                 
                 messagebox.showinfo("Success", msg)
                 dialog.destroy()
-                self.app.refresh_all_tabs()
                 
+            except ConcurrencyConflict as e:
+                self.app.changes.publish(SALES_ORDERS, [so_number])
+                self.app.changes.publish(ITEMS)
+                messagebox.showwarning("Changed Elsewhere", str(e))
+                dialog.destroy()
             except Exception as e:
-                self.db.rollback()
                 messagebox.showerror("Error", f"Failed: {str(e)}")
         
         btn_frame = ttk.Frame(dialog)
@@ -1215,6 +1197,25 @@ class SalesModule:
         ttk.Button(btn_frame, text="✅ Complete Delivery", command=complete_delivery).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="❌ Cancel", command=dialog.destroy).pack(side='left', padx=5)
     
+    def record_delivery(self, so_number, deliveries, row_version):
+        """Post one delivery of [(item_id, quantity)] for an SO in a single transaction:
+        the Sales_Deliveries ledger goes up and, through its triggers, so do the
+        delivered totals while stock goes down. The SO status follows the
+        remaining lines. Returns (total quantity delivered, new status).
+        Raises ConcurrencyConflict if the SO changed since row_version was read."""
+        today = datetime.now().date()
+        with self.db.transaction():
+            self.db.execute_versioned(queries.SO_CLAIM, (so_number, row_version), f"SO #{so_number}")
+            for item_id, quantity in deliveries:
+                self.db.execute(queries.DELIVERY_INSERT, (so_number, item_id, quantity, today))
+            
+            self.db.execute(queries.SO_UNDELIVERED_LINE_COUNT, (so_number,))
+            new_status = "Partially Delivered" if self.db.fetchone()[0] > 0 else "Delivered"
+            self.db.execute(queries.SO_SET_STATUS, (new_status, today, so_number))
+        self.app.changes.publish(SALES_ORDERS, [so_number])
+        self.app.changes.publish(ITEMS, [item_id for item_id, _ in deliveries])
+        return sum(quantity for _, quantity in deliveries), new_status
+    
     def view_delivery_details(self):
         """View delivery details"""
         selected = self.delivery_tree.selection()
@@ -1226,7 +1227,7 @@ class SalesModule:
         
         dialog = tk.Toplevel(self.app.root)
         dialog.title(f"Delivery Details - SO #{so_number}")
-        dialog.geometry("800x500")
+        dialog.geometry("800x600")
         dialog.transient(self.app.root)
         
         # Info
@@ -1240,30 +1241,42 @@ class SalesModule:
         items_frame = ttk.LabelFrame(dialog, text="Delivered Items", padding=10)
         items_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        columns = ("Item", "Quantity Delivered")
-        tree = ttk.Treeview(items_frame, columns=columns, show='headings', height=15)
-        tree.heading("Item", text="Item")
-        tree.column("Item", width=400)
-        tree.heading("Quantity Delivered", text="Quantity Delivered")
-        tree.column("Quantity Delivered", width=200)
+        columns = ("Item", "Ordered", "Delivered", "Remaining")
+        tree = ttk.Treeview(items_frame, columns=columns, show='headings', height=8)
+        col_widths = [400, 100, 100, 100]
+        for i, col in enumerate(columns):
+            tree.heading(col, text=col)
+            tree.column(col, width=col_widths[i])
         tree.pack(fill='both', expand=True)
         
-        self.db.execute('''SELECT i.name, soi.quantity
-            FROM Sales_Order_Items soi
-            JOIN Items i ON soi.item_id = i.item_id
-            WHERE soi.so_number = ?''', (so_number,))
+        self.db.execute(queries.SO_LINE_QUANTITIES, (so_number,))
         
         for row in self.db.fetchall():
             tree.insert('', 'end', values=row)
+        
+        # Each delivery posted against the order
+        ledger_frame = ttk.LabelFrame(dialog, text="Deliveries", padding=10)
+        ledger_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        columns = ("Date", "Item", "Quantity")
+        ledger_tree = ttk.Treeview(ledger_frame, columns=columns, show='headings', height=6)
+        col_widths = [150, 400, 100]
+        for i, col in enumerate(columns):
+            ledger_tree.heading(col, text=col)
+            ledger_tree.column(col, width=col_widths[i])
+        ledger_tree.pack(fill='both', expand=True)
+        
+        self.db.execute(queries.SO_DELIVERIES, (so_number,))
+        
+        for row in self.db.fetchall():
+            ledger_tree.insert('', 'end', values=row)
             
             
     
     # ==================== GST SUMMARY TAB ====================
     
-    def create_gst_summary_tab(self):
+    def create_gst_summary_tab(self, gst_frame):
         """Create dedicated GST summary tab with improved UI"""
-        gst_frame = ttk.Frame(self.notebook)
-        self.notebook.add(gst_frame, text="💰 GST Summary")
     
         # Top frame with title and refresh
         top_frame = ttk.Frame(gst_frame)
@@ -1294,284 +1307,153 @@ class SalesModule:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
+        self.create_gst_summary_panels(self.gst_scrollable_frame)
+
         # Initial load
         self.refresh_gst_summary()
 
-    def refresh_gst_summary(self):
-        """Refresh GST summary with HORIZONTAL layout"""
-        # Clear existing content
-        for widget in self.gst_scrollable_frame.winfo_children():
-            widget.destroy()
-
-        # Get data
-        self.db.execute('''
-            SELECT 
-                soi.gst_percent,
-                COALESCE(SUM(soi.gst_amount), 0) as total_gst_collected,
-                COALESCE(SUM(soi.rate * soi.quantity), 0) as total_base_amount,
-                COUNT(DISTINCT so.so_number) as order_count,
-                COUNT(*) as item_count
-            FROM Sales_Order_Items soi
-            JOIN Sales_Orders so ON soi.so_number = so.so_number
-            GROUP BY soi.gst_percent
-            ORDER BY soi.gst_percent
-        ''')
-        output_gst_data = {row[0]: {'gst': row[1], 'base': row[2], 'orders': row[3], 'items': row[4]} 
-                           for row in self.db.fetchall()}
+    def create_gst_summary_panels(self, parent):
+        """Build every GST summary panel once; show_gst_summary only fills them in"""
+        self.gst_summary = ()   # summary on screen (never equal to a new one before the first load)
+        self.gst_loading = ttk.Label(parent, text=LOADING_TEXT, font=('Arial', 12), foreground='gray')
+        self.gst_loading.pack(pady=40)
+        self.gst_content = ttk.Frame(parent)
 
-        self.db.execute('''
-            SELECT 
-                poi.gst_percent,
-                COALESCE(SUM(poi.gst_amount), 0) as total_gst_paid,
-                COALESCE(SUM(poi.rate * poi.quantity), 0) as total_base_amount,
-                COUNT(DISTINCT po.po_number) as order_count,
-                COUNT(*) as item_count
-            FROM Purchase_Order_Items poi
-            JOIN Purchase_Orders po ON poi.po_number = po.po_number
-            GROUP BY poi.gst_percent
-            ORDER BY poi.gst_percent
-        ''')
-        input_gst_data = {row[0]: {'gst': row[1], 'base': row[2], 'orders': row[3], 'items': row[4]} 
-                          for row in self.db.fetchall()}
+        # === QUICK SUMMARY - HORIZONTAL CARDS (4 cards in one row) ===
+        summary_section = ttk.LabelFrame(self.gst_content, 
+            text="📊 GST Quick Summary", padding=20)
+        summary_section.pack(fill='x', pady=(0, 15), padx=10)
 
-        all_gst_rates = sorted(set(list(output_gst_data.keys()) + list(input_gst_data.keys())))
-
-        if all_gst_rates:
-            # === QUICK SUMMARY - HORIZONTAL CARDS (4 cards in one row) ===
-            total_output_gst = sum(d['gst'] for d in output_gst_data.values())
-            total_input_gst = sum(d['gst'] for d in input_gst_data.values())
-            net_gst = total_output_gst - total_input_gst
-        
-            summary_section = ttk.LabelFrame(self.gst_scrollable_frame, 
-                text="📊 GST Quick Summary", padding=20)
-            summary_section.pack(fill='x', pady=(0, 15), padx=10)
-    
-            summary_cards = ttk.Frame(summary_section)
-            summary_cards.pack(fill='both', expand=True)
-        
-            # Configure grid for equal spacing
-            for i in range(4):
-                summary_cards.grid_columnconfigure(i, weight=1)
-            summary_cards.grid_rowconfigure(0, weight=1)
-        
-            # Card 1: Output GST
-            card1 = ttk.Frame(summary_cards, relief='solid', borderwidth=2)
-            card1.grid(row=0, column=0, padx=10, pady=10, sticky='nsew')
-            ttk.Label(card1, text="Output GST", font=('Arial', 10), 
-                foreground='gray').pack(pady=(15, 5))
-            ttk.Label(card1, text=f"₹{total_output_gst:,.2f}", font=('Arial', 16, 'bold'), 
-                foreground='green').pack(pady=(0, 5))
-            ttk.Label(card1, text="Collected from Sales", font=('Arial', 8), 
-                foreground='gray').pack(pady=(0, 15))
-    
-            # Card 2: Input GST
-            card2 = ttk.Frame(summary_cards, relief='solid', borderwidth=2)
-            card2.grid(row=0, column=1, padx=10, pady=10, sticky='nsew')
-            ttk.Label(card2, text="Input GST", font=('Arial', 10), 
-                foreground='gray').pack(pady=(15, 5))
-            ttk.Label(card2, text=f"₹{total_input_gst:,.2f}", font=('Arial', 16, 'bold'), 
-                foreground='orange').pack(pady=(0, 5))
-            ttk.Label(card2, text="Paid on Purchases", font=('Arial', 8), 
-                foreground='gray').pack(pady=(0, 15))
-    
-            # Card 3: Net Liability
-            card3 = ttk.Frame(summary_cards, relief='solid', borderwidth=2)
-            card3.grid(row=0, column=2, padx=10, pady=10, sticky='nsew')
-            ttk.Label(card3, text="Net GST Liability", font=('Arial', 10), 
-                foreground='gray').pack(pady=(15, 5))
-            net_color = '#dc3545' if net_gst > 0 else ('#28a745' if net_gst < 0 else '#17a2b8')
-            ttk.Label(card3, text=f"₹{net_gst:,.2f}", font=('Arial', 16, 'bold'), 
-                foreground=net_color).pack(pady=(0, 5))
-            status_text = "To Pay" if net_gst > 0 else ("Refund" if net_gst < 0 else "Balanced")
-            ttk.Label(card3, text=status_text, font=('Arial', 8), 
-                foreground=net_color).pack(pady=(0, 15))
-    
-            # Card 4: Total Orders
-            total_orders = sum(d['orders'] for d in output_gst_data.values())
-            card4 = ttk.Frame(summary_cards, relief='solid', borderwidth=2)
-            card4.grid(row=0, column=3, padx=10, pady=10, sticky='nsew')
-            ttk.Label(card4, text="Sales Orders", font=('Arial', 10), 
+        summary_cards = ttk.Frame(summary_section)
+        summary_cards.pack(fill='both', expand=True)
+    
+        # Configure grid for equal spacing
+        for i in range(4):
+            summary_cards.grid_columnconfigure(i, weight=1)
+        summary_cards.grid_rowconfigure(0, weight=1)
+    
+        self.gst_cards = []     # (value StringVar, value Label, caption Label)
+        for col, (title, color, caption) in enumerate(GST_CARDS):
+            card = ttk.Frame(summary_cards, relief='solid', borderwidth=2)
+            card.grid(row=0, column=col, padx=10, pady=10, sticky='nsew')
+            ttk.Label(card, text=title, font=('Arial', 10), 
                 foreground='gray').pack(pady=(15, 5))
-            ttk.Label(card4, text=str(total_orders), font=('Arial', 16, 'bold'), 
-                foreground='blue').pack(pady=(0, 5))
-            ttk.Label(card4, text="With GST", font=('Arial', 8), 
-                foreground='gray').pack(pady=(0, 15))
-    
-            # === COLOR LEGEND - HORIZONTAL (one row) ===
-            legend_frame = ttk.LabelFrame(self.gst_scrollable_frame, text="Color Legend", padding=10)
-            legend_frame.pack(fill='x', pady=(0, 15), padx=10)
-        
-            legend_container = ttk.Frame(legend_frame)
-            legend_container.pack()
-    
-            legend_items = [
-                ("● 0%", '#666666'), ("● 1-5%", '#28a745'), ("● 6-12%", '#17a2b8'),
-                ("● 13-18%", '#ffc107'), ("● 19%+", '#dc3545')
-            ]
-    
-            for text, color in legend_items:
-                ttk.Label(legend_container, text=text, font=('Arial', 10, 'bold'), 
-                    foreground=color).pack(side='left', padx=15)
-        
-            # === TAX BRACKET COMPARISON - COMPACT TABLE ===
-            comparison_section = ttk.LabelFrame(self.gst_scrollable_frame, 
-                text="📊 Tax Bracket Comparison (Output vs Input)", padding=20)
-            comparison_section.pack(fill='x', pady=(0, 15), padx=10)
-    
-            # Header row - SINGLE LINE
-            header_frame = ttk.Frame(comparison_section)
-            header_frame.pack(fill='x', pady=(0, 5))
-    
-            headers = [
-                ("Rate", 10), ("Output GST", 15), ("Input GST", 15), 
-                ("Net Liability", 15), ("Out Orders", 12), ("In Orders", 12)
-            ]
-    
-            for text, width in headers:
-                ttk.Label(header_frame, text=text, font=('Arial', 10, 'bold'), 
-                    width=width).pack(side='left', padx=5)
-    
-            ttk.Separator(comparison_section, orient='horizontal').pack(fill='x', pady=3)
-    
-            # Data rows - COMPACT
-            for gst_rate in all_gst_rates:
-                output_gst_amt = output_gst_data.get(gst_rate, {}).get('gst', 0)
-                input_gst_amt = input_gst_data.get(gst_rate, {}).get('gst', 0)
-                net_bracket = output_gst_amt - input_gst_amt
-                output_orders = output_gst_data.get(gst_rate, {}).get('orders', 0)
-                input_orders = input_gst_data.get(gst_rate, {}).get('orders', 0)
-        
-                if output_gst_amt > 0 or input_gst_amt > 0:
-                    color = self._get_gst_color(gst_rate)
-            
-                    row_frame = ttk.Frame(comparison_section)
-                    row_frame.pack(fill='x', pady=2)
-            
-                    ttk.Label(row_frame, text=f"{gst_rate:.1f}%", 
-                        font=('Arial', 10, 'bold'), foreground=color, width=10).pack(side='left', padx=5)
-                    ttk.Label(row_frame, text=f"₹{output_gst_amt:,.2f}", 
-                        font=('Arial', 10), width=15).pack(side='left', padx=5)
-                    ttk.Label(row_frame, text=f"₹{input_gst_amt:,.2f}", 
-                        font=('Arial', 10), width=15).pack(side='left', padx=5)
-            
-                    net_color = '#dc3545' if net_bracket > 0 else ('#28a745' if net_bracket < 0 else '#17a2b8')
-                    ttk.Label(row_frame, text=f"₹{net_bracket:,.2f}", 
-                        font=('Arial', 10, 'bold'), foreground=net_color, width=15).pack(side='left', padx=5)
-            
-                    ttk.Label(row_frame, text=str(output_orders), 
-                        font=('Arial', 10), width=12).pack(side='left', padx=5)
-                    ttk.Label(row_frame, text=str(input_orders), 
-                        font=('Arial', 10), width=12).pack(side='left', padx=5)
-    
-            # === DETAILED BREAKDOWN - SIDE BY SIDE (Output and Input) ===
-            details_section = ttk.LabelFrame(self.gst_scrollable_frame, 
-                text="📋 Detailed Breakdown by Tax Rate", padding=15)
-            details_section.pack(fill='both', expand=True, pady=(0, 15), padx=10)
-    
-            # Create two-column layout
-            columns_frame = ttk.Frame(details_section)
-            columns_frame.pack(fill='both', expand=True)
-            
-            # Configure columns
-            columns_frame.grid_columnconfigure(0, weight=1)
-            columns_frame.grid_columnconfigure(1, weight=1)
-    
-            # Output GST details (LEFT COLUMN)
-            output_frame = ttk.LabelFrame(columns_frame, text="Output GST (Sales)", padding=10)
-            output_frame.grid(row=0, column=0, padx=5, pady=5, sticky='nsew')
-    
-            # Header for output
-            out_header = ttk.Frame(output_frame)
-            out_header.pack(fill='x', pady=(0, 5))
-            ttk.Label(out_header, text="Rate", font=('Arial', 9, 'bold'), width=8).pack(side='left', padx=3)
-            ttk.Label(out_header, text="Base", font=('Arial', 9, 'bold'), width=12).pack(side='left', padx=3)
-            ttk.Label(out_header, text="GST", font=('Arial', 9, 'bold'), width=12).pack(side='left', padx=3)
-            ttk.Label(out_header, text="Orders", font=('Arial', 9, 'bold'), width=8).pack(side='left', padx=3)
-            ttk.Label(out_header, text="Items", font=('Arial', 9, 'bold'), width=8).pack(side='left', padx=3)
-        
-            ttk.Separator(output_frame, orient='horizontal').pack(fill='x', pady=3)
-    
-            for gst_rate in all_gst_rates:
-                if gst_rate in output_gst_data:
-                    data = output_gst_data[gst_rate]
-                    color = self._get_gst_color(gst_rate)
-                    row = ttk.Frame(output_frame)
-                    row.pack(fill='x', pady=1)
-            
-                    ttk.Label(row, text=f"{gst_rate:.1f}%", font=('Arial', 9, 'bold'), 
-                        foreground=color, width=8).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"₹{data['base']:,.0f}", 
-                        font=('Arial', 9), width=12).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"₹{data['gst']:,.0f}", 
-                        font=('Arial', 9, 'bold'), foreground=color, width=12).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"{data['orders']}", 
-                        font=('Arial', 9), width=8).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"{data['items']}", 
-                        font=('Arial', 9), width=8).pack(side='left', padx=3)
-        
-            # Input GST details (RIGHT COLUMN)
-            input_frame = ttk.LabelFrame(columns_frame, text="Input GST (Purchases)", padding=10)
-            input_frame.grid(row=0, column=1, padx=5, pady=5, sticky='nsew')
-    
-            # Header for input
-            in_header = ttk.Frame(input_frame)
-            in_header.pack(fill='x', pady=(0, 5))
-            ttk.Label(in_header, text="Rate", font=('Arial', 9, 'bold'), width=8).pack(side='left', padx=3)
-            ttk.Label(in_header, text="Base", font=('Arial', 9, 'bold'), width=12).pack(side='left', padx=3)
-            ttk.Label(in_header, text="GST", font=('Arial', 9, 'bold'), width=12).pack(side='left', padx=3)
-            ttk.Label(in_header, text="Orders", font=('Arial', 9, 'bold'), width=8).pack(side='left', padx=3)
-            ttk.Label(in_header, text="Items", font=('Arial', 9, 'bold'), width=8).pack(side='left', padx=3)
-        
-            ttk.Separator(input_frame, orient='horizontal').pack(fill='x', pady=3)
-    
-            for gst_rate in all_gst_rates:
-                if gst_rate in input_gst_data:
-                    data = input_gst_data[gst_rate]
-                    color = self._get_gst_color(gst_rate)
-                    row = ttk.Frame(input_frame)
-                    row.pack(fill='x', pady=1)
-            
-                    ttk.Label(row, text=f"{gst_rate:.1f}%", font=('Arial', 9, 'bold'), 
-                        foreground=color, width=8).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"₹{data['base']:,.0f}", 
-                        font=('Arial', 9), width=12).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"₹{data['gst']:,.0f}", 
-                        font=('Arial', 9, 'bold'), foreground=color, width=12).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"{data['orders']}", 
-                        font=('Arial', 9), width=8).pack(side='left', padx=3)
-                    ttk.Label(row, text=f"{data['items']}", 
-                        font=('Arial', 9), width=8).pack(side='left', padx=3)
+            value_var = tk.StringVar(card)
+            value_label = ttk.Label(card, textvariable=value_var, font=('Arial', 16, 'bold'), foreground=color)
+            value_label.pack(pady=(0, 5))
+            caption_label = ttk.Label(card, text=caption or "", font=('Arial', 8), foreground='gray')
+            caption_label.pack(pady=(0, 15))
+            self.gst_cards.append((value_var, value_label, caption_label))
+
+        # === COLOR LEGEND - HORIZONTAL (one row) ===
+        legend_frame = ttk.LabelFrame(self.gst_content, text="Color Legend", padding=10)
+        legend_frame.pack(fill='x', pady=(0, 15), padx=10)
     
-        else:
-            # No data
-            empty_frame = ttk.Frame(self.gst_scrollable_frame)
-            empty_frame.pack(expand=True, fill='both', pady=100)
-        
-            ttk.Label(empty_frame, text="📊 No GST Data Available", 
-                font=('Arial', 18, 'bold'), foreground='gray').pack(pady=15)
-            ttk.Label(empty_frame, 
-                text="Create sales and purchase orders to see GST analysis", 
-                font=('Arial', 12), foreground='gray').pack(pady=8)
+        legend_container = ttk.Frame(legend_frame)
+        legend_container.pack()
 
-    def _get_gst_color(self, gst_rate):
-        """Helper to get color for GST rate"""
-        if gst_rate == 0:
-            return '#666666'
-        elif gst_rate <= 5:
-            return '#28a745'
-        elif gst_rate <= 12:
-            return '#17a2b8'
-        elif gst_rate <= 18:
-            return '#ffc107'
-        else:
-            return '#dc3545'
+        for _, text, color in GST_BRACKETS:
+            ttk.Label(legend_container, text=f"● {text}", font=('Arial', 10, 'bold'), 
+                foreground=color).pack(side='left', padx=15)
+    
+        # === TAX BRACKET COMPARISON - COMPACT TABLE ===
+        comparison_section = ttk.LabelFrame(self.gst_content, 
+            text="📊 Tax Bracket Comparison (Output vs Input)", padding=20)
+        comparison_section.pack(fill='x', pady=(0, 15), padx=10)
+
+        # Header row - SINGLE LINE
+        header = LabelRows(comparison_section, header_columns(GST_COMPARISON_COLUMNS, ('Arial', 10, 'bold')), pady=0)
+        header.pack(fill='x', pady=(0, 5))
+        header.show([header_cells(("Rate", "Output GST", "Input GST", "Net Liability", "Out Orders", "In Orders"))])
+
+        ttk.Separator(comparison_section, orient='horizontal').pack(fill='x', pady=3)
+
+        # Data rows - COMPACT
+        self.gst_comparison_rows = LabelRows(comparison_section, GST_COMPARISON_COLUMNS)
+        self.gst_comparison_rows.pack(fill='x')
+
+        # === DETAILED BREAKDOWN - SIDE BY SIDE (Output and Input) ===
+        details_section = ttk.LabelFrame(self.gst_content, 
+            text="📋 Detailed Breakdown by Tax Rate", padding=15)
+        details_section.pack(fill='both', expand=True, pady=(0, 15), padx=10)
+
+        # Create two-column layout
+        columns_frame = ttk.Frame(details_section)
+        columns_frame.pack(fill='both', expand=True)
+        
+        # Configure columns
+        columns_frame.grid_columnconfigure(0, weight=1)
+        columns_frame.grid_columnconfigure(1, weight=1)
+
+        # Output GST details (LEFT COLUMN), Input GST details (RIGHT COLUMN)
+        self.gst_detail_rows = []
+        for col, title in enumerate(("Output GST (Sales)", "Input GST (Purchases)")):
+            detail_frame = ttk.LabelFrame(columns_frame, text=title, padding=10)
+            detail_frame.grid(row=0, column=col, padx=5, pady=5, sticky='nsew')
+
+            header = LabelRows(detail_frame, header_columns(GST_DETAIL_COLUMNS, ('Arial', 9, 'bold')), padx=3, pady=0)
+            header.pack(fill='x', pady=(0, 5))
+            header.show([header_cells(("Rate", "Base", "GST", "Orders", "Items"))])
+        
+            ttk.Separator(detail_frame, orient='horizontal').pack(fill='x', pady=3)
+
+            rows = LabelRows(detail_frame, GST_DETAIL_COLUMNS, padx=3, pady=1)
+            rows.pack(fill='x')
+            self.gst_detail_rows.append(rows)
+
+        # No data
+        self.gst_empty = ttk.Frame(parent)
+        ttk.Label(self.gst_empty, text="📊 No GST Data Available", 
+            font=('Arial', 18, 'bold'), foreground='gray').pack(pady=15)
+        ttk.Label(self.gst_empty, 
+            text="Create sales and purchase orders to see GST analysis", 
+            font=('Arial', 12), foreground='gray').pack(pady=8)
+
+    def refresh_gst_summary(self):
+        """Reload the GST summary in the background (the panels keep their figures until it arrives)"""
+        if not hasattr(self, 'gst_scrollable_frame'):
+            return  # tab not opened yet
+        self.app.executor.submit('gst_summary', load_gst_summary, self.show_gst_summary)
+    
+    def show_gst_summary(self, summary):
+        """Update the GST panels in place from a gst_summary.GstSummary (None: no orders)"""
+        if summary == self.gst_summary:
+            return  # nothing changed since the last refresh
+        self.gst_loading.pack_forget()
+        self.gst_summary = summary
+        if summary is None:
+            self.gst_content.pack_forget()
+            self.gst_empty.pack(expand=True, fill='both', pady=100)
+            return
+        self.gst_empty.pack_forget()
+        self.gst_content.pack(fill='both', expand=True)
+
+        # Quick summary cards
+        net = net_color(summary.net_gst)
+        values = [(f"₹{summary.output_gst:,.2f}", None), (f"₹{summary.input_gst:,.2f}", None),
+                  (f"₹{summary.net_gst:,.2f}", net), (str(summary.sales_orders), None)]
+        for (value_var, value_label, caption_label), (text, color) in zip(self.gst_cards, values):
+            value_var.set(text)
+            if color:
+                value_label.configure(foreground=color)
+        self.gst_cards[2][2].configure(text=net_status(summary.net_gst), foreground=net)
+
+        # Comparison table and side-by-side details
+        self.gst_comparison_rows.show([
+            [(f"{row.gst_percent:.1f}%", gst_color(row.gst_percent)), (f"₹{row.output_gst:,.2f}", None),
+             (f"₹{row.input_gst:,.2f}", None), (f"₹{row.net_gst:,.2f}", net_color(row.net_gst)),
+             (str(row.output_orders), None), (str(row.input_orders), None)]
+            for row in summary.comparison])
+        for rows, totals in zip(self.gst_detail_rows, (summary.output, summary.input)):
+            rows.show([
+                [(f"{row.gst_percent:.1f}%", gst_color(row.gst_percent)), (f"₹{row.base:,.0f}", None),
+                 (f"₹{row.gst:,.0f}", gst_color(row.gst_percent)), (f"{row.orders}", None), (f"{row.items}", None)]
+                for row in totals])
     
     # ==================== INVOICES TAB ====================
     
-    def create_invoices_tab(self):
+    def create_invoices_tab(self, inv_frame):
         """Create invoices tab"""
-        inv_frame = ttk.Frame(self.notebook)
-        self.notebook.add(inv_frame, text="📄 Invoices")
         
         top_frame = ttk.Frame(inv_frame)
         top_frame.pack(side='top', fill='x', padx=10, pady=8)
@@ -1585,58 +1467,41 @@ class SalesModule:
         list_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
         columns = ("Inv#", "SO#", "Customer", "Date", "Due Date", "Subtotal", "GST", "Total", "Status")
-        self.inv_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=20)
-        
         widths = [50, 50, 130, 90, 90, 80, 70, 90, 80]
-        for i, col in enumerate(columns):
-            self.inv_tree.heading(col, text=col)
-            self.inv_tree.column(col, width=widths[i])
+        sort_columns = dict(zip(columns, ("invoice_id", "so_number", "name", "invoice_date", "due_date",
+                                          "subtotal", "total_gst", "total_amount", "status")))
+        self.inv_tree = VirtualTreeview(list_frame, self.app.executor, 'invoices', queries.INVOICE_LIST,
+                                        'invoice_id', columns, widths, self.format_invoice_row,
+                                        sort_columns=sort_columns, descending=True, height=20)
+        self.inv_tree.tag_configure('paid', background='#d4edda', foreground='#155724')
+        self.inv_tree.tag_configure('unpaid', background='#f8d7da', foreground='#721c24')
         
         self.inv_tree.pack(side='left', fill='both', expand=True)
         
-        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.inv_tree.yview)
+        scrollbar = ttk.Scrollbar(list_frame, orient='vertical')
         scrollbar.pack(side='right', fill='y')
-        self.inv_tree.configure(yscrollcommand=scrollbar.set)
+        self.inv_tree.set_scrollbar(scrollbar)
         
         self.refresh_invoices()
     
-    def refresh_invoices(self):
-        """Refresh invoices list"""
-        for item in self.inv_tree.get_children():
-            self.inv_tree.delete(item)
-        
-        self.db.execute('''
-            SELECT inv.invoice_id, inv.so_number, c.name, inv.invoice_date, inv.due_date,
-                inv.subtotal, inv.total_gst, inv.total_amount, inv.status
-            FROM Invoices inv
-            JOIN Customers c ON inv.customer_id = c.customer_id
-            ORDER BY inv.invoice_id DESC
-        ''')
-        
-        for row in self.db.fetchall():
-            display_row = (row[0], row[1], row[2], row[3], row[4],
-                          f"₹{row[5]:.2f}", f"₹{row[6]:.2f}", f"₹{row[7]:.2f}", row[8])
-            
-            # Insert ONCE with appropriate tag
-            if row[8] == "Paid":
-                self.inv_tree.insert('', 'end', values=display_row, tags=('paid',))
-            else:
-                self.inv_tree.insert('', 'end', values=display_row, tags=('unpaid',))
+    def refresh_invoices(self, invoice_ids=None):
+        """Reload the invoices list in the background (only these invoices, if given)"""
+        if not hasattr(self, 'inv_tree'):
+            return  # tab not opened yet
+        if invoice_ids is None:
+            self.inv_tree.refresh()
+        else:
+            self.inv_tree.refresh_rows(invoice_ids)
     
-        self.inv_tree.tag_configure('paid', background='#d4edda', foreground='#155724')
-        self.inv_tree.tag_configure('unpaid', background='#f8d7da', foreground='#721c24')
+    def format_invoice_row(self, row):
+        display_row = (row.invoice_id, row.so_number, row.name, row.invoice_date, row.due_date,
+                      f"₹{row.subtotal:.2f}", f"₹{row.total_gst:.2f}", f"₹{row.total_amount:.2f}", row.status)
+        return display_row, ('paid',) if row.status == "Paid" else ('unpaid',)
 
     def generate_invoice(self):
         """Generate invoice from delivered sales order"""
         # Get delivered orders that don't have invoices
-        self.db.execute('''
-            SELECT so.so_number, c.name, so.delivery_date, so.subtotal, so.total_gst, so.total_amount
-            FROM Sales_Orders so
-            JOIN Customers c ON so.customer_id = c.customer_id
-            WHERE so.status = 'Delivered' 
-            AND so.so_number NOT IN (SELECT so_number FROM Invoices WHERE so_number IS NOT NULL)
-            ORDER BY so.so_number DESC
-        ''')
+        self.db.execute(queries.UNINVOICED_SOS)
         
         orders = self.db.fetchall()
         
@@ -1656,7 +1521,7 @@ class SalesModule:
         frame = ttk.LabelFrame(dialog, text="Delivered Orders", padding=10)
         frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        so_dict = {f"SO #{so[0]} - {so[1]} (₹{so[5]:.2f})": so for so in orders}
+        so_dict = {f"SO #{so.so_number} - {so.name} (₹{so.total_amount:.2f})": so for so in orders}
         so_var = tk.StringVar()
         
         for label in so_dict.keys():
@@ -1678,27 +1543,24 @@ class SalesModule:
             
             try:
                 so_data = so_dict[so_var.get()]
-                so_number = so_data[0]
+                so_number = so_data.so_number
                 
-                # Get customer ID
-                self.db.execute("SELECT customer_id FROM Sales_Orders WHERE so_number = ?", (so_number,))
-                customer_id = self.db.fetchone()[0]
+                with self.db.transaction():
+                    # Get customer ID
+                    self.db.execute(queries.SO_CUSTOMER, (so_number,))
+                    customer_id = self.db.fetchone()[0]
                 
-                # Create invoice
-                self.db.execute('''
-                    INSERT INTO Invoices (so_number, customer_id, invoice_date, due_date,
-                        subtotal, total_gst, total_amount, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (so_number, customer_id, datetime.now().date(), due_entry.get(),
-                      so_data[3], so_data[4], so_data[5], 'Unpaid'))
+                    # Create invoice
+                    self.db.execute(queries.INVOICE_INSERT, (so_number, customer_id, datetime.now().date(), due_entry.get(),
+                          so_data.subtotal, so_data.total_gst, so_data.total_amount, 'Unpaid'))
                 
-                invoice_id = self.db.lastrowid()
-                self.db.commit()
+                    invoice_id = self.db.lastrowid()
+                self.app.changes.publish(INVOICES, [invoice_id])
+                self.app.changes.publish(SALES_ORDERS, [so_number])
                 
                 messagebox.showinfo("Success", 
-                    f"Invoice #{invoice_id} generated!\n\nSO #{so_number}\nAmount: ₹{so_data[5]:.2f}\nDue: {due_entry.get()}")
+                    f"Invoice #{invoice_id} generated!\n\nSO #{so_number}\nAmount: ₹{so_data.total_amount:.2f}\nDue: {due_entry.get()}")
                 dialog.destroy()
-                self.refresh_invoices()
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed: {str(e)}")
@@ -1730,19 +1592,17 @@ class SalesModule:
 
         if messagebox.askyesno("Confirm Payment",f"Mark Invoice #{invoice_id} as Paid?\n\nCustomer: {customer}\nAmount: {amount}\n\nThis action will update the payment status."):
             try:
-                # Update invoice status
-                self.db.execute(
-                    "UPDATE Invoices SET status = 'Paid' WHERE invoice_id = ?",
-                    (invoice_id,)
-                )
-                self.db.commit()
+                with self.db.transaction():
+                    # Update invoice status
+                    self.db.execute(
+                        queries.INVOICE_MARK_PAID,
+                        (invoice_id,)
+                    )
+                self.app.changes.publish(INVOICES, [invoice_id])
 
                 messagebox.showinfo("Success", f"Invoice #{invoice_id} marked as Paid!")
-                self.refresh_invoices()
-                self.refresh_sales_reports()  # Update reports
 
             except Exception as e:
-                self.db.rollback()
                 messagebox.showerror("Error", f"Failed to update invoice: {str(e)}")
 
     
@@ -1758,14 +1618,7 @@ class SalesModule:
         so_number = values[1]
         
         # Get invoice details
-        self.db.execute('''
-            SELECT inv.invoice_id, inv.so_number, c.name, c.gstin, c.address,
-                inv.invoice_date, inv.due_date, inv.subtotal, inv.total_gst, 
-                inv.total_amount, inv.status
-            FROM Invoices inv
-            JOIN Customers c ON inv.customer_id = c.customer_id
-            WHERE inv.invoice_id = ?
-        ''', (invoice_id,))
+        self.db.execute(queries.INVOICE_DETAIL, (invoice_id,))
         
         inv_data = self.db.fetchone()
         
@@ -1788,18 +1641,18 @@ class SalesModule:
         cust_frame = ttk.LabelFrame(dialog, text="Customer Information", padding=10)
         cust_frame.pack(fill='x', padx=10, pady=10)
         
-        ttk.Label(cust_frame, text=f"Name: {inv_data[2]}", font=('Arial', 10)).pack(anchor='w', pady=2)
-        ttk.Label(cust_frame, text=f"GSTIN: {inv_data[3] or 'N/A'}", font=('Arial', 10)).pack(anchor='w', pady=2)
-        ttk.Label(cust_frame, text=f"Address: {inv_data[4] or 'N/A'}", font=('Arial', 10)).pack(anchor='w', pady=2)
+        ttk.Label(cust_frame, text=f"Name: {inv_data.name}", font=('Arial', 10)).pack(anchor='w', pady=2)
+        ttk.Label(cust_frame, text=f"GSTIN: {inv_data.gstin or 'N/A'}", font=('Arial', 10)).pack(anchor='w', pady=2)
+        ttk.Label(cust_frame, text=f"Address: {inv_data.address or 'N/A'}", font=('Arial', 10)).pack(anchor='w', pady=2)
         
         # Invoice Info
         info_frame = ttk.LabelFrame(dialog, text="Invoice Information", padding=10)
         info_frame.pack(fill='x', padx=10, pady=10)
         
         info_labels = [
-            f"Invoice Date: {inv_data[5]}",
-            f"Due Date: {inv_data[6]}",
-            f"Status: {inv_data[10]}"
+            f"Invoice Date: {inv_data.invoice_date}",
+            f"Due Date: {inv_data.due_date}",
+            f"Status: {inv_data.status}"
         ]
         
         for text in info_labels:
@@ -1818,18 +1671,12 @@ class SalesModule:
         tree.pack(fill='both', expand=True)
         
         # Get items from sales order
-        self.db.execute('''
-            SELECT i.name, soi.quantity, soi.rate, soi.gst_percent, 
-                soi.gst_amount, soi.total_price
-            FROM Sales_Order_Items soi
-            JOIN Items i ON soi.item_id = i.item_id
-            WHERE soi.so_number = ?
-        ''', (so_number,))
+        self.db.execute(queries.SO_LINES, (so_number,))
         
         for row in self.db.fetchall():
             tree.insert('', 'end', values=(
-                row[0], row[1], f"₹{row[2]:.2f}", 
-                f"{row[3]:.1f}%", f"₹{row[4]:.2f}", f"₹{row[5]:.2f}"
+                row.name, row.quantity, f"₹{row.rate:.2f}", 
+                f"{row.gst_percent:.1f}%", f"₹{row.gst_amount:.2f}", f"₹{row.total_price:.2f}"
             ))
         
         # Amount Summary
@@ -1838,12 +1685,12 @@ class SalesModule:
         
         ttk.Label(summary_frame, text="Subtotal:", font=('Arial', 10)).grid(
             row=0, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{inv_data[7]:.2f}", font=('Arial', 10, 'bold')).grid(
+        ttk.Label(summary_frame, text=f"₹{inv_data.subtotal:.2f}", font=('Arial', 10, 'bold')).grid(
             row=0, column=1, sticky='e', padx=10, pady=3)
         
         ttk.Label(summary_frame, text="GST:", font=('Arial', 10)).grid(
             row=1, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{inv_data[8]:.2f}", font=('Arial', 10, 'bold'), 
+        ttk.Label(summary_frame, text=f"₹{inv_data.total_gst:.2f}", font=('Arial', 10, 'bold'), 
             foreground='blue').grid(row=1, column=1, sticky='e', padx=10, pady=3)
         
         ttk.Separator(summary_frame, orient='horizontal').grid(
@@ -1851,12 +1698,12 @@ class SalesModule:
         
         ttk.Label(summary_frame, text="Total Amount:", font=('Arial', 12, 'bold')).grid(
             row=3, column=0, sticky='w', padx=10, pady=3)
-        ttk.Label(summary_frame, text=f"₹{inv_data[9]:.2f}", font=('Arial', 12, 'bold'), 
+        ttk.Label(summary_frame, text=f"₹{inv_data.total_amount:.2f}", font=('Arial', 12, 'bold'), 
             foreground='green').grid(row=3, column=1, sticky='e', padx=10, pady=3)
         
         # Status badge
-        status_color = 'green' if inv_data[10] == 'Paid' else 'red'
-        ttk.Label(summary_frame, text=f"Payment Status: {inv_data[10]}", 
+        status_color = 'green' if inv_data.status == 'Paid' else 'red'
+        ttk.Label(summary_frame, text=f"Payment Status: {inv_data.status}", 
             font=('Arial', 11, 'bold'), foreground=status_color).grid(
             row=4, column=0, columnspan=2, pady=10)
         
@@ -1864,15 +1711,14 @@ class SalesModule:
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(pady=10)
         
-        if inv_data[10] == 'Unpaid':
+        if inv_data.status == 'Unpaid':
             def mark_paid_from_view():
                 try:
-                    self.db.execute("UPDATE Invoices SET status = 'Paid' WHERE invoice_id = ?", (invoice_id,))
-                    self.db.commit()
+                    with self.db.transaction():
+                        self.db.execute(queries.INVOICE_MARK_PAID, (invoice_id,))
+                    self.app.changes.publish(INVOICES, [invoice_id])
                     messagebox.showinfo("Success", f"Invoice #{invoice_id} marked as Paid!")
                     dialog.destroy()
-                    self.refresh_invoices()
-                    self.refresh_sales_reports()
                 except Exception as e:
                     messagebox.showerror("Error", str(e))
             
@@ -1885,10 +1731,8 @@ class SalesModule:
     
     # ==================== SALES REPORTS TAB ====================
     
-    def create_sales_reports_tab(self):
+    def create_sales_reports_tab(self, report_frame):
         """Create sales reports tab"""
-        report_frame = ttk.Frame(self.notebook)
-        self.notebook.add(report_frame, text="📊 Reports")
     
         top_frame = ttk.Frame(report_frame)
         top_frame.pack(side='top', fill='x', padx=10, pady=10)
@@ -1927,6 +1771,7 @@ class SalesModule:
         # ADD THIS SECTION - GST Brackets Frame
         self.gst_brackets_frame = ttk.LabelFrame(report_frame, text="💰 GST Collection Breakdown by Tax Bracket", padding=15)
         self.gst_brackets_frame.pack(fill='x', padx=10, pady=10)
+        self.create_sales_bracket_panel(self.gst_brackets_frame)
     
         # Top customers
         customers_frame = ttk.LabelFrame(report_frame, text="Top Customers by Revenue (Double-click to view details)", padding=10)
@@ -1952,169 +1797,143 @@ class SalesModule:
         self.refresh_sales_reports()
     
     def refresh_sales_reports(self):
-        """Refresh sales reports and statistics"""
+        """Reload sales reports and statistics in the background"""
+        if not hasattr(self, 'report_tree'):
+            return  # tab not opened yet
+        for label in self.stats_labels.values():
+            label.config(text="...")
+        show_loading(self.report_tree)
+        self.app.executor.submit('sales_reports', self.load_sales_reports, self.show_sales_reports)
+    
+    def create_sales_bracket_panel(self, parent):
+        """Build the GST bracket breakdown once; show_sales_brackets only fills it in"""
+        self.sales_brackets = ()    # brackets on screen (never equal to new ones before the first load)
+        self.brackets_loading = ttk.Label(parent, text=LOADING_TEXT, font=('Arial', 12), foreground='gray')
+        self.brackets_loading.pack(pady=40)
+        self.brackets_content = ttk.Frame(parent)
+
+        # Add color legend at the top
+        legend_frame = ttk.Frame(self.brackets_content)
+        legend_frame.pack(fill='x', pady=(0, 10))
+        
+        ttk.Label(legend_frame, text="Color Legend:", 
+            font=('Arial', 9, 'bold')).pack(side='left', padx=(0, 10))
+        
+        # Color indicators
+        for _, text, color in GST_BRACKETS:
+            ttk.Label(legend_frame, text=f"● {text}", 
+                font=('Arial', 9), foreground=color).pack(side='left', padx=5)
+        
+        ttk.Label(legend_frame, text="(Higher rates = warmer colors)", 
+            font=('Arial', 8), foreground='gray').pack(side='left', padx=(10, 0))
+        
+        # Create header
+        header = LabelRows(self.brackets_content, header_columns(GST_BRACKET_COLUMNS, ('Arial', 9, 'bold')), pady=0)
+        header.pack(fill='x', pady=(0, 5))
+        header.show([header_cells(("Tax Rate", "Base Amount", "GST Collected", "Total (Inc GST)", "Orders", "Items"))])
+        
+        # Add separator
+        ttk.Separator(self.brackets_content, orient='horizontal').pack(fill='x', pady=5)
+        
+        # One row per bracket
+        self.bracket_rows = LabelRows(self.brackets_content, GST_BRACKET_COLUMNS)
+        self.bracket_rows.pack(fill='x')
+        
+        # Add total row
+        ttk.Separator(self.brackets_content, orient='horizontal').pack(fill='x', pady=5)
+        
+        self.bracket_total = LabelRows(self.brackets_content, header_columns(GST_BRACKET_COLUMNS[:4], ('Arial', 10, 'bold')), pady=0)
+        self.bracket_total.pack(fill='x', pady=5)
+        
+        # Add info note
+        info_frame = ttk.Frame(self.brackets_content)
+        info_frame.pack(fill='x', pady=(10, 0))
+        ttk.Label(info_frame, 
+            text="ℹ️ GST liability to be paid to government: Red amount above. This is calculated from all sales orders.", 
+            font=('Arial', 9), foreground='#666666').pack()
+        
+        # No sales data
+        self.brackets_empty = ttk.Label(parent, 
+            text="No sales data available yet. GST brackets will appear once orders are created.", 
+            font=('Arial', 10), foreground='gray')
+    
+    def show_sales_brackets(self, brackets):
+        """Update the GST bracket breakdown in place from a gst_summary.SalesBrackets (None: no sales)"""
+        if brackets == self.sales_brackets:
+            return  # nothing changed since the last refresh
+        self.brackets_loading.pack_forget()
+        self.sales_brackets = brackets
+        if brackets is None:
+            self.brackets_content.pack_forget()
+            self.brackets_empty.pack(pady=20)
+            return
+        self.brackets_empty.pack_forget()
+        self.brackets_content.pack(fill='x')
+        
+        self.bracket_rows.show([
+            [(f"{row.gst_percent:.1f}%", gst_color(row.gst_percent)), (f"₹{row.base:.2f}", None),
+             (f"₹{row.gst:.2f}", gst_color(row.gst_percent)), (f"₹{row.with_gst:.2f}", None),
+             (str(row.orders), None), (str(row.items), None)]
+            for row in brackets.brackets])
+        self.bracket_total.show([[("TOTAL", None), (f"₹{brackets.base:.2f}", 'blue'),
+                                  (f"₹{brackets.gst:.2f}", 'red'), (f"₹{brackets.with_gst:.2f}", 'green')]])
+    
+    def load_sales_reports(self, report):
+        """Every figure and table of the reports tab (runs on a worker thread, one read snapshot)"""
+        stats = report.fetchone(queries.DASHBOARD_STATS)
+        return {
+            'total_orders': stats.so_count,
+            'pending_orders': stats.so_pending_count,
+            'delivered_orders': stats.so_delivered_count,
+            'total_revenue': stats.so_value,
+            'pending_revenue': stats.so_pending_value,
+            'total_invoices': stats.invoice_count,
+            'unpaid_invoices': stats.invoice_unpaid_count,
+            'total_customers': stats.customer_count,
+            # GST collected by bracket from all sales orders
+            'gst_brackets': load_sales_brackets(report),
+            'top_customers': report.fetchall(queries.TOP_CUSTOMERS),
+        }
+    
+    def show_sales_reports(self, data):
+        """Fill the reports tab with what load_sales_reports returned"""
+        total_orders = data['total_orders']
+        pending_orders = data['pending_orders']
+        delivered_orders = data['delivered_orders']
+        total_rev = data['total_revenue']
+        pending_rev = data['pending_revenue']
+        total_invoices = data['total_invoices']
+        unpaid_invoices = data['unpaid_invoices']
+        total_customers = data['total_customers']
+        gst_brackets = data['gst_brackets']
+        top_customers = data['top_customers']
         
         # Total orders
-        self.db.execute("SELECT COUNT(*) FROM Sales_Orders")
-        self.stats_labels['total_orders'].config(text=str(self.db.fetchone()[0]))
+        self.stats_labels['total_orders'].config(text=str(total_orders))
         
         # Pending orders
-        self.db.execute("SELECT COUNT(*) FROM Sales_Orders WHERE status = 'Pending'")
-        self.stats_labels['pending_orders'].config(text=str(self.db.fetchone()[0]))
+        self.stats_labels['pending_orders'].config(text=str(pending_orders))
         
         # Delivered orders
-        self.db.execute("SELECT COUNT(*) FROM Sales_Orders WHERE status = 'Delivered'")
-        self.stats_labels['delivered_orders'].config(text=str(self.db.fetchone()[0]))
+        self.stats_labels['delivered_orders'].config(text=str(delivered_orders))
         
         # Total revenue (all orders)
-        self.db.execute("SELECT COALESCE(SUM(total_amount), 0) FROM Sales_Orders")
-        total_rev = self.db.fetchone()[0]
         self.stats_labels['total_revenue'].config(text=f"₹{total_rev:.2f}")
         
         # Pending revenue
-        self.db.execute("SELECT COALESCE(SUM(total_amount), 0) FROM Sales_Orders WHERE status = 'Pending'")
-        pending_rev = self.db.fetchone()[0]
         self.stats_labels['pending_revenue'].config(text=f"₹{pending_rev:.2f}")
         
         # Total invoices
-        self.db.execute("SELECT COUNT(*) FROM Invoices")
-        self.stats_labels['total_invoices'].config(text=str(self.db.fetchone()[0]))
+        self.stats_labels['total_invoices'].config(text=str(total_invoices))
         
         # Unpaid invoices
-        self.db.execute("SELECT COUNT(*) FROM Invoices WHERE status = 'Unpaid'")
-        self.stats_labels['unpaid_invoices'].config(text=str(self.db.fetchone()[0]))
-        
-                # Total customers
-        self.db.execute("SELECT COUNT(*) FROM Customers")
-        self.stats_labels['total_customers'].config(text=str(self.db.fetchone()[0]))
-        
-        # Clear existing GST brackets content to prevent duplication
-        for widget in self.gst_brackets_frame.winfo_children():
-            widget.destroy()
-        
-        # Query to get GST collected by bracket from all sales orders
-        self.db.execute('''
-            SELECT 
-                soi.gst_percent,
-                COALESCE(SUM(soi.gst_amount), 0) as total_gst_collected,
-                COALESCE(SUM(soi.rate * soi.quantity), 0) as total_base_amount,
-                COALESCE(SUM(soi.total_price), 0) as total_with_gst,
-                COUNT(DISTINCT so.so_number) as order_count,
-                COUNT(*) as item_count
-            FROM Sales_Order_Items soi
-            JOIN Sales_Orders so ON soi.so_number = so.so_number
-            GROUP BY soi.gst_percent
-            ORDER BY soi.gst_percent
-        ''')
-        
-        gst_brackets = self.db.fetchall()
-        
-        if gst_brackets:
-            # Add color legend at the top
-            legend_frame = ttk.Frame(self.gst_brackets_frame)
-            legend_frame.pack(fill='x', pady=(0, 10))
-            
-            ttk.Label(legend_frame, text="Color Legend:", 
-                font=('Arial', 9, 'bold')).pack(side='left', padx=(0, 10))
-            
-            # Color indicators
-            ttk.Label(legend_frame, text="● 0%", 
-                font=('Arial', 9), foreground='#666666').pack(side='left', padx=5)
-            ttk.Label(legend_frame, text="● 1-5%", 
-                font=('Arial', 9), foreground='#28a745').pack(side='left', padx=5)
-            ttk.Label(legend_frame, text="● 6-12%", 
-                font=('Arial', 9), foreground='#17a2b8').pack(side='left', padx=5)
-            ttk.Label(legend_frame, text="● 13-18%", 
-                font=('Arial', 9), foreground='#ffc107').pack(side='left', padx=5)
-            ttk.Label(legend_frame, text="● 19%+", 
-                font=('Arial', 9), foreground='#dc3545').pack(side='left', padx=5)
-            
-            ttk.Label(legend_frame, text="(Higher rates = warmer colors)", 
-                font=('Arial', 8), foreground='gray').pack(side='left', padx=(10, 0))
-            
-            # Create header
-            header_frame = ttk.Frame(self.gst_brackets_frame)
-            header_frame.pack(fill='x', pady=(0, 5))
-            
-            ttk.Label(header_frame, text="Tax Rate", font=('Arial', 9, 'bold'), width=12).pack(side='left', padx=5)
-            ttk.Label(header_frame, text="Base Amount", font=('Arial', 9, 'bold'), width=15).pack(side='left', padx=5)
-            ttk.Label(header_frame, text="GST Collected", font=('Arial', 9, 'bold'), width=15).pack(side='left', padx=5)
-            ttk.Label(header_frame, text="Total (Inc GST)", font=('Arial', 9, 'bold'), width=15).pack(side='left', padx=5)
-            ttk.Label(header_frame, text="Orders", font=('Arial', 9, 'bold'), width=10).pack(side='left', padx=5)
-            ttk.Label(header_frame, text="Items", font=('Arial', 9, 'bold'), width=10).pack(side='left', padx=5)
-            
-            # Add separator
-            ttk.Separator(self.gst_brackets_frame, orient='horizontal').pack(fill='x', pady=5)
-            
-            # Display each bracket
-            total_base = 0
-            total_gst = 0
-            total_with_gst = 0
-            
-            for bracket in gst_brackets:
-                gst_percent, gst_collected, base_amount, amount_with_gst, orders, items = bracket
-                
-                total_base += base_amount
-                total_gst += gst_collected
-                total_with_gst += amount_with_gst
-                
-                bracket_frame = ttk.Frame(self.gst_brackets_frame)
-                bracket_frame.pack(fill='x', pady=2)
-                
-                # Color code based on GST rate
-                if gst_percent == 0:
-                    color = '#666666'  # Gray for 0%
-                elif gst_percent <= 5:
-                    color = '#28a745'  # Green for low tax
-                elif gst_percent <= 12:
-                    color = '#17a2b8'  # Blue for medium-low
-                elif gst_percent <= 18:
-                    color = '#ffc107'  # Yellow for medium
-                else:
-                    color = '#dc3545'  # Red for high tax
-                
-                ttk.Label(bracket_frame, text=f"{gst_percent:.1f}%", 
-                    font=('Arial', 10, 'bold'), foreground=color, width=12).pack(side='left', padx=5)
-                ttk.Label(bracket_frame, text=f"₹{base_amount:.2f}", 
-                    font=('Arial', 10), width=15).pack(side='left', padx=5)
-                ttk.Label(bracket_frame, text=f"₹{gst_collected:.2f}", 
-                    font=('Arial', 10, 'bold'), foreground=color, width=15).pack(side='left', padx=5)
-                ttk.Label(bracket_frame, text=f"₹{amount_with_gst:.2f}", 
-                    font=('Arial', 10), width=15).pack(side='left', padx=5)
-                ttk.Label(bracket_frame, text=str(orders), 
-                    font=('Arial', 10), width=10).pack(side='left', padx=5)
-                ttk.Label(bracket_frame, text=str(items), 
-                    font=('Arial', 10), width=10).pack(side='left', padx=5)
-            
-            # Add total row
-            ttk.Separator(self.gst_brackets_frame, orient='horizontal').pack(fill='x', pady=5)
-            
-            total_frame = ttk.Frame(self.gst_brackets_frame)
-            total_frame.pack(fill='x', pady=5)
-            
-            ttk.Label(total_frame, text="TOTAL", 
-                font=('Arial', 10, 'bold'), width=12).pack(side='left', padx=5)
-            ttk.Label(total_frame, text=f"₹{total_base:.2f}", 
-                font=('Arial', 10, 'bold'), foreground='blue', width=15).pack(side='left', padx=5)
-            ttk.Label(total_frame, text=f"₹{total_gst:.2f}", 
-                font=('Arial', 10, 'bold'), foreground='red', width=15).pack(side='left', padx=5)
-            ttk.Label(total_frame, text=f"₹{total_with_gst:.2f}", 
-                font=('Arial', 10, 'bold'), foreground='green', width=15).pack(side='left', padx=5)
-            
-            # Add info note
-            info_frame = ttk.Frame(self.gst_brackets_frame)
-            info_frame.pack(fill='x', pady=(10, 0))
-            ttk.Label(info_frame, 
-                text="ℹ️ GST liability to be paid to government: Red amount above. This is calculated from all sales orders.", 
-                font=('Arial', 9), foreground='#666666').pack()
-            
-        else:
-            # No sales data
-            ttk.Label(self.gst_brackets_frame, 
-                text="No sales data available yet. GST brackets will appear once orders are created.", 
-                font=('Arial', 10), foreground='gray').pack(pady=20)
+        self.stats_labels['unpaid_invoices'].config(text=str(unpaid_invoices))
         
-        # === END GST BRACKET BREAKDOWN ===
+        # Total customers
+        self.stats_labels['total_customers'].config(text=str(total_customers))
+        
+        # GST bracket breakdown (updated in place)
+        self.show_sales_brackets(gst_brackets)
         
         # Top customers with GST breakdown
         for item in self.report_tree.get_children():
@@ -2124,34 +1943,18 @@ class SalesModule:
         for item in self.report_tree.get_children():
             self.report_tree.delete(item)
         
-        self.db.execute('''
-            SELECT c.customer_id,
-                c.name, 
-                COUNT(so.so_number) as order_count,
-                COALESCE(SUM(so.subtotal), 0) as total_subtotal,
-                COALESCE(SUM(so.total_gst), 0) as total_gst,
-                COALESCE(SUM(so.total_amount), 0) as total_revenue,
-                COALESCE(AVG(so.total_amount), 0) as avg_order
-            FROM Customers c
-            LEFT JOIN Sales_Orders so ON c.customer_id = so.customer_id
-            GROUP BY c.customer_id, c.name
-            HAVING order_count > 0
-            ORDER BY total_revenue DESC
-            LIMIT 20
-        ''')
-        
-        for row in self.db.fetchall():
+        for row in top_customers:
             # Store customer_id in the item's tags for later retrieval
             item_id = self.report_tree.insert('', 'end', values=(
-                row[1],  # Customer name
-                row[2],  # Order count
-                f"₹{row[3]:.2f}",  # Subtotal
-                f"₹{row[4]:.2f}",  # GST
-                f"₹{row[5]:.2f}",  # Total
-                f"₹{row[6]:.2f}"   # Avg
+                row.name,
+                row.order_count,
+                f"₹{row.total_subtotal:.2f}",
+                f"₹{row.total_gst:.2f}",
+                f"₹{row.total_revenue:.2f}",
+                f"₹{row.avg_order:.2f}"
             ))
             # Store customer_id as a tag so we can retrieve it later
-            self.report_tree.item(item_id, tags=(str(row[0]),))
+            self.report_tree.item(item_id, tags=(str(row.customer_id),))
     
     def view_customer_order_details(self):
         """View detailed order breakdown for a customer"""
@@ -2189,25 +1992,16 @@ class SalesModule:
         summary_frame = ttk.LabelFrame(dialog, text="Customer Summary", padding=10)
         summary_frame.pack(fill='x', padx=10, pady=10)
         
-        # Get summary data
-        self.db.execute('''
-            SELECT 
-                COUNT(so.so_number) as total_orders,
-                COALESCE(SUM(so.subtotal), 0) as total_subtotal,
-                COALESCE(SUM(so.total_gst), 0) as total_gst,
-                COALESCE(SUM(so.total_amount), 0) as total_amount,
-                COALESCE(AVG(so.total_amount), 0) as avg_order
-            FROM Sales_Orders so
-            WHERE so.customer_id = ?
-        ''', (customer_id,))
-        
-        summary = self.db.fetchone()
-        
-        summary_text = f"Total Orders: {summary[0]}  |  "
-        summary_text += f"Subtotal: ₹{summary[1]:.2f}  |  "
-        summary_text += f"GST: ₹{summary[2]:.2f}  |  "
-        summary_text += f"Total: ₹{summary[3]:.2f}  |  "
-        summary_text += f"Avg Order: ₹{summary[4]:.2f}"
+        # Get summary data (and the orders it adds up) from one read snapshot
+        with self.db.read_snapshot() as report:
+            summary = report.fetchone(queries.CUSTOMER_SALES_TOTALS, (customer_id,))
+            orders = report.fetchall(queries.CUSTOMER_ORDERS, (customer_id,))
+        
+        summary_text = f"Total Orders: {summary.total_orders}  |  "
+        summary_text += f"Subtotal: ₹{summary.total_subtotal:.2f}  |  "
+        summary_text += f"GST: ₹{summary.total_gst:.2f}  |  "
+        summary_text += f"Total: ₹{summary.total_amount:.2f}  |  "
+        summary_text += f"Avg Order: ₹{summary.avg_order:.2f}"
         
         ttk.Label(summary_frame, text=summary_text, font=('Arial', 10, 'bold'), 
             foreground='blue').pack()
@@ -2230,25 +2024,16 @@ class SalesModule:
         scrollbar.pack(side='right', fill='y')
         tree.configure(yscrollcommand=scrollbar.set)
         
-        # Get all orders for this customer
-        self.db.execute('''
-            SELECT so.so_number, so.order_date, so.status,
-                (SELECT COUNT(*) FROM Sales_Order_Items WHERE so_number = so.so_number) as item_count,
-                so.subtotal, so.total_gst, so.total_amount
-            FROM Sales_Orders so
-            WHERE so.customer_id = ?
-            ORDER BY so.so_number DESC
-        ''', (customer_id,))
-        
-        for row in self.db.fetchall():
+        # All orders for this customer
+        for row in orders:
             tree.insert('', 'end', values=(
-                row[0],  # SO#
-                row[1],  # Date
-                row[2],  # Status
-                row[3],  # Items count
-                f"₹{row[4]:.2f}",  # Subtotal
-                f"₹{row[5]:.2f}",  # GST
-                f"₹{row[6]:.2f}"   # Total
+                row.so_number,
+                row.order_date,
+                row.status,
+                row.item_count,
+                f"₹{row.subtotal:.2f}",
+                f"₹{row.total_gst:.2f}",
+                f"₹{row.total_amount:.2f}"
             ))
         
         # Info label
@@ -0,0 +1,141 @@
+"""
+Sample Data Module - Generates realistic purchase/sales history for benchmarks and query checks
+"""
+
+import random
+from datetime import date, timedelta
+
+from stock_ledger import rebuild_reservations
+
+GST_RATES = [0.0, 5.0, 12.0, 18.0, 28.0]
+CATEGORIES = ["Electronics", "Hardware", "Stationery", "Furniture", "Packaging", "Consumables"]
+
+
+def _order_dates(rng, count, start, days):
+    """Random order dates within [start, start + days)"""
+    for _ in range(count):
+        yield start + timedelta(days=rng.randrange(days))
+
+
+def seed_database(db, order_lines=10000, items=2000, suppliers=200, customers=1000,
+                  lines_per_order=5, years=3, seed=42):
+    """Fill an empty database with generated masters and order history.
+
+    order_lines is split evenly between purchase and sales order lines.
+    Returns a dict with the row counts that were generated.
+    """
+    rng = random.Random(seed)
+    conn = db.conn
+    start = date.today() - timedelta(days=365 * years)
+    days = 365 * years
+
+    # ---- Masters ----
+    item_rows = []
+    for item_id in range(1, items + 1):
+        p_rate = round(rng.uniform(10, 5000), 2)
+        p_gst = rng.choice(GST_RATES)
+        s_rate = round(p_rate * rng.uniform(1.1, 1.6), 2)
+        s_gst = p_gst
+        item_rows.append((item_id, f"Item {item_id:06d}", f"Sample item {item_id}", rng.choice(CATEGORIES),
+                          "Nos", p_rate, p_gst, round(p_rate * (1 + p_gst / 100), 2),
+                          s_rate, s_gst, round(s_rate * (1 + s_gst / 100), 2), f"{8400 + item_id % 100}"))
+    conn.executemany('''INSERT INTO Items (item_id, name, description, category, unit_of_measure,
+        purchase_rate, purchase_gst_percent, purchase_price, selling_rate, selling_gst_percent,
+        selling_price, hsn_code) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', item_rows)
+    # Opening stock goes through the ledger, which fills in quantity_on_hand
+    stock = [(i, rng.randrange(0, 500), rng.randrange(5, 50)) for i in range(1, items + 1)]
+    conn.executemany('''INSERT INTO Inventory (item_id, quantity_on_hand, reorder_level, location, last_updated)
+        VALUES (?, 0, ?, ?, ?)''', ((i, reorder, f"Rack {i % 40}", start) for i, _, reorder in stock))
+    conn.executemany('''INSERT INTO Inventory_Movements (item_id, quantity, movement_date, source_type)
+        VALUES (?, ?, ?, 'opening')''', ((i, qty, start) for i, qty, _ in stock if qty))
+    conn.executemany('''INSERT INTO Suppliers (supplier_id, name, contact_person, phone, email, address, gstin, payment_terms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+        ((s, f"Supplier {s:05d}", f"Contact {s}", f"98{s:08d}", f"supplier{s}@example.com",
+          f"{s} Industrial Area", f"27AAAAA{s:04d}A1Z5", "Net 30") for s in range(1, suppliers + 1)))
+    conn.executemany('''INSERT INTO Customers (customer_id, name, contact_person, phone, email, address, gstin,
+        credit_limit, payment_terms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        ((c, f"Customer {c:06d}", f"Buyer {c}", f"99{c:08d}", f"customer{c}@example.com",
+          f"{c} Market Road", f"29BBBBB{c:04d}B1Z5", 100000.0, "Net 15") for c in range(1, customers + 1)))
+
+    prices = {row[0]: (row[5], row[6], row[8], row[9]) for row in item_rows}
+
+    # ---- Purchase side ----
+    po_lines_target = order_lines // 2
+    po_count = max(1, po_lines_target // lines_per_order)
+    po_rows, poi_rows, gr_rows = [], [], []
+    po_item_id = 0
+    for po_number, order_date in enumerate(_order_dates(rng, po_count, start, days), start=1):
+        roll = rng.random()
+        status = "Completed" if roll < 0.7 else ("Partially Received" if roll < 0.9 else "Pending")
+        supplier_id = rng.randrange(1, suppliers + 1)
+        subtotal = total_gst = 0.0
+        for item_id in rng.sample(range(1, items + 1), lines_per_order):
+            rate, gst_percent, _, _ = prices[item_id]
+            qty = rng.randrange(1, 100)
+            gst_amount = round(rate * qty * gst_percent / 100, 2)
+            po_item_id += 1
+            poi_rows.append((po_item_id, po_number, item_id, qty, rate, gst_percent, gst_amount, rate * qty + gst_amount))
+            subtotal += rate * qty
+            total_gst += gst_amount
+            if status != "Pending":
+                accepted = qty if status == "Completed" else rng.randrange(0, qty)
+                gr_rows.append((po_number, item_id, supplier_id, f"SINV-{po_number:08d}", accepted, accepted, 0,
+                                order_date + timedelta(days=7), ""))
+        po_rows.append((po_number, supplier_id, order_date, order_date + timedelta(days=7), status,
+                        subtotal, total_gst, subtotal + total_gst))
+    conn.executemany('''INSERT INTO Purchase_Orders (po_number, supplier_id, order_date, expected_delivery, status,
+        subtotal, total_gst, total_amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', po_rows)
+    conn.executemany('''INSERT INTO Purchase_Order_Items (po_item_id, po_number, item_id, quantity, rate,
+        gst_percent, gst_amount, total_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', poi_rows)
+    conn.executemany('''INSERT INTO Goods_Receipt (po_number, item_id, supplier_id, invoice_number,
+        received_quantity, accepted_quantity, rejected_quantity, receipt_date, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', gr_rows)
+
+    # ---- Sales side ----
+    so_lines_target = order_lines - po_lines_target
+    so_count = max(1, so_lines_target // lines_per_order)
+    so_rows, soi_rows, delivery_rows, invoice_rows = [], [], [], []
+    so_item_id = 0
+    for so_number, order_date in enumerate(_order_dates(rng, so_count, start, days), start=1):
+        roll = rng.random()
+        status = "Delivered" if roll < 0.6 else ("Partially Delivered" if roll < 0.7 else "Pending")
+        customer_id = rng.randrange(1, customers + 1)
+        subtotal = total_gst = 0.0
+        for item_id in rng.sample(range(1, items + 1), lines_per_order):
+            _, _, rate, gst_percent = prices[item_id]
+            qty = rng.randrange(1, 20)
+            gst_amount = round(rate * qty * gst_percent / 100, 2)
+            so_item_id += 1
+            soi_rows.append((so_item_id, so_number, item_id, qty, rate, gst_percent, gst_amount, rate * qty + gst_amount))
+            subtotal += rate * qty
+            total_gst += gst_amount
+            if status != "Pending":
+                delivered = qty if status == "Delivered" else rng.randrange(0, qty)
+                if delivered:
+                    delivery_rows.append((so_number, item_id, delivered, order_date + timedelta(days=5)))
+        delivery_date = order_date + timedelta(days=5)
+        so_rows.append((so_number, customer_id, order_date, delivery_date, status,
+                        subtotal, total_gst, subtotal + total_gst))
+        # Most delivered orders are invoiced, most invoices are paid
+        if status == "Delivered" and rng.random() < 0.9:
+            invoice_rows.append((so_number, customer_id, delivery_date, delivery_date + timedelta(days=30),
+                                 subtotal, total_gst, subtotal + total_gst,
+                                 "Paid" if rng.random() < 0.8 else "Unpaid"))
+    conn.executemany('''INSERT INTO Sales_Orders (so_number, customer_id, order_date, delivery_date, status,
+        subtotal, total_gst, total_amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', so_rows)
+    conn.executemany('''INSERT INTO Sales_Order_Items (so_item_id, so_number, item_id, quantity, rate,
+        gst_percent, gst_amount, total_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', soi_rows)
+    conn.executemany('''INSERT INTO Sales_Deliveries (so_number, item_id, quantity, delivery_date)
+        VALUES (?, ?, ?, ?)''', delivery_rows)
+    conn.executemany('''INSERT INTO Invoices (so_number, customer_id, invoice_date, due_date, subtotal,
+        total_gst, total_amount, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', invoice_rows)
+    # Open orders hold the rest of their lines
+    rebuild_reservations(conn)
+
+    conn.commit()
+    return {
+        'items': items, 'suppliers': suppliers, 'customers': customers,
+        'purchase_orders': len(po_rows), 'purchase_order_items': len(poi_rows), 'goods_receipts': len(gr_rows),
+        'sales_orders': len(so_rows), 'sales_order_items': len(soi_rows),
+        'sales_deliveries': len(delivery_rows), 'invoices': len(invoice_rows),
+    }
@@ -0,0 +1,102 @@
+"""
+Search Module - Full-text search over items, customers, suppliers and goods receipts
+Run: python search.py DATABASE TEXT...
+"""
+
+import argparse
+import re
+import time
+from collections import namedtuple
+
+import queries
+
+# Searching starts at MIN_TERM_LENGTH characters: the indexes keep prefix
+# indexes for 2 and 3 characters so short prefixes stay fast (migration 10)
+MIN_TERM_LENGTH = 2
+
+RESULTS_PER_KIND = 10
+# Best-ranked matches taken from each index before joining; well above
+# RESULTS_PER_KIND so receipts with many matching lines still fill their results
+CANDIDATES = 500
+
+# Order of the kinds when their scores tie
+KIND_ORDER = ('item', 'customer', 'supplier', 'receipt')
+
+SearchResult = namedtuple('SearchResult', 'kind key title detail rank')
+
+_TERM = re.compile(r"\w+")
+
+
+# ==================== SEARCHING ====================
+
+def search_terms(text):
+    """The words of a search box entry, ignoring ones too short to search on"""
+    return [term for term in _TERM.findall(text) if len(term) >= MIN_TERM_LENGTH]
+
+
+def match_expression(terms):
+    """FTS5 query matching rows that contain every term as a word prefix"""
+    return ' '.join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+
+def has_index(report):
+    """True once migration 10 has built the search indexes"""
+    return report.fetchone(queries.SEARCH_INDEX_COUNT, ('Items_FTS',))[0] > 0
+
+
+def search(report, text, limit=RESULTS_PER_KIND):
+    """Best matches for `text` across items, customers, suppliers and receipts,
+    most relevant first: [SearchResult]. `report` is a ReportConnection.
+    Falls back to LIKE when SQLite was built without FTS5."""
+    terms = search_terms(text)
+    if not terms:
+        return []
+    if has_index(report):
+        match = match_expression(terms)
+        rows = [(kind, report.fetchall(sql, (match, CANDIDATES, limit))) for kind, sql in (
+            ('item', queries.ITEM_SEARCH), ('customer', queries.CUSTOMER_SEARCH),
+            ('supplier', queries.SUPPLIER_SEARCH), ('receipt', queries.RECEIPT_SEARCH))]
+    else:
+        # Unranked and unindexed: rows containing the longest term anywhere
+        pattern = '%' + max(terms, key=len).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        rows = [(kind, report.fetchall(sql, (pattern,) * columns + (limit,))) for kind, sql, columns in (
+            ('item', queries.ITEM_SEARCH_LIKE, 4), ('customer', queries.CUSTOMER_SEARCH_LIKE, 5),
+            ('supplier', queries.SUPPLIER_SEARCH_LIKE, 5), ('receipt', queries.RECEIPT_SEARCH_LIKE, 2))]
+    results = [SearchResult(kind, *row) for kind, found in rows for row in found]
+    best = {}
+    for result in results:
+        best[result.kind] = min(best.get(result.kind, 0), result.rank)
+    results.sort(key=lambda r: (-relevance(r, best[r.kind]), KIND_ORDER.index(r.kind), r.rank))
+    return results
+
+
+def relevance(result, best):
+    """Score of a result relative to the best one of its kind, from 0 to 1.
+    bm25 values of different indexes and weights are not comparable, their
+    ratios within one index are. (bm25 ranks are negative; LIKE ranks are 0.)"""
+    return result.rank / best if best else 1.0
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Search items, customers, suppliers and receipts")
+    parser.add_argument('database')
+    parser.add_argument('text', nargs='+')
+    args = parser.parse_args()
+
+    db = Database(args.database)
+    try:
+        started = time.perf_counter()
+        results = search(db.reports, ' '.join(args.text))
+        elapsed = (time.perf_counter() - started) * 1000
+        for result in results:
+            print(f"{result.kind:<9} {str(result.key):<14} {result.title:<40} {result.detail}")
+        print(f"{len(results)} result(s) in {elapsed:.1f} ms")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Stock Ledger Module - Append-only inventory movements, reservations, monthly snapshots
+and stock as of a date
+Run: python stock_ledger.py [database] [--as-of YYYY-MM-DD] [--snapshot]
+Without options the on-hand and reserved figures are checked against the ledger and reservations.
+"""
+
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+
+import queries
+
+# Source types written to Inventory_Movements (receipts, receipt edits and
+# deliveries are posted by triggers, see migrations.STOCK_LEDGER_TRIGGERS)
+OPENING = 'opening'
+ADJUSTMENT = 'adjustment'
+
+
+# ==================== MOVEMENTS ====================
+
+def adjust_stock(db, item_id, quantity, source_type=ADJUSTMENT, source_id=None, notes=None):
+    """Post a signed stock movement for one item (caller's transaction).
+    The ledger trigger updates Inventory.quantity_on_hand."""
+    if quantity:
+        db.execute(queries.MOVEMENT_INSERT, (item_id, quantity, source_type, source_id, notes))
+
+
+def _day(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value
+
+
+def stock_as_of(conn, item_id, day):
+    """Stock of one item at the end of `day` (date or YYYY-MM-DD): the latest
+    snapshot on or before the next morning plus the movements after it"""
+    before = (_day(day) + timedelta(days=1)).isoformat()
+    snapshot = conn.execute(queries.STOCK_SNAPSHOT_BEFORE, (item_id, before)).fetchone()
+    start, balance = snapshot if snapshot else ('', 0)
+    moved = conn.execute(queries.STOCK_MOVED_BETWEEN, (item_id, start, before)).fetchone()[0]
+    return balance + moved
+
+
+# ==================== RESERVATIONS ====================
+# Open sales orders reserve their lines. Available-to-promise is
+# quantity_on_hand - reserved_quantity; deliveries use up the reservation
+# (trigger on Sales_Deliveries, migration 8).
+
+class InsufficientStock(ValueError):
+    """Some lines of an order could not be reserved; `shortages` is
+    [(item_id, requested, available)]"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for {len(shortages)} item(s)")
+
+
+def reserve_stock(db, so_number, lines):
+    """Reserve [(item_id, quantity)] for an SO with one set-based UPDATE (caller's
+    transaction, which holds the write lock). Reserves all or nothing: raises
+    InsufficientStock when any line is short."""
+    wanted = {}
+    for item_id, quantity in lines:
+        wanted[item_id] = wanted.get(item_id, 0) + quantity
+    if not wanted:
+        return
+    try:
+        with db.savepoint():
+            reserved = db.execute(queries.STOCK_RESERVE, (json.dumps(list(wanted.items())),)).rowcount
+            if reserved != len(wanted):
+                raise InsufficientStock([])
+    except InsufficientStock:
+        # The savepoint has put back the lines that did fit; report the ones that did not
+        db.execute(queries.STOCK_FOR_ITEMS, (json.dumps(list(wanted)),))
+        raise InsufficientStock([(row.item_id, wanted[row.item_id], row.available)
+                                 for row in db.fetchall() if row.available < wanted[row.item_id]])
+    db.insert_many("Stock_Reservations", queries.RESERVATION_COLUMNS,
+                   [(so_number, item_id, quantity) for item_id, quantity in wanted.items()])
+
+
+def release_reservations(db, so_number):
+    """Give back everything an SO still holds (caller's transaction)"""
+    db.execute(queries.STOCK_UNRESERVE, (so_number,))
+    db.execute(queries.RESERVATIONS_DELETE, (so_number,))
+
+
+def rebuild_reservations(conn):
+    """Recreate the reservations of every open SO from what it still has to deliver,
+    even where that is more than is on hand today (caller commits)"""
+    conn.execute("DELETE FROM Stock_Reservations")
+    conn.execute('''INSERT INTO Stock_Reservations (so_number, item_id, quantity)
+        SELECT soi.so_number, soi.item_id, SUM(soi.quantity - soi.delivered_quantity)
+        FROM Sales_Order_Items soi JOIN Sales_Orders so ON so.so_number = soi.so_number
+        WHERE so.status IN ('Pending', 'Partially Delivered')
+        GROUP BY soi.so_number, soi.item_id
+        HAVING SUM(soi.quantity - soi.delivered_quantity) > 0''')
+    conn.execute('''UPDATE Inventory SET reserved_quantity =
+        (SELECT COALESCE(SUM(quantity), 0) FROM Stock_Reservations WHERE item_id = Inventory.item_id)''')
+
+
+# ==================== SNAPSHOTS ====================
+# A snapshot dated D holds each item's stock at the start of D (every movement
+# before D). They are taken on the first of each month.
+
+def take_snapshot(conn, day):
+    """Snapshot every item's stock at the start of `day`, building on the previous
+    snapshot so only one month of movements is read (caller commits)"""
+    day = _day(day).isoformat()
+    return conn.execute('''INSERT OR REPLACE INTO Inventory_Snapshots (item_id, snapshot_date, quantity_on_hand)
+        SELECT inv.item_id, ?, COALESCE(prev.quantity_on_hand, 0) +
+            (SELECT COALESCE(SUM(m.quantity), 0) FROM Inventory_Movements m
+             WHERE m.item_id = inv.item_id AND m.movement_date >= COALESCE(prev.snapshot_date, '')
+             AND m.movement_date < ?)
+        FROM Inventory inv
+        LEFT JOIN Inventory_Snapshots prev ON prev.item_id = inv.item_id
+            AND prev.snapshot_date = (SELECT MAX(snapshot_date) FROM Inventory_Snapshots
+                                      WHERE item_id = inv.item_id AND snapshot_date < ?)''',
+        (day, day, day)).rowcount
+
+
+def month_starts(first, last):
+    """First day of every month after `first` up to and including `last`"""
+    year, month = first.year, first.month
+    while True:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        day = date(year, month, 1)
+        if day > last:
+            return
+        yield day
+
+
+def ensure_snapshots(db, today=None):
+    """Take the month-start snapshots that are missing up to today; returns the dates taken.
+    Costs one query when nothing is due."""
+    today = today or date.today()
+    latest, first = db.conn.execute('''SELECT (SELECT MAX(snapshot_date) FROM Inventory_Snapshots),
+        (SELECT MIN(movement_date) FROM Inventory_Movements)''').fetchone()
+    if latest:
+        start = _day(latest)
+    elif first:
+        start = _day(first)
+    else:
+        return []
+    taken = []
+    for day in month_starts(start, today):
+        with db.transaction():
+            take_snapshot(db.conn, day)
+        taken.append(day)
+    return taken
+
+
+# ==================== VERIFICATION ====================
+
+def check(conn):
+    """Replay the whole ledger and compare it with Inventory.quantity_on_hand;
+    returns [(item_id, on_hand, ledger)] for items that disagree"""
+    return conn.execute('''SELECT inv.item_id, inv.quantity_on_hand, COALESCE(m.total, 0)
+        FROM Inventory inv
+        LEFT JOIN (SELECT item_id, SUM(quantity) AS total FROM Inventory_Movements GROUP BY item_id) m
+            ON m.item_id = inv.item_id
+        WHERE COALESCE(inv.quantity_on_hand, 0) != COALESCE(m.total, 0)
+        ORDER BY inv.item_id''').fetchall()
+
+
+def check_reservations(conn):
+    """Compare Inventory.reserved_quantity with the reservation rows;
+    returns [(item_id, reserved, held)] for items that disagree"""
+    return conn.execute('''SELECT inv.item_id, inv.reserved_quantity, COALESCE(r.total, 0)
+        FROM Inventory inv
+        LEFT JOIN (SELECT item_id, SUM(quantity) AS total FROM Stock_Reservations GROUP BY item_id) r
+            ON r.item_id = inv.item_id
+        WHERE inv.reserved_quantity != COALESCE(r.total, 0)
+        ORDER BY inv.item_id''').fetchall()
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    from database import Database
+    from migrations import console_progress
+
+    parser = argparse.ArgumentParser(description="Check the stock ledger, take snapshots or report stock as of a date")
+    parser.add_argument('database', nargs='?', default='integrated_system.db')
+    parser.add_argument('--as-of', help="Print every item's stock at the end of this date (YYYY-MM-DD)")
+    parser.add_argument('--snapshot', action='store_true', help="Take any month-start snapshots that are due")
+    args = parser.parse_args()
+
+    db = Database(args.database, progress=console_progress)
+    try:
+        if args.snapshot:
+            taken = ensure_snapshots(db)
+            print(f"{len(taken)} snapshot(s) taken" + (f": {', '.join(map(str, taken))}" if taken else ""))
+            return
+        if args.as_of:
+            for item_id, name in db.conn.execute("SELECT item_id, name FROM Items ORDER BY item_id").fetchall():
+                print(f"{item_id:>8}  {name:<40} {stock_as_of(db.conn, item_id, args.as_of):>10,}")
+            return
+        mismatches = check(db.conn)
+        for item_id, on_hand, ledger in mismatches:
+            print(f"Item {item_id:<8} on hand {on_hand:>10,}   ledger {ledger:>10,}")
+        total = db.conn.execute("SELECT COUNT(*) FROM Inventory").fetchone()[0]
+        print(f"{total - len(mismatches)}/{total} items match the ledger")
+        reservations = check_reservations(db.conn)
+        for item_id, reserved, held in reservations:
+            print(f"Item {item_id:<8} reserved {reserved:>10,}   open orders hold {held:>10,}")
+        print(f"{total - len(reservations)}/{total} items match their reservations")
+        mismatches += reservations
+    finally:
+        db.close()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
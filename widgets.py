@@ -0,0 +1,504 @@
+"""
+Widgets Module - Treeview helpers: refreshing only the rows that changed, a
+virtual list that shows a query of any size by keeping only a window of it,
+and rows of labels that are updated in place
+"""
+
+from bisect import bisect_left
+from tkinter import ttk, messagebox
+
+from executor import show_loading
+
+PAGE_SIZE = 100         # rows fetched per page
+MAX_PAGES = 5           # pages kept in the Treeview before the far end is dropped
+EDGE_ROWS = 30          # fetch the next page once the view is this close to the end of the window
+SORT_ARROWS = {False: " ▲", True: " ▼"}
+
+
+# ==================== SYNCHRONIZING ====================
+
+def scroll_to_index(tree, index, count):
+    """Put the index-th of count rows at the top of a Treeview's view"""
+    if count:
+        tree.update_idletasks()  # the Treeview only learns its new row count on layout
+        ttk.Treeview.yview(tree, 'moveto', (index + 0.25) / count)
+
+
+def top_index(tree, count):
+    """Index of the row at the top of a Treeview's view"""
+    return min(int(ttk.Treeview.yview(tree)[0] * count + 0.5), max(count - 1, 0))
+
+
+def longest_increasing(positions):
+    """Indexes of a longest increasing subsequence of `positions` (patience sorting)"""
+    tails, tail_index = [], []
+    previous = [None] * len(positions)
+    for i, position in enumerate(positions):
+        j = bisect_left(tails, position)
+        if j == len(tails):
+            tails.append(position)
+            tail_index.append(i)
+        else:
+            tails[j] = position
+            tail_index[j] = i
+        previous[i] = tail_index[j - 1] if j else None
+    kept = set()
+    i = tail_index[-1] if tail_index else None
+    while i is not None:
+        kept.add(i)
+        i = previous[i]
+    return kept
+
+
+class TreeSynchronizer:
+    """Brings a flat Treeview in line with a fresh list of rows by touching only
+    the rows that changed.
+
+    Tree items are keyed by the record's primary key (`key(row)`, used as the
+    item id). sync() deletes items whose record is gone, rewrites those whose
+    row differs from the one shown, inserts new ones and moves the fewest
+    items needed to reach the new order: the longest run already in order
+    stays put. Selected rows stay selected and the row at the top of the view
+    stays at the top, so a refresh after one edit costs one item update
+    however long the list is.
+    """
+
+    def __init__(self, tree, key, format_row):
+        self.tree = tree
+        self.key = key                  # row -> primary key
+        self.format_row = format_row    # row -> (values, tags)
+        self.shown = {}                 # item id -> the row it shows
+
+    def sync(self, rows):
+        """Show `rows` in this order; returns (inserted, updated, moved, deleted)"""
+        tree = self.tree
+        order, new = [], {}
+        for row in rows:
+            item = str(self.key(row))
+            if item not in new:
+                order.append(item)
+                new[item] = row
+        children = tree.get_children()
+        top = children[top_index(tree, len(children))] if children else None
+        selected = tree.selection()
+
+        # Items that are not ours (a loading row) count as removed
+        deleted = [item for item in children if item not in new or item not in self.shown]
+        if deleted:
+            tree.delete(*deleted)
+        kept = [item for item in children if item in new and item in self.shown]
+        position = {item: i for i, item in enumerate(order)}
+        in_order = longest_increasing([position[item] for item in kept])
+        moved = [item for i, item in enumerate(kept) if i not in in_order]
+        if moved:
+            # Out of the way first, so the rows left are a subsequence of the new order
+            tree.detach(*moved)
+        moved, present = set(moved), set(kept)
+
+        inserted = updated = 0
+        for index, item in enumerate(order):
+            row = new[item]
+            if item in moved:
+                tree.move(item, '', index)
+            if item not in present:
+                values, tags = self.format_row(row)
+                tree.insert('', index, iid=item, values=values, tags=tags)
+                inserted += 1
+            elif self.shown[item] != row:
+                values, tags = self.format_row(row)
+                tree.item(item, values=values, tags=tags)
+                updated += 1
+        self.shown = new
+
+        if moved and selected:
+            tree.selection_set([item for item in selected if item in new])
+        if top in new and (deleted or moved or inserted):
+            scroll_to_index(tree, position[top], len(order))
+        return inserted, updated, len(moved), len(deleted)
+
+    def sync_keys(self, keys, rows):
+        """Bring just the records `keys` up to date from their fresh `rows` (those
+        still in the list), for lists ordered by their key. Returns (updated,
+        deleted), or None when a row is new and sync() has to place it."""
+        tree = self.tree
+        fresh = {str(self.key(row)): row for row in rows}
+        if any(item not in self.shown for item in fresh):
+            return None
+        updated = deleted = 0
+        for item in map(str, keys):
+            if item in fresh:
+                if self.shown[item] != fresh[item]:
+                    values, tags = self.format_row(fresh[item])
+                    tree.item(item, values=values, tags=tags)
+                    self.shown[item] = fresh[item]
+                    updated += 1
+            elif item in self.shown:
+                tree.delete(item)
+                del self.shown[item]
+                deleted += 1
+        return updated, deleted
+
+
+class VirtualTreeview(ttk.Treeview):
+    """Treeview over a list query that only holds the rows around the view.
+
+    `query` is a plain SELECT without ORDER BY; the widget wraps it as
+    SELECT * FROM (query) WHERE ... ORDER BY ... LIMIT ? and pages through
+    it by keyset: the next page starts after the sort value and key of the
+    last row held, so a page costs the same at row 100 and at row 100,000.
+    Rows are loaded on the QueryExecutor as the view nears either end of the
+    window, and pages that drift out of reach are dropped again.
+
+    `key` is the query's unique output column (it is also each row's item id),
+    `sort_columns` maps a heading to the output column it sorts by; clicking
+    the heading re-sorts in SQL. `format_row(row)` returns (values, tags).
+    The attached scrollbar covers the whole list - dragging it far away
+    loads a new window at that position.
+    """
+
+    def __init__(self, parent, executor, name, query, key, columns, widths, format_row,
+                 sort_columns=None, descending=False, **options):
+        super().__init__(parent, columns=columns, show='headings', **options)
+        self.executor = executor
+        self.name = name                # executor job key
+        self.query = query
+        self.key = key
+        self.sort_columns = sort_columns or {}
+        self.sort = key
+        self.descending = descending
+        self.rows = []                  # the rows in the Treeview, in display order
+        self.start = 0                  # position of rows[0] in the whole list
+        self.total = 0
+        self._busy = False              # a window or page is being loaded
+        self._scrollbar = None
+        self._sync = TreeSynchronizer(self, lambda row: getattr(row, key), format_row)
+        for heading, width in zip(columns, widths):
+            self.heading(heading, text=heading)
+            self.column(heading, width=width)
+            if heading in self.sort_columns:
+                self.heading(heading, command=lambda h=heading: self.sort_by(h))
+        self._show_sort()
+
+    def set_scrollbar(self, scrollbar):
+        """Drive a vertical scrollbar that spans the whole list rather than the window"""
+        self._scrollbar = scrollbar
+        scrollbar.configure(command=self.yview)
+        self.configure(yscrollcommand=self._scrolled)
+
+    # ==================== LOADING ====================
+
+    def refresh(self):
+        """Reload in the background, keeping the top row, the selection and the sort"""
+        anchor = self._top_row()
+        if not self.rows:
+            show_loading(self)
+        self._load(lambda report: self._window_at(report, anchor))
+
+    def refresh_rows(self, keys):
+        """Re-read only these rows (by key) after a save: rows in the window are
+        updated in place and rows that left the list are dropped. A new row that
+        lands inside the window, or any change while sorted by another column,
+        reloads the window instead."""
+        if keys is None or self._busy or self.sort != self.key or not self.rows:
+            self.refresh()
+            return
+        keys = list(keys)
+        sql = f"SELECT * FROM ({self.query}) WHERE {self.key} IN ({', '.join('?' * len(keys))})"
+        self._busy = True
+        self.executor.submit(self.name, lambda report: report.fetchall(sql, keys),
+                             lambda rows: self._update_rows(keys, rows), self._failed)
+
+    def reload(self):
+        """Reload from the top of the list (after the query or sort changed)"""
+        if not self.rows:
+            show_loading(self)
+        self._load(lambda report: self._window_at(report, None))
+
+    def reveal(self, value, column=None, on_done=None):
+        """Load the window around the first row whose `column` (default the key)
+        equals `value` and select it; on_done(found) is called afterwards"""
+        column = column or self.key
+
+        def work(report):
+            row = report.fetchone(f"SELECT * FROM ({self.query}) WHERE {column} = ? "
+                                  f"ORDER BY {self._order_by()} LIMIT 1", (value,))
+            return row, self._window_at(report, row) if row else None
+
+        def show(result):
+            row, window = result
+            if row is None:
+                # This job replaced any load still pending under our key, so load
+                # the window anyway rather than leave the list empty or stale
+                self._busy = False
+                if self.rows:
+                    self.refresh()
+                else:
+                    self.reload()
+            else:
+                self._show_window(window)
+                item = self._item_id(row)
+                self.selection_set(item)
+                self.focus(item)
+                self.see(item)
+                self.focus_set()
+            if on_done:
+                on_done(row is not None)
+
+        self._busy = True
+        self.executor.submit(self.name, work, show, self._failed)
+
+    def _load(self, work):
+        self._busy = True
+        self.executor.submit(self.name, work, self._show_window, self._failed)
+
+    def _failed(self, error):
+        self._busy = False
+        messagebox.showerror("Error", f"Could not load data: {error}")
+
+    # ==================== SQL ====================
+
+    def _terms(self):
+        """ORDER BY terms: the sort column (NULL sorts as '') and the key as tie-breaker"""
+        if self.sort == self.key:
+            return [self.key]
+        return [f"COALESCE({self.sort}, '')", self.key]
+
+    def _boundary(self, row):
+        """Values of the ORDER BY terms for a row"""
+        key = getattr(row, self.key)
+        if self.sort == self.key:
+            return (key,)
+        value = getattr(row, self.sort)
+        return ('' if value is None else value, key)
+
+    def _order_by(self, reverse=False):
+        direction = ' DESC' if self.descending != reverse else ''
+        return ', '.join(term + direction for term in self._terms())
+
+    def _after(self, reverse=False, inclusive=False):
+        """Keyset condition: rows after a boundary in list order (before it with reverse)"""
+        operator = ('<' if self.descending != reverse else '>') + ('=' if inclusive else '')
+        terms = self._terms()
+        if len(terms) == 1:
+            return f"{terms[0]} {operator} ?"
+        return f"({', '.join(terms)}) {operator} ({', '.join('?' * len(terms))})"
+
+    def _page_sql(self, where='1', reverse=False):
+        return (f"SELECT * FROM ({self.query}) WHERE {where} "
+                f"ORDER BY {self._order_by(reverse)} LIMIT ? OFFSET ?")
+
+    def _count_sql(self, where='1'):
+        return f"SELECT COUNT(*) FROM ({self.query}) WHERE {where}"
+
+    # ==================== WORKER SIDE ====================
+    # These run on an executor thread: SQL only, no Tk calls.
+
+    def _window_at(self, report, anchor):
+        """A window starting at `anchor` (a row; None for the top of the list)
+        with a page above it: (total, start, rows, index of the anchor)"""
+        total = report.fetchone(self._count_sql())[0]
+        if anchor is None:
+            return total, 0, report.fetchall(self._page_sql(), (PAGE_SIZE * 2, 0)), 0
+        boundary = self._boundary(anchor)
+        above = report.fetchall(self._page_sql(self._after(reverse=True), reverse=True),
+                                boundary + (PAGE_SIZE, 0))
+        below = report.fetchall(self._page_sql(self._after(inclusive=True)), boundary + (PAGE_SIZE * 2, 0))
+        before = report.fetchone(self._count_sql(self._after(reverse=True)), boundary)[0]
+        return total, before - len(above), above[::-1] + below, len(above)
+
+    def _window_at_position(self, report, position):
+        """A window around the row at `position` in the whole list.
+        OFFSET has to step over the rows before it, so this is only used for
+        scrollbar jumps; scrolling itself pages by keyset."""
+        total = report.fetchone(self._count_sql())[0]
+        position = max(0, min(position, total - 1))
+        start = max(0, position - PAGE_SIZE)
+        rows = report.fetchall(self._page_sql(), (PAGE_SIZE * 2, start))
+        return total, start, rows, position - start
+
+    # ==================== TK SIDE ====================
+
+    def _item_id(self, row):
+        return str(getattr(row, self.key))
+
+    def _top_row(self):
+        if not self.rows:
+            return None
+        return self.rows[top_index(self, len(self.rows))]
+
+    def _show_window(self, window):
+        total, start, rows, top = window
+        self.total, self.start = total, start
+        # Rows edited while the window was read can come round a second time
+        seen, self.rows = set(), []
+        for row in rows:
+            if self._item_id(row) not in seen:
+                seen.add(self._item_id(row))
+                self.rows.append(row)
+        self._sync.sync(self.rows)
+        scroll_to_index(self, top, len(self.rows))
+        self._busy = False
+        self._scrolled(*super().yview())
+
+    def _update_rows(self, keys, rows):
+        self._busy = False
+        fresh = {self._item_id(row): row for row in rows}
+        shown = {self._item_id(row) for row in self.rows}
+        first, last = getattr(self.rows[0], self.key), getattr(self.rows[-1], self.key)
+        for item, row in fresh.items():
+            if item in shown:
+                continue
+            key = getattr(row, self.key)
+            before = key < first if not self.descending else key > first
+            after = key > last if not self.descending else key < last
+            if (not before and not after) or (before and self.start == 0) or \
+                    (after and self.start + len(self.rows) >= self.total):
+                self.refresh()  # it belongs in the window
+                return
+            self.total += 1
+            if before:
+                self.start += 1
+        asked = set(map(str, keys))
+        gone = {item for item in shown if item in asked and item not in fresh}
+        self.rows = [fresh.get(self._item_id(row), row) for row in self.rows if self._item_id(row) not in gone]
+        self.total -= len(gone)
+        self._sync.sync(self.rows)
+        self._scrolled(*super().yview())
+
+    def _fetch_page(self, reverse):
+        boundary = self._boundary(self.rows[0] if reverse else self.rows[-1])
+        sql = self._page_sql(self._after(reverse), reverse)
+        self._busy = True
+        self.executor.submit(self.name, lambda report: report.fetchall(sql, boundary + (PAGE_SIZE, 0)),
+                             lambda rows: self._add_page(rows, reverse), self._failed)
+
+    def _add_page(self, rows, reverse):
+        """Add a fetched page at one end of the window and drop pages from the other.
+        The synchronizer keeps the top row in place while rows come and go around it."""
+        held = set(map(self._item_id, self.rows))
+        rows = [row for row in rows if self._item_id(row) not in held]
+        excess = len(self.rows) + len(rows) - PAGE_SIZE * MAX_PAGES
+        if not rows:
+            # The list is shorter than when it was counted
+            if reverse:
+                self.total -= self.start
+                self.start = 0
+            else:
+                self.total = self.start + len(self.rows)
+        elif reverse:
+            self.rows[:0] = rows[::-1]
+            self.start = max(0, self.start - len(rows))
+            if excess > 0:
+                del self.rows[-excess:]
+        else:
+            self.rows.extend(rows)
+            if excess > 0:
+                del self.rows[:excess]
+                self.start += excess
+        self._sync.sync(self.rows)
+        self._busy = False
+        self._scrolled(*super().yview())
+
+    def _scrolled(self, first, last):
+        """yscrollcommand: place the scrollbar within the whole list, fetch near the ends"""
+        first, last = float(first), float(last)
+        count = len(self.rows)
+        if self._scrollbar is not None:
+            if self.total and count:
+                self._scrollbar.set((self.start + first * count) / self.total,
+                                    (self.start + last * count) / self.total)
+            else:
+                self._scrollbar.set(first, last)
+        if self._busy or not count:
+            return
+        if (1 - last) * count < EDGE_ROWS and self.start + count < self.total:
+            self._fetch_page(reverse=False)
+        elif first * count < EDGE_ROWS and self.start > 0:
+            self._fetch_page(reverse=True)
+
+    def yview(self, *args):
+        """Scrollbar command. 'moveto' is a place in the whole list, which may
+        need a new window; scrolling by units and pages stays native."""
+        if len(args) == 2 and args[0] == 'moveto' and self.total and self.rows:
+            self._move_to(float(args[1]) * self.total)
+            return None
+        return super().yview(*args)
+
+    def _move_to(self, position):
+        visible = int(self.cget('height'))
+        position = int(max(0, min(position, self.total - visible)))
+        if self.start <= position and position + visible <= self.start + len(self.rows):
+            super().yview('moveto', (position - self.start + 0.25) / len(self.rows))
+            return
+        if self._scrollbar is not None:
+            self._scrollbar.set(position / self.total, (position + visible) / self.total)
+        self._load(lambda report: self._window_at_position(report, position))
+
+    # ==================== SORTING ====================
+
+    def sort_by(self, heading):
+        """Heading click: sort by that column, or reverse the order if it already is"""
+        column = self.sort_columns[heading]
+        if column == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = column, False
+        self._show_sort()
+        self.reload()
+
+    def _show_sort(self):
+        for heading, column in self.sort_columns.items():
+            arrow = SORT_ARROWS[self.descending] if column == self.sort else ""
+            self.heading(heading, text=heading + arrow)
+
+
+# ==================== LABEL ROWS ====================
+
+class LabelRows:
+    """A table of labels laid out from one column template, updated in place.
+
+    columns is [(width, font)]. show(rows) takes one [(text, colour)] per row,
+    colour None for the default. Label rows are only created when there are
+    more rows than ever before, spare ones are hidden, and only cells whose
+    text or colour changed are reconfigured, so a refresh does not flicker.
+    """
+
+    def __init__(self, parent, columns, padx=5, pady=2):
+        self.frame = ttk.Frame(parent)
+        self.columns = columns
+        self.padx = padx
+        self.pady = pady
+        self.rows = []      # (row frame, labels, cells shown)
+        self.shown = 0      # rows currently packed
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def _add_row(self):
+        frame = ttk.Frame(self.frame)
+        labels = []
+        for width, font in self.columns:
+            label = ttk.Label(frame, font=font, width=width)
+            label.pack(side='left', padx=self.padx)
+            labels.append(label)
+        return frame, labels, [None] * len(self.columns)
+
+    def show(self, rows):
+        """Display these rows; returns how many cells changed"""
+        changed = 0
+        for index, cells in enumerate(rows):
+            if index == len(self.rows):
+                self.rows.append(self._add_row())
+            frame, labels, shown = self.rows[index]
+            for position, cell in enumerate(cells):
+                if shown[position] != cell:
+                    text, color = cell
+                    labels[position].configure(text=text, foreground=color or '')
+                    shown[position] = cell
+                    changed += 1
+            if index >= self.shown:
+                frame.pack(fill='x', pady=self.pady)  # hidden rows are always the last ones
+        for frame, _, _ in self.rows[len(rows):self.shown]:
+            frame.pack_forget()
+        self.shown = len(rows)
+        return changed